@@ -1,7 +1,18 @@
 #!/usr/bin/env python3
+import argparse
+import contextlib
 import os
 import re
-import glob
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+
+from tstools import findings, git_diff, paths, profiling, regex_guard
+from tstools.rewrite_engine import REWRITE_RULES, atomic_write, change_records, rewrite_files
+from tstools.scan_engine import SOURCE_EXTENSIONS, ScanStats
+from tstools.trigram_index import open_index
+from tstools.ts_lexer import IDENT, match_sequence, tokenize_all
 
 # 要修复的目录
 directories = [
@@ -16,44 +27,103 @@ directories = [
     'config'
 ]
 
-# 修复模式
+# 修复模式（按token序列匹配，字符串和注释里的文本不会被改动）
+# 命中后保留前 keep 个token，删除其后直到最后一个token之前的内容
 patterns = [
     {
-        'pattern': re.compile(r'(\(\s*\w+:\s*\w+)\s*:\s*any\s*\)'),
-        'replacement': r'\1)',
+        # (request: any: any) -> (request: any)
+        'tokens': ('(', IDENT, ':', IDENT, ':', 'any', ')'),
+        'keep': 4,
         'description': '修复箭头函数参数类型注解错误'
     },
     {
-        'pattern': re.compile(r'(\w+\s*:\s*\w+)\s*:\s*any(\)|,)'),
-        'replacement': r'\1\2',
+        # admin: any: any, -> admin: any,
+        'tokens': (IDENT, ':', IDENT, ':', 'any', (')', ',')),
+        'keep': 3,
         'description': '修复函数参数类型注解错误'
     }
 ]
 
+# 两种模式都以 IDENT ':' IDENT ':' any 为核心，any 分别是第 6 / 第 5 个token
+ANCHOR = 'any'
+for pattern_info in patterns:
+    pattern_info['anchor'] = pattern_info['tokens'].index(ANCHOR)
+
+# 原始文本上的预筛（线性的正则，不含嵌套量词）。能匹配修复模式的 token 之间只隔着空白时
+# _CANDIDATE_RE 必定命中；隔着注释时，注释紧跟在某个 : 之后，或以 */、换行结束后紧跟 :，
+# _COMMENT_GAP_RE 必定命中
+_CANDIDATE_RE = re.compile(r':\s*[\w$]+\s*:\s*any(?![\w$])')
+_COMMENT_GAP_RE = re.compile(r':\s*/[/*]|\*/\s*:|\n[^\S\n]*:')
+
 def has_syntax_errors(content):
     return ':' in content and ': any' in content
 
+def fix_content(content, lines=None, tokens=None):
+    """
+    从每个 any token 出发向前匹配修复模式，返回 (修复后内容, 修复说明列表)
+
+    原始文本上没有可能的匹配时不做词法分析。
+    lines 为 git diff 的改动行区间时，整个文件照常做词法分析，只修复起点落在改动行内的匹配。
+    tokens 为调用方已有的词法分析结果时直接复用。
+    """
+    if not has_syntax_errors(content) or not (_CANDIDATE_RE.search(content) or _COMMENT_GAP_RE.search(content)):
+        return content, []
+    
+    if tokens is None:
+        with profiling.rule('tokenize'):
+            tokens = tokenize_all(content)
+    if lines is not None:
+        changed = set()
+        for start, end in lines:
+            changed.update(range(start, end + 1))
+    edits = []
+    changes = []
+    # 剖析模式下逐条规则计时（热点循环，未启用时不计时）
+    timing = profiling.enabled()
+    # 下一处匹配允许的最小起点：末尾的 ) 或 , 可能是下一处匹配的开头
+    next_start = 0
+    for k in [k for k, tok in enumerate(tokens) if tok.value == ANCHOR and tok.kind == IDENT]:
+        # 同一个 any 上起点靠前的模式先试，与从左到右逐个token匹配的结果一致
+        for pattern_info in patterns:
+            seq = pattern_info['tokens']
+            i = k - pattern_info['anchor']
+            if i < next_start or (lines is not None and tokens[i].line not in changed):
+                continue
+            if timing:
+                start = time.perf_counter()
+                matched = match_sequence(tokens, i, seq)
+                profiling.add_rule(pattern_info['description'], time.perf_counter() - start, int(matched))
+            else:
+                matched = match_sequence(tokens, i, seq)
+            if matched:
+                keep_end = tokens[i + pattern_info['keep'] - 1].end
+                edits.append((keep_end, tokens[i + len(seq) - 1].start))
+                if pattern_info['description'] not in changes:
+                    changes.append(pattern_info['description'])
+                next_start = i + len(seq) - 1
+                break
+    
+    if not edits:
+        return content, []
+    
+    parts = []
+    last = 0
+    for start, end in edits:
+        parts.append(content[last:start])
+        last = end
+    parts.append(content[last:])
+    return ''.join(parts), changes
+
 def fix_file_syntax(file_path):
+    """修复单个文件（原子写回），返回是否有改动"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
             content = f.read()
         
-        if not has_syntax_errors(content):
-            return False
-        
-        fixed_content = content
-        changes = []
-        
-        for pattern_info in patterns:
-            before = fixed_content
-            fixed_content = pattern_info['pattern'].sub(pattern_info['replacement'], fixed_content)
-            
-            if fixed_content != before:
-                changes.append(pattern_info['description'])
+        fixed_content, changes = fix_content(content)
         
         if fixed_content != content:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(fixed_content)
+            atomic_write(file_path, fixed_content)
             print(f"✅ 修复文件: {file_path}")
             for change in changes:
                 print(f"   - {change}")
@@ -64,36 +134,137 @@ def fix_file_syntax(file_path):
         print(f"❌ 修复文件失败 {file_path}: {e}")
         return False
 
-def fix_directory(dir_path):
+def collect_files(dir_path, index=None):
+    """列出目录下需要检查的文件"""
     if not os.path.exists(dir_path):
-        return 0
+        return []
     
-    fixed_count = 0
+    if index is not None and index.covers([dir_path]):
+        # 只打开可能包含 ": any" 的文件
+        return [os.path.relpath(p) for p in index.candidates(': any', dirs=[dir_path])]
     
+    file_paths = []
     for root, dirs, files in os.walk(dir_path):
         for file in files:
             if file.endswith(('.ts', '.tsx')):
-                file_path = os.path.join(root, file)
-                if fix_file_syntax(file_path):
-                    fixed_count += 1
-    
-    return fixed_count
+                file_paths.append(os.path.join(root, file))
+    return file_paths
 
 def main():
+    parser = argparse.ArgumentParser(description="修复TypeScript类型注解语法错误")
+    paths.add_root_argument(parser)
+    parser.add_argument('--no-index', action='store_true', help="不使用三元组索引，遍历全部文件")
+    parser.add_argument('--dry-run', action='store_true', help="只输出统一diff，不写文件")
+    parser.add_argument('--workers', '-j', type=int, help="并行进程数（默认CPU核数）")
+    regex_guard.add_budget_argument(parser)
+    profiling.add_profile_arguments(parser)
+    findings.add_output_arguments(parser)
+    git_diff.add_diff_arguments(parser)
+    parser.add_argument('--fail-on-change', action='store_true',
+                        help="有文件被修复（dry-run 时为需要修复）时退出码为1，用于 pre-commit")
+    args = parser.parse_args()
+    # 要修复的目录相对项目根目录
+    os.chdir(args.root)
+    
+    profiler = profiling.from_args(args, 'fix_syntax_errors', '.')
+    try:
+        # --staged --dry-run 只做检查：读取暂存区的内容，行号与 diff 一致
+        snapshot = args.staged and args.dry_run
+        changes = git_diff.from_args(args, '.', directories, snapshot=snapshot)
+    except git_diff.GitError as e:
+        print(f"❌ git diff 失败: {e}")
+        return 2
     print("🔧 开始修复TypeScript语法错误...\n")
     
-    total_fixed = 0
+    # 先收集全部目录的文件，再一次性分发到进程池
+    hunks = None
+    with profiling.phase('walk'):
+        owners = {}
+        file_paths = []
+        if changes is not None:
+            # 只处理 git diff 中改动的文件，并且只修复改动行
+            hunks = {}
+            for path, ranges in sorted(changes.items()):
+                file_path = os.path.relpath(path)
+                owner = next((d for d in directories if file_path.startswith(d + os.sep)), None)
+                if owner is None or not file_path.endswith(SOURCE_EXTENSIONS):
+                    continue
+                owners[file_path] = owner
+                file_paths.append(file_path)
+                hunks[file_path] = ranges
+        else:
+            index = None if args.no_index else open_index('.')
+            for dir_name in directories:
+                for file_path in collect_files(dir_name, index):
+                    if file_path not in owners:
+                        owners[file_path] = dir_name
+                        file_paths.append(file_path)
+            
+            if index is not None:
+                index.close()
+    
+    fixed_counts = {dir_name: 0 for dir_name in directories}
+    stats = ScanStats()
+    with contextlib.ExitStack() as stack:
+        # 改动记录逐文件写出（--jsonl / --sarif）；中途出错或输出管道被关闭时同样写出汇总记录
+        stream = stack.enter_context(findings.from_args(args, 'fix_syntax_errors', rules=REWRITE_RULES))
+        targets, target_hunks, base = file_paths, hunks, None
+        if snapshot:
+            # 在暂存区快照上 dry-run，结果路径换回相对项目根目录的路径
+            try:
+                base = stack.enter_context(git_diff.staged_snapshot('.', file_paths))
+            except git_diff.GitError as e:
+                print(f"❌ 导出暂存区内容失败: {e}")
+                return 2
+            targets = [str(base / p) for p in file_paths]
+            target_hunks = {str(base / p): ranges for p, ranges in hunks.items()}
+        for result in rewrite_files(targets, fix_content, workers=args.workers,
+                                    dry_run=args.dry_run, stats=stats, budget=args.file_budget,
+                                    root=base, hunks=target_hunks):
+            if base is not None:
+                result = result._replace(path=os.path.relpath(result.path, base))
+            for item in change_records(result, result.path, dry_run=args.dry_run):
+                stream.emit(item)
+            if result.error:
+                print(f"❌ 修复文件失败 {result.path}: {result.error}")
+                continue
+            if not result.changed:
+                continue
+            fixed_counts[owners[result.path]] += 1
+            if args.dry_run:
+                print(result.diff, end='')
+            else:
+                print(f"✅ 修复文件: {result.path}")
+                for change in result.changes:
+                    print(f"   - {change}")
+        if base is not None:
+            stats.skipped[:] = [os.path.relpath(p, base) for p in stats.skipped]
+        total_fixed = sum(fixed_counts.values())
+        stream.close(changed=total_fixed, dry_run=args.dry_run, skipped=stats.skipped)
+    
+    with profiling.phase('report'):
+        if file_paths:
+            print()
+        for dir_name in directories:
+            print(f"检查目录: {dir_name}")
+            if fixed_counts[dir_name] > 0:
+                action = "需要修复" if args.dry_run else "修复了"
+                print(f"  {action} {fixed_counts[dir_name]} 个文件\n")
+            else:
+                print("  没有发现需要修复的文件\n")
     
-    for dir_name in directories:
-        print(f"检查目录: {dir_name}")
-        fixed_count = fix_directory(dir_name)
-        if fixed_count > 0:
-            total_fixed += fixed_count
-            print(f"  修复了 {fixed_count} 个文件\n")
+        print(f"扫描: {stats.summary()}")
+        for path in stats.skipped:
+            print(f"⏱️ 超时跳过: {path}")
+        if args.dry_run:
+            print(f"🔍 预览完成（未写入文件），共有 {total_fixed} 个文件需要修复")
         else:
-            print("  没有发现需要修复的文件\n")
+            print(f"🎉 修复完成！总共修复了 {total_fixed} 个文件")
     
-    print(f"🎉 修复完成！总共修复了 {total_fixed} 个文件")
+    if profiler is not None:
+        profiler.finish()
+        print(profiler.summary())
+    return 1 if args.fail_on_change and total_fixed else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
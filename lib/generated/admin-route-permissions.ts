@@ -0,0 +1,99 @@
+// 此文件由 scripts/update-api-permissions.py --build-manifest 生成，请勿手工修改
+// 管理后台路由 + HTTP方法 -> 所需权限的预计算查找表
+
+export type AdminRouteMethod = 'GET' | 'HEAD' | 'OPTIONS' | 'POST' | 'PUT' | 'PATCH' | 'DELETE';
+
+export type AdminRoutePermissionTable = Readonly<Record<string, Readonly<Partial<Record<AdminRouteMethod, readonly string[]>>>>>;
+
+export const ADMIN_ROUTE_PERMISSIONS: AdminRoutePermissionTable = {
+  "/api/admin/costs/breakdown": { GET: ["stats:read"], POST: ["stats:read"] },
+  "/api/admin/costs/daily": { GET: ["stats:read"], POST: ["stats:read"] },
+  "/api/admin/costs/roi": { GET: ["stats:read"], POST: ["stats:read"] },
+  "/api/admin/costs/trends": { GET: ["stats:read"] },
+  "/api/admin/financial/costs": { GET: ["stats:read"], POST: ["stats:read"] },
+  "/api/admin/financial/profits": { GET: ["stats:read"], POST: ["stats:read"] },
+  "/api/admin/financial/reports": { GET: ["stats:read"], POST: ["stats:read"] },
+  "/api/admin/financial/revenue": { GET: ["stats:read"], POST: ["stats:read"] },
+  "/api/admin/financial/withdrawals": { GET: ["stats:read"], POST: ["stats:read"] },
+  "/api/admin/growth/metrics": { GET: ["stats:read"] },
+  "/api/admin/growth/segments": { GET: ["stats:read"] },
+  "/api/admin/lottery/data-fix": { POST: ["lottery:write"] },
+  "/api/admin/lottery/draw": { GET: ["lottery:read"], POST: ["lottery:write"] },
+  "/api/admin/lottery/rounds": { GET: ["lottery:read"] },
+  "/api/admin/orders": { GET: ["orders:read"], POST: ["orders:write"] },
+  "/api/admin/organization/admins": { GET: ["system:manage"] },
+  "/api/admin/organization/departments": { GET: ["system:manage"], POST: ["system:manage"] },
+  "/api/admin/organization/departments/[id]": { PATCH: ["system:manage"], DELETE: ["system:manage"] },
+  "/api/admin/organization/roles": { GET: ["system:manage"], POST: ["system:manage"] },
+  "/api/admin/products": { GET: ["products:read"], POST: ["products:write"], PUT: ["products:write"], DELETE: ["products:delete"] },
+  "/api/admin/products/[id]": { GET: ["products:read"] },
+  "/api/admin/products/conversion": { GET: ["products:read"], POST: ["products:write"] },
+  "/api/admin/products/performance": { GET: ["products:read"], POST: ["products:write"] },
+  "/api/admin/products/profit": { GET: ["products:read"], POST: ["products:write"], PUT: ["products:write"] },
+  "/api/admin/products/trending": { GET: ["products:read"], POST: ["products:write"], PUT: ["products:write"] },
+  "/api/admin/rate-limit": { GET: ["settings:read"] },
+  "/api/admin/risk-events": { GET: ["stats:read"], POST: ["stats:read"] },
+  "/api/admin/risk-rules": { GET: ["stats:read"], POST: ["stats:read"], PATCH: ["stats:read"], DELETE: ["stats:read"] },
+  "/api/admin/risk-stats": { GET: ["stats:read"], POST: ["stats:read"] },
+  "/api/admin/risk-users": { GET: ["stats:read"], PATCH: ["stats:read"] },
+  "/api/admin/settings": { GET: ["settings:read"], POST: ["settings:write"] },
+  "/api/admin/settings/features": { GET: ["features:read"], POST: ["features:write"], PUT: ["features:write"], PATCH: ["features:write"], DELETE: ["features:write"] },
+  "/api/admin/settings/operation": { GET: ["operations:read"], OPTIONS: ["operations:read"], POST: ["operations:write"], PUT: ["operations:write"], DELETE: ["operations:write"] },
+  "/api/admin/settings/rewards": { GET: ["rewards:read"], POST: ["rewards:write"], PUT: ["rewards:write"], DELETE: ["rewards:write"] },
+  "/api/admin/settings/risk": { GET: ["risk:read"], POST: ["risk:write"], PUT: ["risk:write"], DELETE: ["risk:write"] },
+  "/api/admin/settings/system": { GET: ["settings:read"], POST: ["settings:write"], PUT: ["settings:write"], DELETE: ["settings:write"] },
+  "/api/admin/show-off/audit/batch": { POST: ["users:write"] },
+  "/api/admin/show-off/content-quality": { GET: ["users:read"], POST: ["users:write"], PUT: ["users:write"] },
+  "/api/admin/show-off/hotness": { GET: ["users:read"], POST: ["users:write"], PATCH: ["users:write"] },
+  "/api/admin/show-off/posts": { GET: ["users:read"] },
+  "/api/admin/show-off/recommendations": { GET: ["users:read"], POST: ["users:write"], PUT: ["users:write"], PATCH: ["users:write"], DELETE: ["users:write"] },
+  "/api/admin/show-off/users/[id]/posts": { GET: ["users:read"] },
+  "/api/admin/users": { GET: ["users:read"], POST: ["users:write"] },
+  "/api/admin/users/[id]": { GET: ["users:read"], POST: ["users:write"] },
+  "/api/admin/users/behavior": { GET: ["users:read"], POST: ["users:write"] },
+  "/api/admin/users/engagement": { GET: ["users:read"], PUT: ["users:write"] },
+  "/api/admin/users/retention": { GET: ["users:read"], POST: ["users:write"] },
+  "/api/admin/users/segments": { GET: ["users:read"], POST: ["users:write"], PUT: ["users:write"] },
+  "/api/admin/users/spending": { GET: ["users:read"], POST: ["users:write"] },
+  "/api/admin/withdrawals": { GET: ["withdrawals:read"], POST: ["withdrawals:write"] },
+};
+
+/** 不要求管理员权限的路由（登录、初始化等） */
+export const PUBLIC_ADMIN_ROUTES: ReadonlySet<string> = new Set(["/api/admin/init", "/api/admin/login", "/api/admin/permissions/my-permissions"]);
+
+// 动态路由按具体程度排序，第一个匹配的即为结果
+const DYNAMIC_ROUTES: ReadonlyArray<readonly [RegExp, string]> = [
+  [/^\/api\/admin\/show\-off\/users\/[^\/]+\/posts$/, "/api/admin/show-off/users/[id]/posts"],
+  [/^\/api\/admin\/organization\/departments\/[^\/]+$/, "/api/admin/organization/departments/[id]"],
+  [/^\/api\/admin\/products\/[^\/]+$/, "/api/admin/products/[id]"],
+  [/^\/api\/admin\/users\/[^\/]+$/, "/api/admin/users/[id]"],
+];
+
+/** 请求路径 -> 清单中的路由（如 /api/admin/users/42 -> /api/admin/users/[id]） */
+export function resolveAdminRoute(pathname: string): string | undefined {
+  const path = pathname.length > 1 ? pathname.replace(/\/+$/, '') : pathname;
+  if (path in ADMIN_ROUTE_PERMISSIONS) {
+    return path;
+  }
+  for (const [pattern, route] of DYNAMIC_ROUTES) {
+    if (pattern.test(path)) {
+      return route;
+    }
+  }
+  return undefined;
+}
+
+/** 路由方法所需的权限；清单中没有该路由或方法时返回 undefined */
+export function getRequiredPermissions(pathname: string, method: string): readonly string[] | undefined {
+  const route = resolveAdminRoute(pathname);
+  if (route === undefined) {
+    return undefined;
+  }
+  return ADMIN_ROUTE_PERMISSIONS[route][method.toUpperCase() as AdminRouteMethod];
+}
+
+/** 管理员是否拥有访问该路由方法所需的全部权限；清单中没有的路由一律拒绝 */
+export function hasRoutePermission(pathname: string, method: string, granted: ReadonlySet<string>): boolean {
+  const required = getRequiredPermissions(pathname, method);
+  return required !== undefined && required.every((permission) => granted.has(permission));
+}
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Prisma 索引建议
+
+挖掘源码中每个 Prisma 查询的 where / orderBy / cursor 字段、Supabase 查询的过滤列和原始SQL引用的列，按所在路由加权，
+与 prisma/schema.prisma 的索引对照（规则见 tstools/index_advisor.py）：
+
+- 建议新增的 @@index（已有索引覆盖不了、权重不低于 --min-weight 的查询形状）
+- 没有查询用到的普通索引、被更长索引包含的冗余索引
+- schema.prisma 的补丁和对应的迁移SQL（默认写到 .cache/index-advisor/），
+  --apply 时直接修改 schema.prisma 并生成 prisma/migrations/<时间>_<名称>/migration.sql
+
+用法:
+    python3 scripts/advise-indexes.py [--weights FILE] [--min-weight N] [--drop-unused]
+                                      [--apply [--migration-name NAME]] [--report FILE]
+                                      [--jsonl FILE] [--sarif FILE] [--fail-on LEVEL]
+
+--weights 为 JSON 对象 {模式: 权重}，模式按 fnmatch 匹配路由 URL（/api/lottery/*）或文件路径，
+可以用线上各路由的请求量替换默认的位置权重。
+"""
+
+import argparse
+import datetime
+import json
+import sys
+from pathlib import Path
+
+from tstools import findings, index_advisor, paths, prisma_schema, profiling, regex_guard
+from tstools.scan_engine import ScanStats
+
+OUTPUT_DIR = Path(".cache") / "index-advisor"
+MIGRATIONS_DIR = Path("prisma") / "migrations"
+
+# 建议新增索引的默认最低权重：只被管理后台偶尔用到的查询形状不值得一个索引
+MIN_WEIGHT = index_advisor.WEIGHT_LIB
+
+# 每个模型最多建议的新索引数：每个索引都会拖慢写入
+MAX_PER_MODEL = 3
+
+RULES = {
+    'index-missing': "查询形状没有可用的索引",
+    'index-unused': "没有任何查询用到该索引的首列",
+    'index-redundant': "索引是另一个索引的最左前缀",
+    'index-unknown-field': "查询条件中的字段在 schema.prisma 中不存在",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Prisma 索引建议")
+    paths.add_root_argument(parser)
+    parser.add_argument('--dirs', nargs='+', default=index_advisor.SCAN_DIRS, help="扫描的目录（默认 app lib bot）")
+    parser.add_argument('--workers', '-j', type=int, help="并行进程数（默认CPU核数）")
+    parser.add_argument('--schema', type=Path, help=f"Prisma schema（默认 <root>/{prisma_schema.SCHEMA_FILE}）")
+    parser.add_argument('--weights', type=Path, metavar='FILE', help="按路由 / 路径覆盖权重的JSON文件")
+    parser.add_argument('--min-weight', type=float, default=MIN_WEIGHT, metavar='N',
+                        help=f"建议新增索引的最低累计权重（默认 {MIN_WEIGHT:g}，即一个 lib 中的查询）")
+    parser.add_argument('--max-per-model', type=int, default=MAX_PER_MODEL, metavar='N',
+                        help=f"每个模型最多建议的新索引数（默认 {MAX_PER_MODEL}，0 为不限），其余列为暂缓")
+    parser.add_argument('--drop-unused', action='store_true', help="补丁和迁移中同时删除未使用和冗余的索引")
+    parser.add_argument('--output-dir', type=Path, metavar='DIR',
+                        help=f"schema.patch / migration.sql 的输出目录（默认 <root>/{OUTPUT_DIR}）")
+    parser.add_argument('--apply', action='store_true', help="修改 schema.prisma 并在 prisma/migrations 下生成迁移")
+    parser.add_argument('--migration-name', default='index_advisor', help="--apply 时的迁移名（默认 index_advisor）")
+    parser.add_argument('--report', type=Path, metavar='FILE',
+                        help=f"JSON 报告（默认 <output-dir>/report.json）")
+    parser.add_argument('--fail-on', choices=('error', 'warning', 'note'),
+                        help="有该级别及以上的记录时退出码为1")
+    findings.add_output_arguments(parser)
+    regex_guard.add_budget_argument(parser)
+    profiling.add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    root = args.root.resolve()
+    schema_path = args.schema or root / prisma_schema.SCHEMA_FILE
+    schema_text = schema_path.read_text(encoding='utf-8')
+    schema = prisma_schema.parse_schema(schema_text)
+    overrides = json.loads(args.weights.read_text(encoding='utf-8')) if args.weights else None
+
+    profiler = profiling.from_args(args, 'advise-indexes', root)
+    stats = ScanStats()
+    shapes = index_advisor.mine_shapes(root, schema, args.dirs, overrides=overrides, workers=args.workers,
+                                       stats=stats, budget=args.file_budget)
+    with profiling.phase('advise'):
+        proposals, deferred = index_advisor.limit_per_model(index_advisor.propose(schema, shapes, args.min_weight),
+                                                            args.max_per_model)
+        stale = index_advisor.unused_indexes(schema, shapes)
+        drop = [(model, index) for model, index, _ in stale] if args.drop_unused else []
+        schema_rel = schema_path.relative_to(root).as_posix() if schema_path.is_relative_to(root) \
+            else schema_path.as_posix()
+        patched, diff = index_advisor.schema_patch(schema_text, schema, proposals, drop, filename=schema_rel)
+        migration = index_advisor.migration_sql(schema, proposals, drop)
+
+    output_dir = args.output_dir or root / OUTPUT_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / 'schema.patch').write_text(diff, encoding='utf-8')
+    (output_dir / 'migration.sql').write_text(migration, encoding='utf-8')
+    migration_path = None
+    if args.apply and migration:
+        stamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        migration_path = root / MIGRATIONS_DIR / f"{stamp}_{args.migration_name}" / 'migration.sql'
+        migration_path.parent.mkdir(parents=True, exist_ok=True)
+        migration_path.write_text(migration, encoding='utf-8')
+        schema_path.write_text(patched, encoding='utf-8')
+
+    with findings.from_args(args, 'advise-indexes', rules=RULES) as stream:
+        for proposal in proposals:
+            model = schema.models[proposal.model]
+            stream.emit(findings.record(
+                'finding', 'index-missing', 'warning', schema_rel,
+                f"{model.name}: 建议 @@index([{', '.join(proposal.fields)}])（权重 {proposal.weight:g}，"
+                f"{len(proposal.sites)} 处查询）",
+                line=model.line, model=model.name, fields=proposal.fields, weight=proposal.weight,
+                sites=proposal.sites))
+        for model, index, kind in stale:
+            text = "没有查询用到首列" if kind == 'unused' else "被更长的索引包含"
+            stream.emit(findings.record(
+                'finding', f'index-{kind}', 'note', schema_rel,
+                f"{model.name}: @@index([{', '.join(index.fields)}]) {text}",
+                line=index.line, model=model.name, fields=index.fields,
+                index=prisma_schema.index_name(model, index)))
+        for shape in shapes:
+            if shape.unknown:
+                stream.emit(findings.record(
+                    'finding', 'index-unknown-field', 'note', shape.path,
+                    f"{shape.model}.{shape.op} 的条件字段不在 schema.prisma 中: {', '.join(shape.unknown)}",
+                    line=shape.line, model=shape.model, fields=shape.unknown))
+        stream.close(shapes=len(shapes), proposals=len(proposals), stale=len(stale))
+        counts = dict(stream.counts)
+
+    report = {
+        'version': 1,
+        'proposals': [p._asdict() for p in proposals],
+        'deferred': [p._asdict() for p in deferred],
+        'stale': [{'model': model.name, 'fields': index.fields, 'kind': kind, 'line': index.line,
+                   'name': prisma_schema.index_name(model, index)} for model, index, kind in stale],
+        'shapes': [dict(s._asdict(), id=s.id) for s in shapes],
+    }
+    report_path = args.report or output_dir / 'report.json'
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+    with profiling.phase('report'):
+        print(f"扫描: {stats.summary()}")
+        for path in stats.skipped:
+            print(f"⏱️ 超时跳过: {path}")
+        sources = {source: sum(s.source == source for s in shapes) for source in
+                   (index_advisor.SOURCE_PRISMA, index_advisor.SOURCE_SUPABASE, index_advisor.SOURCE_SQL)}
+        print(f"查询形状: {len(shapes)} 处（{'，'.join(f'{source} {n}' for source, n in sources.items())}）")
+        print(f"\n建议新增 {len(proposals)} 个索引:")
+        for proposal in proposals:
+            print(f"  {proposal.weight:>8g}  {proposal.model}: @@index([{', '.join(proposal.fields)}])"
+                  f"  ← {', '.join(proposal.sites[:3])}{' ...' if len(proposal.sites) > 3 else ''}")
+        if deferred:
+            print(f"暂缓 {len(deferred)} 个（超出每个模型 {args.max_per_model} 个的限制，见报告）")
+        if stale:
+            print(f"\n未使用 / 冗余的索引 {len(stale)} 个{'（已写入删除）' if args.drop_unused else ''}:")
+            for model, index, kind in stale:
+                print(f"  {kind:<9} {model.name}: @@index([{', '.join(index.fields)}])  {schema_rel}:{index.line}")
+        print()
+        print(f"补丁: {output_dir / 'schema.patch'}，迁移: {output_dir / 'migration.sql'}")
+        if migration_path is not None:
+            print(f"✅ 已修改 {schema_path}，迁移写入 {migration_path}")
+        print(f"记录: {', '.join(f'{level} {n}' for level, n in counts.items()) or '无'}；报告已写入 {report_path}")
+
+    if profiler is not None:
+        profiler.finish()
+        print(profiler.summary())
+    if args.fail_on:
+        levels = findings.LEVELS[:findings.LEVELS.index(args.fail_on) + 1]
+        if any(counts.get(level) for level in levels):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
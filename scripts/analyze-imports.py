@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+页面 / 路由导入图分析与 dynamic() 拆分建议
+
+从 app/ 下的每个 page 和 route 出发解析 TS/TSX 导入图（含 tsconfig.json 的 @/* 别名），
+计算每个入口静态依赖的传递闭包大小（页面另算发到浏览器的 'use client' 部分），
+并按可省下的首屏字节给出最值得改成 dynamic() 的导入（规则见 tstools/import_graph.py）。
+用来替代 next.config.dynamic-imports.js / DYNAMIC_IMPORT_QUICK_START.md 中手工挑选的清单。
+
+用法:
+    python3 scripts/analyze-imports.py [--min-bytes N] [--top N] [--package-sizes FILE]
+                                       [--no-cache | --rebuild-cache] [--report FILE]
+                                       [--baseline FILE] [--jsonl FILE] [--sarif FILE]
+
+每个文件的导入解析结果按 (路径, 大小, mtime, 内容哈希) 缓存在 .cache/import-graph.json，
+再次运行时只重新分析改动过的文件。报告（默认 .cache/import-graph/report.json）不含时间戳，
+按路径排序，可以直接在版本之间 diff；--baseline 指定上一版的报告时打印每个入口的大小变化。
+
+--package-sizes 为 JSON 对象 {包名: 字节数}（如 bundle analyzer 统计的各包大小），
+不提供时 npm 包按 0 计。
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from tstools import findings, import_graph, paths, profiling, regex_guard
+from tstools.scan_engine import ScanStats
+
+OUTPUT_DIR = Path(".cache") / "import-graph"
+CACHE_FILE = Path(".cache") / "import-graph.json"
+
+# 候选的最小可省字节：更小的拆分省下的流量抵不上多一次请求
+MIN_BYTES = 4096
+
+# 每个入口保留的候选数
+TOP = 10
+
+# 与 --baseline 对比时打印的最小变化（字节）
+CHANGE_THRESHOLD = 1024
+
+RULES = {
+    'import-split': "改为 dynamic() 导入可以减少首屏加载的字节",
+    'import-unresolved': "导入的模块在项目中找不到",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="页面 / 路由导入图分析与 dynamic() 拆分建议")
+    paths.add_root_argument(parser)
+    parser.add_argument('--app-dir', default=import_graph.APP_DIR, help="Next.js app 目录（默认 app）")
+    parser.add_argument('--tsconfig', type=Path, help="提供 paths 别名的配置（默认 <root>/tsconfig.json）")
+    parser.add_argument('--workers', '-j', type=int, help="并行进程数（默认CPU核数）")
+    parser.add_argument('--package-sizes', type=Path, metavar='FILE', help="npm 包大小的JSON文件 {包名: 字节数}")
+    parser.add_argument('--min-bytes', type=int, default=MIN_BYTES, metavar='N',
+                        help=f"拆分候选的最小可省字节（默认 {MIN_BYTES}）")
+    parser.add_argument('--top', type=int, default=TOP, metavar='N',
+                        help=f"每个入口保留的候选数（默认 {TOP}，0 为全部）")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument('--no-cache', action='store_true', help="不读写解析缓存")
+    cache_group.add_argument('--rebuild-cache', action='store_true', help="忽略已有缓存并重建")
+    parser.add_argument('--cache-file', type=Path, help=f"缓存文件路径（默认 <root>/{CACHE_FILE}）")
+    parser.add_argument('--report', type=Path, metavar='FILE',
+                        help=f"JSON 报告（默认 <root>/{OUTPUT_DIR}/report.json）")
+    parser.add_argument('--baseline', type=Path, metavar='FILE', help="上一版的报告，打印各入口的大小变化")
+    parser.add_argument('--fail-on', choices=('error', 'warning', 'note'),
+                        help="有该级别及以上的记录时退出码为1")
+    findings.add_output_arguments(parser)
+    regex_guard.add_budget_argument(parser)
+    profiling.add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def entry_record(weight: import_graph.EntryWeight) -> dict:
+    return dict(weight._asdict(), candidates=[c._asdict() for c in weight.candidates])
+
+
+def compare(baseline: dict, report: dict, threshold: int = CHANGE_THRESHOLD):
+    """对比两份报告中每个入口的大小，打印变化超过 threshold 的入口"""
+    old = {(e['kind'], e['url']): e for e in baseline.get('entries', [])}
+    new = {(e['kind'], e['url']): e for e in report['entries']}
+    rows = []
+    for key in sorted(old.keys() | new.keys()):
+        before, after = old.get(key), new.get(key)
+        field = 'client_bytes' if key[0] == import_graph.PAGE else 'bytes'
+        a = before[field] if before else 0
+        b = after[field] if after else 0
+        if before is None or after is None or abs(b - a) >= threshold:
+            rows.append((b - a, key, a, b, before is None, after is None))
+    print(f"\n与基线相比有变化的入口 {len(rows)} 个:")
+    for delta, (kind, url), a, b, added, removed in sorted(rows, key=lambda r: -abs(r[0])):
+        note = "（新增）" if added else "（已删除）" if removed else ""
+        print(f"  {delta:>+10,}  {kind:<5} {url}  {a:,} -> {b:,}{note}")
+
+
+def main():
+    args = parse_args()
+    root = args.root.resolve()
+    profiler = profiling.from_args(args, 'analyze-imports', root)
+    package_sizes = json.loads(args.package_sizes.read_text(encoding='utf-8')) if args.package_sizes else None
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8')) if args.baseline else None
+
+    cache = None
+    if not args.no_cache:
+        cache = import_graph.graph_cache(args.cache_file or root / CACHE_FILE, rebuild=args.rebuild_cache)
+    with profiling.phase('walk'):
+        entries = import_graph.discover_entries(root, args.app_dir)
+        resolver = import_graph.Resolver(root, args.tsconfig)
+    stats = ScanStats()
+    graph = import_graph.build_graph(root, [r for e in entries for r in e.roots], resolver, cache=cache,
+                                     package_sizes=package_sizes, workers=args.workers, stats=stats,
+                                     budget=args.file_budget)
+    if cache is not None:
+        cache.save()
+    weights = import_graph.analyze_entries(graph, entries, args.min_bytes, args.top)
+    ranked = import_graph.rank_candidates(weights)
+
+    with findings.from_args(args, 'analyze-imports', rules=RULES) as stream:
+        for item in ranked:
+            path, _, line = item['sites'][0].rpartition(':') if item['sites'] else (item['module'], '', '')
+            stream.emit(findings.record(
+                'finding', 'import-split', 'note', path,
+                f"{item['module']} 改为 dynamic() 导入，{len(item['pages'])} 个页面共可少加载 {item['bytes']:,} 字节",
+                line=int(line) if line else None, module=item['module'], bytes=item['bytes'],
+                pages=item['pages'], sites=item['sites']))
+        for path, item in graph.unresolved:
+            stream.emit(findings.record(
+                'finding', 'import-unresolved', 'note', path, f"找不到模块 {item.spec}",
+                line=item.line, spec=item.spec))
+        stream.close(entries=len(entries), modules=len(graph.modules), candidates=len(ranked))
+        counts = dict(stream.counts)
+
+    report = {
+        'version': 1,
+        'modules': sorted(({'path': m.path, 'size': m.size, 'client': m.client}
+                           for m in graph.modules.values()), key=lambda m: m['path']),
+        'entries': [entry_record(w) for w in weights],
+        'candidates': ranked,
+        'unresolved': [{'path': path, 'line': item.line, 'spec': item.spec} for path, item in graph.unresolved],
+    }
+    report_path = args.report or root / OUTPUT_DIR / 'report.json'
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+    with profiling.phase('report'):
+        print(f"扫描: {stats.summary()}")
+        for path in stats.skipped:
+            print(f"⏱️ 超时跳过（按无依赖处理）: {path}")
+        pages = [w for w in weights if w.kind == import_graph.PAGE]
+        routes = [w for w in weights if w.kind == import_graph.ROUTE]
+        print(f"导入图: {len(graph.modules)} 个模块，{len(pages)} 个页面，{len(routes)} 个路由，"
+              f"{len(graph.unresolved)} 处导入找不到模块")
+        print("\n首屏（客户端）最大的页面:")
+        for weight in sorted(pages, key=lambda w: -w.client_bytes)[:args.top or None]:
+            print(f"  {weight.client_bytes:>10,}  {weight.url}（{weight.client_modules} 个模块，"
+                  f"已有 {weight.dynamic} 处动态导入）")
+        print(f"\n建议改为 dynamic() 的导入 {len(ranked)} 个:")
+        for item in ranked[:args.top or None]:
+            print(f"  {item['bytes']:>10,}  {item['module']}  （{len(item['pages'])} 个页面，"
+                  f"单页最多 {item['max_bytes']:,}）← {', '.join(item['sites'][:3])}"
+                  f"{' ...' if len(item['sites']) > 3 else ''}")
+        if baseline is not None:
+            compare(baseline, report)
+        print(f"\n记录: {', '.join(f'{level} {n}' for level, n in counts.items()) or '无'}；报告已写入 {report_path}")
+
+    if profiler is not None:
+        profiler.finish()
+        print(profiler.summary())
+    if args.fail_on:
+        levels = findings.LEVELS[:findings.LEVELS.index(args.fail_on) + 1]
+        if any(counts.get(level) for level in levels):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
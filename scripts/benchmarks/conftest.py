@@ -0,0 +1,124 @@
+"""
+维护脚本基准测试的公共夹具
+
+    python3 -m pytest scripts/benchmarks -q
+
+环境变量:
+    TSTOOLS_BENCH_SIZES            语料规模，逗号分隔（默认 1000；可选 10000,100000）
+    TSTOOLS_BENCH_WORKERS          进程数（默认CPU核数）
+    TSTOOLS_BENCH_ENFORCE          设为 1 时吞吐低于基线下限的用例失败（默认只记录结果）
+    TSTOOLS_BENCH_THRESHOLD        相对基线允许的吞吐下降比例（默认 0.3）
+    TSTOOLS_BENCH_UPDATE_BASELINE  设为 1 时用本次结果更新 baseline.json
+
+与基线比较的是相对吞吐：被测脚本的 文件/s 除以同一次运行中参照负载（runner.py reference，
+用同样的进程数读入并词法分析全部文件）的 文件/s，因此基线可以在不同机器之间沿用。
+
+结果写入 .cache/benchmarks/results.json。
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from corpus import generate_corpus, generate_mixed_corpus
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent.parent
+CACHE_DIR = REPO_ROOT / '.cache' / 'benchmarks'
+RESULTS_FILE = CACHE_DIR / 'results.json'
+BASELINE_FILE = BENCH_DIR / 'baseline.json'
+RUNNER = BENCH_DIR / 'runner.py'
+
+SIZES = [int(s) for s in os.environ.get('TSTOOLS_BENCH_SIZES', '1000').split(',') if s.strip()]
+WORKERS = os.environ.get('TSTOOLS_BENCH_WORKERS')
+THRESHOLD = float(os.environ.get('TSTOOLS_BENCH_THRESHOLD', '0.3'))
+ENFORCE = os.environ.get('TSTOOLS_BENCH_ENFORCE') == '1'
+UPDATE_BASELINE = os.environ.get('TSTOOLS_BENCH_UPDATE_BASELINE') == '1'
+
+
+def result_key(tool, size):
+    return f'{tool}@{size}'
+
+
+@pytest.fixture(scope='session')
+def corpus_factory():
+    """按规模生成（或复用 .cache 下已有的）只读原始语料"""
+    def factory(size):
+        root = CACHE_DIR / f'corpus-{size}'
+        return root, generate_corpus(root, size)
+    return factory
+
+
+@pytest.fixture(scope='session')
+def mixed_corpus_factory():
+    """路由之外再加上不含任何预筛字面量的组件文件（corpus.generate_mixed_corpus）"""
+    def factory(size):
+        root = CACHE_DIR / f'corpus-mixed-{size}'
+        return root, generate_mixed_corpus(root, size)
+    return factory
+
+
+@pytest.fixture(scope='session')
+def run_tool():
+    """在子进程中运行 runner.py，返回解析后的结果"""
+    def run(tool, corpus):
+        cmd = [sys.executable, str(RUNNER), tool, str(corpus)]
+        if WORKERS:
+            cmd += ['--workers', WORKERS]
+        proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        assert proc.returncode == 0, proc.stderr
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    return run
+
+
+@pytest.fixture(scope='session')
+def reference(corpus_factory, run_tool, bench_results):
+    """各规模语料上参照负载的结果（每个规模只测一次）"""
+    measured = {}
+
+    def measure(size):
+        if size not in measured:
+            corpus, _ = corpus_factory(size)
+            result = run_tool('reference', corpus)
+            result['size'] = size
+            measured[size] = bench_results[result_key('reference', size)] = result
+        return measured[size]
+    return measure
+
+
+@pytest.fixture(scope='session')
+def baseline():
+    if BASELINE_FILE.exists():
+        return json.loads(BASELINE_FILE.read_text(encoding='utf-8'))
+    return {}
+
+
+@pytest.fixture(scope='session')
+def bench_results(baseline):
+    """收集本次全部结果，测试结束后写入 JSON（需要时同时更新基线）"""
+    results = {}
+    yield results
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    RESULTS_FILE.write_text(json.dumps({
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+    if UPDATE_BASELINE and results:
+        merged = dict(baseline)
+        for key, result in results.items():
+            merged[key] = {'files_per_sec': round(result['files_per_sec'], 1),
+                           'mb_per_sec': round(result['mb_per_sec'], 3)}
+            if 'relative' in result:
+                merged[key]['relative'] = round(result['relative'], 4)
+        BASELINE_FILE.write_text(json.dumps(dict(sorted(merged.items())), indent=2) + '\n',
+                                 encoding='utf-8')
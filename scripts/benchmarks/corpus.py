@@ -0,0 +1,236 @@
+"""
+合成 TypeScript 语料
+
+按固定随机种子生成 route.ts 风格的文件，覆盖各维护脚本关心的写法：
+$queryRawUnsafe 调用（参数化 / 字符串插值 / 导入函数返回的SQL）、getAdminFromRequest 校验块、
+: any: any 类型注解错误，以及已声明权限中间件但方法尚未包装的路由。
+
+混合语料在同样的路由之外再加上 components/ 下的客户端组件（含中文和塔吉克语文本，
+不含上述任何写法），用来衡量候选选择阶段在大部分文件都不命中时的开销。
+"""
+
+import json
+import random
+from pathlib import Path
+from typing import Dict, Tuple
+
+# 生成的路由分布在这些权限域目录下（与 tstools.routes.DOMAIN_RULES 一致）
+DOMAINS = ['users', 'products', 'orders', 'lottery', 'withdrawals', 'stats', 'settings']
+
+# 每个目录下的路由数，避免单个目录过大
+ROUTES_PER_GROUP = 100
+
+MANIFEST_NAME = 'corpus.json'
+
+# 语料内容变化时递增，已缓存的旧语料会被重新生成
+CORPUS_VERSION = 2
+
+_HEADER = """import { NextRequest, NextResponse } from 'next/server';
+import { prisma } from '@/lib/prisma';
+import { getAdminFromRequest } from '@/lib/auth';
+import { getLogger } from '@/lib/logger';
+"""
+
+_MIDDLEWARE = """import { AdminPermissionManager } from '@/lib/admin/permissions/AdminPermissionManager';
+import { AdminPermissions } from '@/lib/admin/permissions/AdminPermissions';
+
+const withReadPermission = AdminPermissionManager.createPermissionMiddleware({
+  customPermissions: AdminPermissions.{domain}.read()
+});
+
+const withWritePermission = AdminPermissionManager.createPermissionMiddleware({
+  customPermissions: AdminPermissions.{domain}.write()
+});
+"""
+
+_HELPER = """
+interface Row{n} {
+  id: string;
+  createdAt: Date;
+  amount: number;
+  meta: Record<string, unknown>;
+}
+
+function formatRow{n}(row: Row{n}, locale: string = 'zh-CN') {
+  const label = `${row.id}-${row.amount.toFixed(2)}`;
+  // 注释中的括号 { ( [ 不应影响解析
+  return {
+    id: row.id,
+    label,
+    date: row.createdAt.toLocaleDateString(locale),
+    tags: ['a', "b", `c${row.amount > 100 ? '+' : '-'}`],
+    ratio: row.amount / 100,
+  };
+}
+"""
+
+_QUERIES = {
+    'safe': "prisma.$queryRawUnsafe('SELECT * FROM {table} WHERE id = $1 LIMIT $2', id, limit)",
+    'unsafe': "prisma.$queryRawUnsafe(`SELECT * FROM {table} WHERE id = '${{id}}' LIMIT ${{limit}}`)",
+    'manual': "prisma.$queryRawUnsafe(await loadReportSql('{table}'))",
+}
+
+_TABLES = ['users', 'orders', 'products', 'lottery_rounds', 'withdraw_requests', 'transactions']
+
+_COMPONENT_HEADER = """'use client';
+
+import React, { useState } from 'react';
+import { useTranslation } from 'react-i18next';
+"""
+
+_WIDGET = """
+// 合成组件 {n}：幸运集市商品卡片
+interface Props{n} {
+  title: string;
+  items: Array<{ id: string; label: string; price: number }>;
+}
+
+export function Widget{n}({ title, items }: Props{n}) {
+  const { t } = useTranslation();
+  const [open, setOpen] = useState(false);
+  return (
+    <section className="widget-{n} rounded-lg shadow">
+      <h2>{title} · 幸运集市</h2>
+      <button onClick={() => setOpen(!open)}>{open ? '收起' : '展开'}（{items.length} 项）</button>
+      {open && items.map(item => (
+        <p key={item.id}>
+          {t('item.label', { defaultValue: item.label })} — {item.price.toFixed(2)} сомонӣ, Бахт ба шумо!
+        </p>
+      ))}
+    </section>
+  );
+}
+"""
+
+# 每个组件目录下的文件数；混合语料中组件数与路由数之比（与项目中的比例相近）
+COMPONENTS_PER_GROUP = 100
+COMPONENTS_PER_ROUTE = 3
+
+
+def _method(name, domain, query_kind, table, legacy_guard, broken_any):
+    param = 'request: any: any' if broken_any else 'request: NextRequest'
+    lines = [
+        f"// {name} - 合成路由",
+        f"export async function {name}({param}) {{",
+        "  const logger = getLogger();",
+        "",
+        "  try {",
+    ]
+    if legacy_guard:
+        lines += [
+            "    // 验证管理员权限",
+            "    const admin = getAdminFromRequest(request);",
+            "    if (!admin) {",
+            "      return NextResponse.json({",
+            "        success: false,",
+            "        error: '管理员权限验证失败'",
+            "      }, { status: 403 });",
+            "    }",
+            "",
+            "    // 检查权限",
+            f"    const hasPermission = admin.permissions.includes('{domain}:read') || admin.role === 'super_admin';",
+            "    if (!hasPermission) {",
+            "      return NextResponse.json({ success: false, error: '权限不足' }, { status: 403 });",
+            "    }",
+            "",
+        ]
+    lines += [
+        "    const { searchParams } = new URL(request.url);",
+        "    const id = searchParams.get('id') || '';",
+        "    const limit = parseInt(searchParams.get('limit') || '20');",
+        "    const sql = `SELECT count(*) FROM " + table + "`;",
+    ]
+    if query_kind:
+        lines.append(f"    const rows = await {_QUERIES[query_kind].format(table=table)};")
+    else:
+        lines.append(f"    const rows = await prisma.{table}.findMany({{ where: {{ id }}, take: limit }});")
+    lines += [
+        "    return NextResponse.json({ success: true, data: rows, sql });",
+        "  } catch (error: any) {",
+        f"    logger.error('{name} failed', error as Error);",
+        "    return NextResponse.json({",
+        "      success: false,",
+        "      error: error.message || '请求失败'",
+        "    }, { status: 500 });",
+        "  }",
+        "}",
+    ]
+    return '\n'.join(lines)
+
+
+def render_route(index: int, rng: random.Random) -> Tuple[str, Dict[str, int]]:
+    """生成第 index 个路由文件的内容，返回 (内容, 特征计数)"""
+    domain = DOMAINS[index % len(DOMAINS)]
+    table = rng.choice(_TABLES)
+    migrated = rng.random() < 0.5      # 已声明权限中间件，等待包装
+    legacy_guard = rng.random() < 0.7
+    broken_any = rng.random() < 0.3
+    methods = ['GET'] + rng.sample(['POST', 'PUT', 'DELETE', 'PATCH'], rng.randint(0, 2))
+
+    features = {'files': 1, 'migrated': int(migrated), 'legacy_guard': int(legacy_guard),
+                'broken_any': int(broken_any), 'safe': 0, 'unsafe': 0, 'manual': 0}
+    parts = [_HEADER]
+    if migrated:
+        parts.append(_MIDDLEWARE.replace('{domain}', domain))
+    for n in range(rng.randint(1, 3)):
+        parts.append(_HELPER.replace('{n}', str(n)))
+    for name in methods:
+        kind = rng.choice([None, None, 'safe', 'unsafe', 'manual'])
+        if kind:
+            features[kind] += 1
+        parts.append(_method(name, domain, kind, table, legacy_guard, broken_any and name == 'GET'))
+    return '\n'.join(parts) + '\n', features
+
+
+def generate_corpus(root: Path, count: int, seed: int = 20241016) -> Dict[str, int]:
+    """
+    在 root 下生成 count 个 app/api/admin/<域>/g<组>/r<序号>/route.ts
+
+    返回各特征的总数，同时写入 root/corpus.json。已生成过相同参数的语料时直接复用。
+    """
+    root = Path(root)
+    manifest_path = root / MANIFEST_NAME
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+        if manifest.get('count') == count and manifest.get('seed') == seed \
+                and manifest.get('version') == CORPUS_VERSION:
+            return manifest['features']
+
+    rng = random.Random(seed)
+    totals: Dict[str, int] = {}
+    for index in range(count):
+        content, features = render_route(index, rng)
+        domain = DOMAINS[index % len(DOMAINS)]
+        route_dir = root / 'app' / 'api' / 'admin' / domain / f'g{index // ROUTES_PER_GROUP}' / f'r{index}'
+        route_dir.mkdir(parents=True, exist_ok=True)
+        (route_dir / 'route.ts').write_text(content, encoding='utf-8')
+        for key, value in features.items():
+            totals[key] = totals.get(key, 0) + value
+
+    manifest_path.write_text(json.dumps({'count': count, 'seed': seed, 'version': CORPUS_VERSION,
+                                         'features': totals},
+                                        ensure_ascii=False, indent=2), encoding='utf-8')
+    return totals
+
+
+def generate_mixed_corpus(root: Path, count: int, seed: int = 20241016) -> Dict[str, int]:
+    """
+    count 个路由（与 generate_corpus 相同）加上 count * COMPONENTS_PER_ROUTE 个
+    components/g<组>/c<序号>.tsx，返回的特征计数中 files 含组件，另有 routes / components
+    """
+    root = Path(root)
+    features = dict(generate_corpus(root, count, seed))
+    components = count * COMPONENTS_PER_ROUTE
+    manifest_path = root / 'components.json'
+    if not manifest_path.exists() or json.loads(manifest_path.read_text(encoding='utf-8')) != \
+            {'count': components, 'seed': seed, 'version': CORPUS_VERSION}:
+        rng = random.Random(seed + 1)
+        for index in range(components):
+            parts = [_COMPONENT_HEADER] + [_WIDGET.replace('{n}', str(n)) for n in range(rng.randint(1, 6))]
+            path = root / 'components' / f'g{index // COMPONENTS_PER_GROUP}' / f'c{index}.tsx'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text('\n'.join(parts), encoding='utf-8')
+        manifest_path.write_text(json.dumps({'count': components, 'seed': seed, 'version': CORPUS_VERSION}),
+                                 encoding='utf-8')
+    features.update(routes=count, components=components, files=count + components)
+    return features
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+在独立进程中对单个维护脚本跑一次基准测试
+
+    python3 scripts/benchmarks/runner.py <工具> <语料目录> [--workers N]
+
+按阶段计时（遍历/分析/写回/报告），最后一行输出 JSON 结果，
+其中包含本进程与进程池子进程各自的峰值 RSS。
+语料会被改写，调用方需要传入一份副本。
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+REPO_ROOT = SCRIPTS_DIR.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from tstools import fileio
+from tstools.findings import FindingStream
+from tstools.paths import load_script
+from tstools.rewrite_engine import rewrite_files
+from tstools.rule_runner import resolve_targets, run_rules
+from tstools.scan_engine import ScanStats, default_workers, iter_source_files, scan_files
+from tstools.ts_lexer import tokenize_all
+
+
+class PhaseTimer:
+    """按阶段累计耗时"""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def bench_scan_sql_injection(root, workers, timer):
+    module = load_script(SCRIPTS_DIR / 'scan-sql-injection.py', 'scan_sql_injection')
+    with timer.phase('walk'):
+        files = module.candidate_files(root, module.SCAN_DIRS, workers, use_index=False)
+    counts = {'files_with_usages': 0, 'unsafe': 0, 'safe': 0, 'manual': 0}
+    # 语料是只读共享的，结果流写到临时目录
+    tmp = tempfile.TemporaryDirectory()
+    stream_path = Path(tmp.name) / module.FINDINGS_FILE.name
+    with timer.phase('analyze'), FindingStream('scan-sql-injection', jsonl=stream_path) as stream:
+        worker = functools.partial(module.scan_file, root=root)
+        for _, (_, result, _) in scan_files([(f, None) for f in files], worker, workers=workers):
+            if not result:
+                continue
+            counts['files_with_usages'] += 1
+            counts['unsafe'] += len(result['unsafe_usages'])
+            counts['safe'] += len(result['safe_usages'])
+            counts['manual'] += len(result['needs_manual_check'])
+            for item in module.result_records(result):
+                stream.emit(item)
+        stream.close(usages=counts['unsafe'] + counts['safe'] + counts['manual'], **counts)
+    with timer.phase('report'), open(os.devnull, 'w', encoding='utf-8') as out:
+        module.render_report(stream_path, out)
+    tmp.cleanup()
+    return counts
+
+
+def bench_fix_syntax_errors(root, workers, timer):
+    module = load_script(REPO_ROOT / 'fix_syntax_errors.py', 'fix_syntax_errors')
+    os.chdir(root)
+    with timer.phase('walk'):
+        files = [f for d in module.directories for f in module.collect_files(d)]
+    changed = 0
+    with timer.phase('rewrite'):
+        for result in rewrite_files(files, module.fix_content, workers=workers):
+            changed += result.changed
+    return {'changed': changed}
+
+
+def bench_update_api_permissions(root, workers, timer):
+    module = load_script(SCRIPTS_DIR / 'update-api-permissions.py', 'update_api_permissions')
+    with timer.phase('discover'):
+        routes = module.discover_routes(root, workers=workers)
+    updated = 0
+    with timer.phase('rewrite'):
+        for route in routes:
+            if route.is_admin and route.uses_get_admin and not route.uses_permission_manager:
+                updated += module.process_api_file(route, root)
+    return {'routes': len(routes), 'updated': updated}
+
+
+def bench_wrap_user_apis(root, workers, timer):
+    module = load_script(SCRIPTS_DIR / 'wrap_user_apis.py', 'wrap_user_apis')
+    with timer.phase('discover'):
+        routes = [r for r in module.discover_routes(root, api_dir=module.ADMIN_API_DIR, workers=workers)
+                  if r.domain is not None and r.uses_permission_manager]
+    changed = 0
+    with timer.phase('rewrite'):
+        files = [str(root / r.path) for r in routes]
+        for result in rewrite_files(files, module.wrap_methods, workers=workers, root=root):
+            changed += result.changed
+    return {'routes': len(routes), 'changed': changed}
+
+
+def bench_run_hygiene(root, workers, timer):
+    """四条规则在同一次遍历中完成（改写规则串联）"""
+    targets = resolve_targets()
+    counts = {}
+    with timer.phase('rules'):
+        for outcome in run_rules(root, targets, mode='fix', workers=workers):
+            for item in outcome.records:
+                counts[item['rule']] = counts.get(item['rule'], 0) + 1
+            for name in outcome.changed_by:
+                counts[f'changed:{name}'] = counts.get(f'changed:{name}', 0) + 1
+    return counts
+
+
+def _reference_worker(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return len(data), len(tokenize_all(data.decode('utf-8')))
+
+
+def bench_reference(root, workers, timer):
+    """
+    参照负载：用同样的进程数读入并词法分析全部文件
+
+    与被测脚本在同一台机器、同一次运行中测得，吞吐之比不受机器快慢和当时负载的影响。
+    """
+    files = [str(p) for p in iter_source_files(root, ['app', 'components'])]
+    tokens = 0
+    with timer.phase('tokenize'):
+        for _, count in scan_files(files, _reference_worker, workers=workers):
+            tokens += count
+    return {'tokens': tokens}
+
+
+# 各脚本在候选选择阶段预筛的字面量（scan-sql-injection、admin-permissions、type-annotations）
+SELECT_LITERALS = ('$queryRawUnsafe', 'getAdminFromRequest', ': any')
+
+
+def _select_decode(path, literal):
+    """原做法：完整读入并解码，再在 str 上做子串检查；返回 (字节数, (是否命中, 分配的字节数))"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    content = data.decode('utf-8')
+    return len(data), (literal in content, sys.getsizeof(data) + sys.getsizeof(content))
+
+
+def _select_mmap(path, literal):
+    """在映射（小文件为读入的 bytes）上按字节预筛，只解码命中的文件"""
+    with fileio.MappedSource(path) as source:
+        allocated = 0 if source.mapped else sys.getsizeof(source.buffer)
+        if not source.contains_any((literal.encode('utf-8'),)):
+            return source.size, (False, allocated)
+        return source.size, (True, allocated + sys.getsizeof(source.text()))
+
+
+def _bench_select(worker, root, workers, timer):
+    """
+    每个字面量各做一遍候选选择（对应一个脚本的预筛阶段）
+
+    在当前进程中串行执行：每个文件只有几微秒的工作量，进程池的启动开销会掩盖差异。
+    """
+    files = [str(p) for p in iter_source_files(root, ['app', 'components'])]
+    counts = {'allocated_bytes': 0}
+    for literal in SELECT_LITERALS:
+        hits = 0
+        with timer.phase(f'select:{literal}'):
+            for _, (hit, allocated) in scan_files(files, functools.partial(worker, literal=literal),
+                                                  workers=1):
+                hits += hit
+                counts['allocated_bytes'] += allocated
+        counts[f'candidates:{literal}'] = hits
+    return counts
+
+
+def bench_select_decode(root, workers, timer):
+    return _bench_select(_select_decode, root, workers, timer)
+
+
+def bench_select_mmap(root, workers, timer):
+    return _bench_select(_select_mmap, root, workers, timer)
+
+
+TOOLS = {
+    'scan-sql-injection': bench_scan_sql_injection,
+    'fix_syntax_errors': bench_fix_syntax_errors,
+    'update-api-permissions': bench_update_api_permissions,
+    'wrap_user_apis': bench_wrap_user_apis,
+    'run-hygiene': bench_run_hygiene,
+    'select-decode': bench_select_decode,
+    'select-mmap': bench_select_mmap,
+    'reference': bench_reference,
+}
+
+
+def corpus_size(root: Path):
+    files = total = 0
+    for current, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(('.ts', '.tsx')):
+                files += 1
+                total += os.path.getsize(os.path.join(current, filename))
+    return files, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="维护脚本基准测试（单次运行）")
+    parser.add_argument('tool', choices=sorted(TOOLS))
+    parser.add_argument('corpus', type=Path)
+    parser.add_argument('--workers', '-j', type=int, default=default_workers())
+    args = parser.parse_args()
+
+    root = args.corpus.resolve()
+    files, nbytes = corpus_size(root)
+    timer = PhaseTimer()
+
+    # 脚本自身的逐文件输出不计入结果，也不刷屏
+    start = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        counts = TOOLS[args.tool](root, args.workers, timer)
+    elapsed = time.perf_counter() - start
+
+    stats = ScanStats(files=files, bytes=nbytes, elapsed=elapsed)
+    result = {
+        'tool': args.tool,
+        'workers': args.workers,
+        'files': files,
+        'bytes': nbytes,
+        'elapsed': elapsed,
+        'files_per_sec': stats.files_per_sec,
+        'mb_per_sec': stats.mb_per_sec,
+        # Linux 上 ru_maxrss 的单位是 KB
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'children_peak_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        'phases': timer.phases,
+        'counts': counts,
+    }
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
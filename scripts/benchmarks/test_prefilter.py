@@ -0,0 +1,32 @@
+"""
+候选选择阶段：完整解码后在 str 上预筛 vs 在 mmap 映射上按字节预筛（tstools/fileio.py）
+
+用混合语料（corpus.generate_mixed_corpus）：与项目中一样，大部分文件是不含任何预筛字面量的组件。
+两种做法选出的候选文件数必须一致；字节预筛只解码命中的文件，分配的字节数必须更少。
+各阶段耗时和分配的字节数与其他用例一起写入 .cache/benchmarks/results.json。
+"""
+
+import pytest
+
+from conftest import SIZES, result_key
+
+
+def candidates(result):
+    return {name: n for name, n in result['counts'].items() if name.startswith('candidates:')}
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_prefilter(size, mixed_corpus_factory, run_tool, bench_results):
+    corpus, features = mixed_corpus_factory(size)
+    decoded = run_tool('select-decode', corpus)
+    mapped = run_tool('select-mmap', corpus)
+    for result in (decoded, mapped):
+        result['size'] = size
+        bench_results[result_key(result['tool'], size)] = result
+
+    assert decoded['files'] == mapped['files'] == features['files']
+    assert candidates(mapped) == candidates(decoded)
+    # 每个合成路由都导入 getAdminFromRequest，$queryRawUnsafe 只出现在部分路由中，组件一个都不命中
+    assert candidates(decoded)['candidates:getAdminFromRequest'] == features['routes']
+    assert candidates(decoded)['candidates:$queryRawUnsafe'] < features['routes']
+    assert mapped['counts']['allocated_bytes'] < decoded['counts']['allocated_bytes']
@@ -0,0 +1,69 @@
+"""
+四个维护脚本（以及一次遍历运行全部规则的 run-hygiene）在合成语料上的吞吐、峰值内存和分阶段耗时
+
+每个用例同时校验结果与语料特征计数一致，避免"变快"其实是漏处理。
+相对吞吐（除以同一次运行中参照负载的吞吐）低于基线 (1 - TSTOOLS_BENCH_THRESHOLD) 倍时
+给出警告；设置 TSTOOLS_BENCH_ENFORCE=1 时改为失败。
+"""
+
+import shutil
+import warnings
+
+import pytest
+
+from conftest import ENFORCE, SIZES, THRESHOLD, UPDATE_BASELINE, result_key
+
+
+def expected_counts(tool, features):
+    """语料特征 -> 该工具应得到的计数"""
+    if tool == 'scan-sql-injection':
+        return {'unsafe': features['unsafe'], 'safe': features['safe'], 'manual': features['manual']}
+    if tool == 'fix_syntax_errors':
+        return {'changed': features['broken_any']}
+    if tool == 'update-api-permissions':
+        return {'updated': features['files'] - features['migrated']}
+    if tool == 'run-hygiene':
+        # 同一次遍历中先补上中间件声明再包装，所有路由都会被包装
+        return {'sql-injection': features['unsafe'], 'sql-manual-check': features['manual'],
+                'changed:type-annotations': features['broken_any'],
+                'changed:admin-permissions': features['files'] - features['migrated'],
+                'changed:wrap-admin-apis': features['files']}
+    return {'changed': features['migrated']}
+
+
+# 只读扫描的工具可以直接使用原始语料，其余工具在副本上运行
+READ_ONLY_TOOLS = {'scan-sql-injection'}
+TOOLS = ['scan-sql-injection', 'fix_syntax_errors', 'update-api-permissions', 'wrap_user_apis',
+         'run-hygiene']
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('tool', TOOLS)
+def test_throughput(tool, size, corpus_factory, run_tool, reference, baseline, bench_results, tmp_path):
+    corpus, features = corpus_factory(size)
+    if tool not in READ_ONLY_TOOLS:
+        work = tmp_path / 'corpus'
+        shutil.copytree(corpus, work)
+        corpus = work
+
+    result = run_tool(tool, corpus)
+    result['size'] = size
+    key = result_key(tool, size)
+    bench_results[key] = result
+
+    assert result['files'] == features['files']
+    for name, expected in expected_counts(tool, features).items():
+        assert result['counts'][name] == expected, f"{key}: {name}"
+    assert set(result['phases']) and all(v >= 0 for v in result['phases'].values())
+
+    result['relative'] = result['files_per_sec'] / reference(size)['files_per_sec']
+    expected = baseline.get(key, {}).get('relative')
+    if expected is None or UPDATE_BASELINE:
+        return
+    floor = expected * (1 - THRESHOLD)
+    if result['relative'] < floor:
+        message = (f"{key} 相对吞吐下降: {result['relative']:.3f}（{result['files_per_sec']:.1f} 文件/s），"
+                   f"基线 {expected:.3f}，允许下限 {floor:.3f}")
+        if ENFORCE:
+            pytest.fail(message)
+        warnings.warn(message)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+管理后台统计的汇总表
+
+1. 从原始SQL目录（tstools/sql_catalog.py）中取出 --paths 下的聚合查询（默认 admin/users/* 和 admin/costs/*），
+   按后台默认视图去掉可选过滤，修复开头的分号和改坏的运算符；--queries 可以补充SQL文件中的查询
+2. 能按天累加的查询生成增量汇总表和刷新函数，其余整条物化（规则见 tstools/rollups.py）
+3. 写到 .cache/rollups/：rollups.sql（建表和刷新函数）、schedule.sql（pg_cron 刷新计划）、
+   rewritten.sql（读汇总的查询；带可选过滤的原查询注明只能替换不带过滤的请求）和 report.json
+4. --check 时在一次性的本地 PostgreSQL 中按 schema.prisma 建表并生成合成数据（同 sql-explain.py），
+   比较改写前后的查询结果；再给源表追加一批新数据，增量刷新后再比较一次，并记录两者的 EXPLAIN 耗时
+
+用法:
+    python3 scripts/build-rollups.py [--paths PREFIX ...] [--queries FILE] [--append-only TABLE]
+                                     [--lookback-days N] [--output-dir DIR] [--report FILE]
+    python3 scripts/build-rollups.py --check [--pg-bin DIR | --dsn DSN] [--scale N] [--extra-sql FILE]
+                                     [--jsonl FILE] [--sarif FILE] [--fail-on LEVEL]
+
+--queries 文件中每条查询以 `-- name: 说明` 行开头。user_behavior_logs 等统计表不在 schema.prisma 中，
+校验时用 --extra-sql 提供它们的建表语句和数据。
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from pathlib import Path
+
+from tstools import findings, paths, pg_local, prisma_schema, profiling, regex_guard, rollups, sql_catalog
+from tstools.prisma_schema import quote_ident
+from tstools.scan_engine import ScanStats
+
+OUTPUT_DIR = Path(".cache") / "rollups"
+
+# 校验时每个源表追加的行数
+NEW_ROWS = 200
+
+RULES = {
+    'rollup-skipped': "聚合查询无法生成汇总",
+    'rollup-materialized': "只能整条物化、按计划全量刷新的查询",
+    'rollup-approximate': "改写后按整天取数，时间边界与原查询不同",
+    'rollup-mismatch': "改写后的查询与原查询结果不一致",
+    'rollup-check-failed': "校验时原查询或改写后的查询执行失败",
+    'rollup-filtered': "原查询带可选过滤，改写只适用于不带过滤的请求",
+}
+
+# 源表中除有默认值的主键外的列（追加数据时由默认值生成主键）
+_COLUMNS_SQL = """
+SELECT string_agg(quote_ident(c.column_name), ', ' ORDER BY c.ordinal_position)
+FROM information_schema.columns c
+WHERE c.table_schema = current_schema() AND c.table_name = '{table}'
+  AND NOT ((c.column_default IS NOT NULL OR c.is_identity = 'YES') AND c.column_name IN (
+    SELECT k.column_name FROM information_schema.key_column_usage k
+    JOIN information_schema.table_constraints t
+      ON t.constraint_schema = k.constraint_schema AND t.constraint_name = k.constraint_name
+    WHERE t.constraint_type = 'PRIMARY KEY' AND k.table_schema = current_schema() AND k.table_name = '{table}'));
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="管理后台统计的汇总表")
+    paths.add_root_argument(parser)
+    parser.add_argument('--workers', '-j', type=int, help="提取SQL的并行进程数（默认CPU核数）")
+    parser.add_argument('--schema', type=Path, help=f"Prisma schema（默认 <root>/{prisma_schema.SCHEMA_FILE}）")
+    parser.add_argument('--paths', nargs='+', default=rollups.QUERY_PATHS, metavar='PREFIX',
+                        help="处理这些路径前缀下的聚合查询（默认 admin/users 和 admin/costs 路由）")
+    parser.add_argument('--queries', type=Path, action='append', default=[], metavar='FILE',
+                        help="补充的聚合查询（SQL文件，每条以 -- name: 行开头），可重复")
+    parser.add_argument('--samples', type=Path, metavar='FILE', help="覆盖参数样例值的JSON文件（同 sql-explain.py）")
+    parser.add_argument('--append-only', action='append', default=[], metavar='TABLE',
+                        help="按只追加处理的表（时间列不是 created_at 时需要指定），可重复")
+    parser.add_argument('--lookback-days', type=int, default=rollups.LOOKBACK_DAYS, metavar='N',
+                        help=f"增量刷新时重算的最近天数（默认 {rollups.LOOKBACK_DAYS}）")
+    parser.add_argument('--incremental-cron', default=rollups.INCREMENTAL_CRON, metavar='CRON',
+                        help=f"增量汇总的刷新计划（默认 '{rollups.INCREMENTAL_CRON}'）")
+    parser.add_argument('--materialized-cron', default=rollups.MATERIALIZED_CRON, metavar='CRON',
+                        help=f"物化视图的刷新计划（默认 '{rollups.MATERIALIZED_CRON}'）")
+    parser.add_argument('--rebuild-cron', default=rollups.REBUILD_CRON, metavar='CRON',
+                        help=f"增量汇总全量重建的计划（默认 '{rollups.REBUILD_CRON}'）")
+    parser.add_argument('--output-dir', type=Path, metavar='DIR', help=f"输出目录（默认 <root>/{OUTPUT_DIR}）")
+    parser.add_argument('--check', action='store_true', help="在本地 PostgreSQL 中比较改写前后的结果")
+    parser.add_argument('--scale', type=int, default=10000, help="--check 时每个表的合成数据行数（默认 10000）")
+    parser.add_argument('--new-rows', type=int, default=NEW_ROWS, metavar='N',
+                        help=f"--check 时每个源表追加的行数（默认 {NEW_ROWS}）")
+    parser.add_argument('--extra-sql', type=Path, action='append', default=[], metavar='FILE',
+                        help="生成种子数据后执行的SQL文件（schema.prisma 之外的统计表及其数据），可重复")
+    parser.add_argument('--timeout', type=float, default=30.0, metavar='SECONDS', help="单条SQL的超时")
+    parser.add_argument('--report', type=Path, metavar='FILE', help="JSON 报告（默认 <output-dir>/report.json）")
+    parser.add_argument('--fail-on', choices=('error', 'warning', 'note'),
+                        help="有该级别及以上的记录时退出码为1")
+    pg_local.add_postgres_arguments(parser)
+    findings.add_output_arguments(parser)
+    regex_guard.add_budget_argument(parser)
+    profiling.add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def fetch(pg, sql, timeout):
+    """执行查询，返回 CSV 形式的全部行"""
+    statement = sql.strip().rstrip(';')
+    out = pg.run(f"SET statement_timeout = {int(timeout * 1000)};\n"
+                 f"COPY (\n{statement}\n) TO STDOUT WITH (FORMAT csv);\n", timeout=timeout + 30)
+    return list(csv.reader(io.StringIO(out)))
+
+
+def canonical(rows):
+    """比较用的形式：数值保留 6 位有效数字（AVG 与 SUM / COUNT 的小数位数不同），行按值排序"""
+    def cell(value):
+        try:
+            return format(float(value), '.6g')
+        except ValueError:
+            return value
+    return sorted(tuple(cell(value) for value in row) for row in rows)
+
+
+def compare(pg, rollup, timeout):
+    """原查询与改写后的查询的结果是否一致"""
+    try:
+        expected = fetch(pg, rollup.reference, timeout)
+    except pg_local.PostgresError as e:
+        return {'error': f"原查询执行失败: {str(e).splitlines()[0]}"}
+    try:
+        actual = fetch(pg, rollup.rewritten, timeout)
+    except pg_local.PostgresError as e:
+        return {'error': f"改写后的查询执行失败: {str(e).splitlines()[0]}"}
+    return {'rows': len(expected), 'match': canonical(expected) == canonical(actual),
+            'rewritten_rows': len(actual)}
+
+
+def append_rows(pg, rollup, rows):
+    """给增量汇总的源表追加一批新数据；有 updated_at 的表再追加一批时间不变、updated_at 为现在的行"""
+    table = quote_ident(rollup.table)
+    columns = pg.run(_COLUMNS_SQL.format(table=rollup.table.replace("'", "''"))).strip()
+    if not columns:
+        raise pg_local.PostgresError(f"找不到表 {rollup.table}")
+    time_column = rollup.time_column.split('.')[-1]
+    insert = f"INSERT INTO {table} ({columns}) SELECT {columns} FROM rollup_new;"
+    script = ["BEGIN;",
+              f"CREATE TEMP TABLE rollup_new ON COMMIT DROP AS SELECT * FROM {table} ORDER BY random() LIMIT {rows};"]
+    if rollup.updated:
+        script += [f"UPDATE rollup_new SET {quote_ident(rollup.updated)} = now();", insert]
+    script += [f"UPDATE rollup_new SET {time_column} = now() - random() * interval '1 day';", insert, "COMMIT;"]
+    pg.run('\n'.join(script) + '\n')
+
+
+def timing(pg, sql, timeout):
+    try:
+        return pg_local.summarize_plan(pg.explain(sql, timeout=timeout)).execution_ms
+    except pg_local.PostgresError:
+        return None
+
+
+def check_rollups(pg, schema, planned, args):
+    """建表、初次刷新并比较；追加数据、增量刷新后再比较。返回 {汇总名: 结果}"""
+    results = {rollup.name: {} for rollup in planned}
+    print(f"📦 建表并生成 {args.scale} 行合成数据...")
+    with profiling.phase('seed'):
+        pg.reset_schema()
+        pg.run(prisma_schema.render_ddl(schema))
+        pg.run(prisma_schema.seed_sql(schema, args.scale))
+        for path in args.extra_sql:
+            pg.run(path.read_text(encoding='utf-8'))
+        pg.run(rollups.rollup_sql(planned))
+
+    with profiling.phase('check'):
+        for rollup in planned:
+            try:
+                pg.run(f"SELECT {rollup.function}();\n", timeout=args.timeout + 30)
+            except pg_local.PostgresError as e:
+                results[rollup.name]['initial'] = {'error': f"刷新失败: {str(e).splitlines()[0]}"}
+                continue
+            results[rollup.name]['initial'] = compare(pg, rollup, args.timeout)
+            results[rollup.name]['original_ms'] = timing(pg, rollup.reference, args.timeout)
+            results[rollup.name]['rewritten_ms'] = timing(pg, rollup.rewritten, args.timeout)
+
+        appended = set()
+        for rollup in planned:
+            if rollup.kind != rollups.KIND_INCREMENTAL or rollup.table in appended:
+                continue
+            appended.add(rollup.table)
+            try:
+                append_rows(pg, rollup, args.new_rows)
+            except pg_local.PostgresError as e:
+                results[rollup.name]['refreshed'] = {'error': f"追加数据失败: {str(e).splitlines()[0]}"}
+        for rollup in planned:
+            if 'error' in results[rollup.name]['initial'] or 'refreshed' in results[rollup.name]:
+                continue
+            try:
+                pg.run(f"SELECT {rollup.function}();\n", timeout=args.timeout + 30)
+            except pg_local.PostgresError as e:
+                results[rollup.name]['refreshed'] = {'error': f"增量刷新失败: {str(e).splitlines()[0]}"}
+                continue
+            results[rollup.name]['refreshed'] = compare(pg, rollup, args.timeout)
+    return results
+
+
+def rollup_records(rollup, check, queries):
+    """单个汇总的 finding 记录（按使用它的每处查询）"""
+    records = []
+    for query_id in rollup.queries:
+        path, line, filters = queries[query_id]
+
+        def add(rule, level, message, **extra):
+            records.append(findings.record('finding', rule, level, path, message, line=line, rollup=rollup.name,
+                                           **extra))
+
+        if rollup.kind == rollups.KIND_MATERIALIZED:
+            add('rollup-materialized', 'note', f"{rollup.name}: {rollup.notes[0]}")
+        if not rollup.exact:
+            add('rollup-approximate', 'note', f"{rollup.name}: {rollup.notes[0]}")
+        if filters:
+            add('rollup-filtered', 'note',
+                f"{rollup.name}: 只在不带可选过滤时改用汇总，带过滤时仍执行原查询: {'; '.join(filters)}",
+                filters=list(filters))
+        for stage in ('initial', 'refreshed'):
+            result = (check or {}).get(stage)
+            if not result:
+                continue
+            if 'error' in result:
+                add('rollup-check-failed', 'warning', f"{rollup.name}: {result['error']}", stage=stage)
+            elif not result['match']:
+                add('rollup-mismatch', 'error',
+                    f"{rollup.name}: {'增量刷新后' if stage == 'refreshed' else ''}结果不一致"
+                    f"（原查询 {result['rows']} 行，改写后 {result['rewritten_rows']} 行）", stage=stage)
+    return records
+
+
+def main():
+    args = parse_args()
+    root = args.root.resolve()
+    schema_path = args.schema or root / prisma_schema.SCHEMA_FILE
+    schema = prisma_schema.load_schema(schema_path)
+    overrides = json.loads(args.samples.read_text(encoding='utf-8')) if args.samples else None
+
+    profiler = profiling.from_args(args, 'build-rollups', root)
+    stats = ScanStats()
+    catalog = sql_catalog.build_catalog(root, workers=args.workers, stats=stats, budget=args.file_budget,
+                                        overrides=overrides)
+    with profiling.phase('plan'):
+        queries, skipped = rollups.collect_queries(catalog, args.paths)
+        for path in args.queries:
+            rel = path.resolve().relative_to(root).as_posix() if path.resolve().is_relative_to(root) else str(path)
+            queries.extend(rollups.load_queries(path, rel))
+        planned, failed = rollups.plan_rollups(queries, schema, args.append_only, args.lookback_days)
+        entries = rollups.schedule(planned, args.incremental_cron, args.materialized_cron, args.rebuild_cron)
+
+    output_dir = args.output_dir or root / OUTPUT_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / 'rollups.sql').write_text(rollups.rollup_sql(planned), encoding='utf-8')
+    (output_dir / 'schedule.sql').write_text(rollups.schedule_sql(entries), encoding='utf-8')
+    (output_dir / 'rewritten.sql').write_text(rollups.rewritten_sql(planned, queries), encoding='utf-8')
+
+    checks = {}
+    if args.check and planned:
+        try:
+            with pg_local.from_args(args) as pg:
+                checks = check_rollups(pg, schema, planned, args)
+        except pg_local.PostgresError as e:
+            print(f"❌ PostgreSQL 不可用: {e}")
+            return 2
+
+    by_id = {query.id: (query.path, query.line, query.filters) for query in queries}
+    with findings.from_args(args, 'build-rollups', rules=RULES) as stream:
+        for template, reason in skipped:
+            stream.emit(findings.record('finding', 'rollup-skipped', 'note', template.path, reason,
+                                        line=template.line))
+        for query, reason in failed:
+            stream.emit(findings.record('finding', 'rollup-skipped', 'note', query.path, reason, line=query.line))
+        for rollup in planned:
+            for item in rollup_records(rollup, checks.get(rollup.name), by_id):
+                stream.emit(item)
+        stream.close(rollups=len(planned), skipped=len(skipped) + len(failed))
+        counts = dict(stream.counts)
+
+    report = {
+        'version': 1,
+        'rollups': [dict(rollup.to_dict(), check=checks.get(rollup.name),
+                         filtered={q: by_id[q][2] for q in rollup.queries if by_id[q][2]})
+                    for rollup in planned],
+        'skipped': [{'id': t.id, 'reason': reason} for t, reason in skipped] +
+                   [{'id': q.id, 'reason': reason} for q, reason in failed],
+        'schedule': entries,
+    }
+    report_path = args.report or output_dir / 'report.json'
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+    with profiling.phase('report'):
+        print(f"SQL目录: {len(catalog)} 条（扫描: {stats.summary()}）；聚合查询 {len(queries)} 条")
+        for prefix in args.paths:
+            if not any(q.path.startswith(prefix) for q in queries) and \
+                    not any(t.path.startswith(prefix) for t, _ in skipped):
+                print(f"ℹ️  {prefix} 下没有原始SQL聚合（如查询构造器取数后在 JS 中汇总），可用 --queries 补充")
+        print()
+        header = f"{'原查询':>10} {'改写后':>10}  结果" if checks else ''
+        print(f"{'汇总':<44}{'方式':<24}{header}")
+        for rollup in planned:
+            kind = f"{rollup.kind}/{rollup.strategy}" if rollup.strategy else rollup.kind
+            line = f"{rollup.name:<44}{kind:<24}"
+            check = checks.get(rollup.name)
+            if check:
+                cells = [f"{check[key]:>8.1f}ms" if check.get(key) is not None else f"{'-':>10}"
+                         for key in ('original_ms', 'rewritten_ms')]
+                stages = []
+                for stage in ('initial', 'refreshed'):
+                    result = check.get(stage)
+                    if result:
+                        stages.append(result['error'] if 'error' in result else
+                                      f"{'✅' if result['match'] else '❌'} {result['rows']} 行")
+                line += f"{cells[0]} {cells[1]}  {' / '.join(stages)}"
+            elif not rollup.exact:
+                line += "（按整天取数）"
+            print(line)
+        for template, reason in skipped:
+            print(f"⚠️  跳过 {template.id}: {reason}")
+        for query, reason in failed:
+            print(f"⚠️  跳过 {query.id}: {reason}")
+        print()
+        print(f"建表和刷新函数: {output_dir / 'rollups.sql'}，刷新计划: {output_dir / 'schedule.sql'}，"
+              f"改写后的查询: {output_dir / 'rewritten.sql'}")
+        print(f"记录: {', '.join(f'{level} {n}' for level, n in counts.items()) or '无'}；报告已写入 {report_path}")
+
+    if profiler is not None:
+        profiler.finish()
+        print(profiler.summary())
+    if args.fail_on:
+        levels = findings.LEVELS[:findings.LEVELS.index(args.fail_on) + 1]
+        if any(counts.get(level) for level in levels):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,38 +1,22 @@
 #!/bin/bash
 
 echo "=== SQL注入风险检查脚本 ==="
-echo "检查所有使用\$queryRawUnsafe的文件"
+echo "检查所有 \$queryRawUnsafe / \$executeRawUnsafe / Prisma.raw 调用"
 echo ""
 
-cd /workspace/luckymart-tj
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+ROOT="${LUCKYMART_ROOT:-$(cd "$SCRIPT_DIR/.." && pwd)}"
 
-# 创建临时文件保存结果
-TEMP_FILE="/tmp/sql_injection_check.txt"
-> "$TEMP_FILE"
+# 优先查询常驻的扫描守护进程（scan-sql-injection.py --daemon），毫秒级返回；
+# 守护进程未运行时（退出码2）退回一次冷启动扫描。
+# 传入文件或目录参数时只检查这些路径；两种方式发现危险用法时退出码都为1。
+python3 "$SCRIPT_DIR/sql-scan-client.py" --root "$ROOT" findings "$@"
+STATUS=$?
 
-# 查找所有使用$queryRawUnsafe的文件
-echo "扫描中..."
-grep -rn "\$queryRawUnsafe" --include="*.ts" --include="*.tsx" app/ lib/ | while IFS=: read -r file line content; do
-  echo "文件: $file" >> "$TEMP_FILE"
-  echo "行号: $line" >> "$TEMP_FILE"
-  echo "代码: $content" >> "$TEMP_FILE"
-  echo "---" >> "$TEMP_FILE"
-done
-
-# 统计结果
-TOTAL_COUNT=$(grep -c "文件:" "$TEMP_FILE" 2>/dev/null || echo "0")
-
-echo ""
-echo "=== 检查结果 ==="
-echo "发现 $TOTAL_COUNT 处使用 \$queryRawUnsafe"
-echo ""
-echo "详细信息保存在: $TEMP_FILE"
-echo ""
-
-# 显示前20个结果
-if [ "$TOTAL_COUNT" -gt 0 ]; then
-  echo "前20个结果："
-  head -80 "$TEMP_FILE"
+if [ "$STATUS" -eq 2 ]; then
+  echo "守护进程未运行，执行冷启动扫描（可用 python3 scripts/sql-scan-client.py start 启动守护进程）..."
+  python3 "$SCRIPT_DIR/scan-sql-injection.py" --root "$ROOT" --fail-on-unsafe "$@"
+  STATUS=$?
 fi
 
 echo ""
@@ -42,3 +26,5 @@ echo "2. 使用参数化查询，不要使用字符串插值"
 echo "3. 示例："
 echo "   错误: prisma.\$queryRawUnsafe(\`SELECT * FROM users WHERE id = '\${userId}'\`)"
 echo "   正确: prisma.\$queryRaw\`SELECT * FROM users WHERE id = \${userId}\`"
+
+exit $STATUS
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Prisma N+1 查询检测
+
+找出循环中（直接或经本文件内的辅助函数）发出的 Prisma 查询，估算每个请求发出的查询数，
+给出批量化写法（findMany + in、include、groupBy、createMany ...），按路由排序：
+每个请求查询数最多的路由排在最前，优先修复负载下对延迟影响最大的地方。分析规则见 tstools/n_plus_one.py。
+
+用法:
+    python3 scripts/find-n-plus-one.py [--top N] [--min-queries N] [--loop-default N] [--unbounded N]
+                                       [--report FILE] [--jsonl FILE] [--sarif FILE] [--fail-on LEVEL]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from tstools import findings, n_plus_one, paths, prisma_schema, profiling, regex_guard
+from tstools.scan_engine import ScanStats
+
+REPORT_FILE = Path(".cache") / "n-plus-one-report.json"
+
+RULES = {
+    'n-plus-one-sequential': "循环中逐个 await 的查询（每次迭代一次往返）",
+    'n-plus-one-concurrent': "循环中并发发出的查询（每次迭代占用一个连接）",
+}
+
+# 每个请求的估计查询数达到该值时记为 warning，否则为 note
+WARN_QUERIES = 10
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Prisma N+1 查询检测")
+    paths.add_root_argument(parser)
+    parser.add_argument('--dirs', nargs='+', default=n_plus_one.SCAN_DIRS, help="扫描的目录（默认 app lib）")
+    parser.add_argument('--workers', '-j', type=int, help="并行进程数（默认CPU核数）")
+    parser.add_argument('--schema', type=Path, help=f"Prisma schema（默认 <root>/{prisma_schema.SCHEMA_FILE}），"
+                                                    f"用于判断能否改用 include")
+    parser.add_argument('--loop-default', type=int, default=n_plus_one.DEFAULT_ITERATIONS, metavar='N',
+                        help=f"无法估算时的循环次数（默认 {n_plus_one.DEFAULT_ITERATIONS}）")
+    parser.add_argument('--unbounded', type=int, default=n_plus_one.UNBOUNDED_ITERATIONS, metavar='N',
+                        help=f"遍历没有 take 的 findMany 结果时的循环次数（默认 {n_plus_one.UNBOUNDED_ITERATIONS}）")
+    parser.add_argument('--min-queries', type=int, default=1, metavar='N',
+                        help="只报告每个请求估计查询数不少于 N 的位置")
+    parser.add_argument('--top', type=int, default=20, metavar='N', help="终端输出前 N 个文件的明细（0 为全部）")
+    parser.add_argument('--report', type=Path, metavar='FILE', help=f"JSON 报告（默认 <root>/{REPORT_FILE}）")
+    parser.add_argument('--fail-on', choices=('error', 'warning', 'note'),
+                        help="有该级别及以上的记录时退出码为1")
+    findings.add_output_arguments(parser)
+    regex_guard.add_budget_argument(parser)
+    profiling.add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def site_record(site):
+    """单处查询的 finding 记录"""
+    sequential = site.round_trips > 1
+    rule = 'n-plus-one-sequential' if sequential else 'n-plus-one-concurrent'
+    level = 'warning' if site.per_request >= WARN_QUERIES else 'note'
+    target = f"{site.model}.{site.op}" if site.model else site.op
+    chain = ' -> '.join(f"{step['function']}()" for step in site.via)
+    message = (f"{target} 在循环中{f'（经 {chain}）' if chain else ''}，"
+               f"每个请求约 {site.per_request} 次查询"
+               f"{f'、{site.round_trips} 次串行往返' if sequential else ''}；建议: {site.suggestion}")
+    return findings.record('finding', rule, level, site.path, message, line=site.line,
+                           model=site.model, op=site.op, per_request=site.per_request,
+                           round_trips=site.round_trips, shape=site.shape, loops=site.loops, via=site.via,
+                           methods=site.methods)
+
+
+def main():
+    args = parse_args()
+    root = args.root.resolve()
+    schema_path = args.schema or root / prisma_schema.SCHEMA_FILE
+    schema = prisma_schema.load_schema(schema_path) if schema_path.exists() else None
+
+    profiler = profiling.from_args(args, 'find-n-plus-one', root)
+    stats = ScanStats()
+    sites = n_plus_one.find_sites(root, args.dirs, schema=schema, default=args.loop_default,
+                                  unbounded=args.unbounded, workers=args.workers, stats=stats,
+                                  budget=args.file_budget)
+    sites = [site for site in sites if site.per_request >= args.min_queries]
+    ranked = n_plus_one.rank_routes(sites)
+    by_id = {site.id: site for site in sites}
+
+    with findings.from_args(args, 'find-n-plus-one', rules=RULES) as stream:
+        for site in sites:
+            stream.emit(site_record(site))
+        stream.close(sites=len(sites), files=len(ranked))
+        counts = dict(stream.counts)
+
+    report = {'version': 1, 'loop_default': args.loop_default, 'unbounded': args.unbounded,
+              'routes': ranked, 'sites': [site.to_dict() for site in sites]}
+    report_path = args.report or root / REPORT_FILE
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+    with profiling.phase('report'):
+        print(f"扫描: {stats.summary()}")
+        for path in stats.skipped:
+            print(f"⏱️ 超时跳过: {path}")
+        print(f"\n{'查询/请求':>9} {'串行往返':>8}  {'方法':<12}路由")
+        shown = ranked if args.top <= 0 else ranked[:args.top]
+        for entry in shown:
+            methods = ','.join(m for m in entry['methods'] if m != '*') or '-'
+            print(f"{entry['queries_per_request']:>9} {entry['round_trips']:>8}  {methods:<12}"
+                  f"{entry['url'] or entry['path']}")
+            for site_id in entry['sites']:
+                site = by_id[site_id]
+                loops = ' × '.join(f"{loop['kind']}@{loop['line']}({loop['iterations']}, {loop['basis']})"
+                                   for loop in site.loops)
+                target = f"{site.model}.{site.op}" if site.model else site.op
+                print(f"{'':>21}L{site.line} {target} ×{site.per_request}  [{loops}]")
+                print(f"{'':>23}→ {site.suggestion}")
+        if len(shown) < len(ranked):
+            print(f"... 另有 {len(ranked) - len(shown)} 个文件，见报告")
+        print()
+        print(f"{len(sites)} 处循环内查询，{len(ranked)} 个文件；"
+              f"记录: {', '.join(f'{level} {n}' for level, n in counts.items()) or '无'}；报告已写入 {report_path}")
+
+    if profiler is not None:
+        profiler.finish()
+        print(profiler.summary())
+    if args.fail_on:
+        levels = findings.LEVELS[:findings.LEVELS.index(args.fail_on) + 1]
+        if any(counts.get(level) for level in levels):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -374,6 +374,31 @@ check_arrow_function_format() {
     fi
 }
 
+# 类型注解语法检查（只看暂存区改动的行，只给出警告，不阻止提交）
+check_type_annotation_syntax() {
+    if [[ "$SKIP_PATTERNS" == *"annotation"* ]]; then
+        log_warning "跳过类型注解语法检查"
+        return 0
+    fi
+    
+    log_section "类型注解语法检查"
+    
+    if ! command -v python3 &> /dev/null; then
+        log_warning "未找到 python3，跳过类型注解语法检查"
+        return 0
+    fi
+    
+    # fix_syntax_errors.py 按 git diff 只分析暂存区中改动的文件和行，--dry-run 不修改文件
+    local output=""
+    if output=$(cd "$PROJECT_ROOT" && python3 fix_syntax_errors.py --staged --dry-run --fail-on-change --no-index 2>&1); then
+        log_success "类型注解语法检查通过"
+    else
+        echo "$output" | grep -E '^(\+\+\+|[-+][^-+])' | head -20
+        log_warning "发现重复的类型注解（如 request: any: any）"
+        log_info "可以运行 python3 fix_syntax_errors.py --staged 自动修复后重新暂存"
+    fi
+}
+
 # 重复导出检查
 check_duplicate_exports() {
     if [[ "$SKIP_PATTERNS" == *"exports"* ]]; then
@@ -469,8 +494,15 @@ check_security_issues() {
         log_warning "请确保没有提交敏感信息"
     fi
     
-    # 检查 SQL 注入风险
-    if echo "$files_to_check" | xargs grep -iE "query.*\$\{" 2>/dev/null | head -3; then
+    # 检查 SQL 注入风险：污点分析只报告受暂存区改动行影响的原始SQL调用
+    if command -v python3 &> /dev/null; then
+        local sql_output=""
+        if ! sql_output=$(python3 "$SCRIPT_DIR/scan-sql-injection.py" --root "$PROJECT_ROOT" \
+                --staged --fail-on-unsafe --no-index --jsonl "$PROJECT_ROOT/.cache/pre-commit-sql.jsonl" 2>&1); then
+            echo "$sql_output" | grep -E '❌|git diff' | head -10
+            log_warning "发现 SQL 注入风险（SQL中插值或拼接了外部输入），请使用参数化查询"
+        fi
+    elif echo "$files_to_check" | xargs grep -iE "query.*\$\{" 2>/dev/null | head -3; then
         log_warning "发现可能的 SQL 注入风险，请使用参数化查询"
     fi
     
@@ -635,6 +667,7 @@ main() {
         check_typescript_errors || ((ERROR_COUNT++))
         check_eslint_quality || ((ERROR_COUNT++))
         check_arrow_function_format
+        check_type_annotation_syntax
         check_duplicate_exports || ((ERROR_COUNT++))
         check_security_issues
     else
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+维护脚本正则的回溯风险检查
+
+用法:
+    python3 scripts/regex-audit.py audit [--pattern REGEX ...]
+    python3 scripts/regex-audit.py fuzz [--pattern REGEX ...] [--sizes 2000,4000,8000,16000]
+
+audit 静态检查嵌套量词等灾难性回溯结构，发现 error 级问题时退出码为 1；
+fuzz 用可"泵"的输入测量每条正则的耗时增长指数（耗时 ~ n^k），
+k 超过 --max-exponent 或在预算内没跑完时退出码为 1。
+默认检查 tstools 各模块和 fix_syntax_errors.py 中全部模块级的正则，--pattern 可追加任意正则。
+"""
+
+import argparse
+import re
+import sys
+
+from tstools.regex_guard import Finding, audit_pattern, audit_rule_sets, fuzz_pattern, fuzz_rule_sets
+
+# 超过该指数视为超线性
+MAX_EXPONENT = 1.5
+
+
+def extra_patterns(patterns):
+    return {f'--pattern[{i}]': re.compile(p) for i, p in enumerate(patterns or [])}
+
+
+def run_audit(args) -> int:
+    findings = audit_rule_sets()
+    for name, regex in extra_patterns(args.pattern).items():
+        findings += [Finding(name, severity, message) for severity, message in audit_pattern(regex)]
+
+    for finding in findings:
+        icon = "❌" if finding.severity == 'error' else "⚠️ "
+        print(f"{icon} {finding.name}: {finding.message}")
+    errors = sum(1 for f in findings if f.severity == 'error')
+    print(f"\n共 {len(findings)} 个问题，其中 {errors} 个可能导致灾难性回溯")
+    return 1 if errors else 0
+
+
+def run_fuzz(args) -> int:
+    sizes = [int(s) for s in args.sizes.split(',')]
+    results = fuzz_rule_sets(sizes=sizes, budget=args.budget)
+    results += [fuzz_pattern(name, regex, sizes=sizes, budget=args.budget)
+                for name, regex in extra_patterns(args.pattern).items()]
+
+    failed = 0
+    print(f"{'正则':<36}{'指数':>8}  最坏输入")
+    for result in results:
+        if result.exponent is None:
+            exponent, icon = '超时', "❌"
+        else:
+            exponent = f'{result.exponent:.2f}'
+            icon = "❌" if result.exponent >= args.max_exponent else "✓"
+        if icon == "❌":
+            failed += 1
+        print(f"{result.name:<36}{exponent:>8}  {result.worst_input}  {icon}")
+        if args.verbose:
+            for n, seconds in result.timings:
+                print(f"    n={n:<8}{seconds * 1000:.3f}ms")
+    print(f"\n{len(results)} 条正则，{failed} 条超线性")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查维护脚本正则的回溯风险")
+    sub = parser.add_subparsers(dest='command', required=True)
+    audit = sub.add_parser('audit', help="静态检查嵌套量词")
+    audit.add_argument('--pattern', action='append', metavar='REGEX', help="追加检查的正则")
+    fuzz = sub.add_parser('fuzz', help="测量最坏输入下的耗时增长指数")
+    fuzz.add_argument('--pattern', action='append', metavar='REGEX', help="追加测量的正则")
+    fuzz.add_argument('--sizes', default='2000,4000,8000,16000', help="输入长度，逗号分隔")
+    fuzz.add_argument('--budget', type=float, default=2.0, help="单次测量的时间预算（秒）")
+    fuzz.add_argument('--max-exponent', type=float, default=MAX_EXPONENT, help="允许的最大增长指数")
+    fuzz.add_argument('--verbose', '-v', action='store_true', help="输出各长度下的耗时")
+    args = parser.parse_args()
+
+    if args.command == 'audit':
+        return run_audit(args)
+    return run_fuzz(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
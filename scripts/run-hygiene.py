@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+统一的代码卫生检查入口：一次遍历运行全部规则
+
+用法:
+    python3 scripts/run-hygiene.py [--root DIR] [--rules NAME[,NAME...]] [--plugin 模块:类名]
+                                   [--fix | --dry-run] [--since REF | --staged]
+                                   [--jsonl FILE] [--sarif FILE] [--fail-on LEVEL]
+    python3 scripts/run-hygiene.py --list
+
+scan-sql-injection.py、fix_syntax_errors.py、update-api-permissions.py 和 wrap_user_apis.py
+在这里作为规则插件运行（见 tstools/rule_runner.py）：每个文件只读取和词法分析一次，
+全部启用的规则在同一次遍历中完成，代价是一次目录遍历而不是四次。
+
+默认只报告（需要改写的地方记为 warning），--dry-run 输出统一diff，--fix 写回文件。
+改写规则按顺序串联：例如 admin-permissions 添加的中间件声明会在同一次遍历中
+被 wrap-admin-apis 用来包装HTTP方法。
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from tstools import findings, git_diff, paths, profiling, regex_guard
+from tstools.rule_runner import BUILTIN_RULES, load_rules, resolve_targets, run_rules, sarif_rules
+from tstools.scan_engine import ScanStats
+
+ICONS = {'error': "❌", 'warning': "⚠️ ", 'note': "✅", 'none': "  "}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="一次遍历运行全部代码卫生规则")
+    paths.add_root_argument(parser)
+    parser.add_argument('--list', action='store_true', help="列出内置规则")
+    parser.add_argument('--rules', metavar='NAME[,NAME...]',
+                        help="只运行这些规则（默认全部内置规则）")
+    parser.add_argument('--plugin', action='append', default=[], metavar='MODULE:CLASS',
+                        help="加载外部规则插件（tstools.rule_runner.Rule 的子类），可重复")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--fix', action='store_true', help="写回改写规则的修改")
+    mode.add_argument('--dry-run', action='store_true', help="只输出统一diff，不写文件")
+    parser.add_argument('--workers', '-j', type=int, help="并行进程数（默认CPU核数）")
+    parser.add_argument('--fail-on', choices=('error', 'warning', 'note'),
+                        help="有该级别及以上的记录时退出码为1")
+    git_diff.add_diff_arguments(parser)
+    findings.add_output_arguments(parser)
+    regex_guard.add_budget_argument(parser)
+    profiling.add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.list:
+        for spec in BUILTIN_RULES:
+            print(f"{spec.name:<20}{spec.description}")
+        return 0
+
+    root = args.root.resolve()
+    names = [name.strip() for name in args.rules.split(',') if name.strip()] if args.rules else None
+    try:
+        targets = resolve_targets(names, args.plugin)
+        # 只导入启用的规则
+        rules = load_rules(targets)
+    except (ValueError, TypeError, ImportError, AttributeError) as e:
+        print(f"❌ 加载规则失败: {e}")
+        return 2
+    mode = 'fix' if args.fix else 'dry-run' if args.dry_run else 'check'
+
+    profiler = profiling.from_args(args, 'run-hygiene', root)
+    try:
+        hunks = git_diff.from_args(args, root, sorted({d for rule in rules for d in rule.dirs}))
+    except git_diff.GitError as e:
+        print(f"❌ git diff 失败: {e}")
+        return 2
+    scope = "全部文件" if hunks is None else f"相对 {args.since} 的改动" if args.since else "暂存区的改动"
+    print(f"🔍 规则: {', '.join(rule.name for rule in rules)}（{scope}）\n")
+
+    stats = ScanStats()
+    per_rule = {}     # 规则ID -> 记录条数
+    changed = errors = 0
+    with findings.from_args(args, 'run-hygiene', rules=sarif_rules(rules)) as stream:
+        for outcome in run_rules(root, targets, hunks=hunks, mode=mode, workers=args.workers,
+                                 stats=stats, budget=args.file_budget):
+            if outcome.error:
+                errors += 1
+                print(f"❌ {outcome.path}: {outcome.error}")
+            for item in outcome.records:
+                stream.emit(item)
+                per_rule[item['rule']] = per_rule.get(item['rule'], 0) + 1
+                location = f"{item['path']}:{item['line']}" if item.get('line') else item['path']
+                print(f"{ICONS[item['level']]} {location} [{item['rule']}] {item['message']}")
+            if outcome.changed_by:
+                changed += 1
+                if outcome.diff:
+                    print(outcome.diff, end='')
+        skipped = [Path(p).relative_to(root).as_posix() for p in stats.skipped]
+        stream.close(rules=[rule.name for rule in rules], mode=mode, changed=changed,
+                     per_rule=per_rule, skipped=skipped, since=args.since, staged=args.staged)
+        counts = dict(stream.counts)
+
+    with profiling.phase('report'):
+        print()
+        for rule_id, count in sorted(per_rule.items()):
+            print(f"  {rule_id:<28}{count}")
+        for path in skipped:
+            print(f"⏱️ 超时跳过: {path}")
+        action = {'check': "需要改写", 'dry-run': "需要改写", 'fix': "已改写"}[mode]
+        print(f"扫描: {stats.summary()}")
+        print(f"记录: {', '.join(f'{level} {n}' for level, n in counts.items()) or '无'}；"
+              f"{action} {changed} 个文件" + (f"；{errors} 个文件处理失败" if errors else ""))
+
+    if profiler is not None:
+        profiler.finish()
+        print(profiler.summary())
+    if errors:
+        return 2
+    if args.fail_on:
+        levels = findings.LEVELS[:findings.LEVELS.index(args.fail_on) + 1]
+        if any(counts.get(level) for level in levels):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
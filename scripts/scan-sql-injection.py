@@ -2,174 +2,616 @@
 """
 SQL注入漏洞自动检测和修复脚本
 
-检测所有使用 $queryRawUnsafe 的代码，并分类：
-1. 安全用法（参数化查询）
-2. 危险用法（字符串插值）
+检测所有 $queryRawUnsafe / $executeRawUnsafe / Prisma.raw 调用，并分类：
+1. 安全用法（常量SQL或参数化查询）
+2. 危险用法（SQL中插值或拼接了外部输入）
+3. 需人工检查（SQL来源无法确定，如从其他文件导入的函数返回值）
+
+SQL 的来源通过文件内的跨函数污点分析追踪（见 tstools/sql_taint.py），
+先在变量或辅助函数中拼好再传入的SQL同样能判断。
+
+用法:
+    python3 scripts/scan-sql-injection.py [--root DIR] [--workers N]
+                                          [--no-cache | --rebuild-cache] [--no-index]
+                                          [--jsonl FILE] [--sarif FILE]
+                                          [--since REF | --staged] [--fail-on-unsafe] [PATH ...]
+    python3 scripts/scan-sql-injection.py --daemon [--poll]
+
+每个文件分析完就把危险用法和需人工检查的用法逐条写入 JSONL 流
+（默认 .cache/sql-injection-findings.jsonl，可选同时写 SARIF 供 CI 注释），
+Markdown 报告 docs/SQL_INJECTION_SCAN_REPORT.md 由 JSONL 流渲染。
+
+--since REF / --staged 只扫描 git diff 中改动的文件，并且只报告判定受改动行影响的调用
+（调用所在函数，或把SQL传给它的调用方函数与改动区间相交）；文件本身仍整体分析，
+保证跨函数的上下文完整。此模式下默认不重写 Markdown 报告。
+
+--daemon 以常驻模式运行：完成一次扫描后把结果保存在内存中，通过 inotify
+（不可用时轮询）监听源码目录，只重新分析变化的文件，并在
+.cache/sql-injection-scan.sock 上回答查询；客户端见 scripts/sql-scan-client.py。
+
+候选文件通过 .cache/ 下的三元组索引选出，不含原始SQL调用的文件不会被打开；
+分析结果按 (路径, 大小, mtime, 内容哈希) 缓存，
+未改动的文件再次扫描时不会重新读取和分析。
 """
 
-import re
+import argparse
+import contextlib
+import functools
 import os
+import sys
+import time
 from pathlib import Path
-from typing import List, Tuple
-
-# 工作目录
-WORK_DIR = Path("/workspace/luckymart-tj")
-
-def find_queryRawUnsafe_files() -> List[Path]:
-    """查找所有使用$queryRawUnsafe的文件"""
-    files = []
-    for root, _, filenames in os.walk(WORK_DIR / "app"):
-        for filename in filenames:
-            if filename.endswith(('.ts', '.tsx')):
-                filepath = Path(root) / filename
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        if '$queryRawUnsafe' in content:
-                            files.append(filepath)
-                except Exception as e:
-                    print(f"读取文件失败 {filepath}: {e}")
-    return files
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from tstools import daemon, fileio, findings, git_diff, paths, profiling, regex_guard
+from tstools.result_cache import ResultCache, content_digest, rules_fingerprint
+from tstools.scan_engine import (
+    SOURCE_EXTENSIONS,
+    ScanStats,
+    default_workers,
+    iter_source_files,
+    scan_files,
+)
+from tstools.trigram_index import open_index
+from tstools.sql_taint import SAFE, SINK_LITERALS, TAINTED, Verdict, analyze_sql_taint
+from tstools.ts_lexer import Token, match_brackets, tokenize_all
+from tstools.watcher import POLL_INTERVAL, open_watcher
+
+# 工作目录（见 tstools/paths.py）
+WORK_DIR = paths.repo_root()
+
+# 默认扫描的源码目录
+SCAN_DIRS = ['app', 'components', 'lib']
+
+# 结果缓存文件（相对项目根目录）
+CACHE_FILE = Path(".cache") / "sql-injection-scan.json"
+
+# 默认的 JSONL 结果流与 Markdown 报告（相对项目根目录）
+FINDINGS_FILE = Path(".cache") / "sql-injection-findings.jsonl"
+REPORT_FILE = Path("docs") / "SQL_INJECTION_SCAN_REPORT.md"
+
+# 守护进程的 socket 名称（<root>/.cache/<名称>.sock）
+SOCKET_NAME = "sql-injection-scan"
+
+# 报告类别 -> (规则ID, 级别, 说明)
+RULES = {
+    'unsafe_usages': ('sql-injection', 'error', "原始SQL中插值或拼接了外部输入"),
+    'needs_manual_check': ('sql-manual-check', 'warning', "原始SQL的来源无法确定，需人工检查"),
+}
+
+# 在映射上做字节预筛用的原始SQL调用字面量
+SINK_BYTES = fileio.encode_literals(SINK_LITERALS)
+
+# 参与分类的规则实现，任何一个变化都会使缓存失效
+RULE_SOURCES = [
+    Path(__file__).resolve(),
+    Path(__file__).resolve().parent / "tstools" / "ts_lexer.py",
+    Path(__file__).resolve().parent / "tstools" / "sql_taint.py",
+]
+
+def scan_file(task: Tuple[Path, Optional[str]], root: Path = WORK_DIR) -> Tuple[int, tuple]:
+    """
+    映射文件一次，包含原始SQL调用时解码并分析（进程池worker）
+
+    task 为 (文件路径, 缓存中的内容哈希)；内容哈希未变时跳过分析。
+    不是合法 UTF-8 的文件给出警告后跳过，不写入缓存。
+    返回 (字节数, (内容哈希, 分析结果, 是否沿用缓存))。
+    """
+    filepath, known_digest = task
+    try:
+        with profiling.phase('read'), fileio.MappedSource(filepath) as source:
+            nbytes = source.size
+            digest = content_digest(source.buffer)
+            if digest == known_digest:
+                return nbytes, (digest, None, True)
+            # 在映射上按字节预筛，不含原始SQL调用的文件不解码
+            if not source.contains_any(SINK_BYTES):
+                return nbytes, (digest, None, False)
+            content = source.text()
+    except OSError as e:
+        print(f"读取文件失败 {filepath}: {e}")
+        return 0, (None, None, False)
+    if content is None:
+        return nbytes, (None, None, False)
+
+    with profiling.phase('analyze'):
+        return nbytes, (digest, analyze_content(content, str(filepath.relative_to(root))), False)
 
 def analyze_file(filepath: Path) -> dict:
     """分析文件中的SQL注入风险"""
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
             content = f.read()
-            lines = content.splitlines()
-        
-        result = {
-            'path': str(filepath.relative_to(WORK_DIR)),
-            'total_usages': 0,
-            'safe_usages': [],  # 使用参数数组的安全用法
-            'unsafe_usages': [],  # 使用字符串插值的危险用法
-            'needs_manual_check': []  # 需要人工检查的复杂情况
-        }
-        
-        # 查找所有$queryRawUnsafe的使用
-        for i, line in enumerate(lines, 1):
-            if '$queryRawUnsafe' in line:
-                result['total_usages'] += 1
-                
-                # 检查后续几行，提取SQL查询
-                sql_context = '\n'.join(lines[max(0, i-1):min(len(lines), i+20)])
-                
-                # 检测是否是安全的参数化用法
-                # 形如: $queryRawUnsafe(query, ...params) 或 $queryRawUnsafe(query, param1, param2)
-                if re.search(r'\$queryRawUnsafe\s*\(\s*[\'"`]?[\w\s]+[\'"`]?\s*,', sql_context):
-                    result['safe_usages'].append({
-                        'line': i,
-                        'context': sql_context[:200]
-                    })
-                # 检测危险的字符串插值
-                elif re.search(r'\$queryRawUnsafe\s*\(\s*[`]', sql_context):
-                    # 检查模板字符串中是否有 ${...}
-                    if re.search(r'\$\{[^}]+\}', sql_context):
-                        result['unsafe_usages'].append({
-                            'line': i,
-                            'context': sql_context[:400]
-                        })
-                    else:
-                        # 使用反引号但没有插值，安全
-                        result['safe_usages'].append({
-                            'line': i,
-                            'context': sql_context[:200]
-                        })
-                else:
-                    result['needs_manual_check'].append({
-                        'line': i,
-                        'context': sql_context[:200]
-                    })
-        
-        return result
-    
+        return analyze_content(content, str(filepath.relative_to(WORK_DIR)))
     except Exception as e:
         print(f"分析文件失败 {filepath}: {e}")
         return None
 
-def generate_report(results: List[dict]):
-    """生成检测报告"""
-    report = []
-    report.append("=" * 80)
-    report.append("SQL注入漏洞自动检测报告")
-    report.append("=" * 80)
-    report.append("")
-    
-    total_files = len(results)
-    total_usages = sum(r['total_usages'] for r in results)
-    total_unsafe = sum(len(r['unsafe_usages']) for r in results)
-    total_safe = sum(len(r['safe_usages']) for r in results)
-    total_manual = sum(len(r['needs_manual_check']) for r in results)
-    
-    report.append(f"扫描文件总数: {total_files}")
-    report.append(f"$queryRawUnsafe使用总数: {total_usages}")
-    report.append(f"  - 安全用法: {total_safe}")
-    report.append(f"  - 危险用法（需修复）: {total_unsafe}")
-    report.append(f"  - 需人工检查: {total_manual}")
-    report.append("")
-    
-    # 危险用法详情
-    if total_unsafe > 0:
-        report.append("=" * 80)
-        report.append("⚠️  发现危险的SQL注入漏洞（需立即修复）")
-        report.append("=" * 80)
-        report.append("")
-        
-        for r in results:
-            if r['unsafe_usages']:
-                report.append(f"文件: {r['path']}")
-                for usage in r['unsafe_usages']:
-                    report.append(f"  行号: {usage['line']}")
-                    report.append(f"  代码片段:")
-                    for line in usage['context'].split('\n')[:10]:
-                        report.append(f"    {line}")
-                    report.append("")
-    
-    # 需人工检查的情况
-    if total_manual > 0:
-        report.append("=" * 80)
-        report.append("🔍 需要人工检查的用法")
-        report.append("=" * 80)
-        report.append("")
-        
-        for r in results:
-            if r['needs_manual_check']:
-                report.append(f"文件: {r['path']}")
-                for usage in r['needs_manual_check']:
-                    report.append(f"  行号: {usage['line']}")
-                    report.append(f"  代码片段:")
-                    for line in usage['context'].split('\n')[:5]:
-                        report.append(f"    {line}")
-                    report.append("")
-    
-    return '\n'.join(report)
+def classify(verdict: Verdict) -> str:
+    """污点等级 -> 报告类别"""
+    if verdict.level == TAINTED:
+        return 'unsafe_usages'
+    if verdict.level == SAFE:
+        return 'safe_usages'
+    # 无法追踪来源的单个变量，另外传入了参数：按参数化查询处理
+    if verdict.sink.simple_query and verdict.sink.has_params:
+        return 'safe_usages'
+    return 'needs_manual_check'
+
+def call_context(content: str, tokens: List[Token], verdict: Verdict, limit: int) -> str:
+    """调用所在行开头到调用结束的源码片段"""
+    sink = verdict.sink
+    line_start = content.rfind('\n', 0, tokens[sink.index].start) + 1
+    if sink.close >= 0:
+        end = tokens[sink.close].end
+    else:
+        end = content.find('\n', tokens[sink.index].end)
+        end = end if end >= 0 else len(content)
+    return content[line_start:min(end, line_start + limit)]
+
+def analyze_content(content: str, rel_path: str, tokens: Optional[List[Token]] = None,
+                    pairs: Optional[Dict[int, int]] = None) -> dict:
+    """
+    分析已读入的文件内容
+
+    单次词法扫描后做文件内的跨函数污点分析：SQL 经变量、字符串拼接
+    或辅助函数传入 $queryRawUnsafe / $executeRawUnsafe / Prisma.raw 时同样能追踪到来源。
+    tokens / pairs 为调用方已有的词法分析结果时直接复用。
+    """
+    result = {
+        'path': rel_path,
+        'total_usages': 0,
+        'safe_usages': [],  # 常量SQL或参数化查询
+        'unsafe_usages': [],  # SQL中插值/拼接了外部输入
+        'needs_manual_check': []  # 来源无法确定的情况
+    }
+
+    if tokens is None:
+        with profiling.rule('tokenize'):
+            tokens = tokenize_all(content)
+    if pairs is None:
+        pairs = match_brackets(tokens)
+    with profiling.rule('taint') as r:
+        verdicts = analyze_sql_taint(tokens, pairs)
+        r.matches = len(verdicts)
+
+    for verdict in verdicts:
+        result['total_usages'] += 1
+        start = time.perf_counter()
+        category = classify(verdict)
+        limit = 400 if category == 'unsafe_usages' else 200
+        usage = {
+            'line': tokens[verdict.sink.index].line,
+            'sink': verdict.sink.name,
+            'context': call_context(content, tokens, verdict, limit)
+        }
+        if verdict.via:
+            usage['via'] = verdict.via
+        usage['spans'] = [list(span) for span in verdict.spans]
+        result[category].append(usage)
+        profiling.add_rule(f'classify:{category}', time.perf_counter() - start, 1)
+
+    return result
+
+def result_records(result: dict) -> Iterator[dict]:
+    """单个文件的分析结果 -> 危险用法和需人工检查用法的流式记录"""
+    for category, (rule, level, message) in RULES.items():
+        for usage in result[category]:
+            if usage.get('via'):
+                message_text = f"{message}（经由辅助函数，调用位置: 第 {', '.join(map(str, usage['via']))} 行）"
+            else:
+                message_text = message
+            yield findings.record('finding', rule, level, result['path'], message_text,
+                                  line=usage['line'], category=category, **{
+                                      k: v for k, v in usage.items() if k not in ('line', 'spans')})
+
+
+def restrict_to_lines(result: dict, ranges: git_diff.LineRanges) -> Optional[dict]:
+    """只保留判定受改动行影响的调用；一个都不剩时返回 None"""
+    if ranges is None:
+        return result
+    restricted = dict(result, total_usages=0)
+    for category in ('safe_usages', 'unsafe_usages', 'needs_manual_check'):
+        restricted[category] = [usage for usage in result[category]
+                                if git_diff.overlaps(usage.get('spans') or [(usage['line'], usage['line'])],
+                                                     ranges)]
+        restricted['total_usages'] += len(restricted[category])
+    return restricted if restricted['total_usages'] else None
+
+
+def new_totals() -> Dict[str, int]:
+    return {'files_with_usages': 0, 'usages': 0, 'safe': 0, 'unsafe': 0, 'manual': 0}
+
+
+def add_totals(totals: Dict[str, int], result: dict):
+    totals['files_with_usages'] += 1
+    totals['usages'] += result['total_usages']
+    totals['safe'] += len(result['safe_usages'])
+    totals['unsafe'] += len(result['unsafe_usages'])
+    totals['manual'] += len(result['needs_manual_check'])
+
+
+def publish(results: Iterable[dict], stream: findings.FindingStream, echo: bool = False) -> Dict[str, int]:
+    """逐个文件把结果写入输出流，返回汇总计数"""
+    totals = new_totals()
+    for result in results:
+        add_totals(totals, result)
+        for item in result_records(result):
+            stream.emit(item)
+            if echo:
+                icon = "❌" if item['level'] == 'error' else "🔍"
+                print(f"  {icon} {item['path']}:{item['line']} {item['sink']}")
+    return totals
+
+
+def render_report(stream_path: Path, out: TextIO):
+    """
+    从 JSONL 结果流渲染检测报告，逐行写入 out
+
+    汇总取自流末尾的 summary 记录，两类详情各顺序读一遍流，不在内存中保留结果。
+    """
+    summary = findings.read_summary(stream_path) or {}
+
+    def emit(line=''):
+        out.write(line + '\n')
+
+    emit("=" * 80)
+    emit("SQL注入漏洞自动检测报告")
+    emit("=" * 80)
+    emit()
+    emit(f"扫描文件总数: {summary.get('files_with_usages', 0)}")
+    emit(f"原始SQL调用总数: {summary.get('usages', 0)}")
+    emit(f"  - 安全用法: {summary.get('safe', 0)}")
+    emit(f"  - 危险用法（需修复）: {summary.get('unsafe', 0)}")
+    emit(f"  - 需人工检查: {summary.get('manual', 0)}")
+    emit()
+
+    sections = [
+        ('unsafe_usages', 'unsafe', "⚠️  发现危险的SQL注入漏洞（需立即修复）", 10),
+        ('needs_manual_check', 'manual', "🔍 需要人工检查的用法", 5),
+    ]
+    for category, count_key, title, max_lines in sections:
+        if not summary.get(count_key):
+            continue
+        emit("=" * 80)
+        emit(title)
+        emit("=" * 80)
+        emit()
+
+        current = None
+        for item in findings.iter_records(stream_path, 'finding'):
+            if item.get('category') != category:
+                continue
+            if item['path'] != current:
+                current = item['path']
+                emit(f"文件: {current}")
+            emit(f"  行号: {item['line']} ({item.get('sink', '$queryRawUnsafe')})")
+            if category == 'unsafe_usages' and item.get('via'):
+                emit(f"  SQL经由辅助函数传入，调用位置: 第 {', '.join(map(str, item['via']))} 行")
+            emit(f"  代码片段:")
+            for line in item['context'].split('\n')[:max_lines]:
+                emit(f"    {line}")
+            emit()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SQL注入漏洞自动检测")
+    paths.add_root_argument(parser)
+    parser.add_argument('--workers', '-j', type=int, default=default_workers(),
+                        help="并行进程数（默认CPU核数，1为串行）")
+    parser.add_argument('--dirs', nargs='+', default=SCAN_DIRS, help="扫描的源码目录")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument('--no-cache', action='store_true', help="不读写结果缓存")
+    cache_group.add_argument('--rebuild-cache', action='store_true', help="忽略已有缓存并重建")
+    parser.add_argument('--cache-file', type=Path, help=f"缓存文件路径（默认 <root>/{CACHE_FILE}）")
+    parser.add_argument('--no-index', action='store_true', help="不使用三元组索引，遍历全部文件")
+    parser.add_argument('--report', type=Path,
+                        help=f"Markdown报告路径（默认 <root>/{REPORT_FILE}；--since/--staged 或指定路径时默认不生成）")
+    parser.add_argument('--fail-on-unsafe', action='store_true', help="发现危险用法时退出码为1")
+    parser.add_argument('paths', nargs='*', type=Path,
+                        help="只扫描这些文件或目录（限于 --dirs 之内；默认不生成 Markdown 报告）")
+    git_diff.add_diff_arguments(parser)
+    findings.add_output_arguments(parser, default_jsonl=str(FINDINGS_FILE))
+    daemon_group = parser.add_argument_group("常驻模式")
+    daemon_group.add_argument('--daemon', action='store_true',
+                              help="常驻内存，监听文件变化并通过本地socket回答查询")
+    daemon_group.add_argument('--poll', action='store_true', help="不使用inotify，按间隔轮询")
+    daemon_group.add_argument('--poll-interval', type=float, default=POLL_INTERVAL, metavar='SECONDS',
+                              help="轮询间隔（秒）")
+    regex_guard.add_budget_argument(parser)
+    profiling.add_profile_arguments(parser)
+    return parser.parse_args()
+
+def selected_files(root: Path, dirs: List[str], targets: List[Path]) -> List[Path]:
+    """命令行给出的文件或目录 -> 其中位于 dirs 之内的源码文件"""
+    scope = [root / d for d in dirs]
+    files = set()
+    for target in targets:
+        target = target.resolve()
+        if target.is_dir():
+            files.update(iter_source_files(target, ['.']))
+        elif target.is_file() and target.name.endswith(SOURCE_EXTENSIONS):
+            files.add(target)
+        else:
+            print(f"⚠️ 不是源码文件或目录，已忽略: {target}")
+    return sorted(f for f in files if any(base in f.parents for base in scope))
+
+def candidate_files(root: Path, dirs: List[str], workers: int, use_index: bool) -> List[Path]:
+    """通过三元组索引选出可能包含原始SQL调用的文件"""
+    if use_index:
+        with open_index(root, workers=workers) as index:
+            if index.covers(dirs):
+                return index.candidates_any(*SINK_LITERALS, dirs=dirs)
+    return iter_source_files(root, dirs)
+
+def scan_tree(root: Path, dirs: List[str], workers: int,
+              cache: Optional[ResultCache], stats: ScanStats,
+              use_index: bool = True, budget: Optional[float] = None,
+              files: Optional[List[Path]] = None) -> Iterator[dict]:
+    """
+    扫描源码目录，按路径顺序逐个产出包含原始SQL调用的文件的分析结果
+
+    命中缓存的文件不读取，其余文件进入进程池；每个文件分析完即产出，
+    已产出的结果不再保留。给出 files 时只扫描这些文件。
+    """
+    if files is None:
+        with profiling.phase('walk'):
+            files = candidate_files(root, dirs, workers, use_index)
+    cached = set()
+    file_stats = {}
+    tasks = []
+    for filepath in files:
+        if cache is None:
+            tasks.append((filepath, None))
+            continue
+        key = str(filepath.relative_to(root))
+        st = filepath.stat()
+        if cache.lookup(key, st) is not None:
+            cached.add(filepath)
+            stats.cached += 1
+            continue
+        file_stats[filepath] = st
+        tasks.append((filepath, cache.digest_of(key)))
+
+    worker = functools.partial(scan_file, root=root)
+    scanned = scan_files(tasks, worker, workers=workers, stats=stats, budget=budget)
+    pending = next(scanned, None)
+    for filepath in files:
+        if filepath in cached:
+            result = cache.get(str(filepath.relative_to(root)))['result']
+        elif pending is not None and pending[0][0] == filepath:
+            # 超时跳过的文件不会出现在 scanned 中
+            _, (digest, result, reused) = pending
+            pending = next(scanned, None)
+            key = str(filepath.relative_to(root))
+            if reused:
+                result = cache.get(key)['result']
+            elif result:
+                print(f"分析: {result['path']}")
+            if cache is not None and digest is not None:
+                cache.store(key, file_stats[filepath], digest, result, reused=reused)
+        else:
+            continue
+        if result:
+            yield result
+
+class ScanDaemon:
+    """常驻模式：在内存中保存每个文件的分析结果，按文件变化增量更新"""
+
+    def __init__(self, root: Path, args, cache: Optional[ResultCache]):
+        self.root = root
+        self.args = args
+        self.cache = cache
+        self.results: Dict[str, dict] = {}     # 相对路径 -> 分析结果（只保留有原始SQL调用的文件）
+        self.skipped: Set[str] = set()
+        self.started = time.time()
+        self.updated = self.started
+        self.reanalyzed = 0
+        self.backend = None
+
+    def full_scan(self, use_index: bool = True):
+        stats = ScanStats()
+        self.results = {result['path']: result
+                        for result in scan_tree(self.root, self.args.dirs, self.args.workers, self.cache,
+                                                stats, use_index=use_index, budget=self.args.file_budget)}
+        self.skipped = set(stats.skipped)
+        if self.cache is not None:
+            self.cache.save()
+        self.updated = time.time()
+        print(f"全量扫描: {stats.summary()}，{len(self.results)} 个文件包含原始SQL调用")
+
+    def _forget(self, key: str):
+        """删除的文件或目录：清理结果和缓存"""
+        prefix = key + os.sep
+        for k in [k for k in self.results if k == key or k.startswith(prefix)]:
+            del self.results[k]
+        if self.cache is not None:
+            for k in [k for k in self.cache.entries if k == key or k.startswith(prefix)]:
+                self.cache.forget(k)
+
+    def on_changes(self, paths: Set[Path], full: bool):
+        """监听器报告的变化：只重新分析这些文件（队列溢出时整体重扫）"""
+        if full:
+            print("⚠️  文件事件队列溢出，整体重扫")
+            self.full_scan(use_index=False)
+            return
+        start = time.perf_counter()
+        count = removed = 0
+        for path in sorted(paths):
+            try:
+                key = str(path.relative_to(self.root))
+            except ValueError:
+                continue
+            if not path.is_file():
+                self._forget(key)
+                removed += 1
+                continue
+            nbytes, outcome = scan_file_budgeted((path, None), self.root, self.args.file_budget)
+            count += 1
+            if isinstance(outcome, regex_guard.TimedOut):
+                self.results.pop(key, None)
+                self.skipped.add(key)
+                print(f"⏱️ 超时跳过: {key}")
+                continue
+            self.skipped.discard(key)
+            digest, result, _ = outcome
+            if self.cache is not None and digest is not None:
+                self.cache.store(key, path.stat(), digest, result)
+            if result:
+                self.results[key] = result
+            else:
+                self.results.pop(key, None)
+        if self.cache is not None:
+            self.cache.save()
+        self.reanalyzed += count
+        self.updated = time.time()
+        print(f"🔄 重新分析 {count} 个文件，移除 {removed} 个，耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def selected(self, paths: Optional[List[str]]) -> Iterator[dict]:
+        """按路径（文件或目录前缀）筛选结果，按路径排序"""
+        prefixes = [p.rstrip('/') for p in paths or []]
+        for key in sorted(self.results):
+            if not prefixes or any(key == p or key.startswith(p + '/') for p in prefixes):
+                yield self.results[key]
+
+    def handle(self, req: dict) -> dict:
+        cmd = req.get('cmd')
+        if cmd == 'findings':
+            records = []
+            totals = new_totals()
+            levels = set(req.get('levels') or findings.LEVELS)
+            for result in self.selected(req.get('paths')):
+                add_totals(totals, result)
+                records.extend({'type': item['type'], 'tool': 'scan-sql-injection', **item}
+                               for item in result_records(result) if item['level'] in levels)
+            return {'findings': records, 'totals': totals}
+        if cmd == 'status':
+            totals = new_totals()
+            for result in self.results.values():
+                add_totals(totals, result)
+            return {'pid': os.getpid(), 'root': str(self.root), 'backend': self.backend,
+                    'started': self.started, 'updated': self.updated,
+                    'reanalyzed': self.reanalyzed, 'skipped': sorted(self.skipped), 'totals': totals}
+        if cmd == 'rescan':
+            self.full_scan(use_index=False)
+            return self.handle({'cmd': 'status'})
+        if cmd == 'report':
+            # 与冷启动扫描写出同样的 JSONL / Markdown 报告
+            stream_path = self.root / FINDINGS_FILE
+            with findings.FindingStream('scan-sql-injection', jsonl=stream_path) as stream:
+                totals = publish(self.selected(None), stream)
+                stream.close(**totals, skipped=sorted(self.skipped))
+            report_path = self.root / REPORT_FILE
+            with open(report_path, 'w', encoding='utf-8') as f:
+                render_report(stream_path, f)
+            return {'report': str(report_path), 'jsonl': str(stream_path), 'totals': totals}
+        raise ValueError(f"未知命令: {cmd}")
+
+
+def scan_file_budgeted(task, root: Path, budget: Optional[float]):
+    worker = functools.partial(scan_file, root=root)
+    if budget:
+        return regex_guard.budgeted_call(worker, budget, task)
+    return worker(task)
+
+
+def run_daemon(args, root: Path, cache: Optional[ResultCache]):
+    """常驻模式主循环"""
+    sock = daemon.socket_path(root, SOCKET_NAME)
+    if daemon.is_running(sock):
+        print(f"守护进程已在运行: {sock}")
+        return
+    state = ScanDaemon(root, args, cache)
+    # 先开始监听再做全量扫描，扫描期间的修改不会丢
+    watcher = open_watcher(root, args.dirs, polling=args.poll, interval=args.poll_interval)
+    state.backend = watcher.backend
+    state.full_scan(use_index=not args.no_index)
+    print(f"监听 {', '.join(args.dirs)}（{watcher.backend}），查询socket: {sock}")
+    try:
+        daemon.serve(sock, state.handle, watcher=watcher, on_changes=state.on_changes)
+    finally:
+        watcher.close()
+    print("守护进程已退出")
+
 
 def main():
-    print("开始扫描SQL注入漏洞...")
+    args = parse_args()
+    root = args.root.resolve()
     
-    # 查找所有使用$queryRawUnsafe的文件
-    files = find_queryRawUnsafe_files()
-    print(f"找到 {len(files)} 个使用$queryRawUnsafe的文件")
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_file or root / CACHE_FILE,
+                            rules_fingerprint(RULE_SOURCES),
+                            rebuild=args.rebuild_cache)
+    if args.daemon:
+        run_daemon(args, root, cache)
+        return
     
-    # 分析每个文件
-    results = []
-    for filepath in files:
-        print(f"分析: {filepath.relative_to(WORK_DIR)}")
-        result = analyze_file(filepath)
-        if result:
-            results.append(result)
+    profiler = profiling.from_args(args, 'scan-sql-injection', root)
+    try:
+        changes = git_diff.from_args(args, root, args.dirs, snapshot=args.staged)
+    except git_diff.GitError as e:
+        print(f"❌ git diff 失败: {e}")
+        return 2
+    files = None
+    scan_root, scan_cache = root, cache
+    snapshot = contextlib.ExitStack()
+    # 只扫描了部分文件时不覆盖全量报告，也不清理缓存中其余文件的条目
+    partial = changes is not None or bool(args.paths)
+    selection = set(selected_files(root, args.dirs, args.paths)) if args.paths else None
+    if changes is None and selection is None:
+        print("开始扫描SQL注入漏洞...")
+    elif changes is None:
+        files = sorted(selection)
+        print(f"开始扫描SQL注入漏洞（指定的 {len(files)} 个文件）...")
+    else:
+        files = sorted(p for p in changes if p.name.endswith(SOURCE_EXTENSIONS)
+                       and (selection is None or p in selection))
+        scope = f"相对 {args.since}" if args.since else "暂存区"
+        print(f"开始扫描SQL注入漏洞（{scope}改动的 {len(files)} 个文件）...")
+    if args.staged:
+        # 检查将要提交的暂存区内容，而不是可能还有未暂存改动的工作区文件（不进缓存）
+        try:
+            scan_root = snapshot.enter_context(git_diff.staged_snapshot(root, files))
+        except git_diff.GitError as e:
+            print(f"❌ 导出暂存区内容失败: {e}")
+            return 2
+        files = [scan_root / p.relative_to(root) for p in files]
+        scan_cache = None
     
-    # 生成报告
-    report = generate_report(results)
+    # 每个文件只读一次，按进程池并行分析；每个文件完成后立即写出记录
+    stats = ScanStats()
+    stream_path = args.jsonl or root / FINDINGS_FILE
+    rules = {rule: text for rule, _, text in RULES.values()}
+    with snapshot, findings.from_args(args, 'scan-sql-injection', rules=rules,
+                                      default_jsonl=stream_path) as stream:
+        results = scan_tree(scan_root, args.dirs, args.workers, scan_cache, stats,
+                            use_index=not args.no_index, budget=args.file_budget, files=files)
+        if changes is not None:
+            results = filter(None, (restrict_to_lines(r, changes[root / r['path']]) for r in results))
+        totals = publish(results, stream, echo=True)
+        stream.close(**totals, skipped=stats.skipped, since=args.since, staged=args.staged)
+    if cache is not None:
+        cache.save(prune=not partial)
+    print(f"找到 {totals['files_with_usages']} 个包含原始SQL调用的文件")
+    print(f"扫描统计: {stats.summary()}")
+    for path in stats.skipped:
+        print(f"⏱️ 超时跳过（未缓存，下次重新扫描）: {path}")
     
-    # 保存报告
-    report_path = WORK_DIR / "docs" / "SQL_INJECTION_SCAN_REPORT.md"
-    with open(report_path, 'w', encoding='utf-8') as f:
-        f.write(report)
+    # 由结果流渲染报告（只扫描了改动时不覆盖全量报告）
+    report_path = args.report or (None if partial else root / REPORT_FILE)
+    if report_path is not None:
+        with profiling.phase('report'):
+            with open(report_path, 'w', encoding='utf-8') as f:
+                render_report(stream_path, f)
+        print(f"\n报告已保存到: {report_path}")
+    print(f"结果流: {stream_path}" + (f"，SARIF: {args.sarif}" if args.sarif else ""))
+    print(f"原始SQL调用 {totals['usages']} 处：安全 {totals['safe']}，"
+          f"危险 {totals['unsafe']}，需人工检查 {totals['manual']}")
     
-    print(f"\n报告已保存到: {report_path}")
-    print("\n" + "=" * 80)
-    print(report)
+    if profiler is not None:
+        profiler.finish()
+        print(profiler.summary())
+    return 1 if args.fail_on_unsafe and totals['unsafe'] else 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+源码三元组索引命令行工具
+
+用法:
+    python3 scripts/source-index.py [--root DIR] build
+    python3 scripts/source-index.py [--root DIR] query '$queryRawUnsafe' [更多字面量...]
+    python3 scripts/source-index.py [--root DIR] regex 'export async function (GET|POST)'
+    python3 scripts/source-index.py [--root DIR] bench
+
+bench 对比"索引查询 + 读取候选文件"与"读取全部文件做子串匹配"的耗时。
+"""
+
+import argparse
+import time
+
+from tstools import paths
+from tstools.trigram_index import TrigramIndex, benchmark
+
+# 基准测试默认使用各脚本实际查询的字面量
+BENCH_LITERALS = ['$queryRawUnsafe', 'getAdminFromRequest', 'AdminPermissionManager', ': any']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="源码三元组索引")
+    paths.add_root_argument(parser)
+    parser.add_argument('--workers', '-j', type=int, help="建索引的并行进程数")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help="增量刷新索引")
+    query = sub.add_parser('query', help="查询可能同时包含全部字面量的文件")
+    query.add_argument('literals', nargs='+')
+    regex = sub.add_parser('regex', help="查询可能匹配正则的文件")
+    regex.add_argument('pattern')
+    bench = sub.add_parser('bench', help="索引查询与全量扫描的耗时对比")
+    bench.add_argument('literals', nargs='*', default=BENCH_LITERALS)
+    args = parser.parse_args()
+
+    root = args.root.resolve()
+
+    if args.command == 'bench':
+        print(f"{'字面量':<26}{'文件数':>8}{'命中':>8}{'候选':>8}{'全量扫描':>12}{'索引查询':>12}{'加速比':>8}")
+        for r in benchmark(root, args.literals, workers=args.workers):
+            speedup = r['full_scan_seconds'] / r['indexed_seconds'] if r['indexed_seconds'] else 0
+            flag = '' if r['consistent'] else '  ⚠️ 结果不一致'
+            print(f"{r['literal']:<26}{r['files']:>8}{r['matches']:>8}{r['candidates']:>8}"
+                  f"{r['full_scan_seconds'] * 1000:>10.1f}ms{r['indexed_seconds'] * 1000:>10.1f}ms"
+                  f"{speedup:>7.1f}x{flag}")
+        return
+
+    with TrigramIndex(root) as index:
+        start = time.perf_counter()
+        changed = index.refresh(workers=args.workers)
+        elapsed = time.perf_counter() - start
+        if args.command == 'build':
+            print(f"索引已更新: {len(changed)} 个文件重新索引, "
+                  f"共 {len(index.all_files())} 个文件, 耗时 {elapsed:.2f}s")
+            return
+        if args.command == 'query':
+            matches = index.candidates(*args.literals)
+        else:
+            matches = index.candidates_regex(args.pattern)
+        for path in matches:
+            print(path.relative_to(root))
+
+
+if __name__ == "__main__":
+    main()
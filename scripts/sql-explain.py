@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+原始SQL目录与 EXPLAIN 基准
+
+1. 从源码中提取全部 $queryRaw / $queryRawUnsafe 等原始SQL，参数代入样例值，
+   写成目录（默认 .cache/sql-catalog.json，见 tstools/sql_catalog.py）
+2. 把 prisma/schema.prisma 转成 DDL 建到一次性的本地 PostgreSQL 中（见 tstools/prisma_schema.py），
+   按 --scales 给出的每个规模生成合成数据
+3. 对每条SQL执行 EXPLAIN (ANALYZE, BUFFERS)，报告顺序扫描、排序/哈希溢出到磁盘，
+   以及耗时随数据量的增长（由最小和最大规模估算的增长指数，1 表示线性）
+
+用法:
+    python3 scripts/sql-explain.py --catalog-only [--catalog FILE] [--samples FILE]
+    python3 scripts/sql-explain.py [--pg-bin DIR | --dsn DSN] [--scales 1000,10000,100000]
+                                   [--ratio participations=5] [--extra-sql FILE] [--only PATTERN]
+                                   [--report FILE] [--jsonl FILE] [--sarif FILE]
+    python3 scripts/sql-explain.py --print-ddl [--scale N]
+
+--samples 为 JSON 对象，按参数名或完整表达式覆盖样例值（值为SQL字面量），如
+{"limit": "20", "cohortType": "'week'"}。
+"""
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Optional
+
+from tstools import findings, paths, pg_local, prisma_schema, profiling, regex_guard, sql_catalog
+from tstools.scan_engine import ScanStats
+
+CATALOG_FILE = Path(".cache") / "sql-catalog.json"
+REPORT_FILE = Path(".cache") / "sql-explain-report.json"
+
+DEFAULT_SCALES = '1000,10000,100000'
+
+# 规模增长时耗时的增长指数超过该值视为超线性
+SUPERLINEAR = 1.2
+# 扫描行数不足该值的顺序扫描不报告（小表顺序扫描是正常的）
+SEQ_SCAN_ROWS = 1000
+
+RULES = {
+    'sql-template-issue': "原始SQL模板本身有问题",
+    'sql-missing-table': "SQL 引用了 schema.prisma 中没有的表",
+    'sql-explain-failed': "EXPLAIN 执行失败",
+    'sql-seq-scan': "大表顺序扫描",
+    'sql-sort-spill': "排序或哈希溢出到磁盘",
+    'sql-superlinear': "耗时随数据量超线性增长",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="原始SQL目录与 EXPLAIN 基准")
+    paths.add_root_argument(parser)
+    parser.add_argument('--workers', '-j', type=int, help="提取SQL的并行进程数（默认CPU核数）")
+    parser.add_argument('--schema', type=Path, help=f"Prisma schema（默认 <root>/{prisma_schema.SCHEMA_FILE}）")
+    parser.add_argument('--samples', type=Path, metavar='FILE', help="覆盖参数样例值的JSON文件")
+    parser.add_argument('--extra-sql', type=Path, action='append', default=[], metavar='FILE',
+                        help="生成种子数据后执行的SQL文件（如 schema.prisma 之外的分析表及其数据），可重复")
+    parser.add_argument('--catalog', type=Path, metavar='FILE', help=f"SQL目录输出（默认 <root>/{CATALOG_FILE}）")
+    parser.add_argument('--catalog-only', action='store_true', help="只生成SQL目录，不连接数据库")
+    parser.add_argument('--print-ddl', action='store_true', help="输出建表语句和 --scale 规模的种子数据SQL后退出")
+    parser.add_argument('--scale', type=int, default=1000, help="--print-ddl 时的种子数据行数")
+    parser.add_argument('--scales', default=DEFAULT_SCALES, metavar='N[,N...]',
+                        help=f"每个表的合成数据行数，逐个规模执行（默认 {DEFAULT_SCALES}）")
+    parser.add_argument('--ratio', action='append', default=[], metavar='MODEL=FACTOR',
+                        help="按模型名或表名调整行数倍数，可重复，如 participations=5")
+    parser.add_argument('--only', metavar='PATTERN', help="只执行 id（路径:行号）包含该文本的SQL")
+    parser.add_argument('--timeout', type=float, default=30.0, metavar='SECONDS', help="单条SQL的超时")
+    parser.add_argument('--work-mem', default=pg_local.DEFAULT_WORK_MEM, help="EXPLAIN 时的 work_mem")
+    parser.add_argument('--report', type=Path, metavar='FILE', help=f"JSON 报告（默认 <root>/{REPORT_FILE}）")
+    parser.add_argument('--fail-on', choices=('error', 'warning', 'note'),
+                        help="有该级别及以上的记录时退出码为1")
+    pg_local.add_postgres_arguments(parser)
+    findings.add_output_arguments(parser)
+    regex_guard.add_budget_argument(parser)
+    profiling.add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def parse_ratios(values):
+    ratios = {}
+    for value in values:
+        name, sep, factor = value.partition('=')
+        if not sep:
+            raise ValueError(f"--ratio 应写作 MODEL=FACTOR，收到 {value!r}")
+        ratios[name.strip()] = float(factor)
+    return ratios
+
+
+def growth_exponent(results: dict) -> Optional[float]:
+    """最小与最大规模之间耗时的增长指数：log(t2/t1) / log(n2/n1)"""
+    points = sorted((scale, r['execution_ms']) for scale, r in results.items() if 'execution_ms' in r)
+    if len(points) < 2:
+        return None
+    (n1, t1), (n2, t2) = points[0], points[-1]
+    if t1 <= 0 or t2 <= 0 or n2 <= n1:
+        return None
+    return round(math.log(t2 / t1) / math.log(n2 / n1), 2)
+
+
+def explain_all(pg, schema, queries, scales, ratios, args):
+    """逐个规模重建数据并 EXPLAIN 每条SQL，返回 {id: {规模: 结果}}"""
+    ddl = prisma_schema.render_ddl(schema)
+    results = {q.id: {} for q in queries}
+    for scale in scales:
+        print(f"📦 规模 {scale}：建表并生成合成数据...")
+        with profiling.phase('seed'):
+            pg.reset_schema()
+            pg.run(ddl)
+            pg.run(prisma_schema.seed_sql(schema, scale, ratios))
+            for path in args.extra_sql:
+                pg.run(path.read_text(encoding='utf-8'))
+        with profiling.phase('explain'):
+            for query in queries:
+                try:
+                    plan = pg.explain(query.sql, timeout=args.timeout, work_mem=args.work_mem)
+                except pg_local.PostgresError as e:
+                    results[query.id][scale] = {'error': str(e).splitlines()[0]}
+                    continue
+                results[query.id][scale] = pg_local.summarize_plan(plan).to_dict()
+    return results
+
+
+def query_records(query, missing, results, scales):
+    """单条SQL的 finding 记录"""
+    records = []
+
+    def add(rule, level, message, **extra):
+        records.append(findings.record('finding', rule, level, query.path, message, line=query.line,
+                                       fingerprint=query.fingerprint, **extra))
+
+    for issue in query.issues:
+        add('sql-template-issue', 'warning', sql_catalog.ISSUES[issue], issue=issue)
+    if missing:
+        add('sql-missing-table', 'warning', f"schema.prisma 中没有表: {', '.join(missing)}", tables=missing)
+    if not results:
+        return records
+    largest = results[max(results)]
+    if 'error' in largest:
+        add('sql-explain-failed', 'error', largest['error'], scale=max(results))
+        return records
+    for scan in largest['seq_scans']:
+        if scan['rows'] >= SEQ_SCAN_ROWS:
+            add('sql-seq-scan', 'warning', f"顺序扫描 {scan['relation']}（{scan['rows']} 行）",
+                relation=scan['relation'], rows=scan['rows'], scale=max(results))
+    for spill in largest['spills']:
+        add('sql-sort-spill', 'warning', f"{spill['node']} 溢出到磁盘（{spill['detail']}，{spill['kb']} kB）",
+            scale=max(results), **spill)
+    exponent = growth_exponent(results)
+    if exponent is not None and exponent > SUPERLINEAR:
+        timings = {scale: r.get('execution_ms') for scale, r in sorted(results.items())}
+        add('sql-superlinear', 'warning', f"耗时增长指数 {exponent}（{len(scales)} 个规模）",
+            exponent=exponent, timings=timings)
+    return records
+
+
+def main():
+    args = parse_args()
+    root = args.root.resolve()
+    try:
+        scales = sorted({int(s) for s in args.scales.split(',') if s.strip()})
+        ratios = parse_ratios(args.ratio)
+    except ValueError as e:
+        print(f"❌ 参数错误: {e}")
+        return 2
+    schema_path = args.schema or root / prisma_schema.SCHEMA_FILE
+    schema = prisma_schema.load_schema(schema_path)
+    if args.print_ddl:
+        print(prisma_schema.render_ddl(schema))
+        print(prisma_schema.seed_sql(schema, args.scale, ratios))
+        return 0
+
+    overrides = json.loads(args.samples.read_text(encoding='utf-8')) if args.samples else None
+    profiler = profiling.from_args(args, 'sql-explain', root)
+    stats = ScanStats()
+    catalog = sql_catalog.build_catalog(root, workers=args.workers, stats=stats, budget=args.file_budget,
+                                        overrides=overrides)
+    catalog_path = args.catalog or root / CATALOG_FILE
+    catalog_path.parent.mkdir(parents=True, exist_ok=True)
+    catalog_path.write_text(json.dumps(sql_catalog.catalog_dict(catalog), ensure_ascii=False, indent=2) + '\n',
+                            encoding='utf-8')
+    tables = set(schema.by_table())
+    missing = {q.id: [t for t in q.tables if t.split('.')[-1] not in tables] for q in catalog}
+    print(f"SQL目录: {len(catalog)} 条（{sum(1 for q in catalog if q.sql is None)} 条无法还原），"
+          f"已写入 {catalog_path}（扫描: {stats.summary()}）")
+    for path in stats.skipped:
+        print(f"⏱️ 超时跳过（不在目录中）: {path}")
+
+    queries = [q for q in catalog if q.sql is not None and (not args.only or args.only in q.id)]
+    selected = {q.id for q in queries}
+    results = {q.id: {} for q in queries}
+    if not args.catalog_only:
+        try:
+            with pg_local.from_args(args) as pg:
+                results = explain_all(pg, schema, queries, scales, ratios, args)
+        except pg_local.PostgresError as e:
+            print(f"❌ PostgreSQL 不可用: {e}")
+            return 2
+
+    report = {'version': 1, 'scales': [] if args.catalog_only else scales, 'work_mem': args.work_mem,
+              'queries': []}
+    with findings.from_args(args, 'sql-explain', rules=RULES) as stream:
+        for query in (q for q in catalog if q.sql is None or q.id in selected):
+            for item in query_records(query, missing[query.id], results.get(query.id), scales):
+                stream.emit(item)
+            report['queries'].append({
+                'id': query.id, 'fingerprint': query.fingerprint, 'method': query.method,
+                'function': query.function, 'tables': query.tables, 'missing_tables': missing[query.id],
+                'issues': query.issues, 'results': results.get(query.id, {}),
+                'growth': growth_exponent(results.get(query.id, {})),
+            })
+        stream.close(queries=len(report['queries']), scales=report['scales'])
+        counts = dict(stream.counts)
+    report_path = args.report or root / REPORT_FILE
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+    with profiling.phase('report'):
+        print()
+        if not args.catalog_only:
+            header = ''.join(f"{scale:>12}" for scale in scales)
+            print(f"{'SQL':<56}{header}{'增长':>8}  问题")
+        for entry in report['queries']:
+            notes = list(entry['issues'])
+            if entry['missing_tables']:
+                notes.append('缺表: ' + ','.join(entry['missing_tables']))
+            if args.catalog_only:
+                if notes:
+                    print(f"⚠️  {entry['id']}: {'; '.join(notes)}")
+                continue
+            cells = []
+            for scale in scales:
+                result = entry['results'].get(scale, {})
+                cells.append(f"{result['execution_ms']:>10.1f}ms" if 'execution_ms' in result else f"{'失败':>10}")
+                notes.extend(f"顺序扫描 {s['relation']}" for s in result.get('seq_scans', ())
+                             if scale == scales[-1] and s['rows'] >= SEQ_SCAN_ROWS)
+                notes.extend(f"{s['node']} 溢出" for s in result.get('spills', ()) if scale == scales[-1])
+            growth = entry['growth']
+            print(f"{entry['id'][-55:]:<56}{''.join(cells)}{growth if growth is not None else '-':>8}  "
+                  f"{'; '.join(notes)}")
+        print()
+        print(f"记录: {', '.join(f'{level} {n}' for level, n in counts.items()) or '无'}；报告已写入 {report_path}")
+
+    if profiler is not None:
+        profiler.finish()
+        print(profiler.summary())
+    if args.fail_on:
+        levels = findings.LEVELS[:findings.LEVELS.index(args.fail_on) + 1]
+        if any(counts.get(level) for level in levels):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
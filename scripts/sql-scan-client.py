@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+SQL注入扫描守护进程的轻量客户端
+
+用法:
+    python3 scripts/sql-scan-client.py [--root DIR] findings [PATH ...] [--json] [--start]
+    python3 scripts/sql-scan-client.py [--root DIR] status | rescan | report | start | stop
+
+只导入标准库和 tstools.daemon，不加载分析代码，查询由常驻的
+scan-sql-injection.py --daemon 在内存中回答。
+findings 的退出码: 0 没有危险用法，1 有危险用法，2 守护进程未运行（可退回冷启动扫描）。
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from tstools import daemon, paths
+
+# 与 scan-sql-injection.py 中的 SOCKET_NAME 一致
+SOCKET_NAME = "sql-injection-scan"
+SCAN_SCRIPT = Path(__file__).resolve().parent / "scan-sql-injection.py"
+LOG_FILE = Path(".cache") / "sql-injection-daemon.log"
+
+# 等待守护进程完成首次全量扫描的时间（秒）
+START_TIMEOUT = 120.0
+
+EXIT_UNSAFE = 1
+EXIT_NOT_RUNNING = 2
+
+
+def start_daemon(root: Path, sock: Path) -> bool:
+    """在后台启动守护进程，等它开始监听后返回"""
+    if daemon.is_running(sock):
+        return True
+    log_path = root / LOG_FILE
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, 'a', encoding='utf-8') as log:
+        subprocess.Popen([sys.executable, str(SCAN_SCRIPT), '--root', str(root), '--daemon'],
+                         stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                         start_new_session=True)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if daemon.is_running(sock):
+            return True
+        time.sleep(0.1)
+    print(f"守护进程启动超时，日志: {log_path}", file=sys.stderr)
+    return False
+
+
+def relative_paths(root: Path, paths):
+    """命令行路径 -> 相对项目根目录的路径"""
+    result = []
+    for p in paths:
+        try:
+            result.append(Path(p).resolve().relative_to(root).as_posix())
+        except ValueError:
+            result.append(p)
+    return result
+
+
+def print_findings(reply: dict):
+    for item in reply['findings']:
+        icon = "❌" if item['level'] == 'error' else "🔍"
+        print(f"{item['path']}:{item['line']}: {icon} {item['message']} ({item['sink']})")
+    totals = reply['totals']
+    print(f"原始SQL调用 {totals['usages']} 处：安全 {totals['safe']}，"
+          f"危险 {totals['unsafe']}，需人工检查 {totals['manual']}"
+          f"（查询耗时 {reply['elapsed_ms']:.1f}ms）")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="查询常驻的SQL注入扫描守护进程")
+    paths.add_root_argument(parser)
+    sub = parser.add_subparsers(dest='command', required=True)
+    query = sub.add_parser('findings', help="危险用法和需人工检查的用法")
+    query.add_argument('paths', nargs='*', help="只看这些文件或目录")
+    query.add_argument('--json', action='store_true', help="按 JSONL 逐行输出记录")
+    query.add_argument('--errors-only', action='store_true', help="只输出危险用法")
+    query.add_argument('--start', action='store_true', help="守护进程未运行时先在后台启动")
+    sub.add_parser('status', help="守护进程状态")
+    sub.add_parser('rescan', help="整体重扫")
+    sub.add_parser('report', help="写出 JSONL 结果流和 Markdown 报告")
+    sub.add_parser('start', help="在后台启动守护进程")
+    sub.add_parser('stop', help="停止守护进程")
+    args = parser.parse_args()
+
+    root = args.root.resolve()
+    sock = daemon.socket_path(root, SOCKET_NAME)
+
+    if args.command == 'start':
+        return 0 if start_daemon(root, sock) else EXIT_NOT_RUNNING
+    if args.command == 'findings' and args.start and not start_daemon(root, sock):
+        return EXIT_NOT_RUNNING
+
+    payload = {'cmd': 'shutdown' if args.command == 'stop' else args.command}
+    if args.command == 'findings':
+        payload['paths'] = relative_paths(root, args.paths)
+        if args.errors_only:
+            payload['levels'] = ['error']
+    try:
+        reply = daemon.request(sock, payload)
+    except daemon.DaemonNotRunning:
+        if args.command != 'stop':
+            print(f"守护进程未运行（{sock}），可用 start 启动或直接运行 scan-sql-injection.py",
+                  file=sys.stderr)
+        return EXIT_NOT_RUNNING
+    if not reply.get('ok'):
+        print(f"查询失败: {reply.get('error')}", file=sys.stderr)
+        return EXIT_NOT_RUNNING
+
+    if args.command == 'findings':
+        if args.json:
+            for item in reply['findings']:
+                print(json.dumps(item, ensure_ascii=False))
+        else:
+            print_findings(reply)
+        return EXIT_UNSAFE if reply['totals']['unsafe'] else 0
+    if args.command != 'stop':
+        reply.pop('ok', None)
+        print(json.dumps(reply, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
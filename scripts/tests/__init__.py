@@ -0,0 +1,8 @@
+"""
+tstools 的行为测试
+
+    python3 -m pytest scripts/tests -q
+
+本目录是包：pytest 会把上一级的 scripts/ 加入 sys.path，用例可以直接 import tstools。
+需要真实源码的用例只读取仓库中的文件。
+"""
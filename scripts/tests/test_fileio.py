@@ -0,0 +1,39 @@
+"""不是合法 UTF-8 的源码文件：逐文件警告后跳过，不中止扫描"""
+
+from tstools import fileio
+from tstools.route_permissions import discover_guards
+from tstools.routes import discover_routes
+from tstools.scan_engine import read_source
+
+VALID = "export async function GET() { return '幸运集市'; }\n"
+
+
+def write_routes(root):
+    for name, data in (('good', VALID.encode('utf-8')), ('broken', b"export async function GET() { '\xff'; }\n")):
+        path = root / 'app' / 'api' / 'admin' / name / 'route.ts'
+        path.parent.mkdir(parents=True)
+        path.write_bytes(data)
+
+
+def test_read_source_warns(tmp_path, capsys):
+    path = tmp_path / 'bad.ts'
+    path.write_bytes(b"const a = '\xc3';\n")
+    assert read_source(path) == (path.stat().st_size, None)
+    assert '不是合法的 UTF-8' in capsys.readouterr().err
+
+
+def test_prefilter_on_bytes(tmp_path):
+    path = tmp_path / 'page.ts'
+    path.write_text(VALID, encoding='utf-8')
+    literals = fileio.encode_literals(['幸运'])
+    assert fileio.read_if_contains(path, literals)[1] == VALID
+    assert fileio.read_if_contains(path, fileio.encode_literals(['$queryRawUnsafe']))[1] is None
+    with fileio.MappedSource(path, threshold=1) as source:
+        assert source.mapped and source.contains_any(literals)
+
+
+def test_discovery_skips_invalid_routes(tmp_path, capsys):
+    write_routes(tmp_path)
+    assert [r.path for r in discover_routes(tmp_path, workers=1)] == ['app/api/admin/good/route.ts']
+    assert [r.path for r in discover_guards(tmp_path, workers=1)] == ['app/api/admin/good/route.ts']
+    assert 'broken/route.ts' in capsys.readouterr().err
@@ -0,0 +1,68 @@
+"""git_diff.parse_diff：--unified=0 的 hunk 解析"""
+
+from tstools.git_diff import overlaps, parse_diff
+
+DIFF = """\
+diff --git a/app/api/a.ts b/app/api/a.ts
+index 1111111..2222222 100644
+--- a/app/api/a.ts
++++ b/app/api/a.ts
+@@ -3 +3 @@ export async function GET() {
+-  const a = 1;
++  const a = 2;
+@@ -10,0 +11,3 @@ export async function GET() {
++  one();
++  two();
++  three();
+@@ -20,2 +22,0 @@ export async function POST() {
+-  removed();
+-  removed();
+diff --git a/app/api/new.ts b/app/api/new.ts
+new file mode 100644
+--- /dev/null
++++ b/app/api/new.ts
+@@ -0,0 +1,2 @@
++export const a = 1;
++export const b = 2;
+diff --git a/app/api/gone.ts b/app/api/gone.ts
+deleted file mode 100644
+--- a/app/api/gone.ts
++++ /dev/null
+@@ -1,2 +0,0 @@
+-export const a = 1;
+-export const b = 2;
+diff --git "a/app/api/\\346\\226\\260.ts" "b/app/api/\\346\\226\\260.ts"
+--- "a/app/api/\\346\\226\\260.ts"
++++ "b/app/api/\\346\\226\\260.ts"
+@@ -1 +1 @@
+-a
++b
+"""
+
+
+def test_hunks():
+    result = parse_diff(DIFF)
+    assert result['app/api/a.ts'] == [(3, 3), (11, 13), (22, 23)]
+    assert result['app/api/new.ts'] == [(1, 2)]
+    # 删除的文件不再有新版本，不计入结果
+    assert 'app/api/gone.ts' not in result
+
+
+def test_pure_deletion_marks_both_neighbours():
+    # @@ -a +b,0 @@：被删的行位于新文件第 b 行之后
+    result = parse_diff("+++ b/x.ts\n@@ -5,3 +4,0 @@\n-a\n-b\n-c\n")
+    assert result == {'x.ts': [(4, 5)]}
+    assert overlaps([(5, 9)], result['x.ts'])
+    assert not overlaps([(6, 9)], result['x.ts'])
+
+
+def test_deletion_at_top_of_file():
+    assert parse_diff("+++ b/x.ts\n@@ -1 +0,0 @@\n-a\n") == {'x.ts': [(1, 1)]}
+
+
+def test_quoted_path():
+    assert parse_diff(DIFF)['app/api/新.ts'] == [(1, 1)]
+
+
+def test_mode_only_change_has_no_ranges():
+    assert parse_diff("diff --git a/x.ts b/x.ts\nold mode 100644\nnew mode 100755\n") == {}
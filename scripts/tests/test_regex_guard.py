@@ -0,0 +1,30 @@
+"""regex_guard：维护脚本中全部模块级正则的回溯检查"""
+
+from tstools import regex_guard
+
+
+def test_rule_sets_cover_every_module_pattern():
+    sets = regex_guard.rule_sets()
+    assert {'_CANDIDATE_RE', '_COMMENT_GAP_RE'} <= set(sets['fix_syntax_errors'])
+    assert '_OPTIONAL_FRAGMENT_RE' in sets['rollups']
+    assert '_SQL_COMPARE_RE' in sets['index_advisor']
+    assert '_PLACEHOLDER_RE' in sets['sql_catalog']
+    assert set(sets['ts_lexer']) == {'_TOKEN_RE', '_TEMPLATE_CHUNK_RE', '_REGEX_RE'}
+
+
+def test_audit_reports_no_errors():
+    errors = [f for f in regex_guard.audit_rule_sets() if f.severity == 'error']
+    assert errors == []
+
+
+def test_audit_flags_nested_quantifiers():
+    # user-003 原先的预筛：注释分支在星号内，连续的 / 可以被拆成指数多种注释组合
+    gap = r'(?:\s|/\*[\s\S]*?\*/|//[^\n]*)*'
+    assert ('error' in {severity for severity, _ in
+                        regex_guard.audit_pattern(rf':{gap}[\w$]+{gap}:{gap}any(?![\w$])')})
+
+
+def test_fuzz_has_no_superlinear_pattern():
+    # 与 regex-audit.py fuzz 的默认阈值一致
+    for result in regex_guard.fuzz_rule_sets(sizes=(1000, 2000, 4000), budget=2.0):
+        assert result.exponent is not None and result.exponent < 1.5, result
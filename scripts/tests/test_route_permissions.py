@@ -0,0 +1,46 @@
+"""路由权限清单：每个方法只需要它实际用到的中间件的权限"""
+
+from pathlib import Path
+
+from tstools.route_permissions import GUARD_MIDDLEWARE, analyze_guards
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+def permissions(guards):
+    return {method: guard.permissions for method, guard in guards.methods.items()
+            if guard.guard == GUARD_MIDDLEWARE}
+
+
+def test_products_route():
+    # GET 中的局部变量 responseData 与 POST / PUT / DELETE 中的同名变量不能串起来
+    rel = 'app/api/admin/products/route.ts'
+    guards = analyze_guards((REPO_ROOT / rel).read_text(encoding='utf-8'), rel)
+    assert permissions(guards) == {
+        'GET': ['products:read'],
+        'POST': ['products:write'],
+        'PUT': ['products:write'],
+        'DELETE': ['products:delete'],
+    }
+
+
+def test_local_bindings_are_lexical():
+    content = """
+const withRead = AdminPermissionManager.createPermissionMiddleware({ customPermissions: AdminPermissions.items.read() });
+const withWrite = AdminPermissionManager.createPermissionMiddleware({ customPermissions: AdminPermissions.items.write() });
+
+function save(data) {
+  return withWrite(async () => data);
+}
+
+export async function GET(request) {
+  const save = (x) => x;
+  return withRead(async () => save(request));
+}
+
+export async function POST(request) {
+  return save(await request.json());
+}
+"""
+    guards = analyze_guards(content, 'app/api/admin/items/route.ts')
+    assert permissions(guards) == {'GET': ['items:read'], 'POST': ['items:write']}
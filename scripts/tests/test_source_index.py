@@ -0,0 +1,31 @@
+"""source-index.py 命令行的冒烟测试"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'source-index.py'
+
+
+def run(root, *args):
+    proc = subprocess.run([sys.executable, str(SCRIPT), '--root', str(root), '-j', '1', *args],
+                          capture_output=True, text=True, check=False)
+    assert proc.returncode == 0, proc.stderr
+    return proc.stdout
+
+
+def test_build_and_query(tmp_path):
+    api = tmp_path / 'app' / 'api' / 'users'
+    api.mkdir(parents=True)
+    (api / 'route.ts').write_text('export async function GET() { return prisma.$queryRawUnsafe(sql); }\n',
+                                  encoding='utf-8')
+    (tmp_path / 'lib').mkdir()
+    (tmp_path / 'lib' / 'db.ts').write_text('export const db = 1;\n', encoding='utf-8')
+
+    assert '2 个文件重新索引' in run(tmp_path, 'build')
+    assert (tmp_path / '.cache' / 'source-index.sqlite').is_file()
+    assert run(tmp_path, 'query', '$queryRawUnsafe').split() == ['app/api/users/route.ts']
+    assert run(tmp_path, 'query', '$queryRawUnsafe', 'getAdminFromRequest') == ''
+    assert run(tmp_path, 'regex', r'export (const|async function) \w+').split() == \
+        ['app/api/users/route.ts', 'lib/db.ts']
+    assert '0 个文件重新索引' in run(tmp_path, 'build')
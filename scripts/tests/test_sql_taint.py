@@ -0,0 +1,109 @@
+"""sql_taint：SQL 经由变量、拼接和同文件函数调用的污点判定"""
+
+import time
+
+import pytest
+
+from tstools.sql_taint import SAFE, TAINTED, UNKNOWN, analyze_sql_taint
+from tstools.ts_lexer import tokenize_all
+
+
+def levels(source):
+    return [v.level for v in analyze_sql_taint(tokenize_all(source))]
+
+
+def handler(body):
+    return f"export async function GET(request: Request) {{\n  const id = request.url;\n{body}\n}}\n"
+
+
+@pytest.mark.parametrize('body, expected', [
+    # 常量SQL
+    ("  await prisma.$queryRawUnsafe('SELECT 1');", SAFE),
+    ("  await prisma.$queryRawUnsafe(`SELECT * FROM users WHERE id = ${id}`);", TAINTED),
+    # 重新赋值：两次赋值都可能生效
+    ("  let sql = 'SELECT 1';\n  sql = `SELECT ${id}`;\n  await prisma.$queryRawUnsafe(sql);", TAINTED),
+    ("  let sql = `SELECT ${id}`;\n  sql = 'SELECT 1';\n  await prisma.$queryRawUnsafe('SELECT 2');", SAFE),
+    # += 拼接
+    ("  let sql = 'SELECT * FROM users WHERE 1=1';\n  sql += ' AND id = ' + id;\n"
+     "  await prisma.$queryRawUnsafe(sql);", TAINTED),
+    ("  let sql = 'SELECT * FROM users';\n  sql += ' LIMIT 10';\n  await prisma.$queryRawUnsafe(sql);", SAFE),
+    # 三元表达式取两个分支
+    ("  const where = id ? `WHERE id = ${id}` : '';\n"
+     "  await prisma.$queryRawUnsafe(`SELECT * FROM users ${where}`);", TAINTED),
+    ("  const order = id ? 'ASC' : 'DESC';\n"
+     "  await prisma.$queryRawUnsafe(`SELECT * FROM users ORDER BY id ${order}`);", SAFE),
+    # parseInt 的结果是数字，可以安全插值
+    ("  const limit = parseInt(id);\n"
+     "  await prisma.$queryRawUnsafe(`SELECT * FROM users LIMIT ${limit}`);", SAFE),
+    ("  await prisma.$queryRawUnsafe(`SELECT * FROM users LIMIT ${Number(id)}`);", SAFE),
+])
+def test_local_flow(body, expected):
+    assert levels(handler(body)) == [expected]
+
+
+def test_through_helper():
+    source = (
+        "function buildWhere(column: string, value: string) {\n"
+        "  return `WHERE ${column} = ${value}`;\n"
+        "}\n"
+        "function constantWhere() {\n"
+        "  return 'WHERE deleted_at IS NULL';\n"
+        "}\n"
+        + handler("  await prisma.$queryRawUnsafe(`SELECT * FROM users ${buildWhere('id', id)}`);\n"
+                  "  await prisma.$queryRawUnsafe(`SELECT * FROM users ${constantWhere()}`);\n"
+                  "  await prisma.$queryRawUnsafe(`SELECT * FROM users ${buildWhere('id', '1')}`);")
+    )
+    assert levels(source) == [TAINTED, SAFE, SAFE]
+
+
+def test_sink_inside_helper():
+    # 原始SQL调用在辅助函数内，污点来自调用方传入的参数
+    source = (
+        "async function run(sql: string) {\n"
+        "  return prisma.$queryRawUnsafe(sql);\n"
+        "}\n"
+        + handler("  await run(`SELECT * FROM users WHERE id = ${id}`);")
+    )
+    [verdict] = analyze_sql_taint(tokenize_all(source))
+    assert verdict.level == TAINTED
+    assert verdict.via == [6]
+
+
+def test_unexported_helper_without_tainted_callers():
+    source = (
+        "async function run(sql: string) {\n"
+        "  return prisma.$queryRawUnsafe(sql);\n"
+        "}\n"
+        + handler("  await run('SELECT 1');")
+    )
+    assert levels(source) == [SAFE]
+
+
+def test_imported_function_is_unknown():
+    assert levels(handler("  await prisma.$queryRawUnsafe(buildQuery());")) == [UNKNOWN]
+
+
+def test_cost_is_linear():
+    # 每个函数一处原始SQL调用，另有一个导出函数调用它
+    def source(n):
+        return ''.join(
+            f"function query{i}(value: string) {{\n"
+            f"  const sql = `SELECT * FROM users WHERE id = ${{value}}`;\n"
+            f"  return prisma.$queryRawUnsafe(sql);\n"
+            f"}}\n"
+            f"export async function handler{i}(request: Request) {{\n"
+            f"  return query{i}(request.url);\n"
+            f"}}\n" for i in range(n))
+
+    def best(n):
+        tokens = tokenize_all(source(n))
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            verdicts = analyze_sql_taint(tokens)
+            timings.append(time.perf_counter() - start)
+        assert [v.level for v in verdicts] == [TAINTED] * n
+        return min(timings)
+
+    # 输入变为 4 倍：线性约 4 倍，按函数数平方增长时约 16 倍
+    assert best(2000) / best(500) < 8
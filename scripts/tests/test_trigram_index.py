@@ -0,0 +1,57 @@
+"""trigram_index：三元组提取、正则的必需字面量和候选文件查询"""
+
+import re
+
+import pytest
+
+from tstools.trigram_index import TrigramIndex, regex_query, trigrams_of
+
+
+def gram(text):
+    return int.from_bytes(text.encode('utf-8'), 'big')
+
+
+def test_trigrams_of():
+    assert trigrams_of(b'abcab') == {gram('abc'), gram('bca'), gram('cab')}
+    assert trigrams_of(b'ab') == set()
+    # 按字节而不是按字符切分
+    assert len(trigrams_of('市'.encode('utf-8'))) == 1
+
+
+@pytest.mark.parametrize('pattern, flags, expected', [
+    (r'\$queryRawUnsafe\(', 0, '$queryRawUnsafe('),
+    (r'getAdmin\w+Request', 0, ('and', ['getAdmin', 'Request'])),
+    (r'(?:foo|barbaz)\d+', 0, ('or', ['foo', 'barbaz'])),
+    # 任一分支没有 3 个字符以上的字面量，整体没有约束
+    (r'(?:foo|ba)x', 0, None),
+    (r'(?:abc)*def', 0, 'def'),
+    (r'(?:abc)+def', 0, ('and', ['abc', 'def'])),
+    (r'abc', re.IGNORECASE, None),
+    (r'(?i)abc', 0, None),
+    (r'[abc]{3}', 0, None),
+])
+def test_regex_query(pattern, flags, expected):
+    assert regex_query(pattern, flags) == expected
+
+
+def test_candidates(tmp_path):
+    app = tmp_path / 'app'
+    app.mkdir()
+    (app / 'a.ts').write_text('prisma.$queryRawUnsafe(sql)\n', encoding='utf-8')
+    (app / 'b.ts').write_text('getAdminFromRequest(request)\n', encoding='utf-8')
+    (app / 'c.ts').write_text("const s = '幸运集市';\n", encoding='utf-8')
+    with TrigramIndex(tmp_path, dirs=['app'], path=tmp_path / 'index.sqlite') as index:
+        assert len(index.refresh(workers=1)) == 3
+        names = lambda paths: [p.name for p in paths]
+        assert names(index.candidates('$queryRawUnsafe')) == ['a.ts']
+        assert names(index.candidates('幸运')) == ['c.ts']
+        assert names(index.candidates_any('$queryRawUnsafe', 'getAdmin')) == ['a.ts', 'b.ts']
+        assert names(index.candidates_regex(r'getAdmin\w+Request')) == ['b.ts']
+        # 少于 3 个字节的字面量不构成约束
+        assert len(index.candidates('sq')) == 3
+
+        (app / 'b.ts').write_text('prisma.$queryRawUnsafe(other)\n', encoding='utf-8')
+        (app / 'c.ts').unlink()
+        assert index.refresh(workers=1) == ['app/b.ts']
+        assert names(index.candidates('$queryRawUnsafe')) == ['a.ts', 'b.ts']
+        assert names(index.all_files()) == ['a.ts', 'b.ts']
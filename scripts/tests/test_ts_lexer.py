@@ -0,0 +1,130 @@
+"""ts_lexer 的词法分析，以及基于 token 的类型注解修复（fix_syntax_errors.fix_content）"""
+
+from pathlib import Path
+
+import pytest
+
+from tstools import regex_guard
+from tstools.paths import load_script
+from tstools.ts_lexer import (
+    IDENT,
+    PUNCT,
+    REGEX,
+    STRING,
+    TEMPLATE,
+    TEMPLATE_HEAD,
+    TEMPLATE_MIDDLE,
+    TEMPLATE_TAIL,
+    brackets_balanced,
+    find_calls,
+    match_brackets,
+    match_sequence,
+    tokenize_all,
+)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+@pytest.fixture(scope='module')
+def fix_syntax_errors():
+    return load_script(REPO_ROOT / 'fix_syntax_errors.py', 'fix_syntax_errors')
+
+
+@pytest.fixture(scope='module')
+def fix_content(fix_syntax_errors):
+    return fix_syntax_errors.fix_content
+
+
+def kinds(source):
+    return [(t.kind, t.value) for t in tokenize_all(source)]
+
+
+def test_strings_and_comments_are_not_code():
+    tokens = tokenize_all("const s = 'a: any: any'; // b: any: any\n/* c */ f(s)")
+    assert [t.value for t in tokens if t.kind == IDENT] == ['const', 's', 'f', 's']
+    assert tokens[3] == (STRING, "'a: any: any'", 10, 23, 1, 0)
+    assert tokens[-3].line == 2
+    assert [t.value for t in tokenize_all('// x', comments=True)] == ['// x']
+
+
+def test_template_interpolation():
+    source = "`a ${b + `c ${d}`} e ${f}`"
+    assert kinds(source) == [
+        (TEMPLATE_HEAD, '`a ${'), (IDENT, 'b'), (PUNCT, '+'),
+        (TEMPLATE_HEAD, '`c ${'), (IDENT, 'd'), (TEMPLATE_TAIL, '}`'),
+        (TEMPLATE_MIDDLE, '} e ${'), (IDENT, 'f'), (TEMPLATE_TAIL, '}`'),
+    ]
+    tokens = tokenize_all(source)
+    assert match_brackets(tokens) == {0: 6, 3: 5, 6: 8}
+    assert brackets_balanced(tokens)
+    assert kinds('`plain`') == [(TEMPLATE, '`plain`')]
+
+
+def test_regex_or_division():
+    assert kinds('x = a / b / c')[3] == (PUNCT, '/')
+    assert kinds('x = /a\\/b[/]/g.test(y)')[2] == (REGEX, '/a\\/b[/]/g')
+    assert kinds('return /x/')[1] == (REGEX, '/x/')
+    assert kinds('f(a) / 2')[4] == (PUNCT, '/')
+
+
+def test_depth_and_unbalanced_brackets():
+    tokens = tokenize_all('f({ a: [1] })')
+    assert [t.depth for t in tokens] == [0, 0, 1, 2, 2, 2, 3, 2, 1, 0]
+    assert match_brackets(tokens)[1] == 9
+    # 未闭合的 ( 不影响之后的配对
+    broken = tokenize_all('{ f( }')
+    assert match_brackets(broken) == {0: 3}
+    assert not brackets_balanced(broken)
+
+
+def test_find_calls():
+    tokens = tokenize_all("prisma.$queryRawUnsafe(sql, a, f(b, c)); x?.$queryRawUnsafe('s')")
+    calls = list(find_calls(tokens, ['$queryRawUnsafe']))
+    assert [len(call.args) for call in calls] == [3, 1]
+    assert match_sequence(tokens, 0, (IDENT, '.', IDENT, '('))
+    assert not match_sequence(tokens, 0, (IDENT, ':'))
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('export async function GET(request: any: any) {}', 'export async function GET(request: any) {}'),
+    ('function f(a: string, admin: any: any, b) {}', 'function f(a: string, admin: any, b) {}'),
+    ('const f = (admin: any /* x */ : any) => 1', 'const f = (admin: any) => 1'),
+    # 连续的两处：前一处末尾的 , 是后一处的开头
+    ('f(a: any: any, b: any: any)', 'f(a: any, b: any)'),
+    # 字符串、注释和对象字面量不修改
+    ("const s = '(a: any: any)'; // (b: any: any)", "const s = '(a: any: any)'; // (b: any: any)"),
+    ('const o = { a: b ? c : any }', 'const o = { a: b ? c : any }'),
+])
+def test_fix_content(fix_content, source, expected):
+    fixed, changes = fix_content(source)
+    assert fixed == expected
+    assert bool(changes) == (source != expected)
+
+
+def test_fix_content_limited_to_changed_lines(fix_content):
+    source = 'function f(a: any: any) {}\nfunction g(b: any: any) {}\n'
+    fixed, _ = fix_content(source, lines=[(2, 2)])
+    assert fixed == 'function f(a: any: any) {}\nfunction g(b: any) {}\n'
+
+
+@pytest.mark.parametrize('source', [
+    'const a: any = 1;\n' + '/' * 44 + '\n',
+    'const a: any = 1;\n' + '/' * 200000 + '\n',
+    'const a: any = 1;\n' + ': /* ' * 20000,
+    'const a: any = 1;\n' + ' ' * 200000 + ':',
+])
+def test_prefilter_is_linear(fix_content, source):
+    # 原先的预筛在 44 个 / 的分隔线上要回溯 90 多秒
+    with regex_guard.time_budget(2):
+        assert fix_content(source) == (source, [])
+
+
+def test_prefilter_keeps_comment_gaps(fix_content):
+    source = 'function f(a /* x */: any // y\n: any) {}\nfunction g(b:\n  // z\n  any: any) {}'
+    fixed, _ = fix_content(source)
+    assert fixed == 'function f(a /* x */: any) {}\nfunction g(b:\n  // z\n  any) {}'
+
+
+def test_prefilter_patterns_pass_audit(fix_syntax_errors):
+    for pattern in (fix_syntax_errors._CANDIDATE_RE, fix_syntax_errors._COMMENT_GAP_RE):
+        assert regex_guard.audit_pattern(pattern) == []
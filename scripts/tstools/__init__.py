@@ -0,0 +1,6 @@
+"""
+LuckyMart-TJ Python维护脚本共享工具包
+
+供 scripts/ 下的扫描、修复脚本复用。子模块按需导入，
+这里不做任何重导出，避免拖慢脚本启动。
+"""
@@ -0,0 +1,173 @@
+"""
+常驻守护进程的本地 Unix socket 查询接口
+
+协议为单行 JSON：客户端发送 {"cmd": 命令, ...}\\n，服务端回复一行
+{"ok": true, ...}（出错时 {"ok": false, "error": 说明}）后关闭连接。
+内置命令 ping / shutdown，其余命令交给调用方的 handler。
+
+服务端是单线程事件循环：socket 和文件监听器一起交给 select，
+每次回答查询前先处理已经到达的变更事件，保证查询结果不落后于磁盘。
+客户端只依赖标准库的 socket/json，不导入分析代码，冷启动开销很小。
+"""
+
+import hashlib
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+SOCKET_DIR = Path('.cache')
+
+# AF_UNIX 路径长度上限（Linux 为 108 字节，含结尾的 \0）
+_MAX_SOCKET_PATH = 100
+
+# 单个请求的大小上限与读取超时
+MAX_REQUEST = 1024 * 1024
+REQUEST_TIMEOUT = 5.0
+
+
+class DaemonNotRunning(Exception):
+    """连接不到守护进程"""
+
+
+def socket_path(root: Path, name: str) -> Path:
+    """<root>/.cache/<name>.sock；路径过长时改用临时目录下按根目录哈希命名的文件"""
+    path = Path(root).resolve() / SOCKET_DIR / f'{name}.sock'
+    if len(os.fsencode(str(path))) <= _MAX_SOCKET_PATH:
+        return path
+    digest = hashlib.blake2b(str(path).encode(), digest_size=8).hexdigest()
+    return Path(tempfile.gettempdir()) / f'{name}-{digest}.sock'
+
+
+def request(path: Path, payload: dict, timeout: float = 30.0) -> dict:
+    """发送一个请求并返回回复，连接失败时抛出 DaemonNotRunning"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(str(path))
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise DaemonNotRunning(str(e))
+        sock.sendall(json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n')
+        chunks = []
+        while True:
+            data = sock.recv(64 * 1024)
+            if not data:
+                break
+            chunks.append(data)
+    finally:
+        sock.close()
+    if not chunks:
+        raise DaemonNotRunning("守护进程关闭了连接")
+    return json.loads(b''.join(chunks))
+
+
+def is_running(path: Path) -> bool:
+    try:
+        return request(path, {'cmd': 'ping'}, timeout=2.0).get('ok', False)
+    except (DaemonNotRunning, OSError, ValueError):
+        return False
+
+
+def _bind(path: Path) -> socket.socket:
+    """绑定 socket；残留的 socket 文件（上次异常退出）直接删除"""
+    if path.exists():
+        if is_running(path):
+            raise RuntimeError(f"守护进程已在运行: {path}")
+        path.unlink()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(str(path))
+    os.chmod(path, 0o600)
+    sock.listen(16)
+    sock.setblocking(False)
+    return sock
+
+
+def _read_request(conn: socket.socket) -> dict:
+    conn.settimeout(REQUEST_TIMEOUT)
+    buf = b''
+    while b'\n' not in buf:
+        data = conn.recv(64 * 1024)
+        if not data:
+            break
+        buf += data
+        if len(buf) > MAX_REQUEST:
+            raise ValueError("请求过大")
+    return json.loads(buf.split(b'\n', 1)[0] or b'{}')
+
+
+def serve(path: Path, handler: Callable[[dict], dict], watcher=None,
+          on_changes: Optional[Callable[[set, bool], None]] = None):
+    """
+    在 path 上提供查询服务，直到收到 shutdown、SIGTERM 或 Ctrl-C
+
+    watcher 为 tstools.watcher 中的监听器；有变更时调用 on_changes(变更路径集合, 是否需要整体重扫)。
+    handler(request) 返回回复字典（不含 ok 字段），抛出的异常作为错误回复。
+    """
+    server = _bind(path)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ, 'accept')
+    if watcher is not None and watcher.fileno() is not None:
+        selector.register(watcher.fileno(), selectors.EVENT_READ, 'watch')
+
+    def sync():
+        if watcher is None:
+            return
+        changed = watcher.changes()
+        if changed or watcher.overflowed:
+            full, watcher.overflowed = watcher.overflowed, False
+            on_changes(changed, full)
+
+    def answer(conn) -> bool:
+        """处理一个连接，返回是否继续服务"""
+        with conn:
+            try:
+                req = _read_request(conn)
+                cmd = req.get('cmd')
+                if cmd == 'ping':
+                    reply = {'ok': True, 'pid': os.getpid()}
+                elif cmd == 'shutdown':
+                    reply = {'ok': True}
+                else:
+                    sync()
+                    start = time.perf_counter()
+                    reply = dict(handler(req), ok=True)
+                    reply['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            except Exception as e:
+                cmd = None
+                reply = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            try:
+                conn.sendall(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+            except OSError:
+                pass
+            return cmd != 'shutdown'
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        running = True
+        while running:
+            timeout = watcher.timeout() if watcher is not None else None
+            for key, _ in selector.select(timeout):
+                if key.data == 'accept':
+                    try:
+                        conn, _ = server.accept()
+                    except BlockingIOError:
+                        continue
+                    running = answer(conn) and running
+            sync()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        selector.close()
+        server.close()
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,104 @@
+"""
+零解码的源码文件访问层
+
+扫描脚本原先对每个文件都完整读入、解码成 str 之后才做一次子串预筛，大部分文件随即被丢弃。
+这里把文件 mmap 成只读映射，字面量预筛直接在映射上做字节搜索，只有命中的文件才解码：
+没有命中的文件既不复制成 bytes，也不解码。UTF-8 中多字节字符的后续字节不会与 ASCII 或
+其他字符的首字节相同，字节搜索的结果与在解码后的文本上搜索一致。
+
+小于 MMAP_THRESHOLD 的文件直接 read() 成 bytes 再按字节搜索：对几 KB 的路由文件，
+mmap / munmap 的系统调用开销比一次 read 更大（基准见 scripts/benchmarks/test_prefilter.py）。
+
+不是合法 UTF-8 的文件逐个给出警告后跳过（文本为 None），不再让整次扫描因异常中止。
+"""
+
+import mmap
+import os
+import sys
+from typing import Iterable, Optional, Sequence, Tuple
+
+from tstools import profiling
+
+# 不小于该字节数的文件才映射，更小的文件直接读入
+MMAP_THRESHOLD = 64 * 1024
+
+
+def encode_literals(literals: Iterable[str]) -> Tuple[bytes, ...]:
+    """预筛字面量 -> UTF-8 字节串"""
+    return tuple(literal.encode('utf-8') for literal in literals)
+
+
+def warn_invalid(path, error: UnicodeDecodeError):
+    """非法 UTF-8 的逐文件警告"""
+    print(f"⚠️ 不是合法的 UTF-8，已跳过 {path}（第 {error.start} 字节: {error.reason}）", file=sys.stderr)
+
+
+class MappedSource:
+    """
+    只读映射的源码文件（小于 MMAP_THRESHOLD 的文件读入为 bytes）
+
+    buffer 支持 find / 切片 / 缓冲区协议，可以直接传给 hashlib。用作上下文管理器，退出时解除映射。
+    """
+
+    def __init__(self, path, threshold: int = MMAP_THRESHOLD):
+        # 直接用文件描述符：每个文件只有几微秒的工作量，Path 和缓冲文件对象的构造开销都很显著
+        self.path = path
+        self.decode_error: Optional[UnicodeDecodeError] = None
+        self._map = None
+        self._data = b''
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            self.size = os.fstat(fd).st_size
+            if self.size and self.size >= threshold:
+                self._map = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            elif self.size:
+                self._data = os.read(fd, self.size)
+                self.size = len(self._data)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> 'MappedSource':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    @property
+    def mapped(self) -> bool:
+        return self._map is not None
+
+    @property
+    def buffer(self):
+        return self._map if self._map is not None else self._data
+
+    def contains_any(self, literals: Sequence[bytes]) -> bool:
+        buffer = self.buffer
+        return any(buffer.find(literal) != -1 for literal in literals)
+
+    def text(self, warn: bool = True) -> Optional[str]:
+        """解码为 str（映射的文件直接从映射解码，不经过中间的 bytes）；非法 UTF-8 时返回 None"""
+        try:
+            return str(self.buffer, 'utf-8')
+        except UnicodeDecodeError as e:
+            self.decode_error = e
+            if warn:
+                warn_invalid(self.path, e)
+            return None
+
+
+def read_if_contains(path, literals: Sequence[bytes]) -> Tuple[int, Optional[str]]:
+    """
+    包含任一字面量（UTF-8 字节串，见 encode_literals）时解码文件
+
+    返回 (字节数, 文本)；不包含任何字面量或不是合法 UTF-8 时文本为 None。literals 为空时总是解码。
+    """
+    with profiling.phase('read'):
+        with MappedSource(path) as source:
+            if literals and not source.contains_any(literals):
+                return source.size, None
+            return source.size, source.text()
@@ -0,0 +1,171 @@
+"""
+扫描结果与改动记录的流式输出
+
+每个文件处理完就立即写出对应的记录，内存占用与语料规模无关：
+- JSONL：每行一个 JSON 对象，最后一行是 {"type": "summary", ...}
+- SARIF 2.1.0：results 数组逐条写出，可直接交给 CI 的代码扫描注释工具
+
+记录格式:
+    {"type": "finding" | "change", "tool": 脚本名, "rule": 规则ID,
+     "level": "error" | "warning" | "note", "path": 相对路径,
+     "line": 行号或 null, "message": 说明, ...附加字段}
+
+Markdown 报告由 iter_records() 读取 JSONL 流后渲染，不再在内存中拼接整份报告。
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO
+
+SARIF_VERSION = '2.1.0'
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+LEVELS = ('error', 'warning', 'note', 'none')
+
+
+def record(kind: str, rule: str, level: str, path: str, message: str,
+           line: Optional[int] = None, **extra) -> dict:
+    """构造一条 finding / change 记录（tool 字段由 FindingStream 填写）"""
+    assert level in LEVELS, level
+    return {'type': kind, 'rule': rule, 'level': level, 'path': path,
+            'line': line, 'message': message, **extra}
+
+
+class _JsonlWriter:
+    def __init__(self, fp: TextIO):
+        self.fp = fp
+
+    def write(self, item: dict):
+        self.fp.write(json.dumps(item, ensure_ascii=False) + '\n')
+        self.fp.flush()
+
+    def close(self, summary: dict):
+        self.write(summary)
+
+
+class _SarifWriter:
+    """先写出 run 的头部，results 逐条追加，summary 放进 run.properties 收尾"""
+
+    def __init__(self, fp: TextIO, tool: str, rules: Dict[str, str]):
+        self.fp = fp
+        self.first = True
+        driver = {
+            'name': tool,
+            'rules': [{'id': rule_id, 'shortDescription': {'text': text}}
+                      for rule_id, text in rules.items()],
+        }
+        fp.write(f'{{"version": "{SARIF_VERSION}", "$schema": "{SARIF_SCHEMA}", '
+                 f'"runs": [{{"tool": {json.dumps({"driver": driver}, ensure_ascii=False)}, '
+                 f'"results": [\n')
+        fp.flush()
+
+    def write(self, item: dict):
+        region = {'startLine': item['line']} if item.get('line') else None
+        location = {'artifactLocation': {'uri': item['path']}}
+        if region:
+            location['region'] = region
+        result = {
+            'ruleId': item['rule'],
+            'level': item['level'],
+            'message': {'text': item['message']},
+            'locations': [{'physicalLocation': location}],
+        }
+        extra = {k: v for k, v in item.items()
+                 if k not in ('type', 'tool', 'rule', 'level', 'path', 'line', 'message')}
+        if extra:
+            result['properties'] = extra
+        prefix = '' if self.first else ',\n'
+        self.first = False
+        self.fp.write(prefix + json.dumps(result, ensure_ascii=False))
+        self.fp.flush()
+
+    def close(self, summary: dict):
+        properties = {k: v for k, v in summary.items() if k != 'type'}
+        self.fp.write(f'\n], "properties": {json.dumps(properties, ensure_ascii=False)}}}]}}\n')
+
+
+class FindingStream:
+    """
+    把记录同时写到 JSONL 和/或 SARIF 输出，每条记录立即 flush
+
+    两个路径都没有给出时只统计条数，不写任何文件。
+    """
+
+    def __init__(self, tool: str, jsonl: Optional[Path] = None, sarif: Optional[Path] = None,
+                 rules: Optional[Dict[str, str]] = None):
+        self.tool = tool
+        self.counts: Dict[str, int] = {}      # level -> 条数
+        self._files: List[TextIO] = []
+        self._writers = []
+        if jsonl is not None:
+            self._writers.append(_JsonlWriter(self._open(jsonl)))
+        if sarif is not None:
+            self._writers.append(_SarifWriter(self._open(sarif), tool, rules or {}))
+        self.closed = False
+
+    def _open(self, path) -> TextIO:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fp = open(path, 'w', encoding='utf-8')
+        self._files.append(fp)
+        return fp
+
+    def emit(self, item: dict):
+        item = {'type': item['type'], 'tool': self.tool, **item}
+        self.counts[item['level']] = self.counts.get(item['level'], 0) + 1
+        for writer in self._writers:
+            writer.write(item)
+
+    def close(self, **summary):
+        """写出汇总记录并关闭输出；summary 中自动带上各级别的条数"""
+        if self.closed:
+            return
+        self.closed = True
+        item = {'type': 'summary', 'tool': self.tool, 'counts': dict(self.counts), **summary}
+        try:
+            for writer in self._writers:
+                writer.close(item)
+        finally:
+            for fp in self._files:
+                fp.close()
+
+    def __enter__(self) -> 'FindingStream':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def iter_records(path: Path, kind: Optional[str] = None) -> Iterator[dict]:
+    """逐行读取 JSONL 流，可按 type 过滤"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if kind is None or item.get('type') == kind:
+                yield item
+
+
+def read_summary(path: Path) -> Optional[dict]:
+    """JSONL 流的汇总记录（流被中断而没有汇总时返回 None）"""
+    summary = None
+    for item in iter_records(path, 'summary'):
+        summary = item
+    return summary
+
+
+def add_output_arguments(parser, default_jsonl: Optional[str] = None):
+    """为脚本添加 --jsonl / --sarif 参数"""
+    jsonl_help = "逐条写出 JSONL 记录"
+    if default_jsonl:
+        jsonl_help += f"（默认 <root>/{default_jsonl}）"
+    parser.add_argument('--jsonl', type=Path, metavar='FILE', help=jsonl_help)
+    parser.add_argument('--sarif', type=Path, metavar='FILE', help="逐条写出 SARIF 2.1.0 结果")
+
+
+def from_args(args, tool: str, rules: Optional[Dict[str, str]] = None,
+              default_jsonl: Optional[Path] = None) -> FindingStream:
+    """按命令行参数打开输出流"""
+    return FindingStream(tool, jsonl=args.jsonl or default_jsonl, sarif=args.sarif, rules=rules)
@@ -0,0 +1,142 @@
+"""
+按 git diff 限定处理范围（--since <ref> / --staged）
+
+只调用普通的 git 命令，解析 `git diff --unified=0` 的 hunk 头，得到每个改动文件
+在新版本中的改动行区间。规则仍然对整个文件做词法和污点分析（保证上下文正确），
+只是只报告或只修改落在改动区间内的结果，处理量与 diff 大小成正比。
+
+- --staged：暂存区相对 HEAD 的改动（pre-commit）。只检查不修改的脚本用 staged_snapshot
+  把暂存区的内容导出到临时目录再分析，行号与 diff 一致；直接处理工作区文件时，
+  同时有未暂存改动的文件行号与暂存区不一致，整个文件视为改动。
+- --since REF：工作区相对 REF 与 HEAD 的合并基点的改动（CI），未跟踪的新文件整体计入。
+"""
+
+import contextlib
+import re
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# 改动行区间 [start, end]（含两端，从1开始）；None 表示整个文件
+LineRanges = Optional[List[Tuple[int, int]]]
+
+_HUNK_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+
+class GitError(Exception):
+    """git 不可用、不是 git 仓库或 ref 不存在"""
+
+
+def _git(root: Path, *args: str) -> str:
+    try:
+        proc = subprocess.run(['git', '-c', 'core.quotePath=false', *args], cwd=str(root),
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise GitError("找不到 git 命令")
+    if proc.returncode != 0:
+        raise GitError(proc.stderr.decode('utf-8', 'replace').strip() or f"git {args[0]} 失败")
+    return proc.stdout.decode('utf-8', 'surrogateescape')
+
+
+def _unquote(path: str) -> str:
+    """git 对含特殊字符的路径加双引号，并把 UTF-8 字节转义成 \\ooo"""
+    if path.startswith('"') and path.endswith('"'):
+        raw = path[1:-1].encode('utf-8', 'surrogateescape').decode('unicode_escape').encode('latin-1')
+        return raw.decode('utf-8', 'surrogateescape')
+    return path
+
+
+def parse_diff(text: str) -> Dict[str, List[Tuple[int, int]]]:
+    """解析 --unified=0 的 diff 输出：新文件路径 -> 改动行区间"""
+    result: Dict[str, List[Tuple[int, int]]] = {}
+    current = None
+    for line in text.splitlines():
+        if line.startswith('+++ '):
+            target = _unquote(line[4:].rstrip('\t'))
+            current = None if target == '/dev/null' else target[2:] if target.startswith('b/') else target
+            if current is not None:
+                result.setdefault(current, [])
+            continue
+        if current is None or not line.startswith('@@'):
+            continue
+        m = _HUNK_RE.match(line)
+        if not m:
+            continue
+        start = int(m.group(1))
+        count = int(m.group(2)) if m.group(2) is not None else 1
+        if count == 0:
+            # 纯删除：被删的行位于 start 与 start+1 之间，两侧的行都算受影响
+            result[current].append((max(start, 1), start + 1))
+        else:
+            result[current].append((start, start + count - 1))
+    return result
+
+
+def changed_lines(root: Path, since: Optional[str] = None, staged: bool = False,
+                  paths: Sequence[str] = (), snapshot: bool = False) -> Dict[Path, LineRanges]:
+    """
+    改动的文件（绝对路径）-> 改动行区间；已删除的文件不包含在内
+
+    paths 为相对 root 的路径限定（目录或文件）。snapshot 为 True 表示调用方读取的是
+    暂存区的内容（staged_snapshot），部分暂存的文件不再整体视为改动。
+    """
+    root = Path(root).resolve()
+    pathspec = ['--', *paths] if paths else []
+    diff_args = ['diff', '--relative', '--unified=0', '--no-color', '--no-ext-diff',
+                 '--no-renames', '--diff-filter=d']
+    whole_files: List[str] = []
+    if staged:
+        text = _git(root, *diff_args, '--cached', *pathspec)
+        if not snapshot:
+            # 部分暂存的文件：磁盘上的内容和行号与暂存区不同
+            whole_files = _git(root, 'diff', '--relative', '--name-only', *pathspec).splitlines()
+    else:
+        ref = since or 'HEAD'
+        try:
+            base = _git(root, 'merge-base', ref, 'HEAD').strip()
+        except GitError:
+            base = _git(root, 'rev-parse', '--verify', f'{ref}^{{commit}}').strip()
+        text = _git(root, *diff_args, base, *pathspec)
+        whole_files = _git(root, 'ls-files', '--others', '--exclude-standard', *pathspec).splitlines()
+
+    changes: Dict[Path, LineRanges] = {root / p: ranges for p, ranges in parse_diff(text).items()}
+    for p in whole_files:
+        path = root / _unquote(p)
+        if path in changes or not staged:
+            changes[path] = None
+    return {path: ranges for path, ranges in changes.items() if path.is_file()}
+
+
+@contextlib.contextmanager
+def staged_snapshot(root: Path, files: Iterable[Path]) -> Iterator[Path]:
+    """把这些文件在暂存区中的内容导出到临时目录（相对 root 的路径不变），退出时删除"""
+    root = Path(root).resolve()
+    rels = [Path(f).resolve().relative_to(root).as_posix() for f in files]
+    with tempfile.TemporaryDirectory(prefix='staged-') as tmp:
+        if rels:
+            _git(root, 'checkout-index', f'--prefix={tmp}/', '--', *rels)
+        yield Path(tmp)
+
+
+def overlaps(spans: Iterable[Sequence[int]], ranges: LineRanges) -> bool:
+    """任一 [start, end] 区间与改动区间相交（ranges 为 None 时总是 True）"""
+    if ranges is None:
+        return True
+    return any(a <= end and start <= b for a, b in spans for start, end in ranges)
+
+
+def add_diff_arguments(parser):
+    """为脚本添加 --since / --staged 参数"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--since', metavar='REF',
+                       help="只处理相对 REF（与 HEAD 的合并基点）改动过的文件和行")
+    group.add_argument('--staged', action='store_true', help="只处理暂存区中改动的文件和行")
+
+
+def from_args(args, root: Path, dirs: Sequence[str] = (),
+              snapshot: bool = False) -> Optional[Dict[Path, LineRanges]]:
+    """未指定 --since / --staged 时返回 None（处理全部文件）；snapshot 见 changed_lines"""
+    if not args.since and not args.staged:
+        return None
+    return changed_lines(root, since=args.since, staged=args.staged, paths=dirs, snapshot=snapshot)
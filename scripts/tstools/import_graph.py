@@ -0,0 +1,653 @@
+"""
+TS/TSX 导入图与 dynamic() 拆分建议
+
+从 app/ 下的页面和路由出发解析完整的导入图（含 tsconfig.json 中 paths 的 @/* 等别名），
+对每个页面（page.tsx 连同各级目录的 layout / template / loading / error / not-found）
+和 API 路由（route.ts）计算静态导入的传递闭包及其字节数：
+
+- 页面的首屏字节只算会发到浏览器的部分：从 'use client' 模块开始的静态闭包，服务端组件不计
+- 路由计算全部静态依赖（冷启动时要加载的代码）
+
+某个导入改成 dynamic() / import() 后入口能少加载的字节，等于导入图上被该模块支配
+（入口出发的每条路径都经过它）的模块字节之和。候选只取直接挂在入口文件下的支配子树，
+更深的模块已经计入上层候选。
+
+import type、typeof import() 等纯类型导入不算依赖；已有的 import() / dynamic() 不计入首屏。
+没有安装的 npm 包大小未知按 0 计，可以另外提供（见 analyze-imports.py 的 --package-sizes）。
+字节数为源码大小，用于排序和版本间对比，不等于压缩后的产物大小。
+"""
+
+import json
+import os
+import posixpath
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from tstools import fileio, profiling
+from tstools.result_cache import ResultCache, content_digest, rules_fingerprint
+from tstools.scan_engine import SKIP_DIRS, ScanStats, scan_files
+from tstools.ts_lexer import IDENT, STRING, TEMPLATE, Token, tokenize_all
+
+APP_DIR = 'app'
+
+# 依次查找的 TypeScript / JavaScript 配置
+TSCONFIG_FILES = ('tsconfig.json', 'jsconfig.json')
+
+# 解析模块名时依次尝试的扩展名
+RESOLVE_EXTENSIONS = ('.tsx', '.ts', '.jsx', '.js', '.mjs', '.json')
+
+# 需要分析导入语句的扩展名；其余（.json、.css 等）作为没有依赖的叶子模块
+PARSED_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs', '.cjs')
+
+# 入口类型
+PAGE = 'page'
+ROUTE = 'route'
+
+# 页面所在目录及各级上层目录中与页面一起加载的文件
+SEGMENT_FILES = ('layout', 'template', 'loading', 'error', 'not-found')
+
+# 导入方式
+STATIC = 'static'
+DYNAMIC = 'dynamic'
+
+# npm 包在图中的节点名前缀
+PACKAGE_PREFIX = 'npm:'
+
+# 参与解析的实现，任何一个变化都会使缓存失效
+RULE_SOURCES = [
+    Path(__file__).resolve(),
+    Path(__file__).resolve().parent / 'ts_lexer.py',
+]
+
+# 支配树的虚拟根
+_START = ''
+
+# import('x').then(...) 是运行时导入，import('x').Foo 是类型引用
+_PROMISE_METHODS = {'then', 'catch', 'finally'}
+
+# 导入 / 导出子句中除标识符外允许出现的符号
+_CLAUSE_PUNCT = {',', '*', '{', '}'}
+
+
+class Import(NamedTuple):
+    spec: str       # 模块名，如 @/components/ui/button
+    kind: str       # STATIC / DYNAMIC
+    line: int
+
+
+class Module(NamedTuple):
+    path: str       # 相对项目根目录；npm 包为 npm:<包名>
+    size: int
+    client: bool    # 有 'use client' 指令
+    imports: List[Import]
+
+
+class Entry(NamedTuple):
+    url: str
+    kind: str           # PAGE / ROUTE
+    path: str
+    roots: List[str]    # 入口文件及一起加载的 layout 等，按目录层级排序
+
+
+class Candidate(NamedTuple):
+    module: str
+    bytes: int          # 改为动态导入后入口少加载的字节数
+    modules: int        # 其中包含的模块数
+    sites: List[str]    # 导入它的位置 path:line
+
+
+class EntryWeight(NamedTuple):
+    url: str
+    kind: str
+    path: str
+    roots: List[str]
+    modules: int            # 静态闭包的模块数
+    bytes: int
+    client_modules: int     # 页面发到浏览器的模块数（路由为 0）
+    client_bytes: int
+    dynamic: int            # 闭包中已有的动态导入数
+    candidates: List[Candidate]
+
+
+# ---------------------------------------------------------------------------
+# 导入语句
+
+def _string_value(tok: Token) -> Optional[str]:
+    if tok.kind in (STRING, TEMPLATE):
+        return tok.value[1:-1]
+    return None
+
+
+def _module_specifier(tokens: Sequence[Token], start: int, depth: int) -> Tuple[int, Optional[str]]:
+    """跳过导入 / 导出子句，返回 (from 的下标, 模块名)；不是 from 子句时返回 (-1, None)"""
+    for k in range(start, len(tokens)):
+        tok = tokens[k]
+        if tok.depth > depth:
+            continue
+        if tok.kind == IDENT:
+            if tok.value == 'from' and k + 1 < len(tokens):
+                spec = _string_value(tokens[k + 1])
+                if spec is not None:
+                    return k, spec
+            if tok.value in ('import', 'export') and k > start:
+                break
+        elif tok.value not in _CLAUSE_PUNCT:
+            break
+    return -1, None
+
+
+def _type_only(tokens: Sequence[Token], start: int, end: int, depth: int) -> bool:
+    """子句 tokens[start:end] 只导入类型：import type ...，或 { type A, type B }"""
+    first = tokens[start]
+    if first.value == 'type' and tokens[start + 1].value not in (',', 'from'):
+        return True
+    if first.value != '{':
+        return False       # 有默认导入或命名空间导入
+    names = 0
+    expect = True
+    for k in range(start + 1, end):
+        tok = tokens[k]
+        if tok.depth != depth + 1:
+            continue
+        if tok.value == ',':
+            expect = True
+        elif expect:
+            expect = False
+            names += 1
+            nxt = tokens[k + 1]
+            if tok.value != 'type' or nxt.kind != IDENT or nxt.value == 'as':
+                return False
+    return names > 0
+
+
+def _import_at(tokens: Sequence[Token], i: int) -> Optional[Import]:
+    n = len(tokens)
+    tok = tokens[i]
+    if i + 1 >= n:
+        return None
+    nxt = tokens[i + 1]
+    if nxt.value == '(':
+        if i and tokens[i - 1].value == 'typeof':
+            return None
+        spec = _string_value(tokens[i + 2]) if i + 2 < n else None
+        if spec is None:
+            return None    # 模块名是变量，无法静态解析
+        k = i + 3
+        while k < n and not (tokens[k].value == ')' and tokens[k].depth == nxt.depth):
+            k += 1
+        if k + 2 < n and tokens[k + 1].value == '.' and tokens[k + 2].value not in _PROMISE_METHODS:
+            return None
+        return Import(spec, DYNAMIC, tok.line)
+    spec = _string_value(nxt)
+    if spec is not None:
+        return Import(spec, STATIC, tok.line)        # import './globals.css'
+    if nxt.value == '.':
+        return None        # import.meta
+    k, spec = _module_specifier(tokens, i + 1, tok.depth)
+    if spec is None or _type_only(tokens, i + 1, k, tok.depth):
+        return None
+    return Import(spec, STATIC, tok.line)
+
+
+def _export_from(tokens: Sequence[Token], i: int) -> Optional[Import]:
+    tok = tokens[i]
+    j = i + 1
+    if j < len(tokens) and tokens[j].value == 'type':
+        j += 1
+    if j >= len(tokens) or tokens[j].value not in ('*', '{'):
+        return None
+    k, spec = _module_specifier(tokens, i + 1, tok.depth)
+    if spec is None or _type_only(tokens, i + 1, k, tok.depth):
+        return None
+    return Import(spec, STATIC, tok.line)
+
+
+def _require_at(tokens: Sequence[Token], i: int) -> Optional[Import]:
+    if i + 3 >= len(tokens) or tokens[i + 1].value != '(' or tokens[i + 3].value != ')':
+        return None
+    spec = _string_value(tokens[i + 2])
+    return Import(spec, STATIC, tokens[i].line) if spec is not None else None
+
+
+_HANDLERS = {'import': _import_at, 'export': _export_from, 'require': _require_at}
+
+
+def is_client_module(tokens: Sequence[Token]) -> bool:
+    """
+    文件中有 'use client' 指令
+
+    项目里有些文件被历史脚本把指令挪到了 import 之后，
+    所以顶层独立成句的 'use client'（前面是文件开头、; 、} 或 import 的模块名）都算。
+    """
+    for i, tok in enumerate(tokens):
+        if tok.kind != STRING or tok.depth or tok.value[1:-1] != 'use client':
+            continue
+        prev = tokens[i - 1] if i else None
+        if prev is None or prev.value in (';', '}') or prev.kind == STRING:
+            return True
+    return False
+
+
+def parse_imports(tokens: Sequence[Token]) -> List[Import]:
+    """import / export ... from / import() / require() 引用的模块，按出现顺序"""
+    found = []
+    for i, tok in enumerate(tokens):
+        handler = _HANDLERS.get(tok.value) if tok.kind == IDENT else None
+        if handler is None or (i and tokens[i - 1].value == '.'):
+            continue
+        item = handler(tokens, i)
+        if item is not None:
+            found.append(item)
+    return found
+
+
+def parse_module(content: str) -> Tuple[bool, List[Import]]:
+    """返回 ('use client', 导入列表)"""
+    tokens = tokenize_all(content)
+    return is_client_module(tokens), parse_imports(tokens)
+
+
+# ---------------------------------------------------------------------------
+# 模块解析
+
+def read_jsonc(path: Path) -> dict:
+    """读取允许注释和尾逗号的 JSON（tsconfig.json）；不是合法 UTF-8 时警告并按空配置处理"""
+    try:
+        text = path.read_text(encoding='utf-8')
+    except UnicodeDecodeError as e:
+        fileio.warn_invalid(path, e)
+        return {}
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    text = re.sub(r'"(?:[^"\\]|\\.)*"|//[^\n]*|/\*[\s\S]*?\*/',
+                  lambda m: m.group() if m.group().startswith('"') else '', text)
+    return json.loads(re.sub(r',(\s*[}\]])', r'\1', text))
+
+
+def package_name(spec: str) -> str:
+    """react-dom/client -> react-dom，@radix-ui/react-tabs/dist -> @radix-ui/react-tabs"""
+    parts = spec.split('/')
+    return '/'.join(parts[:2]) if spec.startswith('@') and len(parts) > 1 else parts[0]
+
+
+class Resolver:
+    """按 tsconfig 的 baseUrl / paths 和扩展名顺序把模块名解析为项目内的文件"""
+
+    def __init__(self, root: Path, config: Optional[Path] = None):
+        self.root = Path(root)
+        self.config = config or next((self.root / name for name in TSCONFIG_FILES
+                                      if (self.root / name).is_file()), None)
+        self.base_url: Optional[str] = None
+        self.aliases: List[Tuple[str, List[str]]] = []
+        self._files: Dict[str, Optional[str]] = {}
+        if self.config is None:
+            return
+        options = read_jsonc(self.config).get('compilerOptions', {})
+        base = self.config.parent / options.get('baseUrl', '.')
+        if 'baseUrl' in options:
+            self.base_url = self._relative(base)
+        for pattern, targets in options.get('paths', {}).items():
+            self.aliases.append((pattern, [self._relative(base / target) for target in targets]))
+        # 与 TypeScript 一致：前缀最长的模式优先
+        self.aliases.sort(key=lambda item: -len(item[0].partition('*')[0]))
+
+    def _relative(self, path: Path) -> str:
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+    def _file(self, base: str) -> Optional[str]:
+        if base not in self._files:
+            candidates = [base] + [base + ext for ext in RESOLVE_EXTENSIONS] + \
+                [f"{base}/index{ext}" for ext in RESOLVE_EXTENSIONS]
+            self._files[base] = next((c for c in candidates
+                                      if not c.startswith('../') and (self.root / c).is_file()), None)
+        return self._files[base]
+
+    def resolve(self, spec: str, importer: str) -> Optional[str]:
+        """返回项目内的相对路径、npm:<包名>，或 None（别名 / 相对路径找不到文件）"""
+        if spec.startswith('.'):
+            return self._file(posixpath.normpath(posixpath.join(posixpath.dirname(importer), spec)))
+        for pattern, targets in self.aliases:
+            prefix, star, suffix = pattern.partition('*')
+            if star:
+                if len(spec) < len(prefix) + len(suffix) or not spec.startswith(prefix) \
+                        or not spec.endswith(suffix):
+                    continue
+                rest = spec[len(prefix):len(spec) - len(suffix)]
+            elif spec != pattern:
+                continue
+            else:
+                rest = ''
+            for target in targets:
+                found = self._file(posixpath.normpath(target.replace('*', rest)))
+                if found is not None:
+                    return found
+            return None
+        if self.base_url is not None:
+            found = self._file(posixpath.normpath(posixpath.join(self.base_url, spec)))
+            if found is not None:
+                return found
+        return PACKAGE_PREFIX + package_name(spec)
+
+
+# ---------------------------------------------------------------------------
+# 导入图
+
+class Graph:
+    """模块及其解析后的导入"""
+
+    def __init__(self):
+        self.modules: Dict[str, Module] = {}
+        self.edges: Dict[str, List[Tuple[str, Import]]] = {}
+        self.unresolved: List[Tuple[str, Import]] = []
+
+    def deps(self, path: str, kind: str = STATIC) -> List[str]:
+        return [target for target, item in self.edges.get(path, ()) if item.kind == kind]
+
+    def closure(self, roots: Iterable[str]) -> Set[str]:
+        """静态导入的传递闭包（含 roots）"""
+        seen = set()
+        stack = list(roots)
+        while stack:
+            path = stack.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            stack.extend(self.deps(path))
+        return seen
+
+    def client_boundaries(self, roots: Iterable[str]) -> Set[str]:
+        """从服务端组件出发，第一层 'use client' 模块"""
+        seen = set()
+        boundaries = set()
+        stack = list(roots)
+        while stack:
+            path = stack.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            module = self.modules.get(path)
+            if module is not None and module.client:
+                boundaries.add(path)
+            else:
+                stack.extend(self.deps(path))
+        return boundaries
+
+    def size(self, paths: Iterable[str]) -> int:
+        return sum(self.modules[p].size for p in paths if p in self.modules)
+
+
+def _parse_worker(task: Tuple[Path, Optional[str]]) -> Tuple[int, tuple]:
+    """
+    读取并分析一个模块（进程池worker）
+
+    task 为 (文件路径, 缓存中的内容哈希)；返回 (字节数, (内容哈希, 分析结果, 是否沿用缓存))。
+    """
+    filepath, known_digest = task
+    try:
+        with profiling.phase('read'):
+            with open(filepath, 'rb') as f:
+                data = f.read()
+    except OSError as e:
+        print(f"读取文件失败 {filepath}: {e}")
+        return 0, (None, None, False)
+    digest = content_digest(data)
+    if digest == known_digest:
+        return len(data), (digest, None, True)
+    client, imports = False, []
+    if filepath.name.endswith(PARSED_EXTENSIONS):
+        # 不是合法 UTF-8 的模块只计大小，不解析其导入
+        try:
+            content = str(data, 'utf-8')
+        except UnicodeDecodeError as e:
+            fileio.warn_invalid(filepath, e)
+            content = ''
+        with profiling.phase('parse'):
+            client, imports = parse_module(content)
+    return len(data), (digest, {'client': client, 'imports': [list(item) for item in imports]}, False)
+
+
+def _module(path: str, size: int, result: Optional[dict]) -> Module:
+    if result is None:
+        return Module(path, size, False, [])
+    return Module(path, size, result['client'], [Import(*item) for item in result['imports']])
+
+
+def _load_wave(root: Path, paths: Sequence[str], cache: Optional[ResultCache], workers: Optional[int],
+               stats: ScanStats, budget: Optional[float]) -> List[Module]:
+    """分析一批模块：stat 未变的直接取缓存，其余进入进程池"""
+    modules = {}
+    tasks = []
+    file_stats = {}
+    for rel in paths:
+        filepath = root / rel
+        st = filepath.stat()
+        entry = cache.lookup(rel, st) if cache is not None else None
+        if entry is not None:
+            stats.cached += 1
+            modules[rel] = _module(rel, entry['size'], entry['result'])
+            continue
+        file_stats[rel] = st
+        tasks.append((filepath, cache.digest_of(rel) if cache is not None else None))
+
+    for (filepath, _), (digest, result, reused) in scan_files(tasks, _parse_worker, workers=workers,
+                                                         stats=stats, budget=budget):
+        rel = filepath.relative_to(root).as_posix()
+        if reused:
+            result = cache.get(rel)['result']
+        if cache is not None and digest is not None:
+            cache.store(rel, file_stats[rel], digest, result, reused=reused)
+        modules[rel] = _module(rel, file_stats[rel].st_size, result)
+    # 超时跳过的文件按没有依赖的模块处理
+    return [modules.get(rel) or _module(rel, file_stats[rel].st_size, None) for rel in paths]
+
+
+def build_graph(root: Path, roots: Iterable[str], resolver: Resolver, cache: Optional[ResultCache] = None,
+                package_sizes: Optional[Dict[str, int]] = None, workers: Optional[int] = None,
+                stats: Optional[ScanStats] = None, budget: Optional[float] = None) -> Graph:
+    """从 roots 出发逐层解析可达的全部模块（含动态导入的目标）"""
+    root = Path(root).resolve()
+    stats = stats if stats is not None else ScanStats()
+    package_sizes = package_sizes or {}
+    graph = Graph()
+    frontier = sorted(set(roots))
+    queued = set(frontier)
+    while frontier:
+        wave = _load_wave(root, frontier, cache, workers, stats, budget)
+        frontier = []
+        with profiling.phase('resolve'):
+            for module in wave:
+                graph.modules[module.path] = module
+                edges = graph.edges[module.path] = []
+                for item in module.imports:
+                    target = resolver.resolve(item.spec, module.path)
+                    if target is None:
+                        graph.unresolved.append((module.path, item))
+                        continue
+                    edges.append((target, item))
+                    if target.startswith(PACKAGE_PREFIX):
+                        name = target[len(PACKAGE_PREFIX):]
+                        graph.modules.setdefault(target, Module(target, package_sizes.get(name, 0), False, []))
+                    elif target not in queued:
+                        queued.add(target)
+                        frontier.append(target)
+        frontier.sort()
+    return graph
+
+
+# ---------------------------------------------------------------------------
+# 入口
+
+def _segment_file(root: Path, directory: str, name: str) -> Optional[str]:
+    for ext in PARSED_EXTENSIONS:
+        rel = f"{directory}/{name}{ext}"
+        if (root / rel).is_file():
+            return rel
+    return None
+
+
+def entry_url(directory: str, app_dir: str = APP_DIR) -> str:
+    """app/(shop)/products/[id] -> /products/[id]：路由组和 @并行路由不出现在URL中"""
+    parts = directory.split('/')[len(app_dir.split('/')):]
+    return '/' + '/'.join(p for p in parts if not (p.startswith('(') and p.endswith(')')) and
+                          not p.startswith('@'))
+
+
+def discover_entries(root: Path, app_dir: str = APP_DIR) -> List[Entry]:
+    """app 下全部 page / route 文件（跳过 _ 开头的私有目录），按路径排序"""
+    root = Path(root).resolve()
+    entries = []
+    for current, subdirs, filenames in os.walk(root / app_dir):
+        subdirs[:] = sorted(d for d in subdirs if d not in SKIP_DIRS and not d.startswith('_'))
+        directory = Path(current).relative_to(root).as_posix()
+        for kind in (PAGE, ROUTE):
+            path = _segment_file(root, directory, kind)
+            if path is None:
+                continue
+            roots = []
+            if kind == PAGE:
+                parts = directory.split('/')
+                for n in range(len(app_dir.split('/')), len(parts) + 1):
+                    ancestor = '/'.join(parts[:n])
+                    roots.extend(filter(None, (_segment_file(root, ancestor, name) for name in SEGMENT_FILES)))
+            entries.append(Entry(entry_url(directory, app_dir), kind, path, roots + [path]))
+    return sorted(entries, key=lambda e: e.path)
+
+
+# ---------------------------------------------------------------------------
+# 支配树与拆分建议
+
+def dominators(succ: Dict[str, List[str]]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    以 _START 为根的直接支配者（Cooper-Harvey-Kennedy 迭代算法）
+
+    返回 (节点 -> 直接支配者, 逆后序)。
+    """
+    order = []
+    seen = {_START}
+    stack = [(_START, iter(succ.get(_START, ())))]
+    while stack:
+        node, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            order.append(node)
+        elif child not in seen:
+            seen.add(child)
+            stack.append((child, iter(succ.get(child, ()))))
+    order.reverse()
+    index = {node: i for i, node in enumerate(order)}
+    preds: Dict[str, List[str]] = {node: [] for node in order}
+    for node in order:
+        for child in succ.get(node, ()):
+            preds[child].append(node)
+
+    idom = {_START: _START}
+
+    def intersect(a: str, b: str) -> str:
+        while a != b:
+            while index[a] > index[b]:
+                a = idom[a]
+            while index[b] > index[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for node in order[1:]:
+            new = None
+            for pred in preds[node]:
+                if pred in idom:
+                    new = pred if new is None else intersect(pred, new)
+            if idom.get(node) != new:
+                idom[node] = new
+                changed = True
+    return idom, order
+
+
+def _dominates(idom: Dict[str, str], node: str, path: str) -> bool:
+    while path in idom and path != _START:
+        if path == node:
+            return True
+        path = idom[path]
+    return False
+
+
+def _sites(graph: Graph, scope: Set[str], target: str, idom: Dict[str, str]) -> List[str]:
+    """导入 target 的位置（不含 target 自身子树里的循环引用）"""
+    return sorted({f"{path}:{item.line}" for path in scope for dep, item in graph.edges.get(path, ())
+                   if dep == target and item.kind == STATIC and not _dominates(idom, target, path)})
+
+
+def analyze_entry(graph: Graph, entry: Entry, min_bytes: int = 0, top: int = 0) -> EntryWeight:
+    """入口的闭包大小和按可省字节排序的拆分候选（top 为 0 时不限个数）"""
+    closure = graph.closure(entry.roots)
+    if entry.kind == PAGE:
+        starts = graph.client_boundaries(entry.roots)
+        nodes = graph.closure(starts)
+    else:
+        starts = set(entry.roots)
+        nodes = closure
+    succ = {_START: sorted(starts)}
+    for path in nodes:
+        succ[path] = sorted(set(graph.deps(path)))
+    idom, order = dominators(succ)
+
+    subtree = {node: (graph.modules[node].size if node in graph.modules else 0, 1) for node in order}
+    for node in reversed(order[1:]):
+        size, count = subtree[node]
+        parent = subtree[idom[node]]
+        subtree[idom[node]] = (parent[0] + size, parent[1] + count)
+
+    roots = set(entry.roots)
+    candidates = []
+    for node in order[1:]:
+        if node in roots or (idom[node] != _START and idom[node] not in roots):
+            continue
+        size, count = subtree[node]
+        if size and size >= min_bytes:
+            candidates.append(Candidate(node, size, count, _sites(graph, closure, node, idom)))
+    candidates.sort(key=lambda c: (-c.bytes, c.module))
+    if top:
+        candidates = candidates[:top]
+
+    client = nodes if entry.kind == PAGE else set()
+    return EntryWeight(
+        url=entry.url, kind=entry.kind, path=entry.path, roots=entry.roots,
+        modules=len(closure), bytes=graph.size(closure),
+        client_modules=len(client), client_bytes=graph.size(client),
+        dynamic=sum(len(graph.deps(path, DYNAMIC)) for path in closure),
+        candidates=candidates,
+    )
+
+
+def analyze_entries(graph: Graph, entries: Sequence[Entry], min_bytes: int = 0, top: int = 0) -> List[EntryWeight]:
+    with profiling.phase('analyze'):
+        return [analyze_entry(graph, entry, min_bytes, top) for entry in entries]
+
+
+def rank_candidates(weights: Iterable[EntryWeight]) -> List[dict]:
+    """汇总各页面的候选：同一模块在多个页面的可省字节相加"""
+    ranked: Dict[str, dict] = {}
+    for weight in weights:
+        if weight.kind != PAGE:
+            continue
+        for candidate in weight.candidates:
+            item = ranked.setdefault(candidate.module, {
+                'module': candidate.module, 'bytes': 0, 'max_bytes': 0, 'pages': [], 'sites': set(),
+            })
+            item['bytes'] += candidate.bytes
+            item['max_bytes'] = max(item['max_bytes'], candidate.bytes)
+            item['pages'].append(weight.url)
+            item['sites'].update(candidate.sites)
+    for item in ranked.values():
+        item['sites'] = sorted(item['sites'])
+    return sorted(ranked.values(), key=lambda item: (-item['bytes'], item['module']))
+
+
+def graph_cache(path: Path, rebuild: bool = False) -> ResultCache:
+    """导入解析结果的增量缓存"""
+    return ResultCache(path, rules_fingerprint(RULE_SOURCES), rebuild=rebuild)
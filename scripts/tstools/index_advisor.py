@@ -0,0 +1,564 @@
+"""
+Prisma 索引建议
+
+从源码中挖掘查询形状，与 schema.prisma 中已有的索引对照：
+
+- Prisma 调用 prisma.<model>.findMany / findFirst / count / groupBy / update ... 的
+  where（等值：字面量、equals、in；范围：gt / lt / contains ...）、orderBy、cursor 和 groupBy 的 by。
+  where 是本地变量时（const where: any = {}; where.status = x）合并声明和后续赋值里的字段
+- Supabase 查询构造器 .from('table').eq('col', v).gte(...).order(...) 的过滤和排序列
+- 原始SQL（见 sql_catalog.py）中 WHERE / JOIN ON 的比较、ORDER BY 和 GROUP BY 引用的列
+
+每处查询的权重 = 所在位置的权重（面向用户的路由 > lib 中的共用代码 > 管理后台，可用 JSON 文件覆盖）
+× 每个请求的执行次数（在循环中时取 n_plus_one.py 的估算）。
+
+候选索引按 等值列 + 排序列 / 第一个范围列 的顺序组成；已有索引（含主键和唯一约束）的
+最左前缀能覆盖的不再建议，被更长候选覆盖的合并。没有任何查询用到首列的普通 @@index 报告为未使用，
+首列序列是另一个索引前缀的报告为冗余。
+"""
+
+import difflib
+import fnmatch
+import functools
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from tstools import fileio, n_plus_one, profiling
+from tstools.prisma_schema import Index, Model, Schema, index_name, quote_ident
+from tstools.scan_engine import ScanStats, iter_source_files, scan_files
+from tstools.sql_catalog import SqlTemplate, extract_templates
+from tstools.ts_lexer import IDENT, STRING, Token, match_brackets, split_args, statement_end, tokenize_all
+
+# bot 中的查询也会用到索引
+SCAN_DIRS = ['app', 'lib', 'bot']
+
+# 没有 where 的操作
+_UNFILTERED_OPS = {'create', 'createMany'}
+
+# where 中的条件运算符
+EQUALITY_OPERATORS = {'equals', 'in'}
+RANGE_OPERATORS = {'gt', 'gte', 'lt', 'lte', 'not', 'notIn', 'contains', 'startsWith', 'endsWith',
+                   'has', 'hasSome', 'hasEvery', 'mode', 'search'}
+_SKIP_KEYS = {'OR', 'NOT', 'some', 'every', 'none', 'is', 'isNot'}
+
+# 位置权重：面向用户的 API 路由、lib 中的共用代码、管理后台路由、其他
+WEIGHT_PUBLIC = 10.0
+WEIGHT_LIB = 5.0
+WEIGHT_ADMIN = 1.0
+WEIGHT_OTHER = 1.0
+
+# 候选索引最多的列数
+MAX_COLUMNS = 3
+
+SOURCE_PRISMA = 'prisma'
+SOURCE_SQL = 'sql'
+SOURCE_SUPABASE = 'supabase'
+
+# Supabase 查询构造器 .from('table').eq('col', v).order('col') 的过滤方法
+SUPABASE_EQUALITY = {'eq', 'in', 'is', 'match'}
+SUPABASE_RANGE = {'neq', 'gt', 'gte', 'lt', 'lte', 'like', 'ilike', 'contains', 'containedBy', 'textSearch'}
+
+# 解码前的字节预筛：Prisma 客户端变量名或 Supabase 的 .from(
+_PREFILTER_BYTES = fileio.encode_literals(sorted(n_plus_one.CLIENT_NAMES) + ['.from('])
+
+
+class QueryShape(NamedTuple):
+    path: str
+    line: int
+    model: str                  # 模型名（schema.prisma 中的名称）
+    op: str                     # Prisma 操作，原始SQL为 $queryRaw 等
+    source: str                 # 'prisma' / 'sql'
+    equality: List[str]         # Prisma 字段名，按出现顺序
+    ranges: List[str]
+    order: List[str]            # orderBy / cursor / ORDER BY
+    grouped: List[str]          # groupBy 的 by / GROUP BY：只用于判断索引是否被用到
+    unknown: List[str]          # schema 中不存在的字段
+    weight: float
+
+    @property
+    def id(self) -> str:
+        return f"{self.path}:{self.line}"
+
+    def candidate(self) -> List[str]:
+        """等值列 + 排序列；没有排序时加第一个范围列"""
+        columns = list(self.equality)
+        tail = self.order or self.ranges[:1]
+        columns.extend(f for f in tail if f not in columns)
+        return columns[:MAX_COLUMNS]
+
+
+class Proposal(NamedTuple):
+    model: str
+    fields: List[str]
+    equality: int               # 前几列是等值列（顺序可调换）
+    weight: float
+    sites: List[str]            # 受益的查询位置
+
+    def index(self) -> Index:
+        return Index(list(self.fields), False, None, 0)
+
+
+def location_weight(rel_path: str, overrides: Optional[Dict[str, float]] = None) -> float:
+    """
+    按文件位置的默认权重；overrides 为 {模式: 权重}，模式按 fnmatch 匹配路由 URL 或文件路径，
+    如 {"/api/lottery/*": 50, "app/api/admin/*": 0.5}，多个命中时取最长的模式
+    """
+    url = n_plus_one.route_of(rel_path)
+    if overrides:
+        matched = [pattern for pattern in overrides
+                   if fnmatch.fnmatch(rel_path, pattern) or (url and fnmatch.fnmatch(url, pattern))]
+        if matched:
+            return float(overrides[max(matched, key=len)])
+    if url is None:
+        return WEIGHT_LIB if rel_path.startswith('lib/') else WEIGHT_OTHER
+    return WEIGHT_ADMIN if url.startswith('/api/admin/') else WEIGHT_PUBLIC
+
+
+# --- Prisma 调用 ---
+
+class _Miner:
+    """单个文件内 Prisma 调用的 where / orderBy / cursor 字段"""
+
+    def __init__(self, tokens: List[Token], pairs: Dict[int, int]):
+        self.tokens = tokens
+        self.pairs = pairs
+
+    def properties(self, open_idx: int) -> List[Tuple[str, int, int]]:
+        """对象字面量的顶层属性：[(键, 值起始, 值结束)]；简写 { id } 的值就是键本身"""
+        tokens = self.tokens
+        close = self.pairs.get(open_idx, -1)
+        props = []
+        for start, end in split_args(tokens, open_idx, close):
+            tok = tokens[start]
+            if tok.value == '...' and start + 1 < end:
+                props.extend(self.variable(start + 1, end))
+                continue
+            if tok.kind in (IDENT, STRING) and start + 1 < end and tokens[start + 1].value == ':':
+                key = tok.value.strip('\'"')
+                props.append((key, start + 2, end))
+            elif tok.kind == IDENT and end == start + 1:
+                props.append((tok.value, start, end))
+        return props
+
+    def variable(self, start: int, end: int) -> List[Tuple[str, int, int]]:
+        """值为本地变量时，按声明中的对象字面量和后续 name.key = value 赋值展开"""
+        tokens = self.tokens
+        if end - start != 1 or tokens[start].kind != IDENT:
+            return []
+        name = tokens[start].value
+        props = []
+        for k in range(start - 1, 0, -1):
+            tok = tokens[k]
+            if tok.kind != IDENT or tok.value != name or tokens[k - 1].value not in ('const', 'let', 'var'):
+                continue
+            eq = k + 1
+            while eq < start and tokens[eq].value != '=':
+                eq += 1
+            if eq + 1 < start and tokens[eq + 1].value == '{':
+                props.extend(self.properties(eq + 1))
+            for m in range(eq, start - 3):
+                if tokens[m].value == name and tokens[m + 1].value == '.' and tokens[m + 2].kind == IDENT \
+                        and tokens[m + 3].value == '=' and (m == 0 or tokens[m - 1].value != '.'):
+                    value_end = statement_end(tokens, m + 4)
+                    props.append((tokens[m + 2].value, m + 4, value_end if value_end > 0 else m + 5))
+            break
+        return props
+
+    def value_object(self, start: int) -> Optional[int]:
+        """值是对象字面量时返回 { 的下标"""
+        if self.tokens[start].value == '{' and start in self.pairs:
+            return start
+        return None
+
+    def where(self, start: int, end: int, model: Model, shape: dict):
+        props = self.properties(start) if self.value_object(start) is not None else self.variable(start, end)
+        for key, value_start, value_end in props:
+            if key in _SKIP_KEYS:
+                continue
+            if key == 'AND':
+                tok = self.tokens[value_start]
+                if tok.value == '[' and value_start in self.pairs:
+                    for item_start, item_end in split_args(self.tokens, value_start, self.pairs[value_start]):
+                        self.where(item_start, item_end, model, shape)
+                else:
+                    self.where(value_start, value_end, model, shape)
+                continue
+            inner = self.value_object(value_start)
+            if model.field(key) is None:
+                # 复合唯一键 userId_segmentType: { userId, segmentType }
+                if inner is not None and '_' in key:
+                    for sub, _, _ in self.properties(inner):
+                        _add(shape['equality'] if model.field(sub) else shape['unknown'], sub)
+                else:
+                    _add(shape['unknown'], key)
+                continue
+            if inner is None:
+                _add(shape['equality'], key)
+                continue
+            operators = {op for op, _, _ in self.properties(inner)}
+            if operators & EQUALITY_OPERATORS:
+                _add(shape['equality'], key)
+            elif operators & RANGE_OPERATORS:
+                _add(shape['ranges'], key)
+
+    def order_fields(self, start: int, end: int, model: Model, shape: dict, kind: str):
+        tokens = self.tokens
+        if tokens[start].value == '[' and start in self.pairs:
+            for item_start, item_end in split_args(tokens, start, self.pairs[start]):
+                if tokens[item_start].kind == STRING:
+                    # groupBy 的 by: ['userId']
+                    name = tokens[item_start].value[1:-1]
+                    _add(shape[kind] if model.field(name) else shape['unknown'], name)
+                else:
+                    self.order_fields(item_start, item_end, model, shape, kind)
+            return
+        props = self.properties(start) if self.value_object(start) is not None else self.variable(start, end)
+        for key, _, _ in props:
+            _add(shape[kind] if model.field(key) else shape['unknown'], key)
+
+    def shape(self, open_idx: int, model: Model) -> Optional[dict]:
+        tokens = self.tokens
+        close = self.pairs.get(open_idx, -1)
+        args = split_args(tokens, open_idx, close)
+        if not args or tokens[args[0][0]].value != '{':
+            return None
+        shape = {'equality': [], 'ranges': [], 'order': [], 'grouped': [], 'unknown': []}
+        for key, value_start, value_end in self.properties(args[0][0]):
+            if key == 'where':
+                self.where(value_start, value_end, model, shape)
+            elif key in ('orderBy', 'cursor'):
+                self.order_fields(value_start, value_end, model, shape, 'order')
+            elif key == 'by':
+                self.order_fields(value_start, value_end, model, shape, 'grouped')
+        return shape
+
+    def supabase(self, tables: Dict[str, Model]) -> Iterable[Tuple[int, Model, dict]]:
+        """.from('table') 之后链式调用中的过滤和排序列：(from 的下标, 模型, 形状)"""
+        tokens, pairs = self.tokens, self.pairs
+        for i, tok in enumerate(tokens[1:-2], 1):
+            if tok.value != 'from' or tokens[i - 1].value != '.' or tokens[i + 1].value != '(' \
+                    or tokens[i + 2].kind != STRING or i + 1 not in pairs:
+                continue
+            model = tables.get(tokens[i + 2].value[1:-1])
+            if model is None:
+                continue
+            columns = {f.column: f.name for f in model.fields}
+            shape = {'equality': [], 'ranges': [], 'order': [], 'grouped': [], 'unknown': []}
+            k = pairs[i + 1] + 1
+            while k + 2 < len(tokens) and tokens[k].value in ('.', '?.') and tokens[k + 1].kind == IDENT \
+                    and tokens[k + 2].value == '(' and k + 2 in pairs:
+                method = tokens[k + 1].value
+                args = split_args(tokens, k + 2, pairs[k + 2])
+                kind = 'equality' if method in SUPABASE_EQUALITY else 'ranges' if method in SUPABASE_RANGE \
+                    else 'order' if method == 'order' else None
+                if kind and args:
+                    first = tokens[args[0][0]]
+                    if first.kind == STRING:
+                        names = [first.value[1:-1]]
+                    elif method == 'match' and first.value == '{':
+                        names = [key for key, _, _ in self.properties(args[0][0])]
+                    else:
+                        names = []
+                    for name in names:
+                        field = columns.get(name) or (name if model.field(name) else None)
+                        _add(shape[kind] if field else shape['unknown'], field or name)
+                k = pairs[k + 2] + 1
+            yield i, model, shape
+
+
+def _add(items: List[str], name: str):
+    if name not in items:
+        items.append(name)
+
+
+def accessors(schema: Schema) -> Dict[str, str]:
+    """客户端访问名 -> 模型名（prisma.userSegments -> userSegments）"""
+    return {name[:1].lower() + name[1:]: name for name in schema.models}
+
+
+def mine_source(content: str, rel_path: str, schema: Schema, weight: float,
+                tokens: Optional[List[Token]] = None, pairs: Optional[Dict[int, int]] = None
+                ) -> Tuple[List[QueryShape], Dict[int, int]]:
+    """单个文件中 Prisma 和 Supabase 调用的查询形状，以及 行号 -> 每个请求的执行次数（循环中的 Prisma 查询）"""
+    if tokens is None:
+        tokens = tokenize_all(content)
+    if pairs is None:
+        pairs = match_brackets(tokens)
+    repeats = {site.line: site.per_request for site in n_plus_one.analyze_source(content, rel_path,
+                                                                                 tokens=tokens, pairs=pairs)}
+    models = accessors(schema)
+    miner = _Miner(tokens, pairs)
+    shapes = []
+    for index, accessor, op, open_idx in n_plus_one.find_queries(tokens):
+        if accessor not in models or op in _UNFILTERED_OPS:
+            continue
+        model = schema.models[models[accessor]]
+        found = miner.shape(open_idx, model)
+        if found is None or not any(found.values()):
+            continue
+        line = tokens[index].line
+        shapes.append(QueryShape(rel_path, line, model.name, op, SOURCE_PRISMA, found['equality'],
+                                 found['ranges'], found['order'], found['grouped'], found['unknown'],
+                                 weight * repeats.get(line, 1)))
+    for index, model, found in miner.supabase(schema.by_table()):
+        if any(found.values()):
+            shapes.append(QueryShape(rel_path, tokens[index].line, model.name, 'from', SOURCE_SUPABASE,
+                                     found['equality'], found['ranges'], found['order'], found['grouped'],
+                                     found['unknown'], weight))
+    return shapes, repeats
+
+
+# --- 原始SQL ---
+
+_SQL_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_SQL_TABLE_RE = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+("?\w+"?)(?:\s+(?:AS\s+)?(?!(?:ON|WHERE|JOIN|LEFT|RIGHT|INNER|'
+                           r'FULL|CROSS|GROUP|ORDER|LIMIT|SET|USING|VALUES|UNION|HAVING|WINDOW)\b)(\w+))?', re.I)
+# 只从词首开始匹配：从词中间的每个位置重新尝试时，长标识符上是平方级的回溯
+_SQL_COMPARE_RE = re.compile(r'(?<!\w)(?:(\w+)\.)?"?(\w+)"?\s*(=\s*ANY\b|=|<>|!=|<=|>=|<|>|\bNOT\s+IN\b|\bIN\b|'
+                             r'\bI?LIKE\b|\bBETWEEN\b|\bIS\b)', re.I)
+_SQL_LIST_RE = re.compile(r'\b(ORDER|GROUP)\s+BY\s+(.+?)(?=\bLIMIT\b|\bOFFSET\b|\bHAVING\b|\bORDER\b|\bWINDOW\b|'
+                          r'\bUNION\b|\)|;|$)', re.I | re.S)
+_SQL_RHS_RE = re.compile(r'=\s*(\w+)\."?(\w+)"?')
+_SQL_SET_RE = re.compile(r'\bSET\b.*?(?=\bWHERE\b|\bFROM\b|\bRETURNING\b|$)', re.I | re.S)
+_SQL_CASE_RE = re.compile(r'\bCASE\b.*?\bEND\b', re.I | re.S)
+_SQL_COLUMN_RE = re.compile(r'^(?:(\w+)\.)?"?(\w+)"?(?:\s+(?:ASC|DESC)\b.*)?$', re.I | re.S)
+_SQL_KEYWORDS = {'and', 'or', 'not', 'null', 'true', 'false', 'select', 'where', 'on', 'then', 'else', 'when',
+                 'case', 'end', 'interval', 'now', 'current_date', 'current_timestamp'}
+
+
+def _sql_columns(sql: str, tables: Dict[str, Model]) -> Dict[str, dict]:
+    """SQL 中按表归类的列：{模型名: {'equality': [...], 'ranges': [...], 'order': [...], 'grouped': [...]}}"""
+    text = _SQL_STRING_RE.sub("''", sql)
+    # SET 子句是赋值，CASE WHEN 在选择列表里，都不是过滤条件
+    text = _SQL_CASE_RE.sub(' ', _SQL_SET_RE.sub(' ', text))
+    aliases: Dict[str, Model] = {}
+    for m in _SQL_TABLE_RE.finditer(text):
+        model = tables.get(m.group(1).strip('"'))
+        if model is None:
+            continue
+        aliases[model.table] = model
+        if m.group(2):
+            aliases[m.group(2)] = model
+    referenced = {id(model): model for model in aliases.values()}
+
+    def owner(alias: Optional[str], column: str) -> Optional[Model]:
+        if alias:
+            return aliases.get(alias)
+        owners = [model for model in referenced.values() if any(f.column == column for f in model.fields)]
+        return owners[0] if len(owners) == 1 else None
+
+    result: Dict[str, dict] = {}
+
+    def add(alias, column, kind):
+        if column.lower() in _SQL_KEYWORDS or column.isdigit():
+            return
+        model = owner(alias, column)
+        if model is None:
+            return
+        field = next((f.name for f in model.fields if f.column == column), None)
+        if field is None:
+            return
+        entry = result.setdefault(model.name, {'equality': [], 'ranges': [], 'order': [], 'grouped': []})
+        _add(entry[kind], field)
+
+    for m in _SQL_COMPARE_RE.finditer(text):
+        operator = m.group(3).upper()
+        kind = 'equality' if operator.startswith('=') or operator in ('IN', 'IS') else 'ranges'
+        add(m.group(1), m.group(2), kind)
+    for m in _SQL_RHS_RE.finditer(text):
+        add(m.group(1), m.group(2), 'equality')
+    for m in _SQL_LIST_RE.finditer(text):
+        for item in m.group(2).split(','):
+            column = _SQL_COLUMN_RE.match(item.strip())
+            if column:
+                add(column.group(1), column.group(2), 'order' if m.group(1).upper() == 'ORDER' else 'grouped')
+    return result
+
+
+def sql_shapes(template: SqlTemplate, schema: Schema, weight: float) -> List[QueryShape]:
+    """原始SQL中每个表的查询形状"""
+    if template.sql is None:
+        return []
+    shapes = []
+    for model_name, found in _sql_columns(template.sql, schema.by_table()).items():
+        if not any(found.values()):
+            continue
+        # JOIN ON 两边的列都记为等值；范围列不再重复出现在等值列里
+        ranges = [f for f in found['ranges'] if f not in found['equality']]
+        shapes.append(QueryShape(template.path, template.line, model_name, template.method, SOURCE_SQL,
+                                 found['equality'], ranges, found['order'], found['grouped'], [], weight))
+    return shapes
+
+
+# --- 汇总 ---
+
+def _worker(path: Path, root: Path, schema: Schema, overrides: Optional[Dict[str, float]]
+            ) -> Tuple[int, List[QueryShape]]:
+    """进程池 worker"""
+    nbytes, content = fileio.read_if_contains(path, _PREFILTER_BYTES)
+    if content is None:
+        return nbytes, []
+    with profiling.phase('analyze'):
+        rel_path = path.relative_to(root).as_posix()
+        weight = location_weight(rel_path, overrides)
+        tokens = tokenize_all(content)
+        pairs = match_brackets(tokens)
+        shapes, repeats = mine_source(content, rel_path, schema, weight, tokens=tokens, pairs=pairs)
+        for template in extract_templates(content, rel_path, tokens=tokens, pairs=pairs):
+            shapes.extend(sql_shapes(template, schema, weight * repeats.get(template.line, 1)))
+        return nbytes, shapes
+
+
+def mine_shapes(root: Path, schema: Schema, dirs: Sequence[str] = SCAN_DIRS,
+                overrides: Optional[Dict[str, float]] = None, workers: Optional[int] = None,
+                stats: Optional[ScanStats] = None, budget: Optional[float] = None) -> List[QueryShape]:
+    """并行挖掘目录下全部查询形状（按路径、行号排序）"""
+    root = Path(root).resolve()
+    with profiling.phase('walk'):
+        paths = iter_source_files(root, dirs)
+    worker = functools.partial(_worker, root=root, schema=schema, overrides=overrides)
+    shapes = []
+    for _, found in scan_files(paths, worker, workers=workers, stats=stats, budget=budget):
+        shapes.extend(found)
+    return shapes
+
+
+def _covers(existing: Sequence[str], columns: Sequence[str], equality: int) -> bool:
+    """existing 的最左前缀能否满足 columns：前 equality 列顺序任意，其后按顺序"""
+    if len(existing) < len(columns):
+        return False
+    if set(existing[:equality]) != set(columns[:equality]):
+        return False
+    return list(existing[equality:len(columns)]) == list(columns[equality:])
+
+
+def existing_indexes(model: Model) -> List[Tuple[List[str], bool]]:
+    """模型上的全部索引（含主键）：[(字段, 是否唯一)]"""
+    found = [(list(model.id_fields), True)] if model.id_fields else []
+    found.extend((list(index.fields), index.unique) for index in model.indexes)
+    return found
+
+
+def is_covered(model: Model, columns: Sequence[str], equality: int, ordered: bool = True) -> bool:
+    """
+    已有索引是否满足候选列
+
+    唯一索引的列全部是等值条件时是点查询；没有排序要求时，
+    等值列被覆盖即可（剩下的范围列只在已经很小的结果上过滤）。
+    """
+    for fields, unique in existing_indexes(model):
+        if unique and fields and set(fields) <= set(columns[:equality]):
+            return True
+        if _covers(fields, columns, equality):
+            return True
+        if not ordered and equality and _covers(fields, columns[:equality], equality):
+            return True
+    return False
+
+
+def propose(schema: Schema, shapes: Iterable[QueryShape], min_weight: float = 0.0) -> List[Proposal]:
+    """未被已有索引覆盖的候选索引，按权重从高到低"""
+    grouped: Dict[Tuple[str, Tuple[str, ...]], dict] = {}
+    for shape in shapes:
+        columns = shape.candidate()
+        if not columns:
+            continue
+        equality = min(len(shape.equality), len(columns))
+        model = schema.models[shape.model]
+        if is_covered(model, columns, equality, ordered=bool(shape.order)):
+            continue
+        # 等值列顺序不影响可用性，统一按字段在模型中的顺序排列，便于合并
+        order = {f.name: i for i, f in enumerate(model.fields)}
+        columns = sorted(columns[:equality], key=lambda f: order.get(f, 0)) + columns[equality:]
+        entry = grouped.setdefault((shape.model, tuple(columns)),
+                                   {'equality': equality, 'weight': 0.0, 'sites': []})
+        entry['weight'] += shape.weight
+        entry['sites'].append(shape.id)
+
+    # 被更长候选的最左前缀覆盖的合并进去
+    keys = sorted(grouped, key=lambda k: -len(k[1]))
+    merged: Dict[Tuple[str, Tuple[str, ...]], dict] = {}
+    for key in keys:
+        entry = grouped[key]
+        target = next((other for other in merged if other[0] == key[0]
+                       and _covers(other[1], key[1], entry['equality'])), None)
+        if target is None:
+            merged[key] = dict(entry, sites=list(entry['sites']))
+        else:
+            merged[target]['weight'] += entry['weight']
+            merged[target]['sites'].extend(entry['sites'])
+    proposals = [Proposal(model, list(columns), entry['equality'], round(entry['weight'], 2),
+                          sorted(set(entry['sites'])))
+                 for (model, columns), entry in merged.items() if entry['weight'] >= min_weight]
+    proposals.sort(key=lambda p: (-p.weight, p.model, p.fields))
+    return proposals
+
+
+def limit_per_model(proposals: Sequence[Proposal], limit: int) -> Tuple[List[Proposal], List[Proposal]]:
+    """每个模型只保留权重最高的 limit 个建议（写入越多的表越要克制），其余返回为暂缓"""
+    kept, deferred = [], []
+    count: Dict[str, int] = {}
+    for proposal in proposals:
+        count[proposal.model] = count.get(proposal.model, 0) + 1
+        (kept if limit <= 0 or count[proposal.model] <= limit else deferred).append(proposal)
+    return kept, deferred
+
+
+def unused_indexes(schema: Schema, shapes: Iterable[QueryShape]) -> List[Tuple[Model, Index, str]]:
+    """[(模型, 索引, 'unused' | 'redundant')]：只检查普通 @@index，唯一约束不动"""
+    used: Dict[str, set] = {}
+    for shape in shapes:
+        used.setdefault(shape.model, set()).update(shape.equality, shape.ranges, shape.order, shape.grouped)
+    found = []
+    for model in schema.models.values():
+        plain = [index for index in model.indexes if not index.unique and index.fields]
+        unused = [index for index in plain if index.fields[0] not in used.get(model.name, ())]
+        # 冗余：是另一个保留下来的索引（含主键、唯一约束）的最左前缀
+        kept = [fields for fields, _ in existing_indexes(model)
+                if not any(index.fields == fields for index in unused)]
+        for index in plain:
+            if index in unused:
+                found.append((model, index, 'unused'))
+            elif any(fields != index.fields and fields[:len(index.fields)] == index.fields for fields in kept):
+                found.append((model, index, 'redundant'))
+    return found
+
+
+# --- 输出 ---
+
+def schema_patch(schema_text: str, schema: Schema, proposals: Sequence[Proposal],
+                 drop: Sequence[Tuple[Model, Index]] = (), filename: str = 'prisma/schema.prisma') -> Tuple[str, str]:
+    """(修改后的 schema 文本, unified diff)：新索引插在模型的 } 之前，删除的索引去掉对应行"""
+    lines = schema_text.splitlines(keepends=True)
+    inserts: Dict[int, List[str]] = {}
+    for proposal in proposals:
+        model = schema.models[proposal.model]
+        inserts.setdefault(model.end_line, []).append(f"  @@index([{', '.join(proposal.fields)}])\n")
+    removed = {index.line for _, index in drop}
+    out = []
+    for lineno, line in enumerate(lines, 1):
+        if lineno in inserts:
+            if out and out[-1].strip() and not out[-1].lstrip().startswith('@@'):
+                out.append('\n')
+            out.extend(inserts[lineno])
+        if lineno not in removed:
+            out.append(line)
+    patched = ''.join(out)
+    diff = ''.join(difflib.unified_diff(lines, patched.splitlines(keepends=True),
+                                        fromfile=f'a/{filename}', tofile=f'b/{filename}'))
+    return patched, diff
+
+
+def migration_sql(schema: Schema, proposals: Sequence[Proposal], drop: Sequence[Tuple[Model, Index]] = ()) -> str:
+    """与 prisma migrate 生成格式一致的迁移SQL"""
+    out = []
+    for model, index in drop:
+        out.append(f"-- DropIndex\nDROP INDEX {quote_ident(index_name(model, index))};\n")
+    for proposal in proposals:
+        model = schema.models[proposal.model]
+        index = proposal.index()
+        columns = ', '.join(quote_ident(c) for c in model.columns(index.fields))
+        out.append(f"-- CreateIndex\nCREATE INDEX {quote_ident(index_name(model, index))} "
+                   f"ON {quote_ident(model.table)}({columns});\n")
+    return '\n'.join(out)
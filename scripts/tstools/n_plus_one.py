@@ -0,0 +1,636 @@
+"""
+Prisma N+1 查询静态检测
+
+在循环中发出的 Prisma 查询（for / for...of / while，以及 .map / .forEach 等回调）：
+
+- 直接写在循环体里的 prisma.model.op(...) / tx.model.op(...) / $queryRaw 等
+- 循环里调用的本文件函数（函数声明、const f = async () => ...、类方法，按名称匹配，可多层）
+  中的查询，调用链记录在 via 中
+
+循环次数按被遍历的集合估算：来自 findMany 时取 take（字面量，或变量赋值里的默认值，
+如 parseInt(... || '20')），没有 take 的 findMany 视为无上限；数组字面量取元素个数；
+其余情况用默认值。每处查询每个请求发出的次数为调用链上所有循环次数之积。
+
+await 写在 for 循环里的查询逐个往返（串行），Promise.all(xs.map(async ...)) 中的查询并发发出
+但仍占用同样多的连接。按操作类型给出批量化写法：findMany + in、groupBy、createMany、
+updateMany / deleteMany，被遍历集合的模型在 schema.prisma 中有对应关系字段时建议 include。
+"""
+
+import functools
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from tstools import fileio, profiling
+from tstools.prisma_schema import Schema
+from tstools.route_permissions import local_bindings, method_entries, route_url
+from tstools.routes import API_DIR, ROUTE_FILENAME
+from tstools.scan_engine import ScanStats, iter_source_files, scan_files
+from tstools.sql_catalog import RAW_METHODS
+from tstools.ts_lexer import (IDENT, NUMBER, STRING, TEMPLATE, TEMPLATE_HEAD, Token,
+                              find_function_declarations, match_brackets, match_sequence, split_args,
+                              statement_end, tokenize_all)
+
+# 默认扫描的目录
+SCAN_DIRS = ['app', 'lib']
+
+# Prisma 客户端变量名（$transaction 回调中的 tx 也算）
+CLIENT_NAMES = {'prisma', 'tx', 'db', 'trx', 'prismaClient'}
+_CLIENT_BYTES = fileio.encode_literals(sorted(CLIENT_NAMES))
+
+READ_OPS = {'findUnique', 'findUniqueOrThrow', 'findFirst', 'findFirstOrThrow', 'findMany',
+            'count', 'aggregate', 'groupBy'}
+WRITE_OPS = {'create', 'createMany', 'update', 'updateMany', 'upsert', 'delete', 'deleteMany'}
+QUERY_OPS = READ_OPS | WRITE_OPS
+
+# 回调逐个元素执行的数组方法；reduce 的 async 回调通常 await 上一次的结果，按串行处理
+CALLBACK_METHODS = {'map', 'forEach', 'flatMap', 'filter', 'reduce', 'some', 'every', 'find', 'findIndex'}
+_SEQUENTIAL_CALLBACKS = {'reduce'}
+
+# 无法估算时的循环次数；findMany 没有 take 时的循环次数
+DEFAULT_ITERATIONS = 20
+UNBOUNDED_ITERATIONS = 100
+
+# 一处查询最多保留的调用链数（同一函数被多处调用时）
+_MAX_PATHS = 32
+
+_NOT_METHODS = {'if', 'for', 'while', 'switch', 'catch', 'function', 'return', 'constructor', 'super'}
+_METHOD_PREFIX = {'{', '}', ';', 'static', 'private', 'public', 'protected', 'async', 'override'}
+_DECLARATIONS = ('const', 'let', 'var')
+
+
+class Loop(NamedTuple):
+    kind: str            # 'for' / 'for-of' / 'while' / 'map' 等回调方法名
+    line: int
+    start: int           # 循环体（回调为实参列表）的起止 token 下标（含）
+    end: int
+    iterations: int
+    basis: str           # 估算依据
+    source: Optional[str]   # 被遍历集合来自 findMany 时的模型（客户端访问名，如 participations）
+
+
+class QuerySite(NamedTuple):
+    path: str
+    line: int
+    function: Optional[str]     # 查询所在函数
+    model: Optional[str]        # 客户端访问名；原始SQL为 None
+    op: str
+    key: Optional[str]          # where 的第一个字段
+    loops: List[dict]           # 由外到内：kind / line / iterations / basis / concurrent
+    via: List[dict]             # 调用链（由外到内）：function / line
+    methods: List[str]          # 能走到这里的 HTTP 方法
+    per_request: int            # 每个请求估计发出的查询数
+    round_trips: int            # 其中串行往返的次数
+    shape: str                  # 建议的批量化写法
+    suggestion: str
+
+    @property
+    def id(self) -> str:
+        return f"{self.path}:{self.line}"
+
+    def to_dict(self) -> dict:
+        return {'id': self.id, **self._asdict()}
+
+
+class _Function(NamedTuple):
+    name: str
+    start: int
+    end: int
+
+
+def relations(schema: Schema) -> Dict[str, Dict[str, str]]:
+    """客户端访问名 -> {关系字段: 目标模型的访问名}"""
+    accessor = {name: name[:1].lower() + name[1:] for name in schema.models}
+    return {accessor[model.name]: {f.name: accessor[f.type] for f in model.fields if f.type in accessor}
+            for model in schema.models.values()}
+
+
+def find_queries(tokens: Sequence[Token]) -> List[Tuple[int, Optional[str], str, int]]:
+    """
+    找出 Prisma 客户端调用：[(客户端 token 下标, 模型访问名, 操作, 实参起始下标)]
+
+    prisma.users.findMany( -> (i, 'users', 'findMany', '(' 的下标)；
+    原始SQL prisma.$queryRaw`...` / $queryRawUnsafe(...) 的模型为 None，实参起始为模板或 ( 的下标。
+    """
+    found = []
+    for i, tok in enumerate(tokens[:-3]):
+        if tok.kind != IDENT or tok.value not in CLIENT_NAMES:
+            continue
+        if i and tokens[i - 1].value in ('.', '?.') and not (i >= 2 and tokens[i - 2].value == 'this'):
+            continue
+        if tokens[i + 1].value != '.':
+            continue
+        method = tokens[i + 2].value
+        if method in RAW_METHODS and (tokens[i + 3].kind in (TEMPLATE, TEMPLATE_HEAD) or tokens[i + 3].value == '('):
+            found.append((i, None, method, i + 3))
+        elif match_sequence(tokens, i + 1, ('.', IDENT, '.', IDENT, '(')) and tokens[i + 4].value in QUERY_OPS:
+            found.append((i, method, tokens[i + 4].value, i + 5))
+    return found
+
+
+class _Analyzer:
+    """单个文件内的循环、查询和本地调用"""
+
+    def __init__(self, tokens: List[Token], pairs: Dict[int, int], default: int, unbounded: int):
+        self.tokens = tokens
+        self.pairs = pairs
+        self.openers = {close: open_ for open_, close in pairs.items()}
+        self.default = default
+        self.unbounded = unbounded
+        self.functions = self._functions()
+        self.names = {f.name for f in self.functions}
+        self._starts = {f.start for f in self.functions}
+        self.loops = list(self._loops())
+        self.calls = self._calls()
+
+    # --- 函数 ---
+
+    def _is_function_value(self, start: int, end: int) -> bool:
+        """const f = <value> 的值是否为函数（或 withXxx(async () => ...) 这样包装后的函数）"""
+        tokens = self.tokens
+        if start > end:
+            return False
+        k = start
+        if tokens[k].value == 'async':
+            k += 1
+        if k <= end and tokens[k].value == 'function':
+            return True
+        if k <= end and tokens[k].value == '(' and k in self.pairs:
+            after = self.pairs[k] + 1
+            if after <= end and tokens[after].value in ('=>', ':'):
+                return True
+        if k + 1 <= end and tokens[k].kind == IDENT and tokens[k + 1].value == '=>':
+            return True
+        # 包装函数：第一个实参是函数
+        if tokens[start].kind == IDENT and tokens[start].value not in ('await', 'new'):
+            k = start
+            while k + 2 <= end and tokens[k + 1].value == '.' and tokens[k + 2].kind == IDENT:
+                k += 2
+            if tokens[k].value in CALLBACK_METHODS or k + 1 > end or tokens[k + 1].value != '(':
+                return False
+            args = split_args(tokens, k + 1, self.pairs.get(k + 1, -1))
+            return bool(args) and self._is_function_value(args[0][0], args[0][1] - 1)
+        return False
+
+    def _functions(self) -> List[_Function]:
+        tokens, pairs = self.tokens, self.pairs
+        functions = [_Function(f.name, f.start, f.body_close)
+                     for f in find_function_declarations(tokens, pairs=pairs) if f.body_close > 0]
+        for name, spans in local_bindings(tokens, pairs, nested=True).items():
+            for start, end in spans:
+                if self._is_function_value(start, end):
+                    functions.append(_Function(name, start - 3, end))
+        # 类方法：[async] name(...) [: Type] { ... }
+        for i, tok in enumerate(tokens[1:-1], 1):
+            if tok.kind != IDENT or tok.value in _NOT_METHODS or tokens[i + 1].value != '(':
+                continue
+            if tokens[i - 1].value not in _METHOD_PREFIX:
+                continue
+            close = pairs.get(i + 1, -1)
+            if close < 0:
+                continue
+            k = close + 1
+            if k < len(tokens) and tokens[k].value == ':':
+                while k < len(tokens) and tokens[k].value != '{' and tokens[k].value != ';':
+                    k = pairs[k] + 1 if tokens[k].value in ('(', '[', '<') and k in pairs else k + 1
+                if k < len(tokens) and tokens[k].value == '{' and tokens[k - 1].value == ':':
+                    k = pairs.get(k, k) + 1   # 返回类型是对象字面量类型
+                    while k < len(tokens) and tokens[k].value not in ('{', ';'):
+                        k += 1
+            if k < len(tokens) and tokens[k].value == '{' and k in pairs:
+                functions.append(_Function(tok.value, i, pairs[k]))
+        return functions
+
+    def function_at(self, index: int) -> Optional[_Function]:
+        inner = None
+        for func in self.functions:
+            if func.start <= index <= func.end and (inner is None or func.start >= inner.start):
+                inner = func
+        return inner
+
+    def _calls(self) -> Dict[str, List[int]]:
+        """本地函数名 -> 调用处的 token 下标（含作为回调传给 map 等的引用）"""
+        tokens = self.tokens
+        calls: Dict[str, List[int]] = {}
+        for i, tok in enumerate(tokens[:-1]):
+            if tok.kind != IDENT or tok.value not in self.names:
+                continue
+            prev = tokens[i - 1].value if i else ''
+            if prev in ('function', 'const', 'let', 'var') or i in self._starts:
+                continue
+            if prev in ('.', '?.') and not (i >= 2 and tokens[i - 2].value == 'this'):
+                continue
+            nxt = tokens[i + 1].value
+            if nxt == '(' or nxt in (')', ',') and any(loop.start <= i <= loop.end and loop.kind in CALLBACK_METHODS
+                                                       for loop in self.loops):
+                calls.setdefault(tok.value, []).append(i)
+        return calls
+
+    # --- 循环 ---
+
+    def _loops(self):
+        tokens, pairs = self.tokens, self.pairs
+        n = len(tokens)
+        for i, tok in enumerate(tokens):
+            if tok.kind != IDENT:
+                continue
+            if tok.value in ('for', 'while') and i + 1 < n:
+                if i and tokens[i - 1].value == '.':
+                    continue
+                j = i + 2 if tokens[i + 1].value == 'await' else i + 1
+                if j >= n or tokens[j].value != '(' or j not in pairs:
+                    continue
+                close = pairs[j]
+                if tok.value == 'while' and self._do_while(i):
+                    continue
+                end = self._body_end(close + 1)
+                if end < 0:
+                    continue
+                if tok.value == 'while':
+                    yield Loop('while', tok.line, close + 1, end, self.default, '默认', None)
+                else:
+                    yield self._for_loop(i, j, close, end)
+            elif tok.value == 'do' and i + 1 < n and tokens[i + 1].value == '{' and i + 1 in pairs:
+                yield Loop('while', tok.line, i + 1, pairs[i + 1], self.default, '默认', None)
+            elif tok.value in CALLBACK_METHODS and i >= 2 and tokens[i - 1].value in ('.', '?.') \
+                    and i + 1 < n and tokens[i + 1].value == '(' and i + 1 in pairs:
+                close = pairs[i + 1]
+                args = split_args(tokens, i + 1, close)
+                if not args or not self._is_callback(args[0]):
+                    continue
+                iterations, basis, source = self._estimate_receiver(i - 2)
+                yield Loop(tok.value, tok.line, i + 1, close, iterations, basis, source)
+
+    def _is_callback(self, arg: Tuple[int, int]) -> bool:
+        tokens = self.tokens
+        start, end = arg
+        if end - start == 1 and tokens[start].value in self.names:
+            return True
+        return any(tokens[k].value in ('=>', 'function') for k in range(start, end)
+                   if tokens[k].depth <= tokens[start].depth + 1)
+
+    def _do_while(self, index: int) -> bool:
+        """do { ... } while (...) 的 while"""
+        tokens = self.tokens
+        if index == 0 or tokens[index - 1].value != '}':
+            return False
+        opener = self.openers.get(index - 1, -1)
+        return opener > 0 and tokens[opener - 1].value == 'do'
+
+    def _body_end(self, index: int) -> int:
+        tokens = self.tokens
+        if index >= len(tokens):
+            return -1
+        if tokens[index].value == '{':
+            return self.pairs.get(index, -1)
+        end = statement_end(tokens, index)
+        return end if end >= 0 else self.pairs.get(index, -1)
+
+    def _for_loop(self, index: int, open_idx: int, close: int, end: int) -> Loop:
+        tokens = self.tokens
+        line = tokens[index].line
+        for k in range(open_idx + 1, close):
+            if tokens[k].depth == tokens[open_idx].depth + 1 and tokens[k].value in ('of', 'in') \
+                    and tokens[k].kind == IDENT:
+                iterations, basis, source = self._estimate(k + 1, close, index)
+                return Loop('for-of' if tokens[k].value == 'of' else 'for-in', line, close + 1, end,
+                            iterations, basis, source)
+        # for (let i = 0; i < N; i++) / i < xs.length
+        for k in range(open_idx + 1, close - 1):
+            if tokens[k].value in ('<', '<='):
+                bound = tokens[k + 1]
+                if bound.kind == NUMBER:
+                    try:
+                        return Loop('for', line, close + 1, end, int(float(bound.value)) + (tokens[k].value == '<='),
+                                    f"< {bound.value}", None)
+                    except ValueError:
+                        break
+                if bound.kind == IDENT and match_sequence(tokens, k + 2, ('.', 'length')):
+                    iterations, basis, source = self._resolve(bound.value, index)
+                    return Loop('for', line, close + 1, end, iterations, basis, source)
+                break
+        return Loop('for', line, close + 1, end, self.default, '默认', None)
+
+    # --- 循环次数估算 ---
+
+    def _estimate_receiver(self, index: int) -> Tuple[int, str, Optional[str]]:
+        """xs.map(...) 中 xs 的元素个数；index 为 . 之前的 token"""
+        tokens = self.tokens
+        tok = tokens[index]
+        if tok.value in (')', ']'):
+            opener = self.openers.get(index, -1)
+            if opener < 0:
+                return self.default, '默认', None
+            if tok.value == ']':
+                return self._estimate(opener, index + 1, opener)
+            # xs.filter(...).map(...)：按 xs 估算；Object.values(x) 等按 x 估算
+            callee = opener - 1
+            if callee >= 2 and tokens[callee].value in CALLBACK_METHODS and tokens[callee - 1].value in ('.', '?.'):
+                return self._estimate_receiver(callee - 2)
+            args = split_args(tokens, opener, index)
+            if len(args) == 1 and tokens[callee].value in ('values', 'keys', 'entries', 'from'):
+                return self._estimate(args[0][0], args[0][1], opener)
+            return self.default, '默认', None
+        if tok.kind != IDENT:
+            return self.default, '默认', None
+        k = index
+        while k >= 2 and tokens[k - 1].value in ('.', '?.') and tokens[k - 2].kind == IDENT:
+            k -= 2
+        return self._resolve(tokens[k].value, k)
+
+    def _estimate(self, start: int, end: int, before: int) -> Tuple[int, str, Optional[str]]:
+        """表达式 tokens[start:end] 求值得到的集合大小"""
+        tokens = self.tokens
+        while start < end and tokens[start].value in ('await', ';', '...'):
+            start += 1
+        if start >= end:
+            return self.default, '默认', None
+        tok = tokens[start]
+        if tok.value == '[' and start in self.pairs:
+            return len(split_args(tokens, start, self.pairs[start])), '数组字面量', None
+        found = self._find_many(start, end)
+        if found is not None:
+            return found
+        if tok.kind == IDENT:
+            k = start
+            while k + 2 < end and tokens[k + 1].value in ('.', '?.') and tokens[k + 2].kind == IDENT:
+                k += 2
+            if k + 1 < end and tokens[k + 1].value == '(' and tokens[k].value in CALLBACK_METHODS:
+                return self._estimate_receiver(k - 2)
+            if k + 1 < end and tokens[k + 1].value == '(' and tokens[k].value in ('values', 'keys', 'entries', 'from'):
+                args = split_args(tokens, k + 1, self.pairs.get(k + 1, -1))
+                if len(args) == 1:
+                    return self._estimate(args[0][0], args[0][1], before)
+            if k + 1 >= end or tokens[k + 1].value != '(':
+                return self._resolve(tok.value, before)
+        return self.default, '默认', None
+
+    def _find_many(self, start: int, end: int) -> Optional[Tuple[int, str, Optional[str]]]:
+        """client.model.findMany({ take: N }) -> (N, 依据, model)"""
+        tokens = self.tokens
+        if not (tokens[start].value in CLIENT_NAMES and match_sequence(tokens, start + 1, ('.', IDENT, '.', 'findMany', '('))):
+            return None
+        model = tokens[start + 2].value
+        open_idx = start + 5
+        close = self.pairs.get(open_idx, -1)
+        if close < 0:
+            return None
+        depth = tokens[open_idx].depth + 2
+        for k in range(open_idx + 1, close):
+            if tokens[k].value == 'take' and tokens[k].depth == depth and tokens[k].kind == IDENT:
+                value = tokens[k + 2] if tokens[k + 1].value == ':' else tokens[k]
+                if value.kind == NUMBER:
+                    return int(float(value.value)), f"take: {value.value}", model
+                if value.kind == IDENT:
+                    number = self._number(value.value, k)
+                    if number is not None:
+                        return number, f"take: {value.value}（默认 {number}）", model
+                return self.default, 'take 无法静态求值', model
+        return self.unbounded, 'findMany 未限制 take', model
+
+    def _declaration(self, name: str, before: int) -> Optional[Tuple[int, int]]:
+        """before 之前最近的 const/let/var name = ... 的值区间 [start, end)；
+        const [a, b] = await Promise.all([...]) 中取对应位置的元素"""
+        tokens = self.tokens
+        for k in range(min(before, len(tokens) - 1), 0, -1):
+            tok = tokens[k]
+            if tok.kind != IDENT or tok.value != name:
+                continue
+            if tokens[k - 1].value in _DECLARATIONS and k + 1 < len(tokens) and tokens[k + 1].value in ('=', ':'):
+                eq = k + 1
+                if tokens[eq].value == ':':
+                    # 带类型注解的声明
+                    eq = next((m for m in range(k + 2, min(len(tokens), k + 40)) if tokens[m].value == '='
+                               and tokens[m].depth == tok.depth), -1)
+                    if eq < 0:
+                        return None
+                end = statement_end(tokens, eq)
+                return eq + 1, end if end >= 0 else len(tokens)
+            # 数组解构
+            opener = k
+            while opener > 0 and tokens[opener].depth >= tok.depth:
+                opener -= 1
+            if tokens[opener].value == '[' and opener in self.pairs and opener >= 1 \
+                    and tokens[opener - 1].value in _DECLARATIONS:
+                position = [i for i, (s, e) in enumerate(split_args(tokens, opener, self.pairs[opener]))
+                            if s <= k < e]
+                eq = self.pairs[opener] + 1
+                if not position or eq >= len(tokens) or tokens[eq].value != '=':
+                    return None
+                m = eq + 1
+                while m < len(tokens) and tokens[m].value == 'await':
+                    m += 1
+                if match_sequence(tokens, m, ('Promise', '.', 'all', '(', '[')) and m + 4 in self.pairs:
+                    items = split_args(tokens, m + 4, self.pairs[m + 4])
+                    if position[0] < len(items):
+                        return items[position[0]]
+                return None
+        return None
+
+    def _resolve(self, name: str, before: int) -> Tuple[int, str, Optional[str]]:
+        span = self._declaration(name, before)
+        if span is None:
+            return self.default, '默认', None
+        return self._estimate(span[0], span[1], span[0])
+
+    def _number(self, name: str, before: int) -> Optional[int]:
+        """变量的默认数值：limit = 20、parseInt(... || '20')、{ limit = 20 } = ..."""
+        tokens = self.tokens
+        span = self._declaration(name, before)
+        if span is None:
+            # 解构或参数默认值：name = 20
+            for k in range(min(before, len(tokens) - 2), -1, -1):
+                if tokens[k].value == name and tokens[k + 1].value == '=' and tokens[k + 2].kind == NUMBER:
+                    return int(float(tokens[k + 2].value))
+            return None
+        for tok in tokens[span[0]:span[1]]:
+            if tok.kind == NUMBER:
+                return int(float(tok.value))
+            if tok.kind == STRING and tok.value[1:-1].isdigit():
+                return int(tok.value[1:-1])
+        return None
+
+    # --- 查询 ---
+
+    def where_key(self, open_idx: int) -> Optional[str]:
+        """client.model.op({ where: { key: ... } }) 的第一个条件字段"""
+        tokens = self.tokens
+        close = self.pairs.get(open_idx, -1)
+        depth = tokens[open_idx].depth + 2
+        for k in range(open_idx + 1, max(close, open_idx + 1) - 3):
+            if tokens[k].value == 'where' and tokens[k].depth == depth and tokens[k + 1].value == ':' \
+                    and tokens[k + 2].value == '{' and tokens[k + 3].kind == IDENT:
+                key = tokens[k + 3].value
+                return None if key in ('AND', 'OR', 'NOT') else key
+        return None
+
+    def awaited(self, index: int) -> bool:
+        tokens = self.tokens
+        k = index - 2 if index >= 2 and tokens[index - 1].value == '.' and tokens[index - 2].value == 'this' else index
+        return k > 0 and tokens[k - 1].value == 'await'
+
+    def loops_at(self, index: int, func: Optional[_Function]) -> List[Tuple[Loop, bool]]:
+        """函数内包含 index 的循环（由外到内）及其是否并发"""
+        inside = [loop for loop in self.loops if loop.start <= index <= loop.end
+                  and (func is None or func.start < loop.start <= func.end)]
+        inside.sort(key=lambda loop: loop.start)
+        result = []
+        for loop in inside:
+            if loop.kind in CALLBACK_METHODS:
+                concurrent = loop.kind not in _SEQUENTIAL_CALLBACKS
+            else:
+                concurrent = not self.awaited(index)
+            result.append((loop, concurrent))
+        return result
+
+    def contexts(self, index: int, seen: frozenset = frozenset()) -> List[Tuple[list, list, Optional[str]]]:
+        """到达 index 的调用链：[(循环列表, 经过的函数, 最外层函数名)]"""
+        func = self.function_at(index)
+        loops = self.loops_at(index, func)
+        if func is None:
+            return [(loops, [], None)]
+        callers = [c for c in self.calls.get(func.name, ()) if not func.start <= c <= func.end]
+        if func.name in seen or not callers:
+            return [(loops, [], func.name)]
+        paths = []
+        for call in callers:
+            for outer, via, root in self.contexts(call, seen | {func.name}):
+                paths.append((outer + loops, via + [{'function': func.name, 'line': self.tokens[call].line}], root))
+                if len(paths) >= _MAX_PATHS:
+                    return paths
+        return paths
+
+
+def _product(values) -> int:
+    result = 1
+    for value in values:
+        result *= value
+    return result
+
+
+def suggest(model: Optional[str], op: str, key: Optional[str], source: Optional[str],
+            relation_fields: Optional[Dict[str, Dict[str, str]]] = None) -> Tuple[str, str]:
+    """(批量化写法, 说明)"""
+    if model is None:
+        return 'any-array', "合并为一条SQL，用 = ANY($1) 传入全部键，结果按键分组"
+    if source and relation_fields and op in READ_OPS:
+        field = next((f for f, target in relation_fields.get(source, {}).items() if target == model), None)
+        if field:
+            return 'include', (f"在取 {source} 的 findMany 中加 include: {{ {field}: true }}"
+                               f"（或 select 关系字段），去掉循环内的 {model}.{op}")
+    key = key or 'id'
+    where = f"where: {{ {key}: {{ in: keys }} }}"
+    if op in ('findUnique', 'findUniqueOrThrow', 'findFirst', 'findFirstOrThrow'):
+        return 'findMany-in', f"循环前用 {model}.findMany({{ {where} }}) 一次取回，按 {key} 建 Map 后在循环内查表"
+    if op == 'findMany':
+        return 'findMany-in', f"合并为一次 {model}.findMany({{ {where} }})，在内存中按 {key} 分组"
+    if op in ('count', 'aggregate', 'groupBy'):
+        return 'groupBy', f"改为一次 {model}.groupBy({{ by: ['{key}'], {where}, ... }})，聚合项不变"
+    if op == 'create':
+        return 'createMany', f"先收集数据，再用 {model}.createMany({{ data }}) 一次写入"
+    if op in ('update', 'upsert'):
+        return 'updateMany', (f"更新值相同时用 {model}.updateMany({{ {where} }})；"
+                              f"逐行不同的值合并到一个 $transaction([...]) 或一条 UPDATE ... FROM (VALUES ...)")
+    if op == 'delete':
+        return 'deleteMany', f"改为一次 {model}.deleteMany({{ {where} }})"
+    return op, f"把各次循环的条件合并后只调用一次 {model}.{op}"
+
+
+def analyze_source(content: str, rel_path: str, relation_fields: Optional[Dict[str, Dict[str, str]]] = None,
+                   default: int = DEFAULT_ITERATIONS, unbounded: int = UNBOUNDED_ITERATIONS,
+                   tokens: Optional[List[Token]] = None, pairs: Optional[Dict[int, int]] = None) -> List[QuerySite]:
+    """单个文件中位于循环内（直接或经本地函数）的 Prisma 查询"""
+    if not any(name in content for name in CLIENT_NAMES):
+        return []
+    if tokens is None:
+        tokens = tokenize_all(content)
+    if pairs is None:
+        pairs = match_brackets(tokens)
+    analyzer = _Analyzer(tokens, pairs, default, unbounded)
+    entries = {local: method for method, locals_ in method_entries(tokens).items() for local in locals_}
+    sites = []
+    for index, model, op, open_idx in find_queries(tokens):
+        looping = [path for path in analyzer.contexts(index) if path[0]]
+        if not looping:
+            continue
+        loops, via, _ = max(looping, key=lambda p: _product(loop.iterations for loop, _ in p[0]))
+        methods = sorted({entries[root] for _, _, root in looping if root in entries})
+        key = analyzer.where_key(open_idx) if model is not None else None
+        source = next((loop.source for loop, _ in reversed(loops) if loop.source), None)
+        shape, suggestion = suggest(model, op, key, source, relation_fields)
+        func = analyzer.function_at(index)
+        sites.append(QuerySite(
+            path=rel_path, line=tokens[index].line, function=func.name if func else None,
+            model=model, op=op, key=key,
+            loops=[{'kind': loop.kind, 'line': loop.line, 'iterations': loop.iterations, 'basis': loop.basis,
+                    'concurrent': concurrent} for loop, concurrent in loops],
+            via=via, methods=methods,
+            per_request=_product(loop.iterations for loop, _ in loops),
+            round_trips=_product(loop.iterations for loop, concurrent in loops if not concurrent),
+            shape=shape, suggestion=suggestion,
+        ))
+    return sites
+
+
+def route_of(rel_path: str) -> Optional[str]:
+    """app/api/**/route.ts 的 URL；其他文件返回 None"""
+    if rel_path.startswith(API_DIR + '/') and rel_path.endswith('/' + ROUTE_FILENAME):
+        return route_url(rel_path)
+    return None
+
+
+def _worker(path: Path, root: Path, relation_fields, default: int, unbounded: int) -> Tuple[int, List[QuerySite]]:
+    """进程池 worker"""
+    nbytes, content = fileio.read_if_contains(path, _CLIENT_BYTES)
+    if content is None:
+        return nbytes, []
+    with profiling.phase('analyze'):
+        return nbytes, analyze_source(content, path.relative_to(root).as_posix(), relation_fields,
+                                      default=default, unbounded=unbounded)
+
+
+def find_sites(root: Path, dirs: Sequence[str] = SCAN_DIRS, schema: Optional[Schema] = None,
+               default: int = DEFAULT_ITERATIONS, unbounded: int = UNBOUNDED_ITERATIONS,
+               workers: Optional[int] = None, stats: Optional[ScanStats] = None,
+               budget: Optional[float] = None) -> List[QuerySite]:
+    """并行分析目录下全部源码（按路径、行号排序）"""
+    root = Path(root).resolve()
+    with profiling.phase('walk'):
+        paths = iter_source_files(root, dirs)
+    worker = functools.partial(_worker, root=root, relation_fields=relations(schema) if schema else None,
+                               default=default, unbounded=unbounded)
+    sites = []
+    for _, found in scan_files(paths, worker, workers=workers, stats=stats, budget=budget):
+        sites.extend(found)
+    return sites
+
+
+def rank_routes(sites: Sequence[QuerySite]) -> List[dict]:
+    """
+    按文件汇总，按每个请求的估计查询数从高到低排序
+
+    路由文件的得分取各 HTTP 方法中最大的一个（同一请求只走一个方法）；
+    找不到入口方法的查询（如只被未导出的函数使用）计入每个方法。
+    """
+    by_path: Dict[str, List[QuerySite]] = {}
+    for site in sites:
+        by_path.setdefault(site.path, []).append(site)
+    ranked = []
+    for path, group in by_path.items():
+        methods: Dict[str, int] = {}
+        for site in group:
+            for method in site.methods or ['*']:
+                methods[method] = methods.get(method, 0) + site.per_request
+        loose = methods.pop('*', 0)
+        if methods:
+            methods = {method: count + loose for method, count in methods.items()}
+        else:
+            methods = {'*': loose}
+        ranked.append({
+            'path': path, 'url': route_of(path),
+            'queries_per_request': max(methods.values()),
+            'round_trips': sum(site.round_trips for site in group),
+            'methods': dict(sorted(methods.items())),
+            'sites': [site.id for site in sorted(group, key=lambda s: -s.per_request)],
+        })
+    ranked.sort(key=lambda r: (r['url'] is None, -r['queries_per_request'], r['path']))
+    return ranked
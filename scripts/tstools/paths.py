@@ -0,0 +1,48 @@
+"""
+项目根目录与维护脚本定位
+
+各脚本原先各自写死根目录（/workspace/luckymart-tj，或依赖当前目录），互相并不一致。
+现在统一按以下顺序确定项目根目录：
+1. 命令行 --root
+2. 环境变量 LUCKYMART_ROOT
+3. 脚本所在的仓库（scripts/ 的上一级）
+"""
+
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+REPO_DIR = SCRIPTS_DIR.parent
+
+ROOT_ENV = 'LUCKYMART_ROOT'
+
+
+def repo_root() -> Path:
+    """默认的项目根目录"""
+    env = os.environ.get(ROOT_ENV)
+    return Path(env).resolve() if env else REPO_DIR
+
+
+def add_root_argument(parser):
+    """为脚本添加 --root 参数"""
+    parser.add_argument('--root', type=Path, default=repo_root(),
+                        help=f"项目根目录（默认 ${ROOT_ENV}，未设置时为脚本所在仓库）")
+
+
+def load_script(path: Path, name: str):
+    """按路径加载脚本模块（文件名可以带连字符），同一进程内只加载一次"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # 注册到 sys.modules，进程池 worker 才能按模块名反序列化函数
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
@@ -0,0 +1,203 @@
+"""
+本地一次性 PostgreSQL
+
+所有 SQL 都通过 psql 执行，不依赖 Python 数据库驱动。两种用法：
+
+- --pg-bin DIR（或 PATH / pg_config 能找到 initdb）：在临时目录 initdb 一个只监听 Unix socket 的实例，
+  关闭 fsync，用完停止并删除
+- --dsn：连接一个已有的、允许随意写入的数据库（不要指向生产库）；
+  所有对象建在独立的 schema 中，结束时删除
+
+EXPLAIN 在事务中执行并回滚，INSERT / UPDATE 类的语句不会改动种子数据。
+"""
+
+import contextlib
+import glob
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+
+# 建表和种子数据所在的 schema
+SCHEMA = 'luckymart_explain'
+
+# EXPLAIN 时的默认 work_mem（与 PostgreSQL 默认值一致，排序溢出到磁盘的判断以此为准）
+DEFAULT_WORK_MEM = '4MB'
+
+
+class PostgresError(Exception):
+    """psql / initdb / pg_ctl 执行失败"""
+
+
+def find_binary(name: str, bin_dir: Optional[Path] = None) -> Optional[str]:
+    """按 --pg-bin、PATH、pg_config --bindir、/usr/lib/postgresql/*/bin 的顺序查找可执行文件"""
+    if bin_dir is not None:
+        path = Path(bin_dir) / name
+        return str(path) if path.exists() else None
+    found = shutil.which(name)
+    if found:
+        return found
+    pg_config = shutil.which('pg_config')
+    if pg_config:
+        proc = subprocess.run([pg_config, '--bindir'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        path = Path(proc.stdout.decode().strip()) / name
+        if proc.returncode == 0 and path.exists():
+            return str(path)
+    candidates = sorted(glob.glob(f'/usr/lib/postgresql/*/bin/{name}'),
+                        key=lambda p: [int(x) if x.isdigit() else 0 for x in Path(p).parts[-3].split('.')])
+    return candidates[-1] if candidates else None
+
+
+def _run(cmd: List[str], input_text: Optional[str] = None, env: Optional[dict] = None,
+         timeout: Optional[float] = None) -> str:
+    try:
+        proc = subprocess.run(cmd, input=input_text.encode('utf-8') if input_text is not None else None,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise PostgresError(f"{Path(cmd[0]).name} 超时（{timeout:.0f}s）")
+    except OSError as e:
+        raise PostgresError(f"无法执行 {cmd[0]}: {e}")
+    if proc.returncode != 0:
+        message = proc.stderr.decode('utf-8', 'replace').strip() or proc.stdout.decode('utf-8', 'replace').strip()
+        raise PostgresError(message or f"{Path(cmd[0]).name} 退出码 {proc.returncode}")
+    return proc.stdout.decode('utf-8', 'replace')
+
+
+class Postgres:
+    """通过 psql 访问一个数据库，search_path 指向 schema"""
+
+    def __init__(self, dsn: str, psql: str = 'psql', schema: str = SCHEMA):
+        self.dsn = dsn
+        self.psql = psql
+        self.schema = schema
+
+    def run(self, sql: str, timeout: Optional[float] = None) -> str:
+        """执行一段 SQL（遇到错误即停止），返回 psql 的非对齐输出"""
+        env = dict(os.environ, PGOPTIONS=f'-c search_path={self.schema} -c client_min_messages=warning')
+        return _run([self.psql, '-X', '-q', '-A', '-t', '-v', 'ON_ERROR_STOP=1', '-d', self.dsn, '-f', '-'],
+                    input_text=sql, env=env, timeout=timeout)
+
+    def reset_schema(self):
+        self.run(f'DROP SCHEMA IF EXISTS "{self.schema}" CASCADE;\nCREATE SCHEMA "{self.schema}";\n')
+
+    def drop_schema(self):
+        self.run(f'DROP SCHEMA IF EXISTS "{self.schema}" CASCADE;\n')
+
+    def explain(self, sql: str, timeout: float = 30.0, work_mem: str = DEFAULT_WORK_MEM) -> dict:
+        """EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)，在事务中执行后回滚"""
+        statement = sql.strip().rstrip(';')
+        script = (f"BEGIN;\nSET LOCAL statement_timeout = {int(timeout * 1000)};\n"
+                  f"SET LOCAL work_mem = '{work_mem}';\n"
+                  f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)\n{statement};\nROLLBACK;\n")
+        out = self.run(script, timeout=timeout + 30)
+        try:
+            return json.loads(out)[0]
+        except (ValueError, IndexError) as e:
+            raise PostgresError(f"无法解析 EXPLAIN 输出: {e}")
+
+
+@contextlib.contextmanager
+def throwaway_cluster(bin_dir: Optional[Path] = None) -> Iterator[Postgres]:
+    """在临时目录中启动一个一次性实例，退出时停止并删除"""
+    initdb = find_binary('initdb', bin_dir)
+    pg_ctl = find_binary('pg_ctl', bin_dir)
+    psql = find_binary('psql', bin_dir)
+    if not (initdb and pg_ctl and psql):
+        raise PostgresError("找不到 initdb / pg_ctl / psql，请安装 PostgreSQL 或用 --pg-bin / --dsn 指定")
+    tmp = tempfile.mkdtemp(prefix='pg-explain-')
+    data = os.path.join(tmp, 'data')
+    started = False
+    try:
+        # initdb 不允许以 root 运行
+        _run([initdb, '-D', data, '-U', 'postgres', '-A', 'trust', '-E', 'UTF8', '--no-sync'])
+        options = (f"-c listen_addresses='' -k {tmp} -c fsync=off -c synchronous_commit=off "
+                   f"-c full_page_writes=off")
+        _run([pg_ctl, '-D', data, '-l', os.path.join(tmp, 'server.log'), '-w', '-o', options, 'start'])
+        started = True
+        yield Postgres(f'host={tmp} user=postgres dbname=postgres', psql=psql)
+    finally:
+        if started:
+            with contextlib.suppress(PostgresError):
+                _run([pg_ctl, '-D', data, '-m', 'immediate', 'stop'])
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def add_postgres_arguments(parser):
+    """为脚本添加 --dsn / --pg-bin 参数"""
+    group = parser.add_argument_group("本地 PostgreSQL")
+    group.add_argument('--dsn', help="连接已有的可写测试库（对象建在独立 schema 中，不要指向生产库）")
+    group.add_argument('--pg-bin', type=Path, metavar='DIR',
+                       help="initdb / pg_ctl / psql 所在目录（默认从 PATH、pg_config 查找），启动一次性实例")
+
+
+@contextlib.contextmanager
+def from_args(args) -> Iterator[Postgres]:
+    """按命令行参数连接或启动数据库；退出时清理"""
+    if args.dsn:
+        psql = find_binary('psql', args.pg_bin)
+        if psql is None:
+            raise PostgresError("找不到 psql")
+        pg = Postgres(args.dsn, psql=psql)
+        try:
+            yield pg
+        finally:
+            with contextlib.suppress(PostgresError):
+                pg.drop_schema()
+        return
+    with throwaway_cluster(args.pg_bin) as pg:
+        yield pg
+
+
+class PlanSummary(NamedTuple):
+    execution_ms: float
+    planning_ms: float
+    rows: int                    # 顶层节点返回的行数
+    seq_scans: List[dict]        # [{'relation', 'rows'（扫描的行数，含被过滤的）, 'filter'}]
+    spills: List[dict]           # [{'node', 'detail', 'kb'}] 排序 / 哈希溢出到磁盘
+    shared_hit: int
+    shared_read: int
+    temp_written: int
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+def _walk(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get('Plans', ()):
+        yield from _walk(child)
+
+
+def summarize_plan(explain: dict) -> PlanSummary:
+    """EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) 的结果 -> 顺序扫描、磁盘溢出、耗时和缓冲区统计"""
+    root = explain['Plan']
+    seq_scans = []
+    spills = []
+    for node in _walk(root):
+        kind = node.get('Node Type')
+        loops = node.get('Actual Loops', 1) or 1
+        if kind == 'Seq Scan':
+            scanned = (node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)) * loops
+            seq_scans.append({'relation': node.get('Relation Name'), 'rows': int(scanned),
+                              'filter': node.get('Filter')})
+        elif kind == 'Sort' and node.get('Sort Space Type') == 'Disk':
+            spills.append({'node': kind, 'detail': node.get('Sort Method'), 'kb': node.get('Sort Space Used', 0)})
+        elif kind == 'Hash' and node.get('Hash Batches', 1) > 1:
+            spills.append({'node': kind, 'detail': f"{node['Hash Batches']} batches",
+                           'kb': node.get('Peak Memory Usage', 0)})
+        elif kind == 'Aggregate' and node.get('Disk Usage', 0) > 0:
+            spills.append({'node': 'HashAggregate', 'detail': f"{node.get('HashAgg Batches', 0)} batches",
+                           'kb': node['Disk Usage']})
+    return PlanSummary(
+        execution_ms=float(explain.get('Execution Time', 0.0)),
+        planning_ms=float(explain.get('Planning Time', 0.0)),
+        rows=int(root.get('Actual Rows', 0)),
+        seq_scans=seq_scans,
+        spills=spills,
+        shared_hit=int(root.get('Shared Hit Blocks', 0)),
+        shared_read=int(root.get('Shared Read Blocks', 0)),
+        temp_written=int(root.get('Temp Written Blocks', 0)),
+    )
@@ -0,0 +1,423 @@
+"""
+prisma/schema.prisma 解析与 PostgreSQL DDL / 合成数据生成
+
+只处理本项目用到的写法：model / enum 块、字段的 @id @unique @default @map @db.* @updatedAt，
+以及 @@id @@unique @@index @@map。关系字段（类型为另一个模型）不生成列。
+
+DDL 与 prisma migrate 生成的结构一致（表名、列名、主键、唯一约束和索引），
+用于在一次性的本地 Postgres 中重建数据库做 EXPLAIN。
+
+合成数据（seed_sql）：每个表按 generate_series 生成指定行数，主键为 md5(行号)::uuid，
+所有表共用同一个主键空间，因此 user_id 之类的 uuid 外键总能命中被引用表的某一行；
+外键按平方分布偏向前面的主键，模拟少数重度用户。时间分布在最近一年内。
+"""
+
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+SCHEMA_FILE = 'prisma/schema.prisma'
+
+# Prisma 标量类型 -> PostgreSQL 默认类型
+_SCALAR_TYPES = {
+    'String': 'text',
+    'Int': 'integer',
+    'BigInt': 'bigint',
+    'Float': 'double precision',
+    'Decimal': 'numeric(65,30)',
+    'Boolean': 'boolean',
+    'DateTime': 'timestamp(3)',
+    'Json': 'jsonb',
+    'Bytes': 'bytea',
+}
+
+# @db.X -> PostgreSQL 类型
+_NATIVE_TYPES = {
+    'VarChar': 'varchar', 'Char': 'char', 'Text': 'text', 'Uuid': 'uuid', 'Xml': 'xml',
+    'Citext': 'citext', 'Inet': 'inet', 'Bit': 'bit', 'VarBit': 'varbit',
+    'Integer': 'integer', 'SmallInt': 'smallint', 'BigInt': 'bigint', 'Oid': 'oid',
+    'Decimal': 'numeric', 'Money': 'money', 'Real': 'real', 'DoublePrecision': 'double precision',
+    'Boolean': 'boolean', 'Date': 'date', 'Time': 'time', 'Timetz': 'timetz',
+    'Timestamp': 'timestamp', 'Timestamptz': 'timestamptz',
+    'Json': 'json', 'JsonB': 'jsonb', 'ByteA': 'bytea',
+}
+
+# PostgreSQL 标识符最长 63 字节，Prisma 生成的约束名超长时截断
+_MAX_IDENT = 63
+
+_BLOCK_RE = re.compile(r'^(model|enum|type|view)\s+(\w+)\s*\{')
+_FIELD_RE = re.compile(r'^(\w+)\s+(\w+)(\[\])?(\?)?\s*(.*)$')
+_ATTR_RE = re.compile(r'@@?([\w.]+)')
+
+
+class Field(NamedTuple):
+    name: str
+    column: str                  # @map 之后的列名
+    type: str                    # Prisma 类型（标量、枚举或模型名）
+    optional: bool
+    is_list: bool
+    native: Optional[str]        # @db.VarChar(255) -> 'VarChar(255)'
+    default: Optional[str]       # @default(...) 括号内的原文
+    is_id: bool
+    unique: bool
+    updated_at: bool
+    line: int
+
+
+class Index(NamedTuple):
+    fields: List[str]            # Prisma 字段名
+    unique: bool
+    name: Optional[str]          # map: / name: 指定的约束名
+    line: int
+
+
+class Model(NamedTuple):
+    name: str
+    table: str                   # @@map 之后的表名
+    fields: List[Field]
+    id_fields: List[str]
+    indexes: List[Index]         # 不含主键；字段上的 @unique 也在这里
+    line: int                    # model 所在行
+    end_line: int                # 结束的 } 所在行
+
+    def field(self, name: str) -> Optional[Field]:
+        return next((f for f in self.fields if f.name == name), None)
+
+    def columns(self, names: Sequence[str]) -> List[str]:
+        return [self.field(name).column if self.field(name) else name for name in names]
+
+
+class Schema(NamedTuple):
+    models: Dict[str, Model]
+    enums: Dict[str, List[str]]
+
+    def scalar_fields(self, model: Model) -> List[Field]:
+        """生成列的字段（去掉关系字段）"""
+        return [f for f in model.fields if f.type not in self.models]
+
+    def by_table(self) -> Dict[str, Model]:
+        return {model.table: model for model in self.models.values()}
+
+
+def _strip_comment(line: str) -> str:
+    """去掉 // 注释（字符串内的 // 保留）"""
+    quoted = False
+    for i, ch in enumerate(line):
+        if ch == '"' and (i == 0 or line[i - 1] != '\\'):
+            quoted = not quoted
+        elif not quoted and line.startswith('//', i):
+            return line[:i]
+    return line
+
+
+def parse_attributes(text: str) -> List[Tuple[str, Optional[str]]]:
+    """'@id @default(uuid()) @db.Uuid' -> [('id', None), ('default', 'uuid()'), ('db.Uuid', None)]"""
+    attrs = []
+    i = 0
+    n = len(text)
+    while i < n:
+        if text[i] != '@':
+            i += 1
+            continue
+        m = _ATTR_RE.match(text, i)
+        if m is None:
+            i += 1
+            continue
+        name = m.group(1)
+        i = m.end()
+        args = None
+        if i < n and text[i] == '(':
+            depth = 0
+            quoted = False
+            start = i + 1
+            while i < n:
+                ch = text[i]
+                if ch == '"' and text[i - 1] != '\\':
+                    quoted = not quoted
+                elif not quoted and ch == '(':
+                    depth += 1
+                elif not quoted and ch == ')':
+                    depth -= 1
+                    if depth == 0:
+                        break
+                i += 1
+            args = text[start:i]
+            i += 1
+        attrs.append((name, args))
+    return attrs
+
+
+def _string_arg(args: Optional[str], key: Optional[str] = None) -> Optional[str]:
+    """取出 "name" 或 key: "name" 形式的字符串参数"""
+    if not args:
+        return None
+    pattern = rf'\b{key}\s*:\s*"([^"]*)"' if key else r'^\s*"([^"]*)"'
+    m = re.search(pattern, args)
+    return m.group(1) if m else None
+
+
+def _field_list(args: Optional[str]) -> List[str]:
+    """'[userId, createdAt(sort: Desc)], name: "x"' -> ['userId', 'createdAt']"""
+    if not args:
+        return []
+    m = re.search(r'\[([^\]]*)\]', args)
+    if not m:
+        return []
+    names = []
+    depth = 0
+    current = ''
+    for ch in m.group(1):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            names.append(current)
+            current = ''
+        elif depth == 0:
+            current += ch
+    names.append(current)
+    return [name.strip() for name in names if name.strip()]
+
+
+def parse_schema(text: str) -> Schema:
+    """解析 schema.prisma 文本"""
+    models: Dict[str, Model] = {}
+    enums: Dict[str, List[str]] = {}
+    block = None       # (kind, name, line)
+    fields: List[Field] = []
+    block_attrs: List[Tuple[str, Optional[str], int]] = []
+    values: List[str] = []
+
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        line = _strip_comment(raw).strip()
+        if not line:
+            continue
+        if block is None:
+            m = _BLOCK_RE.match(line)
+            if m:
+                block = (m.group(1), m.group(2), lineno)
+                fields, block_attrs, values = [], [], []
+            continue
+        if line == '}':
+            kind, name, start = block
+            if kind == 'enum':
+                enums[name] = values
+            elif kind == 'model':
+                models[name] = _build_model(name, fields, block_attrs, start, lineno)
+            block = None
+            continue
+        if block[0] == 'enum':
+            if not line.startswith('@@'):
+                values.append(line.split()[0])
+            continue
+        if line.startswith('@@'):
+            block_attrs.extend((name, args, lineno) for name, args in parse_attributes(line))
+            continue
+        m = _FIELD_RE.match(line)
+        if not m or block[0] != 'model':
+            continue
+        name, type_, is_list, optional, rest = m.groups()
+        attrs = parse_attributes(rest)
+        column = name
+        native = default = None
+        is_id = unique = updated_at = False
+        for attr, args in attrs:
+            if attr == 'map':
+                column = _string_arg(args) or column
+            elif attr == 'id':
+                is_id = True
+            elif attr == 'unique':
+                unique = True
+            elif attr == 'default':
+                default = args
+            elif attr == 'updatedAt':
+                updated_at = True
+            elif attr.startswith('db.'):
+                native = attr[3:] + (f'({args})' if args is not None else '')
+        fields.append(Field(name, column, type_, bool(optional), bool(is_list), native, default,
+                            is_id, unique, updated_at, lineno))
+    return Schema(models, enums)
+
+
+def _build_model(name: str, fields: List[Field], block_attrs, start: int, end: int) -> Model:
+    table = name
+    id_fields = [f.name for f in fields if f.is_id]
+    indexes = [Index([f.name], True, None, f.line) for f in fields if f.unique]
+    for attr, args, lineno in block_attrs:
+        if attr == 'map':
+            table = _string_arg(args) or table
+        elif attr == 'id':
+            id_fields = _field_list(args)
+        elif attr in ('index', 'unique'):
+            indexes.append(Index(_field_list(args), attr == 'unique',
+                                 _string_arg(args, 'map') or _string_arg(args, 'name'), lineno))
+    return Model(name, table, fields, id_fields, indexes, start, end)
+
+
+def load_schema(path: Path) -> Schema:
+    return parse_schema(Path(path).read_text(encoding='utf-8'))
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _constraint_name(table: str, columns: Sequence[str], suffix: str) -> str:
+    """Prisma 的默认约束名：表_列_后缀，超长时截断表和列的部分"""
+    base = '_'.join([table, *columns])
+    return base[:_MAX_IDENT - len(suffix) - 1] + '_' + suffix
+
+
+def index_name(model: Model, index: Index) -> str:
+    if index.name:
+        return index.name
+    return _constraint_name(model.table, model.columns(index.fields), 'key' if index.unique else 'idx')
+
+
+def column_type(schema: Schema, field: Field) -> str:
+    if field.type in schema.enums:
+        base = quote_ident(field.type)
+    elif field.native:
+        m = re.match(r'(\w+)(\(.*\))?$', field.native)
+        base = _NATIVE_TYPES.get(m.group(1), m.group(1).lower()) + (m.group(2) or '').replace(' ', '')
+    else:
+        base = _SCALAR_TYPES.get(field.type, 'text')
+    return base + '[]' if field.is_list else base
+
+
+def _default_sql(schema: Schema, field: Field) -> Optional[str]:
+    value = field.default
+    if value is None:
+        return None
+    value = value.strip()
+    if value == 'now()':
+        return 'CURRENT_TIMESTAMP'
+    if value == 'uuid()':
+        return 'gen_random_uuid()'
+    if value in ('cuid()', 'autoincrement()'):
+        return None      # cuid 由客户端生成；autoincrement 用 IDENTITY 表示
+    m = re.fullmatch(r'dbgenerated\(\s*"(.*)"\s*\)', value)
+    if m:
+        return m.group(1)
+    if value.startswith('"'):
+        return "'" + value[1:-1].replace("'", "''") + "'"
+    if value.startswith('['):
+        return "'{}'"
+    if field.type in schema.enums:
+        return f"'{value}'"
+    return value
+
+
+def render_ddl(schema: Schema) -> str:
+    """生成建表语句（枚举、表、主键、唯一约束和索引）"""
+    out = []
+    for name, values in schema.enums.items():
+        labels = ', '.join("'" + v.replace("'", "''") + "'" for v in values)
+        out.append(f"CREATE TYPE {quote_ident(name)} AS ENUM ({labels});\n")
+    for model in schema.models.values():
+        lines = []
+        for field in schema.scalar_fields(model):
+            col = f"  {quote_ident(field.column)} {column_type(schema, field)}"
+            if field.default == 'autoincrement()':
+                col += ' GENERATED BY DEFAULT AS IDENTITY'
+            if not field.optional and not field.is_list:
+                col += ' NOT NULL'
+            default = _default_sql(schema, field)
+            if default is not None:
+                col += f' DEFAULT {default}'
+            lines.append(col)
+        if model.id_fields:
+            pk = ', '.join(quote_ident(c) for c in model.columns(model.id_fields))
+            lines.append(f"  CONSTRAINT {quote_ident(_constraint_name(model.table, [], 'pkey'))} "
+                         f"PRIMARY KEY ({pk})")
+        out.append(f"CREATE TABLE {quote_ident(model.table)} (\n" + ',\n'.join(lines) + "\n);\n")
+        for index in model.indexes:
+            cols = ', '.join(quote_ident(c) for c in model.columns(index.fields))
+            kind = 'UNIQUE INDEX' if index.unique else 'INDEX'
+            out.append(f"CREATE {kind} {quote_ident(index_name(model, index))} "
+                       f"ON {quote_ident(model.table)}({cols});\n")
+    return '\n'.join(out)
+
+
+def _hash01(column: str, salt: int = 0) -> str:
+    """行号 g 的确定性伪随机数 [0, 1)，每列使用不同的种子"""
+    seed = (zlib.crc32(column.encode('utf-8')) + salt) % 4294967296
+    return f"(((g::bigint * 2654435761 + {seed}) % 4294967296) / 4294967296.0)"
+
+
+def _seed_value(schema: Schema, model: Model, field: Field, keys: int) -> str:
+    """单个字段的合成数据表达式（g 为行号，keys 为主键空间大小）"""
+    sql_type = column_type(schema, field)
+    base_type = sql_type.split('(')[0]
+    unique = field.is_id or any(index.unique and field.name in index.fields for index in model.indexes)
+    u = _hash01(f"{model.table}.{field.column}")
+    length = re.search(r'\((\d+)\)', sql_type)
+    width = int(length.group(1)) if length and base_type in ('varchar', 'char') else 32
+
+    if field.is_list:
+        value = "ARRAY[1, 2]" if field.type in ('Int', 'BigInt') else "ARRAY['a', 'b']"
+        return f"{value}::{sql_type}"
+    if field.type in schema.enums:
+        labels = ', '.join(f"'{v}'" for v in schema.enums[field.type])
+        count = len(schema.enums[field.type])
+        value = f"(ARRAY[{labels}])[1 + floor({u} * {count})::int]::{sql_type}"
+    elif base_type == 'uuid':
+        key = 'g' if unique else f"(1 + floor({keys} * {u} * {u}))::bigint"
+        value = f"md5({key}::text)::uuid"
+    elif base_type in ('text', 'varchar', 'char', 'citext'):
+        if unique:
+            value = f"left(md5('{field.column}' || g), {min(width, 32)})"
+        else:
+            value = f"left(md5('{field.column}' || floor({u} * {keys})::bigint), {min(width, 32)})"
+            if field.default and field.default.startswith('"'):
+                # 有默认值的状态类字段：大部分行取默认值
+                value = f"CASE WHEN {u} < 0.8 THEN {_default_sql(schema, field)} ELSE {value} END"
+    elif base_type in ('integer', 'smallint', 'bigint'):
+        value = 'g' if unique else f"floor({u} * 1000)::{base_type}"
+    elif base_type in ('double precision', 'real'):
+        value = f"{u} * 1000"
+    elif base_type == 'numeric':
+        m = re.search(r'\((\d+),(\d+)\)', sql_type)
+        precision, scale = (int(m.group(1)), int(m.group(2))) if m else (65, 30)
+        digits = max(min(precision - scale, 6), 0)
+        value = f"(floor({u} * {10 ** (digits + scale)}) / {10 ** scale})::{sql_type}"
+    elif base_type == 'boolean':
+        value = f"{u} < 0.5"
+    elif base_type == 'date':
+        value = "(current_date - g)" if unique else f"(current_date - floor({u} * 365)::int)"
+    elif base_type.startswith(('timestamp', 'time')):
+        value = ("now() - g * interval '1 minute'" if unique
+                 else f"now() - {u} * interval '365 days'")
+        value = f"({value})::{sql_type}"
+    elif base_type in ('jsonb', 'json'):
+        value = f"{base_type}_build_object('seed', g)"
+    elif base_type == 'bytea':
+        value = "decode(md5(g::text), 'hex')"
+    else:
+        value = f"'{field.column}'"
+
+    if field.optional and not unique:
+        value = f"CASE WHEN {_hash01(f'{model.table}.{field.column}', 1)} < 0.1 THEN NULL ELSE {value} END"
+    return value
+
+
+def seed_sql(schema: Schema, rows: int, ratios: Optional[Dict[str, float]] = None) -> str:
+    """
+    生成合成数据：每个表 rows 行（ratios 按模型名或表名调整倍数）
+
+    外键与主键共用 [1, rows] 的主键空间。
+    """
+    ratios = ratios or {}
+    out = []
+    for model in schema.models.values():
+        fields = schema.scalar_fields(model)
+        ratio = ratios.get(model.name, ratios.get(model.table, 1.0))
+        count = max(int(rows * ratio), 1)
+        columns = ', '.join(quote_ident(f.column) for f in fields)
+        values = ',\n  '.join(_seed_value(schema, model, f, rows) for f in fields)
+        out.append(f"INSERT INTO {quote_ident(model.table)} ({columns})\n"
+                   f"SELECT\n  {values}\nFROM generate_series(1, {count}) AS g;\n")
+    out.append("ANALYZE;\n")
+    return '\n'.join(out)
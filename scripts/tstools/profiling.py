@@ -0,0 +1,249 @@
+"""
+维护脚本的 --profile 性能剖析
+
+记录各阶段（walk/read/analyze/write/report）耗时、每条规则的耗时与命中次数，
+以及最慢的 N 个文件，输出为 JSON；可选同时输出 cProfile 的 .prof 文件
+（可用 snakeviz、flameprof 等工具查看火焰图）。
+
+未启用剖析时 phase()/rule() 返回空操作对象，几乎没有额外开销。
+进程池 worker 中记录的数据随结果返回，由主进程合并，
+因此 worker 内的阶段耗时是各进程耗时之和，而不是墙钟时间。
+"""
+
+import cProfile
+import heapq
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 默认输出目录（相对项目根目录）
+PROFILE_DIR = Path('.cache') / 'profile'
+
+DEFAULT_TOP = 20
+
+
+class _Collector:
+    """一个进程内（或单个文件）的阶段与规则统计"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.rules: Dict[str, List[float]] = {}   # 名称 -> [耗时, 调用次数, 命中次数]
+
+    def add_phase(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_rule(self, name: str, seconds: float, matches: int = 0):
+        entry = self.rules.get(name)
+        if entry is None:
+            self.rules[name] = [seconds, 1, matches]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+            entry[2] += matches
+
+    def export(self) -> dict:
+        return {'phases': self.phases, 'rules': self.rules}
+
+    def merge(self, data: dict):
+        for name, seconds in data['phases'].items():
+            self.add_phase(name, seconds)
+        for name, (seconds, calls, matches) in data['rules'].items():
+            entry = self.rules.setdefault(name, [0.0, 0, 0])
+            entry[0] += seconds
+            entry[1] += calls
+            entry[2] += matches
+
+
+# 当前进程正在使用的统计对象；None 表示未启用
+_current: Optional[_Collector] = None
+# 主进程中的剖析会话
+_profiler: Optional['Profiler'] = None
+
+
+class _Timer:
+    __slots__ = ('name', 'is_rule', 'matches', 'start')
+
+    def __init__(self, name: str, is_rule: bool):
+        self.name = name
+        self.is_rule = is_rule
+        self.matches = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if _current is not None:
+            if self.is_rule:
+                _current.add_rule(self.name, elapsed, self.matches)
+            else:
+                _current.add_phase(self.name, elapsed)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ('matches',)
+
+    def __init__(self):
+        self.matches = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullTimer()
+
+
+def enabled() -> bool:
+    return _current is not None
+
+
+def phase(name: str):
+    """with phase('read'): ... 累计阶段耗时"""
+    return _Timer(name, False) if _current is not None else _NULL
+
+
+def rule(name: str):
+    """with rule('名称') as r: ...; r.matches += n 累计规则耗时和命中次数"""
+    return _Timer(name, True) if _current is not None else _NULL
+
+
+def add_rule(name: str, seconds: float, matches: int = 0):
+    """直接记录一次规则调用（用于在循环内自行计时的热点代码）"""
+    if _current is not None:
+        _current.add_rule(name, seconds, matches)
+
+
+def active_profiler() -> Optional['Profiler']:
+    return _profiler
+
+
+def profiled_call(worker: Callable[[Any], Tuple[int, Any]], item: Any) -> Tuple[int, Any]:
+    """
+    在独立的统计对象下执行 worker(item)，返回 (字节数, (结果, 剖析数据))
+
+    scan_files 在剖析启用时用它包装 worker；进程池和串行两种模式都适用。
+    """
+    global _current
+    previous = _current
+    _current = _Collector()
+    start = time.perf_counter()
+    try:
+        nbytes, result = worker(item)
+        data = _current.export()
+    finally:
+        _current = previous
+    label = item[0] if isinstance(item, tuple) else item
+    data['file'] = (str(label), time.perf_counter() - start, nbytes)
+    return nbytes, (result, data)
+
+
+class Profiler:
+    """主进程中的剖析会话"""
+
+    def __init__(self, tool: str, output: Path, top: int = DEFAULT_TOP, cprofile: bool = False):
+        self.tool = tool
+        self.output = Path(output)
+        self.top = top
+        self.collector = _Collector()
+        self.files = 0
+        self.bytes = 0
+        self._slowest: List[Tuple[float, int, str, dict]] = []
+        self._seq = 0
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self._start = 0.0
+        self.elapsed = 0.0
+
+    def start(self) -> 'Profiler':
+        global _current, _profiler
+        _current = self.collector
+        _profiler = self
+        self._start = time.perf_counter()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        return self
+
+    def merge(self, data: dict):
+        """合并 profiled_call 返回的单文件数据"""
+        self.collector.merge(data)
+        path, seconds, nbytes = data['file']
+        self.files += 1
+        self.bytes += nbytes
+        self._seq += 1
+        entry = (seconds, self._seq, path, {'bytes': nbytes, 'rules': data['rules']})
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, entry)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def report(self) -> dict:
+        slowest = sorted(self._slowest, reverse=True)
+        return {
+            'tool': self.tool,
+            'elapsed': self.elapsed,
+            'files': self.files,
+            'bytes': self.bytes,
+            'phases': dict(sorted(self.collector.phases.items(), key=lambda kv: -kv[1])),
+            'rules': {
+                name: {'seconds': seconds, 'calls': calls, 'matches': matches}
+                for name, (seconds, calls, matches)
+                in sorted(self.collector.rules.items(), key=lambda kv: -kv[1][0])
+            },
+            'slowest_files': [
+                {'path': path, 'seconds': seconds, **extra}
+                for seconds, _, path, extra in slowest
+            ],
+        }
+
+    def finish(self) -> dict:
+        """停止剖析并写出 JSON（以及 .prof），返回报告"""
+        global _current, _profiler
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self.elapsed = time.perf_counter() - self._start
+        _current = None
+        _profiler = None
+
+        report = self.report()
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        if self._cprofile is not None:
+            prof_path = self.output.with_suffix('.prof')
+            self._cprofile.dump_stats(str(prof_path))
+            report['cprofile'] = str(prof_path)
+        self.output.write_text(json.dumps(report, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        return report
+
+    def summary(self, limit: int = 5) -> str:
+        report = self.report()
+        lines = [f"性能剖析已写入: {self.output}"]
+        lines.append("  阶段: " + ", ".join(f"{k} {v:.2f}s" for k, v in report['phases'].items()))
+        for name, entry in list(report['rules'].items())[:limit]:
+            lines.append(f"  规则 {name}: {entry['seconds']:.3f}s, "
+                         f"{entry['calls']} 次调用, {entry['matches']} 次命中")
+        for entry in report['slowest_files'][:limit]:
+            lines.append(f"  慢文件 {entry['path']}: {entry['seconds'] * 1000:.1f}ms")
+        return '\n'.join(lines)
+
+
+def add_profile_arguments(parser):
+    """为脚本添加 --profile / --profile-top / --cprofile 参数"""
+    parser.add_argument('--profile', nargs='?', const='', metavar='FILE',
+                        help=f"输出性能剖析JSON（默认 <root>/{PROFILE_DIR}/<脚本名>.json）")
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_TOP, metavar='N',
+                        help="记录最慢的 N 个文件")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="同时输出 cProfile 的 .prof 文件（隐含 --profile；只包含主进程，"
+                             "配合 -j 1 可覆盖逐文件分析）")
+
+
+def from_args(args, tool: str, root) -> Optional[Profiler]:
+    """按命令行参数创建并启动剖析会话，--profile 和 --cprofile 都未指定时返回 None"""
+    if args.profile is None and not args.cprofile:
+        return None
+    output = Path(args.profile) if args.profile else Path(root) / PROFILE_DIR / f'{tool}.json'
+    return Profiler(tool, output, top=args.profile_top, cprofile=args.cprofile).start()
@@ -0,0 +1,429 @@
+"""
+正则回溯防护
+
+- time_budget()/budgeted_call(): 单个文件的处理时间预算，超时的文件被跳过并报告，
+  不会拖住整个扫描（基于 SIGALRM；sre 匹配循环会定期检查信号，因此正则本身也能被打断）
+- audit_pattern(): 静态检查嵌套量词、量词内可重叠的分支、相邻可重叠的量词
+- fuzz_pattern(): 用可"泵"的输入测量匹配耗时随输入长度的增长指数
+"""
+
+import contextlib
+import math
+import re
+import signal
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+try:  # Python 3.11+ 中 sre_parse/sre_constants 已弃用
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_constants
+    import sre_parse
+
+# 单个文件的默认处理时间预算（秒）
+DEFAULT_FILE_BUDGET = 10.0
+
+
+class BudgetExceeded(Exception):
+    """处理时间超出预算"""
+
+
+class TimedOut(NamedTuple):
+    """超出预算被跳过的文件（代替 worker 的结果返回）"""
+    path: str
+    budget: float
+
+
+def _budget_supported() -> bool:
+    return hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+
+
+@contextlib.contextmanager
+def time_budget(seconds: Optional[float]):
+    """
+    with time_budget(5): ... 超时抛出 BudgetExceeded
+
+    seconds 为空或 0 时不限时；非主线程或平台不支持 SIGALRM 时同样不限时。
+    """
+    if not seconds or not _budget_supported():
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise BudgetExceeded(f"超出 {seconds:g}s 时间预算")
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def budgeted_call(worker: Callable[[Any], Tuple[int, Any]], seconds: float, item: Any) -> Tuple[int, Any]:
+    """在时间预算内执行 worker(item)，超时返回 (0, TimedOut)"""
+    try:
+        with time_budget(seconds):
+            return worker(item)
+    except BudgetExceeded:
+        label = item[0] if isinstance(item, tuple) else item
+        return 0, TimedOut(str(label), seconds)
+
+
+def add_budget_argument(parser):
+    parser.add_argument('--file-budget', type=float, default=DEFAULT_FILE_BUDGET, metavar='SECONDS',
+                        help=f"单个文件的处理时间预算，超时跳过并报告（默认 {DEFAULT_FILE_BUDGET:g}s，0 为不限）")
+
+
+# ---------------------------------------------------------------- 静态检查
+
+class Finding(NamedTuple):
+    name: str
+    severity: str   # 'error' | 'warning'
+    message: str
+
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+_POSSESSIVE = getattr(sre_constants, 'POSSESSIVE_REPEAT', None)
+_ATOMIC_GROUP = getattr(sre_constants, 'ATOMIC_GROUP', None)
+_MAXREPEAT = sre_constants.MAXREPEAT
+
+# 用于近似计算字符集的样本字母表
+_ALPHABET = [chr(c) for c in range(128)] + ['é', '中', '￿']
+_CATEGORY_TESTS = {
+    sre_constants.CATEGORY_DIGIT: str.isdigit,
+    sre_constants.CATEGORY_NOT_DIGIT: lambda c: not c.isdigit(),
+    sre_constants.CATEGORY_SPACE: str.isspace,
+    sre_constants.CATEGORY_NOT_SPACE: lambda c: not c.isspace(),
+    sre_constants.CATEGORY_WORD: lambda c: c.isalnum() or c == '_',
+    sre_constants.CATEGORY_NOT_WORD: lambda c: not (c.isalnum() or c == '_'),
+}
+
+
+def _in_class(items, ch: str) -> bool:
+    negate = False
+    hit = False
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            hit = hit or ord(ch) == av
+        elif op == sre_constants.RANGE:
+            hit = hit or av[0] <= ord(ch) <= av[1]
+        elif op == sre_constants.CATEGORY:
+            test = _CATEGORY_TESTS.get(av)
+            hit = hit or (test is not None and test(ch))
+    return hit != negate
+
+
+def _charset(nodes, dotall: bool) -> frozenset:
+    """子模式可能消耗的全部字符（在样本字母表上近似）"""
+    chars = set()
+    for op, av in nodes:
+        if op == sre_constants.LITERAL:
+            chars.add(chr(av))
+        elif op == sre_constants.NOT_LITERAL:
+            chars.update(c for c in _ALPHABET if ord(c) != av)
+        elif op == sre_constants.ANY:
+            chars.update(c for c in _ALPHABET if dotall or c != '\n')
+        elif op == sre_constants.IN:
+            chars.update(c for c in _ALPHABET if _in_class(av, c))
+        elif op == sre_constants.SUBPATTERN:
+            chars |= _charset(av[-1], dotall)
+        elif op == sre_constants.BRANCH:
+            for alt in av[1]:
+                chars |= _charset(alt, dotall)
+        elif op in _REPEATS or op == _POSSESSIVE:
+            chars |= _charset(av[2], dotall)
+        elif op == _ATOMIC_GROUP:
+            chars |= _charset(av, dotall)
+    return frozenset(chars)
+
+
+def _first_chars(nodes, dotall: bool) -> frozenset:
+    """子模式第一个字符可能的取值（遇到可为空的项时继续向后合并）"""
+    chars = set()
+    for node in nodes:
+        op, av = node
+        if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT, sre_constants.AT):
+            continue
+        if op == sre_constants.SUBPATTERN:
+            sub = av[-1]
+        elif op == _ATOMIC_GROUP:
+            sub = av
+        elif op in _REPEATS or op == _POSSESSIVE:
+            chars |= _first_chars(av[2], dotall)
+            if av[0] == 0:
+                continue
+            return frozenset(chars)
+        elif op == sre_constants.BRANCH:
+            for alt in av[1]:
+                chars |= _first_chars(alt, dotall)
+            return frozenset(chars)
+        else:
+            return frozenset(chars | _charset([node], dotall))
+        chars |= _first_chars(sub, dotall)
+        return frozenset(chars)
+    return frozenset(chars)
+
+
+def _can_be_empty(nodes) -> bool:
+    for op, av in nodes:
+        if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT, sre_constants.AT):
+            continue
+        if op in _REPEATS or op == _POSSESSIVE:
+            if av[0] > 0 and not _can_be_empty(av[2]):
+                return False
+        elif op == sre_constants.SUBPATTERN:
+            if not _can_be_empty(av[-1]):
+                return False
+        elif op == sre_constants.BRANCH:
+            if not any(_can_be_empty(alt) for alt in av[1]):
+                return False
+        else:
+            return False
+    return True
+
+
+def _describe(ch_set: Iterable[str]) -> str:
+    sample = sorted(ch_set)[:5]
+    return ''.join(repr(c)[1:-1] for c in sample)
+
+
+def _delimited(nodes, index: int, body_first: frozenset, dotall: bool) -> bool:
+    """nodes[index] 的量词之后是否紧跟一个它无法开始匹配的必需项（如 \\[ ... *\\] 中的 \\]）"""
+    for node in nodes[index + 1:]:
+        if _can_be_empty([node]):
+            continue
+        return not (_first_chars([node], dotall) & body_first)
+    return False
+
+
+def audit_pattern(pattern, flags: int = 0) -> List[Tuple[str, str]]:
+    """
+    静态检查一个正则，返回 [(严重程度, 说明)]
+
+    error: 无界量词内嵌套了没有分隔符的可重复量词，如 (a+)+、(\\w+\\s*)*
+    warning: 无界量词内的分支首字符重叠，如 (a|ab)*；相邻无界量词可匹配相同字符，如 \\s*\\s*
+    """
+    if isinstance(pattern, re.Pattern):
+        flags |= pattern.flags
+        pattern = pattern.pattern
+    dotall = bool(flags & re.DOTALL)
+    findings: List[Tuple[str, str]] = []
+
+    def check_branches(sub):
+        """量词直接作用的分支之间首字符不能重叠"""
+        nodes = list(sub)
+        while len(nodes) == 1 and nodes[0][0] == sre_constants.SUBPATTERN:
+            nodes = list(nodes[0][1][-1])
+        if len(nodes) != 1 or nodes[0][0] != sre_constants.BRANCH:
+            return
+        firsts = [_first_chars(alt, dotall) for alt in nodes[0][1][1]]
+        for i in range(len(firsts)):
+            for j in range(i + 1, len(firsts)):
+                common = firsts[i] & firsts[j]
+                if common:
+                    findings.append(('warning', f"量词内第 {i + 1} 与第 {j + 1} 个分支首字符重叠 "
+                                                f"[{_describe(common)}]"))
+                    return
+
+    def walk(nodes, outer: Optional[str]):
+        nodes = list(nodes)
+        pending = None   # 上一个无界量词的字符集（中间只隔着可为空的项）
+        for index, (op, av) in enumerate(nodes):
+            if op in _REPEATS:
+                lo, hi, sub = av
+                unbounded = hi == _MAXREPEAT
+                body = _charset(sub, dotall)
+                if (outer is not None and hi > 1 and not _can_be_empty(sub)
+                        and not _delimited(nodes, index, _first_chars(sub, dotall), dotall)):
+                    findings.append(('error', f"嵌套量词: {outer} 内部又有可重复的量词，失败时会指数级回溯"))
+                if unbounded:
+                    if pending is not None and pending & body:
+                        findings.append(('warning', f"相邻的无界量词可匹配相同字符 [{_describe(pending & body)}]，"
+                                                    "失败时可能多项式回溯"))
+                    check_branches(sub)
+                walk(sub, f"量词 {{{lo},∞}}" if unbounded else outer)
+                pending = body if unbounded else (pending if lo == 0 else None)
+            elif op == _POSSESSIVE or op == _ATOMIC_GROUP:
+                # 占有量词和原子组不回溯
+                walk(av[2] if op == _POSSESSIVE else av, None)
+                pending = None
+            elif op == sre_constants.SUBPATTERN:
+                walk(av[-1], outer)
+                if not _can_be_empty(av[-1]):
+                    pending = None
+            elif op == sre_constants.BRANCH:
+                for alt in av[1]:
+                    walk(alt, outer)
+                pending = None
+            elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+                walk(av[1], None)
+            elif op != sre_constants.AT:
+                pending = None
+
+    walk(sre_parse.parse(pattern, flags), None)
+    return list(dict.fromkeys(findings))
+
+
+# 只以 match()/scanner() 方式使用的规则组，模糊测试时按同样方式计时
+ANCHORED_RULE_SETS = {'ts_lexer'}
+
+# tstools 之外、模块级正则同样需要审计的脚本（相对仓库根目录）
+AUDITED_SCRIPTS = ['fix_syntax_errors.py']
+
+
+def rule_sets() -> Dict[str, Dict[str, re.Pattern]]:
+    """各模块中需要审计的正则（按模块分组）：tstools 各模块和 AUDITED_SCRIPTS 中全部模块级的已编译正则"""
+    import importlib
+    import pkgutil
+
+    import tstools
+    from tstools import paths
+
+    modules = {info.name.split('.', 1)[1]: importlib.import_module(info.name)
+               for info in pkgutil.walk_packages(tstools.__path__, 'tstools.')}
+    for script in AUDITED_SCRIPTS:
+        name = Path(script).stem.replace('-', '_')
+        modules[name] = paths.load_script(paths.REPO_DIR / script, name)
+
+    sets = {}
+    for group, module in sorted(modules.items()):
+        patterns = {name: value for name, value in vars(module).items() if isinstance(value, re.Pattern)}
+        if patterns:
+            sets[group] = patterns
+    return sets
+
+
+def audit_rule_sets(sets: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Finding]:
+    sets = sets if sets is not None else rule_sets()
+    findings = []
+    for group, patterns in sets.items():
+        for name, pattern in patterns.items():
+            for severity, message in audit_pattern(pattern):
+                findings.append(Finding(f'{group}.{name}', severity, message))
+    return findings
+
+
+# ---------------------------------------------------------------- 模糊测试
+
+class ScalingResult(NamedTuple):
+    name: str
+    exponent: Optional[float]      # None 表示在预算内没跑完（视为灾难性回溯）
+    worst_input: str               # 最坏输入的描述
+    timings: List[Tuple[int, float]]
+
+
+def _pump_inputs(regex: re.Pattern) -> Dict[str, Callable[[int], str]]:
+    """根据正则中各量词可消耗的字符构造可"泵"的输入"""
+    dotall = bool(regex.flags & re.DOTALL)
+    tree = sre_parse.parse(regex.pattern, regex.flags)
+    pumps = []
+
+    def collect(nodes):
+        for op, av in nodes:
+            if op in _REPEATS or op == _POSSESSIVE:
+                chars = sorted(_charset(av[2], dotall))
+                if chars:
+                    # 每个量词取几个有代表性的字符
+                    picks = {c for c in chars if c in ' a0_\\\n/\'"`${'} or {chars[0]}
+                    pumps.extend(sorted(picks))
+                collect(av[2])
+            elif op == sre_constants.SUBPATTERN:
+                collect(av[-1])
+            elif op == sre_constants.BRANCH:
+                for alt in av[1]:
+                    collect(alt)
+            elif op == _ATOMIC_GROUP:
+                collect(av)
+            elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+                collect(av[1])
+
+    collect(tree)
+    prefixes = {''}
+    first = sorted(_first_chars(tree, dotall))
+    prefixes.update(c for c in first if not c.isalnum())
+    inputs = {}
+    for pump in dict.fromkeys(pumps):
+        for prefix in sorted(prefixes)[:4]:
+            for suffix in ('', '\n', '\x00'):
+                label = repr(prefix + pump + '…' + suffix)
+                inputs[label] = (lambda n, p=prefix, c=pump, s=suffix: p + c * n + s)
+    # 两个字符交替，触发相邻量词之间的重叠
+    for a, b in zip(pumps, pumps[1:]):
+        inputs[repr(a + b + '…')] = (lambda n, a=a, b=b: (a + b) * (n // 2) + '\x00')
+    return inputs
+
+
+def _time_scan(regex: re.Pattern, text: str, anchored: bool = False) -> float:
+    """
+    扫描一遍 text 并返回耗时
+
+    anchored=False 时从每个位置尝试匹配（等价于反复 search）；
+    anchored=True 时按词法分析器的用法，从上次匹配结束处连续 match，失败即停止。
+    """
+    start = time.perf_counter()
+    if anchored:
+        scanner = regex.scanner(text)
+        while scanner.match():
+            pass
+    else:
+        for _ in regex.finditer(text):
+            pass
+    return time.perf_counter() - start
+
+
+def fuzz_pattern(name: str, regex: re.Pattern, sizes: Sequence[int] = (2000, 4000, 8000, 16000),
+                 budget: float = 2.0, anchored: bool = False) -> ScalingResult:
+    """找出最慢的泵输入，并用对数坐标下的最小二乘估计耗时 ~ n^k 的指数 k"""
+    inputs = _pump_inputs(regex)
+    if not inputs:
+        return ScalingResult(name, 1.0, '', [])
+
+    # 先用最小规模挑出最慢的输入
+    worst_label, worst_time = None, -1.0
+    for label, make in inputs.items():
+        try:
+            with time_budget(budget):
+                elapsed = _time_scan(regex, make(sizes[0]), anchored)
+        except BudgetExceeded:
+            return ScalingResult(name, None, label, [(sizes[0], budget)])
+        if elapsed > worst_time:
+            worst_label, worst_time = label, elapsed
+
+    make = inputs[worst_label]
+    timings = []
+    for n in sizes:
+        text = make(n)
+        try:
+            with time_budget(budget):
+                # 重复到累计 20ms 以上再取平均，减少计时噪声
+                runs, total = 0, 0.0
+                while total < 0.02 and runs < 50:
+                    total += _time_scan(regex, text, anchored)
+                    runs += 1
+        except BudgetExceeded:
+            return ScalingResult(name, None, worst_label, timings + [(n, budget)])
+        timings.append((n, total / runs))
+
+    xs = [math.log(n) for n, _ in timings]
+    ys = [math.log(max(t, 1e-9)) for _, t in timings]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    slope = (sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+             / sum((x - mean_x) ** 2 for x in xs))
+    return ScalingResult(name, slope, worst_label, timings)
+
+
+def fuzz_rule_sets(sets: Optional[Dict[str, Dict[str, re.Pattern]]] = None,
+                   **kwargs) -> List[ScalingResult]:
+    sets = sets if sets is not None else rule_sets()
+    results = []
+    for group, patterns in sets.items():
+        for name, pattern in patterns.items():
+            results.append(fuzz_pattern(f'{group}.{name}', pattern,
+                                        anchored=group in ANCHORED_RULE_SETS, **kwargs))
+    return results
@@ -0,0 +1,109 @@
+"""
+持久化增量结果缓存
+
+按 (路径, 大小, mtime, 内容哈希) 缓存每个文件的分析结果：
+- 大小和mtime都没变：直接复用，不读文件
+- 大小或mtime变了但内容哈希相同（如git checkout）：复用并刷新stat
+- 其余情况重新分析
+
+缓存带版本戳，分类规则（脚本源码）变化时整体失效。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+# 缓存文件格式版本，结构变化时递增
+CACHE_FORMAT = 1
+
+
+def content_digest(data) -> str:
+    """文件内容哈希（bytes 或 mmap 等支持缓冲区协议的对象）"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def rules_fingerprint(sources: Iterable[Path]) -> str:
+    """根据规则实现的源码计算版本戳"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(CACHE_FORMAT).encode())
+    for source in sources:
+        h.update(Path(source).read_bytes())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """单个JSON文件承载的结果缓存"""
+
+    def __init__(self, path: Path, version: str, rebuild: bool = False):
+        self.path = Path(path)
+        self.version = version
+        self.entries: Dict[str, dict] = {}
+        self._seen = set()
+        self.hits = 0
+        self.misses = 0
+        if not rebuild:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.version:
+            self.entries = data.get('entries', {})
+
+    def lookup(self, key: str, st: os.stat_result) -> Optional[dict]:
+        """stat未变时返回缓存条目"""
+        self._seen.add(key)
+        entry = self.entries.get(key)
+        if entry and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime_ns:
+            self.hits += 1
+            return entry
+        return None
+
+    def digest_of(self, key: str) -> Optional[str]:
+        """已缓存的内容哈希（用于stat变化后的二次确认）"""
+        entry = self.entries.get(key)
+        return entry['digest'] if entry else None
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.entries.get(key)
+
+    def forget(self, key: str):
+        """文件被删除时移除条目"""
+        self.entries.pop(key, None)
+        self._seen.discard(key)
+
+    def store(self, key: str, st: os.stat_result, digest: str, result: Any, reused: bool = False):
+        self._seen.add(key)
+        if reused:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.entries[key] = {
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'digest': digest,
+            'result': result,
+        }
+
+    def save(self, prune: bool = True):
+        """
+        写回磁盘（临时文件+rename），顺带清理本次未出现的文件
+
+        只扫描了部分文件（--staged / --since 等）时传 prune=False，保留其余文件的条目。
+        """
+        entries = self.entries if not prune else {k: v for k, v in self.entries.items() if k in self._seen}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=str(self.path.parent))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.version, 'entries': entries}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
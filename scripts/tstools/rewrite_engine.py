@@ -0,0 +1,123 @@
+"""
+并行原子批量改写引擎
+
+- 每个文件只读一次，由调用方提供的 fixer 在一次扫描中应用全部规则
+- 给出 hunks（git diff 改动行区间）时，fixer 只修改改动行，见 tstools/git_diff.py
+- 文件分发到进程池，结果按输入顺序流式返回
+- 写回采用"同目录临时文件 + rename"，中途中断不会留下写了一半的文件
+- dry-run 模式不写文件，返回统一diff格式的改动
+- change_records() 把结果转换为流式改动记录（见 tstools/findings.py）
+"""
+
+import difflib
+import functools
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from tstools import findings, profiling, regex_guard
+from tstools.git_diff import LineRanges
+from tstools.scan_engine import ScanStats, scan_files
+
+# 改动记录的规则ID -> 说明（写入 SARIF 的规则列表）
+REWRITE_RULES = {
+    'rewrite': "自动改写",
+    'rewrite-skipped': "跳过改写",
+    'rewrite-error': "改写失败",
+}
+
+# fixer: 文件内容 -> (新内容, 改动说明列表)，必须是可pickle的顶层函数；
+# 按 hunk 改写时以 fixer(content, lines) 调用，lines 为改动行区间
+Fixer = Callable[..., Tuple[str, List[str]]]
+
+
+class RewriteResult(NamedTuple):
+    path: str
+    changed: bool
+    changes: List[str]
+    diff: Optional[str] = None   # 仅 dry-run 时提供
+    error: Optional[str] = None
+
+
+def atomic_write(path, text: str, encoding: str = 'utf-8'):
+    """写入同目录的临时文件后 rename 覆盖，保留原文件权限"""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline='') as f:
+            f.write(text)
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def unified_diff(path: str, before: str, after: str) -> str:
+    return ''.join(difflib.unified_diff(
+        before.splitlines(keepends=True),
+        after.splitlines(keepends=True),
+        fromfile=f'a/{path}',
+        tofile=f'b/{path}',
+    ))
+
+
+def _rewrite_worker(item, fixer: Fixer, dry_run: bool, root=None) -> Tuple[int, RewriteResult]:
+    """读取、修复并（非dry-run时）原子写回单个文件（进程池worker）"""
+    path, lines = item if isinstance(item, tuple) else (item, None)
+    path = str(path)
+    label = os.path.relpath(path, root) if root is not None else path
+    try:
+        with profiling.phase('read'):
+            with open(path, 'rb') as f:
+                data = f.read()
+            content = data.decode('utf-8')
+        with profiling.phase('analyze'):
+            fixed, changes = fixer(content) if lines is None else fixer(content, lines)
+        if fixed == content:
+            # 未改动时 changes 中可能带有 fixer 给出的跳过说明
+            return len(data), RewriteResult(path, False, changes)
+        if dry_run:
+            return len(data), RewriteResult(path, True, changes, diff=unified_diff(label, content, fixed))
+        with profiling.phase('write'):
+            atomic_write(path, fixed)
+        return len(data), RewriteResult(path, True, changes)
+    except regex_guard.BudgetExceeded:
+        # 交给 budgeted_call 记为超时跳过，而不是改写失败
+        raise
+    except Exception as e:
+        return 0, RewriteResult(path, False, [], error=str(e))
+
+
+def change_records(result: RewriteResult, label: str, dry_run: bool = False) -> Iterator[dict]:
+    """单个文件的改写结果 -> 改动记录：改动为 note，跳过说明为 warning，失败为 error"""
+    if result.error:
+        yield findings.record('change', 'rewrite-error', 'error', label, result.error)
+        return
+    rule, level = ('rewrite', 'note') if result.changed else ('rewrite-skipped', 'warning')
+    for change in result.changes:
+        yield findings.record('change', rule, level, label, change, dry_run=dry_run)
+
+
+def rewrite_files(paths: Sequence, fixer: Fixer, workers: Optional[int] = None,
+                  dry_run: bool = False, stats: Optional[ScanStats] = None,
+                  root=None, budget: Optional[float] = None,
+                  hunks: Optional[Dict[str, LineRanges]] = None) -> Iterator[RewriteResult]:
+    """
+    在进程池中改写文件，按 paths 顺序流式产出结果
+
+    给出 root 时，dry-run 的diff中使用相对 root 的路径。
+    超出 budget 的文件不会被改写，记录在 stats.skipped 中。
+    hunks 为 {路径: 改动行区间}，其中的文件只改写改动行（区间为 None 时整个文件）。
+    """
+    worker = functools.partial(_rewrite_worker, fixer=fixer, dry_run=dry_run, root=root)
+    items = list(paths) if hunks is None else [(p, hunks.get(str(p))) for p in paths]
+    for _, result in scan_files(items, worker, workers=workers, stats=stats, budget=budget):
+        yield result
@@ -0,0 +1,902 @@
+"""
+管理后台统计查询的汇总表
+
+admin/users/* 等统计接口每次请求都对全表做 GROUP BY。这里把SQL目录（sql_catalog.py）中的聚合查询
+改写为读取预先汇总的数据：
+
+- 增量汇总表：单表、聚合可以按桶累加（COUNT / SUM / MIN / MAX，AVG 拆成 SUM + COUNT）、
+  有时间列的查询。按 DATE(时间列) 和 GROUP BY 的各表达式分桶保存部分聚合，刷新时只重算最近
+  lookback 天的桶（表有 updated_at 时再加上上次刷新后被修改的行所在的桶）；改写后的查询按桶再聚合，
+  时间条件改为桶上的条件，耗时只与天数和分组数有关，与用户数、订单数无关
+- 物化视图：其余查询（JOIN、CTE、UNION、COUNT(DISTINCT)、随时间变化的条件 ...）整条物化，
+  按计划 REFRESH MATERIALIZED VIEW CONCURRENTLY
+
+时间条件以 NOW() 为基准时，改写后按整天取数（起始那天从 0 点算起），记为近似，
+校验时与把时间条件对齐到 0 点的原查询比较。增量刷新不处理删除，计划中每周全量重建一次。
+
+带可选过滤（cond ? `AND user_id = ...` : ''）的查询按不带过滤的默认视图汇总，
+改写后的查询只能替换不带过滤的请求，带过滤的请求仍执行原查询（rewritten.sql 中逐条注明）。
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from tstools import sql_catalog
+from tstools.prisma_schema import Schema, quote_ident
+from tstools.sql_catalog import SqlTemplate
+
+# 默认处理的路由
+QUERY_PATHS = ['app/api/admin/users/', 'app/api/admin/costs/']
+
+KIND_INCREMENTAL = 'incremental'
+KIND_MATERIALIZED = 'materialized'
+
+# 增量刷新的方式：只追加的表按最近几天重算；有 updated_at 的表再重算被修改的行所在的桶
+STRATEGY_APPEND = 'append'
+STRATEGY_CHANGED = 'changed'
+
+STATE_TABLE = 'rollup_refresh_state'
+REFRESH_ALL = 'refresh_rollups'
+BUCKET = 'bucket'
+POSITION = 'rollup_pos'
+
+# 增量刷新时重算的最近天数（迟到的数据落在这些桶中）
+LOOKBACK_DAYS = 2
+# 按 updated_at 找被修改的行时向前多取的时间，覆盖上次刷新时尚未提交的事务
+REFRESH_OVERLAP = '5 minutes'
+
+# 默认刷新计划（pg_cron / crontab 格式）
+INCREMENTAL_CRON = '*/5 * * * *'
+MATERIALIZED_CRON = '0 * * * *'
+REBUILD_CRON = '30 3 * * 0'
+
+# 插入后不再变化的时间列
+INSERT_TIME_COLUMNS = {'created_at', 'createdat'}
+UPDATED_COLUMNS = ('updated_at', 'updatedAt')
+
+_MAX_NAME = 55     # 留出 refresh_ 前缀，整体不超过 63
+
+# 渲染时跳过的模板问题：修复不了的参数
+_BLOCKING_ISSUES = (sql_catalog.ISSUE_PLACEHOLDER_IN_LITERAL, sql_catalog.ISSUE_UNBOUND_PLACEHOLDER,
+                    sql_catalog.ISSUE_DYNAMIC_SQL)
+# cond ? `AND user_id = ...` : '' 形式的可选过滤：后台默认视图不带
+_OPTIONAL_FRAGMENT_RE = re.compile(r"\?[\s\S]*:\s*(?:''|\"\"|``)\s*$")
+
+AGGREGATES = {'count', 'sum', 'avg', 'min', 'max'}
+# 不能按桶累加的聚合函数
+_OTHER_AGGREGATES = {'array_agg', 'string_agg', 'json_agg', 'jsonb_agg', 'json_object_agg', 'jsonb_object_agg',
+                     'bool_and', 'bool_or', 'every', 'bit_and', 'bit_or', 'stddev', 'stddev_pop', 'stddev_samp',
+                     'variance', 'var_pop', 'var_samp', 'percentile_cont', 'percentile_disc', 'mode', 'corr',
+                     'covar_pop', 'covar_samp'}
+_NOW_FUNCTIONS = {'now', 'current_timestamp', 'localtimestamp', 'clock_timestamp', 'statement_timestamp',
+                  'transaction_timestamp'}
+_TIME_FUNCTIONS = _NOW_FUNCTIONS | {'current_date', 'current_time', 'localtime'}
+_KEYWORDS = {
+    'select', 'from', 'where', 'and', 'or', 'not', 'null', 'is', 'in', 'as', 'case', 'when', 'then', 'else', 'end',
+    'true', 'false', 'between', 'like', 'ilike', 'similar', 'escape', 'interval', 'over', 'partition', 'by',
+    'order', 'group', 'having', 'limit', 'offset', 'window', 'union', 'intersect', 'except', 'asc', 'desc',
+    'nulls', 'first', 'last', 'filter', 'distinct', 'all', 'any', 'some', 'exists', 'cast', 'extract', 'at',
+    'time', 'zone', 'with', 'without', 'unknown', 'isnull', 'notnull', 'rows', 'range', 'preceding',
+    'following', 'unbounded', 'current', 'row', 'collate', 'double', 'precision', 'varying',
+} | _TIME_FUNCTIONS
+# 作列名时必须加引号的保留字
+_RESERVED = {
+    'all', 'analyse', 'analyze', 'and', 'any', 'array', 'as', 'asc', 'both', 'case', 'cast', 'check', 'collate',
+    'column', 'constraint', 'create', 'current_catalog', 'current_date', 'current_role', 'current_time',
+    'current_timestamp', 'current_user', 'default', 'deferrable', 'desc', 'distinct', 'do', 'else', 'end',
+    'except', 'false', 'fetch', 'for', 'foreign', 'from', 'grant', 'group', 'having', 'in', 'initially',
+    'intersect', 'into', 'lateral', 'leading', 'limit', 'localtime', 'localtimestamp', 'not', 'null', 'offset',
+    'on', 'only', 'or', 'order', 'placing', 'primary', 'references', 'returning', 'select', 'session_user', 'some',
+    'symmetric', 'table', 'then', 'to', 'trailing', 'true', 'union', 'unique', 'user', 'using', 'variadic', 'when',
+    'where', 'window', 'with',
+}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<string>[Ee]?'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+)
+  | (?P<word>[^\W\d][\w$]*)
+  | (?P<param>\$\d+)
+  | (?P<op>::|<=|>=|<>|!=|\|\||[^\s\w])
+""", re.S | re.X)
+
+
+class Unsupported(ValueError):
+    """查询无法（按该方式）生成汇总，消息为原因"""
+
+
+class AggregateQuery(NamedTuple):
+    path: str
+    line: int
+    sql: str                    # 修复后、不带可选过滤的SQL
+    filters: Tuple[str, ...] = ()   # 去掉的可选过滤（JS 表达式）；不为空时改写只适用于不带这些过滤的请求
+
+    @property
+    def id(self) -> str:
+        return f"{self.path}:{self.line}"
+
+
+class Rollup(NamedTuple):
+    name: str
+    kind: str                   # incremental / materialized
+    queries: List[str]          # 使用该汇总的查询 id
+    table: Optional[str]        # 增量汇总的源表
+    time_column: Optional[str]
+    strategy: Optional[str]     # append / changed
+    updated: Optional[str]      # changed 方式用来找被修改的行的列
+    columns: List[str]
+    ddl: str
+    refresh: str                # 刷新函数
+    rewritten: str              # 读汇总的查询
+    reference: str             # 校验时与改写结果比较的原查询
+    exact: bool
+    notes: List[str]
+
+    @property
+    def function(self) -> str:
+        return f"refresh_{self.name}"
+
+    def to_dict(self) -> dict:
+        return dict(self._asdict(), function=self.function)
+
+
+class _Tok(NamedTuple):
+    kind: str
+    text: str
+    start: int
+    end: int
+
+    @property
+    def norm(self) -> str:
+        return self.text if self.kind in ('string', 'quoted') else self.text.lower()
+
+
+def tokenize(sql: str) -> List[_Tok]:
+    """SQL 词法单元（去掉空白和注释）"""
+    tokens = []
+    for m in _TOKEN_RE.finditer(sql):
+        if m.lastgroup != 'space':
+            tokens.append(_Tok(m.lastgroup, m.group(), m.start(), m.end()))
+    return tokens
+
+
+def _pairs(tokens: Sequence[_Tok]) -> Dict[int, int]:
+    pairs, stack = {}, []
+    for i, tok in enumerate(tokens):
+        if tok.text == '(':
+            stack.append(i)
+        elif tok.text == ')' and stack:
+            pairs[stack.pop()] = i
+    if stack:
+        raise Unsupported("括号不匹配")
+    return pairs
+
+
+def _is_word(tok: _Tok, *names: str) -> bool:
+    return tok.kind == 'word' and tok.text.lower() in names
+
+
+def _ident(name: str) -> str:
+    return name if re.fullmatch(r'[a-z_][a-z0-9_]*', name) and name not in _RESERVED else quote_ident(name)
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
+
+def rollup_name(path: str, line: int) -> str:
+    """app/api/admin/users/behavior/route.ts:257 -> rollup_admin_users_behavior_257"""
+    stem = re.sub(r'^app/api/|/route\.\w+$|\.\w+$', '', path)
+    suffix = f"_{line}"
+    return ('rollup_' + _slug(stem))[:_MAX_NAME - len(suffix)] + suffix
+
+
+# ---------- 取得后台默认视图下的SQL ----------
+
+def optional_filters(template: SqlTemplate) -> List[dict]:
+    """cond ? `AND ...` : '' 形式的参数（后台默认视图不带这些过滤）"""
+    return [p for p in template.params + template.inline if _OPTIONAL_FRAGMENT_RE.search(p['expr'])]
+
+
+def dashboard_sql(template: SqlTemplate) -> str:
+    """模板在后台默认视图（不带可选过滤）下的SQL，修复开头的分号和改坏的运算符"""
+    blocking = [issue for issue in template.issues if issue in _BLOCKING_ISSUES]
+    if template.sql is None or blocking:
+        raise Unsupported('; '.join(sql_catalog.ISSUES[issue] for issue in blocking or
+                                    [sql_catalog.ISSUE_DYNAMIC_SQL]))
+    optional = optional_filters(template)
+    if not optional:
+        return sql_catalog.repair_sql(template.sql)
+
+    def value(param: dict) -> str:
+        return '' if param in optional else param['sample']
+
+    text = template.template
+    for item in template.inline:
+        text = text.replace('${' + item['expr'] + '}', value(item))
+    text = re.sub(r'\$(\d+)', lambda m: value(template.params[int(m.group(1)) - 1])
+                  if int(m.group(1)) <= len(template.params) else m.group(), text)
+    return sql_catalog.repair_sql(text)
+
+
+def is_aggregate(sql: str) -> bool:
+    """SELECT 查询，且有 GROUP BY 或聚合函数"""
+    tokens = tokenize(sql)
+    if not tokens or not _is_word(tokens[0], 'select', 'with'):
+        return False
+    for i, tok in enumerate(tokens[:-1]):
+        if _is_word(tok, 'group') and _is_word(tokens[i + 1], 'by'):
+            return True
+        if _is_word(tok, *AGGREGATES) and tokens[i + 1].text == '(':
+            return True
+    return False
+
+
+def collect_queries(catalog: Sequence[SqlTemplate], prefixes: Sequence[str]
+                    ) -> Tuple[List[AggregateQuery], List[Tuple[SqlTemplate, str]]]:
+    """目录中位于 prefixes 下的聚合查询；返回 (查询, [(无法使用的模板, 原因)])"""
+    queries, skipped = [], []
+    for template in catalog:
+        if not any(template.path.startswith(prefix) for prefix in prefixes):
+            continue
+        if template.sql is not None and not is_aggregate(sql_catalog.repair_sql(template.sql)):
+            continue
+        try:
+            sql = dashboard_sql(template)
+            filters = tuple(' '.join(p['expr'].split()) for p in optional_filters(template))
+            queries.append(AggregateQuery(template.path, template.line, sql, filters))
+        except Unsupported as e:
+            skipped.append((template, str(e)))
+    return queries, skipped
+
+
+def load_queries(path: Path, rel_path: str) -> List[AggregateQuery]:
+    """补充的聚合查询文件：每条查询以 `-- name: ...` 行开头（name 只作说明），以分号或下一个 name 结束"""
+    queries = []
+    current: Optional[Tuple[int, List[str]]] = None
+
+    def flush():
+        if current is not None and ''.join(current[1]).strip().strip(';').strip():
+            queries.append(AggregateQuery(rel_path, current[0], '\n'.join(current[1]).strip().rstrip(';').strip()))
+
+    for lineno, line in enumerate(path.read_text(encoding='utf-8').splitlines(), 1):
+        if re.match(r'\s*--\s*name\s*:', line):
+            flush()
+            current = (lineno, [])
+        elif current is not None:
+            current[1].append(line)
+    flush()
+    return queries
+
+
+# ---------- 解析 ----------
+
+def _clauses(tokens: Sequence[_Tok], pairs: Dict[int, int]) -> Dict[str, Tuple[int, int]]:
+    """单个 SELECT 的各子句（顶层）的词法单元范围；CTE、UNION、子查询、DISTINCT 抛出 Unsupported"""
+    if not tokens or not _is_word(tokens[0], 'select'):
+        raise Unsupported("WITH（CTE）查询" if tokens and _is_word(tokens[0], 'with') else "不是 SELECT")
+    if len(tokens) > 1 and _is_word(tokens[1], 'distinct'):
+        raise Unsupported("SELECT DISTINCT")
+    marks = []
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok.text == '(':
+            if any(_is_word(t, 'select') for t in tokens[i + 1:pairs[i]]):
+                raise Unsupported("包含子查询")
+            i = pairs[i] + 1
+            continue
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        if _is_word(tok, 'union', 'intersect', 'except'):
+            raise Unsupported("UNION / INTERSECT / EXCEPT")
+        if _is_word(tok, 'window', 'fetch', 'for'):
+            raise Unsupported(f"{tok.text.upper()} 子句")
+        if _is_word(tok, 'group', 'order') and nxt is not None and _is_word(nxt, 'by'):
+            marks.append((tok.text.lower(), i, i + 2))
+            i += 2
+            continue
+        if _is_word(tok, 'select', 'from', 'where', 'having', 'limit', 'offset'):
+            marks.append((tok.text.lower(), i, i + 1))
+        i += 1
+    clauses = {}
+    for k, (name, _, body) in enumerate(marks):
+        end = marks[k + 1][1] if k + 1 < len(marks) else len(tokens)
+        if tokens[end - 1].text == ';':
+            end -= 1
+        if name in clauses:
+            raise Unsupported(f"重复的 {name.upper()} 子句")
+        clauses[name] = (body, end)
+    return clauses
+
+
+def _split(tokens: Sequence[_Tok], pairs: Dict[int, int], a: int, b: int, sep: str = ',') -> List[Tuple[int, int]]:
+    """按顶层的逗号（或 AND，BETWEEN ... AND 除外）分割"""
+    parts, start, between = [], a, False
+    i = a
+    while i < b:
+        tok = tokens[i]
+        if tok.text == '(':
+            i = pairs[i] + 1
+            continue
+        if sep == 'and' and _is_word(tok, 'between'):
+            between = True
+        elif (tok.text == ',' if sep == ',' else _is_word(tok, 'and')):
+            if sep == 'and' and between:
+                between = False
+            else:
+                parts.append((start, i))
+                start = i + 1
+        i += 1
+    if start < b:
+        parts.append((start, b))
+    return parts
+
+
+def _ref_end(tokens: Sequence[_Tok], i: int, a: int, b: int) -> Optional[int]:
+    """tokens[i] 开始的列引用（col / alias.col）的结束位置；不是列引用时返回 None"""
+    tok = tokens[i]
+    if tok.kind not in ('word', 'quoted') or (tok.kind == 'word' and tok.text.lower() in _KEYWORDS):
+        return None
+    if i + 1 < b and (tokens[i + 1].text == '(' or tokens[i + 1].kind == 'string'):
+        return None        # 函数调用、DATE '2024-01-01' 这样的类型字面量
+    if i > a and (tokens[i - 1].text in ('::', '.') or _is_word(tokens[i - 1], 'as')):
+        return None        # 类型名、别名
+    if i >= 2 and tokens[i - 1].text == '(' and _is_word(tokens[i - 2], 'extract'):
+        return None        # EXTRACT(hour FROM ...) 的字段名
+    j = i + 1
+    while j + 1 < b and tokens[j].text == '.' and tokens[j + 1].kind in ('word', 'quoted'):
+        j += 2
+    return j
+
+
+def _refs(tokens: Sequence[_Tok], a: int, b: int) -> List[str]:
+    refs = []
+    i = a
+    while i < b:
+        j = _ref_end(tokens, i, a, b)
+        if j is None:
+            i += 1
+            continue
+        refs.append(''.join(t.norm for t in tokens[i:j]))
+        i = j
+    return refs
+
+
+class _Item(NamedTuple):
+    a: int
+    b: int                      # 表达式的范围（不含别名）
+    alias: Optional[str]
+
+
+def _select_items(tokens: Sequence[_Tok], pairs: Dict[int, int], a: int, b: int) -> List[_Item]:
+    items = []
+    for x, y in _split(tokens, pairs, a, b):
+        alias = None
+        if y - x >= 3 and _is_word(tokens[y - 2], 'as'):
+            alias, y = tokens[y - 1], y - 2
+        elif (y - x >= 2 and tokens[y - 1].kind in ('word', 'quoted') and
+              not (tokens[y - 1].kind == 'word' and tokens[y - 1].text.lower() in _KEYWORDS) and
+              (tokens[y - 2].text == ')' or tokens[y - 2].kind in ('string', 'number', 'quoted') or
+               (tokens[y - 2].kind == 'word' and tokens[y - 2].text.lower() not in _KEYWORDS))):
+            alias, y = tokens[y - 1], y - 1
+        name = None
+        if alias is not None:
+            name = alias.text[1:-1].replace('""', '"') if alias.kind == 'quoted' else alias.text.lower()
+        items.append(_Item(x, y, name))
+    return items
+
+
+def _output_name(tokens: Sequence[_Tok], item: _Item) -> str:
+    """查询结果中该列的名称（与 PostgreSQL 的命名规则一致）"""
+    if item.alias:
+        return item.alias
+    first = tokens[item.a]
+    end = _ref_end(tokens, item.a, item.a, item.b)
+    if end == item.b or (end is not None and end < item.b and tokens[end].text == '::'):
+        last = tokens[end - 1]
+        return last.text[1:-1] if last.kind == 'quoted' else last.text.lower()
+    if first.kind == 'word' and item.a + 1 < item.b and tokens[item.a + 1].text == '(':
+        return first.text.lower()
+    if _is_word(first, 'case'):
+        return 'case'
+    return '?column?'
+
+
+def output_columns(sql: str) -> List[str]:
+    """查询结果的列名（CTE 之后的主查询、UNION 的第一个分支）；有 * 时抛出 Unsupported"""
+    tokens = tokenize(sql)
+    pairs = _pairs(tokens)
+    i = 0
+    while i < len(tokens) and not _is_word(tokens[i], 'select'):
+        i = pairs[i] + 1 if tokens[i].text == '(' else i + 1
+    if i == len(tokens):
+        raise Unsupported("找不到 SELECT")
+    start = i + 1
+    if start < len(tokens) and _is_word(tokens[start], 'distinct', 'all'):
+        start += 1
+    j = start
+    while j < len(tokens) and not _is_word(tokens[j], 'from', 'union', 'intersect', 'except'):
+        j = pairs[j] + 1 if tokens[j].text == '(' else j + 1
+    names = []
+    for item in _select_items(tokens, pairs, start, j):
+        if tokens[item.b - 1].text == '*':
+            raise Unsupported("输出列无法确定（SELECT *）")
+        names.append(_output_name(tokens, item))
+    return names
+
+
+class _Filter(NamedTuple):
+    column: str                 # 列引用（未加引号的部分转为小写）
+    op: str
+    rhs: Tuple[int, int]
+    exact: bool                 # 以 CURRENT_DATE 为基准：按天取数与原条件等价
+
+
+def _time_filter(tokens: Sequence[_Tok], pairs: Dict[int, int], a: int, b: int) -> Optional[_Filter]:
+    """col >= <与列无关的时间表达式> / col < ...；其他形式返回 None"""
+    ops = [i for i in range(a, b) if tokens[i].text in ('>=', '<', '>', '<=', '=', '<>', '!=')]
+    if len(ops) != 1 or tokens[ops[0]].text not in ('>=', '<'):
+        return None
+    k = ops[0]
+    if _ref_end(tokens, a, a, k) != k or _refs(tokens, k + 1, b):
+        return None
+    words = {t.text.lower() for t in tokens[k + 1:b] if t.kind == 'word'}
+    return _Filter(''.join(t.norm for t in tokens[a:k]), tokens[k].text, (k + 1, b), not words & _NOW_FUNCTIONS)
+
+
+def sql_text(tokens: Sequence[_Tok], a: int, b: int, source: Optional[str] = None) -> str:
+    """词法单元范围对应的原文（source 缺省时用单个空格连接）"""
+    if a >= b:
+        return ''
+    if source is not None:
+        return source[tokens[a].start:tokens[b - 1].end]
+    return ' '.join(t.text for t in tokens[a:b])
+
+
+def _time_column(tokens: Sequence[_Tok], a: int, b: int) -> Optional[str]:
+    """DATE(col)、DATE_TRUNC('x', col)、EXTRACT(x FROM col)、col::date 中的列"""
+    first = tokens[a]
+    refs = _refs(tokens, a, b)
+    if len(refs) != 1:
+        return None
+    if _is_word(first, 'date', 'date_trunc', 'extract') and a + 1 < b and tokens[a + 1].text == '(':
+        return refs[0]
+    if b - a >= 3 and tokens[b - 2].text == '::' and _is_word(tokens[b - 1], 'date'):
+        return refs[0]
+    return None
+
+
+# ---------- 增量汇总 ----------
+
+class _Incremental:
+    """把单个聚合查询拆成按桶的部分聚合和读汇总的查询"""
+
+    def __init__(self, name: str, sql: str, schema: Optional[Schema], append_only: Set[str], lookback: int):
+        self.name = name
+        self.sql = sql
+        self.schema = schema
+        self.append_only = append_only
+        self.lookback = lookback
+        self.tokens = tokenize(sql)
+        self.pairs = _pairs(self.tokens)
+        self.subs: List[Tuple[List[str], str]] = []         # (表达式的词法单元, 汇总表中的列)
+        self.partials: Dict[tuple, Tuple[str, str]] = {}    # 部分聚合 -> (列名, 表达式)
+        self.allowed: Set[str] = set()
+        self.leftover: List[str] = []
+
+    def text(self, a: int, b: int) -> str:
+        return sql_text(self.tokens, a, b, self.sql)
+
+    def norm(self, a: int, b: int) -> List[str]:
+        return [t.norm for t in self.tokens[a:b]]
+
+    def source_table(self, a: int, b: int) -> Tuple[str, Optional[str]]:
+        tokens = self.tokens
+        parts = [t for t in tokens[a:b] if not _is_word(t, 'as')]
+        if not parts or any(t.kind not in ('word', 'quoted') and t.text != '.' for t in parts):
+            raise Unsupported("FROM 中有 JOIN、子查询或多个表")
+        names = [t for t in parts if t.text != '.']
+        dotted = len(parts) - len(names)
+        if len(names) - dotted > 2 or any(_is_word(t, 'join', 'on', 'lateral') for t in names):
+            raise Unsupported("FROM 中有 JOIN 或多个表")
+        table = names[dotted].text.strip('"')
+        alias = names[-1].text if len(names) == dotted + 2 else None
+        return table, alias
+
+    def strategy(self, table: str, column: str) -> Tuple[str, Optional[str]]:
+        """(刷新方式, updated_at 列)"""
+        model = self.schema.by_table().get(table) if self.schema is not None else None
+        if model is not None:
+            for field in self.schema.scalar_fields(model):
+                if field.column in UPDATED_COLUMNS:
+                    return STRATEGY_CHANGED, field.column
+        bare = column.split('.')[-1].strip('"')
+        if bare.lower() in INSERT_TIME_COLUMNS or table in self.append_only:
+            return STRATEGY_APPEND, None
+        raise Unsupported(f"{table}.{bare} 不是插入时间且表没有 updated_at，无法判断哪些桶需要重算")
+
+    def partial(self, fn: str, args: Tuple[int, int], filter_text: str) -> str:
+        """聚合调用 -> 按桶再聚合的表达式，登记需要保存的部分聚合"""
+        a, b = args
+        arg_text = self.text(a, b)
+
+        def add(kind: str) -> str:
+            key = (kind, tuple(self.norm(a, b)), filter_text)
+            if key not in self.partials:
+                refs = _refs(self.tokens, a, b)
+                if arg_text == '*':
+                    base = f"{kind}_rows"
+                elif len(refs) == 1 and _ref_end(self.tokens, a, a, b) == b:
+                    base = f"{kind}_{_slug(refs[0].split('.')[-1])}"
+                else:
+                    base = f"{kind}_expr"
+                if filter_text:
+                    base += '_filtered'
+                column = base
+                used = {c for c, _ in self.partials.values()} | {sub for _, sub in self.subs}
+                n = 2
+                while column in used or column in (BUCKET, POSITION):
+                    column = f"{base}_{n}"
+                    n += 1
+                expr = f"{kind.upper()}({arg_text})" + (f" {filter_text}" if filter_text else '')
+                self.partials[key] = (column, expr)
+            return _ident(self.partials[key][0])
+
+        if fn == 'count':
+            return f"COALESCE(SUM({add('count')}), 0)::bigint"
+        if fn == 'sum':
+            return f"SUM({add('sum')})"
+        if fn in ('min', 'max'):
+            return f"{fn.upper()}({add(fn)})"
+        total = add('sum')
+        count = add('count')
+        return f"(SUM({total})::numeric / NULLIF(SUM({count}), 0))"
+
+    def substitute(self, i: int, b: int) -> Optional[Tuple[int, str]]:
+        tokens = self.tokens
+        tok = tokens[i]
+        if not (i > 0 and (tokens[i - 1].text in ('.', '::') or _is_word(tokens[i - 1], 'as'))):
+            for norm, column in self.subs:
+                n = len(norm)
+                if i + n <= b and self.norm(i, i + n) == norm:
+                    return i + n, column
+        name = tok.text.lower()
+        if tok.kind != 'word' or name not in AGGREGATES | _OTHER_AGGREGATES or i + 1 >= b or \
+                tokens[i + 1].text != '(':
+            return None
+        close = self.pairs[i + 1]
+        j = close + 1
+        filter_text = ''
+        if j + 1 < b and _is_word(tokens[j], 'filter') and tokens[j + 1].text == '(':
+            filter_text = self.text(j, self.pairs[j + 1] + 1)
+            j = self.pairs[j + 1] + 1
+        if j < b and _is_word(tokens[j], 'over'):
+            # 窗口函数作用在分组后的结果上，只改写其参数
+            if filter_text:
+                raise Unsupported("带 FILTER 的窗口聚合")
+            return close + 1, f"{tok.text}({self.rewrite(i + 2, close)})"
+        if name in _OTHER_AGGREGATES:
+            raise Unsupported(f"{tok.text.upper()} 不能按桶累加")
+        if i + 2 == close or _is_word(tokens[i + 2], 'distinct') or \
+                any(_is_word(t, 'order') for t in tokens[i + 2:close]):
+            raise Unsupported(f"{tok.text.upper()}(DISTINCT / ORDER BY ...) 不能按桶累加")
+        return j, self.partial(name, (i + 2, close), filter_text)
+
+    def rewrite(self, a: int, b: int) -> str:
+        """把表达式中的分组表达式和聚合替换为汇总表上的表达式"""
+        if a >= b:
+            return ''
+        tokens = self.tokens
+        out, pos, i = [], tokens[a].start, a
+        while i < b:
+            sub = self.substitute(i, b)
+            if sub is None:
+                end = _ref_end(tokens, i, a, b)
+                if end is not None:
+                    ref = ''.join(t.norm for t in tokens[i:end])
+                    if ref not in self.allowed:
+                        self.leftover.append(self.text(i, end))
+                    i = end
+                else:
+                    i += 1
+                continue
+            j, replacement = sub
+            out.append(self.sql[pos:tokens[i].start])
+            out.append(replacement)
+            pos = tokens[j - 1].end
+            i = j
+        out.append(self.sql[pos:tokens[b - 1].end])
+        return ''.join(out)
+
+    def build(self) -> Rollup:
+        tokens = self.tokens
+        clauses = _clauses(tokens, self.pairs)
+        if 'from' not in clauses:
+            raise Unsupported("没有 FROM")
+        table, alias = self.source_table(*clauses['from'])
+        items = _select_items(tokens, self.pairs, *clauses['select'])
+
+        static, filters = [], []
+        for a, b in _split(tokens, self.pairs, *clauses['where'], sep='and') if 'where' in clauses else ():
+            words = {t.text.lower() for t in tokens[a:b] if t.kind == 'word'}
+            if not words & _TIME_FUNCTIONS:
+                static.append(self.text(a, b))
+                continue
+            found = _time_filter(tokens, self.pairs, a, b)
+            if found is None:
+                raise Unsupported(f"条件随时间变化: {sql_text(tokens, a, b)}")
+            filters.append(found)
+
+        groups = []
+        for a, b in _split(tokens, self.pairs, *clauses['group']) if 'group' in clauses else ():
+            if b - a == 1 and tokens[a].kind == 'number' and 1 <= int(tokens[a].text) <= len(items):
+                item = items[int(tokens[a].text) - 1]
+                a, b = item.a, item.b
+            elif b - a == 1 and tokens[a].kind == 'word':
+                item = next((it for it in items if it.alias == tokens[a].text.lower() and
+                             self.norm(it.a, it.b) != self.norm(a, b)), None)
+                if item is not None:
+                    a, b = item.a, item.b
+            groups.append((a, b))
+
+        columns = {f.column for f in filters}
+        if not columns:
+            columns = {c for c in (_time_column(tokens, a, b) for a, b in groups) if c}
+        if not columns:
+            raise Unsupported("没有时间列，无法按天分桶")
+        if len(columns) > 1:
+            raise Unsupported(f"多个时间列: {', '.join(sorted(columns))}")
+        column = columns.pop()
+        strategy, updated = self.strategy(table, column)
+
+        bucket_expr = f"DATE({column})"
+        bucket_norm = [t.norm for t in tokenize(bucket_expr)]
+        self.subs.append((bucket_norm, BUCKET))
+        dims = []           # (列名, 表达式原文)
+        grouped = []        # 改写后的 GROUP BY
+        for a, b in groups:
+            norm = self.norm(a, b)
+            if norm == bucket_norm:
+                grouped.append(BUCKET)
+                continue
+            if any(norm == n for n, _ in self.subs):
+                continue
+            item = next((it for it in items if self.norm(it.a, it.b) == norm and it.alias), None)
+            end = _ref_end(tokens, a, a, b)
+            if item is not None:
+                column_name = item.alias
+            elif end == b:
+                column_name = tokens[b - 1].norm.strip('"')
+            else:
+                column_name = f"dim_{len(dims) + 1}"
+            if column_name in (BUCKET, POSITION) or column_name in {d for d, _ in dims}:
+                column_name = f"{column_name}_{len(dims) + 1}"
+            dims.append((column_name, self.text(a, b)))
+            self.subs.append((norm, _ident(column_name)))
+            grouped.append(_ident(column_name))
+        self.subs.sort(key=lambda sub: -len(sub[0]))
+
+        # 改写各子句
+        self.allowed = {BUCKET} | {_ident(d) for d, _ in dims}
+        select = []
+        names = []
+        for item in items:
+            text = self.rewrite(item.a, item.b)
+            name = _output_name(tokens, item)
+            names.append(name)
+            select.append(text if name == '?column?' or text == _ident(name) else f"{text} AS {_ident(name)}")
+        self.allowed |= {c for c, _ in self.partials.values()} | {_ident(n) for n in names} | set(names)
+        having = self.rewrite(*clauses['having']) if 'having' in clauses else ''
+        order = self.rewrite(*clauses['order']) if 'order' in clauses else ''
+        if self.leftover:
+            raise Unsupported(f"引用了不在分组中的列: {', '.join(dict.fromkeys(self.leftover))}")
+        if not self.partials and not dims and BUCKET not in grouped:
+            raise Unsupported("没有聚合")
+
+        name = self.name
+        columns_sql = [f"{bucket_expr} AS {BUCKET}"] + \
+                      [expr if expr == _ident(col) else f"{expr} AS {_ident(col)}" for col, expr in dims] + \
+                      [f"{expr} AS {_ident(col)}" for col, expr in self.partials.values()]
+        from_text = self.text(*clauses['from'])
+
+        def populate(predicate: Optional[str] = None, indent: str = '') -> str:
+            conditions = [f"({c})" for c in static] + ([predicate] if predicate else [])
+            lines = ["SELECT " + f",\n{indent}       ".join(columns_sql), f"FROM {from_text}"]
+            if conditions:
+                lines.append("WHERE " + f"\n{indent}  AND ".join(conditions))
+            lines.append("GROUP BY " + ', '.join(str(k) for k in range(1, 2 + len(dims))))
+            return '\n'.join(indent + line if k else line for k, line in enumerate(lines))
+
+        ddl = (f"CREATE TABLE IF NOT EXISTS {name} AS\n{populate()}\nWITH NO DATA;\n"
+               f"CREATE INDEX IF NOT EXISTS {name}_bucket_idx ON {name} ({BUCKET});\n")
+
+        recent = f"{column} >= _from_day"
+        changed = ''
+        delete = f"{BUCKET} >= _from_day"
+        if strategy == STRATEGY_CHANGED:
+            ref = f"{alias}.{updated}" if alias else updated
+            where = ' AND '.join([f"{ref} >= _since - interval '{REFRESH_OVERLAP}'"] + [f"({c})" for c in static])
+            changed = (f"    _changed := ARRAY(SELECT DISTINCT {bucket_expr} FROM {from_text}\n"
+                       f"                      WHERE {where});\n")
+            recent = f"({recent} OR {bucket_expr} = ANY(_changed))"
+            delete += f" OR {BUCKET} = ANY(_changed)"
+        refresh = (
+            f"CREATE OR REPLACE FUNCTION refresh_{name}(_full boolean DEFAULT false) RETURNS void\n"
+            f"LANGUAGE plpgsql AS $rollup$\n"
+            f"DECLARE\n"
+            f"  _since timestamptz;\n"
+            f"  _from_day date;\n"
+            f"  _changed date[];\n"
+            f"BEGIN\n"
+            f"  PERFORM pg_advisory_xact_lock(hashtext('{name}'));\n"
+            f"  SELECT refreshed_at INTO _since FROM {STATE_TABLE} WHERE name = '{name}';\n"
+            f"  IF _full OR _since IS NULL THEN\n"
+            f"    DELETE FROM {name};\n"
+            f"    INSERT INTO {name}\n    {populate(indent='    ')};\n"
+            f"  ELSE\n"
+            f"    _from_day := (_since - interval '{self.lookback} days')::date;\n"
+            f"{changed}"
+            f"    DELETE FROM {name} WHERE {delete};\n"
+            f"    INSERT INTO {name}\n    {populate(recent, indent='    ')};\n"
+            f"  END IF;\n"
+            f"  INSERT INTO {STATE_TABLE} (name, kind, refreshed_at) VALUES ('{name}', '{KIND_INCREMENTAL}', now())\n"
+            f"  ON CONFLICT (name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;\n"
+            f"END\n"
+            f"$rollup$;\n")
+
+        where = [f"{BUCKET} {f.op} ({self.text(*f.rhs)})::date" for f in filters]
+        lines = ["SELECT " + ',\n       '.join(select), f"FROM {name}"]
+        if where:
+            lines.append("WHERE " + ' AND '.join(where))
+        if grouped:
+            lines.append("GROUP BY " + ', '.join(grouped))
+        if having:
+            lines.append(f"HAVING {having}")
+        if order:
+            lines.append(f"ORDER BY {order}")
+        for clause in ('limit', 'offset'):
+            if clause in clauses:
+                lines.append(f"{clause.upper()} {self.text(*clauses[clause])}")
+        rewritten = '\n'.join(lines)
+
+        # 校验用的原查询：近似的时间条件对齐到 0 点
+        reference, pos = [], 0
+        for f in sorted((f for f in filters if not f.exact), key=lambda f: f.rhs[0]):
+            a, b = f.rhs
+            reference += [self.sql[pos:tokens[a].start], f"date_trunc('day', {self.text(a, b)})"]
+            pos = tokens[b - 1].end
+        reference.append(self.sql[pos:])
+        exact = all(f.exact for f in filters)
+
+        notes = []
+        if not exact:
+            notes.append("时间条件以 NOW() 为基准，改写后按整天取数")
+        if strategy == STRATEGY_CHANGED:
+            notes.append(f"按 {updated} 找被修改的行；行的时间列被修改时旧桶要等全量重建")
+        else:
+            notes.append(f"按只追加处理：最近 {self.lookback} 天之前的修改要等全量重建")
+        return Rollup(name, KIND_INCREMENTAL, [], table, column, strategy, updated,
+                      [BUCKET] + [d for d, _ in dims] + [c for c, _ in self.partials.values()],
+                      ddl, refresh, rewritten, ''.join(reference), exact, notes)
+
+
+# ---------- 物化视图 ----------
+
+def _materialized(name: str, sql: str, reason: str) -> Rollup:
+    columns = output_columns(sql)
+    if len(set(columns)) != len(columns):
+        raise Unsupported(f"输出列重名: {', '.join(columns)}")
+    ddl = (f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS\n"
+           f"SELECT q.*, row_number() OVER () AS {POSITION}\n"
+           f"FROM (\n{sql}\n) q\n"
+           f"WITH NO DATA;\n"
+           f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_pos_key ON {name} ({POSITION});\n")
+    refresh = (
+        f"CREATE OR REPLACE FUNCTION refresh_{name}(_full boolean DEFAULT false) RETURNS void\n"
+        f"LANGUAGE plpgsql AS $rollup$\n"
+        f"BEGIN\n"
+        f"  IF _full OR NOT (SELECT relispopulated FROM pg_class WHERE oid = '{name}'::regclass) THEN\n"
+        f"    REFRESH MATERIALIZED VIEW {name};\n"
+        f"  ELSE\n"
+        f"    REFRESH MATERIALIZED VIEW CONCURRENTLY {name};\n"
+        f"  END IF;\n"
+        f"  INSERT INTO {STATE_TABLE} (name, kind, refreshed_at) VALUES ('{name}', '{KIND_MATERIALIZED}', now())\n"
+        f"  ON CONFLICT (name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;\n"
+        f"END\n"
+        f"$rollup$;\n")
+    rewritten = f"SELECT {', '.join(_ident(c) for c in columns)}\nFROM {name}\nORDER BY {POSITION}"
+    return Rollup(name, KIND_MATERIALIZED, [], None, None, None, None, columns + [POSITION], ddl, refresh,
+                  rewritten, sql, True, [f"不能增量汇总: {reason}；结果为上次刷新时的快照"])
+
+
+def plan_rollup(name: str, sql: str, schema: Optional[Schema] = None, append_only: Sequence[str] = (),
+                lookback: int = LOOKBACK_DAYS) -> Rollup:
+    """优先生成增量汇总表，不行时整条物化；都不行时抛出 Unsupported"""
+    try:
+        return _Incremental(name, sql, schema, set(append_only), lookback).build()
+    except Unsupported as e:
+        return _materialized(name, sql, str(e))
+
+
+def plan_rollups(queries: Sequence[AggregateQuery], schema: Optional[Schema] = None,
+                 append_only: Sequence[str] = (), lookback: int = LOOKBACK_DAYS
+                 ) -> Tuple[List[Rollup], List[Tuple[AggregateQuery, str]]]:
+    """逐个查询生成汇总（相同的SQL共用一个）；返回 (汇总, [(无法生成的查询, 原因)])"""
+    rollups: Dict[str, Rollup] = {}
+    by_sql: Dict[str, str] = {}
+    failed = []
+    for query in queries:
+        key = ' '.join(t.norm for t in tokenize(query.sql))
+        if key in by_sql:
+            rollups[by_sql[key]].queries.append(query.id)
+            continue
+        name = rollup_name(query.path, query.line)
+        try:
+            rollup = plan_rollup(name, query.sql, schema, append_only, lookback)
+        except Unsupported as e:
+            failed.append((query, str(e)))
+            continue
+        rollup.queries.append(query.id)
+        rollups[name] = rollup
+        by_sql[key] = name
+    return list(rollups.values()), failed
+
+
+# ---------- 输出 ----------
+
+def rollup_sql(rollups: Sequence[Rollup]) -> str:
+    """刷新状态表、全部汇总表 / 物化视图、刷新函数和 refresh_rollups()"""
+    out = [
+        "-- 管理后台统计的汇总表（scripts/build-rollups.py 生成）\n",
+        f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (\n"
+        f"  name text PRIMARY KEY,\n"
+        f"  kind text NOT NULL,\n"
+        f"  refreshed_at timestamptz NOT NULL\n"
+        f");\n",
+    ]
+    for rollup in rollups:
+        out.append(f"-- {rollup.name}（{rollup.kind}）: {', '.join(rollup.queries)}\n{rollup.ddl}\n{rollup.refresh}")
+    calls = ''.join(f"  PERFORM {rollup.function}(_full);\n" for rollup in rollups)
+    out.append(f"CREATE OR REPLACE FUNCTION {REFRESH_ALL}(_full boolean DEFAULT false) RETURNS void\n"
+               f"LANGUAGE plpgsql AS $rollup$\nBEGIN\n{calls}END\n$rollup$;\n")
+    return '\n'.join(out)
+
+
+def schedule(rollups: Sequence[Rollup], incremental: str = INCREMENTAL_CRON,
+             materialized: str = MATERIALIZED_CRON, rebuild: str = REBUILD_CRON) -> List[dict]:
+    """刷新计划：增量汇总频繁刷新并定期全量重建，物化视图按较长的间隔刷新"""
+    entries = []
+    for rollup in rollups:
+        if rollup.kind == KIND_INCREMENTAL:
+            entries.append({'job': rollup.name, 'cron': incremental, 'command': f"SELECT {rollup.function}()"})
+            entries.append({'job': f"{rollup.name}_rebuild", 'cron': rebuild,
+                            'command': f"SELECT {rollup.function}(true)"})
+        else:
+            entries.append({'job': rollup.name, 'cron': materialized, 'command': f"SELECT {rollup.function}()"})
+    return entries
+
+
+def schedule_sql(entries: Sequence[dict]) -> str:
+    """pg_cron 的任务定义"""
+    out = ["-- 刷新计划（需要 pg_cron 扩展）。没有 pg_cron 时可以在 crontab 中执行同样的命令，如",
+           "--   */5 * * * *  psql \"$DATABASE_URL\" -c 'SELECT refresh_rollups()'",
+           "CREATE EXTENSION IF NOT EXISTS pg_cron;", ""]
+    for entry in entries:
+        out.append(f"SELECT cron.schedule('{entry['job']}', '{entry['cron']}', $cron${entry['command']}$cron$);")
+    return '\n'.join(out) + '\n'
+
+
+def rewritten_sql(rollups: Sequence[Rollup], queries: Sequence[AggregateQuery] = ()) -> str:
+    """改写后的查询，按原查询位置标注；带可选过滤的原查询注明只能替换不带过滤的请求"""
+    filters = {query.id: query.filters for query in queries if query.filters}
+    out = []
+    for rollup in rollups:
+        notes = ''.join(f"-- {note}\n" for note in rollup.notes)
+        for query_id in rollup.queries:
+            if query_id in filters:
+                notes += (f"-- {query_id}: 只在请求不带可选过滤时改用本查询，带过滤时仍执行原查询"
+                          f"（汇总不含过滤列）: {'; '.join(filters[query_id])}\n")
+        out.append(f"-- {', '.join(rollup.queries)} -> {rollup.name}\n{notes}{rollup.rewritten};\n")
+    return '\n'.join(out)
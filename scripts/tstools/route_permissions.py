@@ -0,0 +1,379 @@
+"""
+管理后台路由权限清单（构建步骤）
+
+静态分析 app/api/admin/**/route.ts：找出模块顶层用
+AdminPermissionManager.createPermissionMiddleware(...) 声明的中间件及其权限，
+再从每个导出的 HTTP 方法出发，沿文件内的函数调用找到它实际用到的中间件，
+得到 路由 + 方法 -> 所需权限（如 users:read）的查找表。
+
+权限层据此直接按 (路径, 方法) 查表，请求时不再为每个路由构造中间件、扫描权限列表。
+没有任何守卫（既没有权限中间件，也没有旧的 getAdminFromRequest 校验）的方法单独报告。
+"""
+
+import functools
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from tstools import profiling
+from tstools.routes import (ADMIN_API_DIR, HTTP_METHODS, PUBLIC_ADMIN_ROUTES, ROUTE_FILENAME,
+                            exported_methods, route_key)
+from tstools.scan_engine import ScanStats, iter_source_files, read_source, scan_files
+from tstools.ts_lexer import (IDENT, STRING, Token, find_function_declarations, match_brackets,
+                              match_sequence, statement_end, tokenize_all)
+
+MANIFEST_VERSION = 1
+
+# 默认输出位置（相对项目根目录）
+JSON_FILE = 'lib/generated/admin-route-permissions.json'
+TS_FILE = 'lib/generated/admin-route-permissions.ts'
+
+# 方法的守卫类型
+GUARD_MIDDLEWARE = 'middleware'      # 权限中间件，权限已写入清单
+GUARD_UNRESOLVED = 'unresolved'      # 有权限中间件，但权限无法静态解析
+GUARD_LEGACY = 'legacy'              # 只有 getAdminFromRequest 校验，没有具体权限
+GUARD_NONE = 'none'                  # 没有任何守卫
+
+LEGACY_GUARD = 'getAdminFromRequest'
+
+# 资源名中的 _ 前后都必须是字母或数字；分支只消耗单个字符，没有嵌套量词
+_CONSTANT_PERMISSION = re.compile(r'^(?=[A-Z])((?:[A-Z0-9]|_(?=[A-Z0-9]))+)_([A-Z]+)$')
+
+
+class MethodGuard(NamedTuple):
+    guard: str
+    permissions: List[str]    # 如 ['users:read']，按字母排序
+
+
+class RouteGuards(NamedTuple):
+    path: str                        # 相对项目根目录的 route.ts
+    url: str                         # /api/admin/users/[id]
+    public: bool                     # 登录、初始化等不要求管理员权限的路由
+    methods: Dict[str, MethodGuard]
+    unresolved: List[str]            # 无法静态解析权限的中间件名
+
+
+def route_url(rel_path: str) -> str:
+    """app/api/admin/(group)/users/[id]/route.ts -> /api/admin/users/[id]（去掉路由分组）"""
+    parts = rel_path.split('/')[1:-1]
+    return '/' + '/'.join(p for p in parts if not (p.startswith('(') and p.endswith(')')))
+
+
+def _permission_from(tokens: Sequence[Token], start: int, end: int) -> Optional[str]:
+    """
+    在 tokens[start:end] 中解析权限表达式
+
+    AdminPermissions.users.read() / AdminPermissions.users.read -> users:read；
+    AdminPermissions.USERS_READ -> users:read。
+    """
+    for i in range(start, end):
+        if not (tokens[i].kind == IDENT and tokens[i].value == 'AdminPermissions'):
+            continue
+        if match_sequence(tokens, i + 1, ('.', IDENT, '.', IDENT)) and i + 4 < end:
+            return f"{tokens[i + 2].value}:{tokens[i + 4].value}"
+        if match_sequence(tokens, i + 1, ('.', IDENT)) and i + 2 < end:
+            m = _CONSTANT_PERMISSION.match(tokens[i + 2].value)
+            if m:
+                return f"{m.group(1).lower()}:{m.group(2).lower()}"
+    # 直接写出的权限字符串，如 ['users:read']
+    for i in range(start, end):
+        if tokens[i].kind == STRING and ':' in tokens[i].value:
+            return tokens[i].value[1:-1]
+    return None
+
+
+def _middleware_calls(tokens: Sequence[Token], pairs: Dict[int, int]) -> Iterable[Tuple[int, int, Optional[str]]]:
+    """AdminPermissionManager.createPermissionMiddleware(...) 调用：(标识符下标, 右括号下标, 权限)"""
+    for i, tok in enumerate(tokens):
+        if tok.kind != IDENT or tok.value != 'createPermissionMiddleware':
+            continue
+        if i + 1 >= len(tokens) or tokens[i + 1].value != '(':
+            continue
+        close = pairs.get(i + 1, -1)
+        if close < 0:
+            continue
+        yield i, close, _permission_from(tokens, i + 2, close)
+
+
+def _module_level(tokens: Sequence[Token]) -> List[bool]:
+    """
+    每个 token 是否处在模块顶层
+
+    正常文件中即深度 0；括号不配对的文件深度会逐渐漂移，这时以最近一个 export 的深度作为顶层深度
+    （export 只能出现在模块顶层）。
+    """
+    level = 0
+    result = []
+    for tok in tokens:
+        if tok.kind == IDENT and tok.value == 'export':
+            level = tok.depth
+        result.append(tok.depth <= level)
+    return result
+
+
+def _next_export(tokens: Sequence[Token], start: int) -> int:
+    return next((k for k in range(start, len(tokens)) if tokens[k].kind == IDENT and tokens[k].value == 'export'),
+                len(tokens))
+
+
+def local_bindings(tokens: Sequence[Token], pairs: Dict[int, int],
+                   nested: bool = False) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    文件内的函数声明和 const/let 绑定：名称 -> [(起始下标, 结束下标)]
+
+    默认只收集模块顶层的绑定，nested 为 True 时也收集函数体内的局部绑定。
+    绑定的范围不会越过下一条 export 语句。
+    """
+    top = _module_level(tokens)
+    bindings: Dict[str, List[Tuple[int, int]]] = {}
+    for func in find_function_declarations(tokens, pairs=pairs):
+        if func.body_close > 0 and (nested or top[func.start]):
+            limit = _next_export(tokens, func.start + 1) - 1
+            bindings.setdefault(func.name, []).append((func.start, min(func.body_close, limit)))
+    for i, tok in enumerate(tokens[:-2]):
+        if tok.kind == IDENT and tok.value in ('const', 'let') and tokens[i + 1].kind == IDENT \
+                and tokens[i + 2].value == '=' and (nested or top[i]):
+            limit = _next_export(tokens, i + 3) - 1
+            end = statement_end(tokens, i)
+            if end < 0:
+                # 没有分号的声明：到同一深度的下一条 const/let/function/export 为止
+                end = next((k - 1 for k in range(i + 3, limit + 1)
+                            if tokens[k].depth == tok.depth and tokens[k].kind == IDENT
+                            and tokens[k].value in ('const', 'let', 'function', 'async')),
+                           limit)
+            bindings.setdefault(tokens[i + 1].value, []).append((i + 3, min(end, limit)))
+    return bindings
+
+
+def _declared_names(tokens: Sequence[Token], start: int, end: int) -> Set[str]:
+    """tokens[start:end + 1] 中声明的局部名称（遮蔽同名的顶层绑定）"""
+    return {tokens[k + 1].value for k in range(start, end)
+            if tokens[k].kind == IDENT and tokens[k].value in ('const', 'let', 'var', 'function')
+            and tokens[k + 1].kind == IDENT}
+
+
+def method_entries(tokens: Sequence[Token]) -> Dict[str, Set[str]]:
+    """导出的 HTTP 方法 -> 实现它的本地名称（export { handler as GET } 时为 handler）"""
+    entries: Dict[str, Set[str]] = {}
+    for name, export_idx in exported_methods(tokens):
+        local = name
+        if tokens[export_idx + 1].value == '{':
+            k = export_idx + 2
+            while k < len(tokens) and tokens[k].value != '}':
+                if tokens[k].value == name and k >= 2 and tokens[k - 1].value == 'as':
+                    local = tokens[k - 2].value
+                k += 1
+        entries.setdefault(name, set()).add(local)
+    return entries
+
+
+def analyze_guards(content: str, rel_path: str, tokens: Optional[Sequence[Token]] = None,
+                   pairs: Optional[Dict[int, int]] = None) -> RouteGuards:
+    """分析单个 route.ts 中每个导出方法的守卫与所需权限"""
+    if tokens is None:
+        tokens = tokenize_all(content)
+    if pairs is None:
+        pairs = match_brackets(tokens)
+
+    # 绑定到常量的中间件：名称 -> 权限；直接调用（未绑定）的按出现位置记录
+    middleware: Dict[str, Optional[str]] = {}
+    inline: Dict[int, Optional[str]] = {}
+    for idx, close, permission in _middleware_calls(tokens, pairs):
+        k = idx - 1
+        while k >= 0 and tokens[k].value in ('.', 'AdminPermissionManager'):
+            k -= 1
+        if k >= 2 and tokens[k].value == '=' and tokens[k - 2].value in ('const', 'let', 'var'):
+            middleware[tokens[k - 1].value] = permission
+        else:
+            inline[idx] = permission
+
+    bindings = local_bindings(tokens, pairs)
+    unresolved = sorted(name for name, permission in middleware.items() if permission is None)
+
+    def reachable(names: Iterable[str]) -> Tuple[Set[str], bool, bool, bool]:
+        """从这些本地名称出发可达的权限、是否有中间件守卫、是否有无法解析的中间件、是否有旧校验"""
+        permissions: Set[str] = set()
+        guarded = unknown = legacy = False
+        seen: Set[str] = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            for start, end in bindings.get(name, ()):
+                shadowed = _declared_names(tokens, start, end)
+                for k in range(start, end + 1):
+                    tok = tokens[k]
+                    if tok.kind != IDENT:
+                        continue
+                    if tok.value in middleware and not (k > 0 and tokens[k - 1].value == '.'):
+                        guarded = True
+                        if middleware[tok.value] is None:
+                            unknown = True
+                        else:
+                            permissions.add(middleware[tok.value])
+                    elif k in inline:
+                        guarded = True
+                        if inline[k] is None:
+                            unknown = True
+                        else:
+                            permissions.add(inline[k])
+                    elif tok.value == LEGACY_GUARD:
+                        legacy = True
+                    elif tok.value in bindings and tok.value not in seen and tok.value not in shadowed \
+                            and tokens[k - 1].value != '.':
+                        stack.append(tok.value)
+        return permissions, guarded, unknown, legacy
+
+    methods: Dict[str, MethodGuard] = {}
+    for method, locals_ in sorted(method_entries(tokens).items(),
+                                  key=lambda item: HTTP_METHODS.index(item[0])):
+        permissions, guarded, unknown, legacy = reachable(locals_)
+        if guarded:
+            # 部分权限无法解析时整体不进入查找表，避免按不完整的权限放行
+            guard = GUARD_UNRESOLVED if unknown or not permissions else GUARD_MIDDLEWARE
+        else:
+            guard = GUARD_LEGACY if legacy else GUARD_NONE
+        methods[method] = MethodGuard(guard, sorted(permissions))
+
+    key = route_key(rel_path)
+    return RouteGuards(rel_path, route_url(rel_path), key in PUBLIC_ADMIN_ROUTES, methods, unresolved)
+
+
+def _guards_worker(path: Path, root: Path) -> Tuple[int, Optional[RouteGuards]]:
+    """进程池 worker（不是合法 UTF-8 的文件返回 None）"""
+    nbytes, content = read_source(path)
+    if content is None:
+        return nbytes, None
+    with profiling.phase('analyze'):
+        return nbytes, analyze_guards(content, path.relative_to(root).as_posix())
+
+
+def discover_guards(root: Path, workers: Optional[int] = None, stats: Optional[ScanStats] = None,
+                    budget: Optional[float] = None) -> List[RouteGuards]:
+    """并行分析 app/api/admin 下全部 route.ts（超时跳过和无法解码的路由不在结果中）"""
+    root = Path(root).resolve()
+    with profiling.phase('walk'):
+        paths = [p for p in iter_source_files(root, [ADMIN_API_DIR]) if p.name == ROUTE_FILENAME]
+    worker = functools.partial(_guards_worker, root=root)
+    return [guards for _, guards in scan_files(paths, worker, workers=workers, stats=stats, budget=budget)
+            if guards is not None]
+
+
+def build_manifest(routes: Sequence[RouteGuards]) -> dict:
+    """
+    生成查找表
+
+    routes 只含权限可以静态确定的方法；unresolved / legacy / unguarded 列出其余方法
+    （不在查找表中，权限层按未知路由拒绝），public 为不要求管理员权限的路由。
+    """
+    manifest = {'version': MANIFEST_VERSION, 'routes': {}, 'unresolved': [], 'legacy': [],
+                'unguarded': [], 'public': []}
+    for route in sorted(routes, key=lambda r: r.url):
+        if route.public:
+            manifest['public'].append(route.url)
+            continue
+        entry = {method: guard.permissions for method, guard in route.methods.items()
+                 if guard.guard == GUARD_MIDDLEWARE}
+        if entry:
+            manifest['routes'][route.url] = entry
+        for kind, guard_kind in (('unresolved', GUARD_UNRESOLVED), ('legacy', GUARD_LEGACY),
+                                 ('unguarded', GUARD_NONE)):
+            missing = [m for m, guard in route.methods.items() if guard.guard == guard_kind]
+            if missing:
+                manifest[kind].append({'route': route.url, 'file': route.path, 'methods': missing})
+    return manifest
+
+
+def _segment_pattern(segment: str) -> str:
+    if segment.startswith('[[...') and segment.endswith(']]'):
+        return '(?:/.*)?'
+    if segment.startswith('[...') and segment.endswith(']'):
+        return '/.+'
+    if segment.startswith('[') and segment.endswith(']'):
+        return '/[^/]+'
+    return '/' + re.escape(segment)
+
+
+def _dynamic_routes(urls: Iterable[str]) -> List[Tuple[str, str]]:
+    """动态路由 -> (JS 正则源码, 路由)，静态段多、动态段少的更具体，排在前面"""
+    result = []
+    for url in urls:
+        segments = url.strip('/').split('/')
+        dynamic = [s for s in segments if s.startswith('[')]
+        if not dynamic:
+            continue
+        source = '^' + ''.join(_segment_pattern(s) for s in segments) + '$'
+        catch_all = any(s.startswith(('[...', '[[...')) for s in segments)
+        result.append(((catch_all, len(dynamic), -len(segments)), source.replace('/', '\\/'), url))
+    return [(source, url) for _, source, url in sorted(result)]
+
+
+def render_json(manifest: dict) -> str:
+    return json.dumps(manifest, ensure_ascii=False, indent=2) + '\n'
+
+
+def render_ts(manifest: dict) -> str:
+    """生成给权限层 import 的 TypeScript 查找表"""
+    routes = manifest['routes']
+    lines = [
+        "// 此文件由 scripts/update-api-permissions.py --build-manifest 生成，请勿手工修改",
+        "// 管理后台路由 + HTTP方法 -> 所需权限的预计算查找表",
+        "",
+        "export type AdminRouteMethod = " + ' | '.join(f"'{m}'" for m in HTTP_METHODS) + ";",
+        "",
+        "export type AdminRoutePermissionTable = Readonly<Record<string, "
+        "Readonly<Partial<Record<AdminRouteMethod, readonly string[]>>>>>;",
+        "",
+        "export const ADMIN_ROUTE_PERMISSIONS: AdminRoutePermissionTable = {",
+    ]
+    for url, entry in routes.items():
+        methods = ', '.join(f"{method}: {json.dumps(perms)}" for method, perms in entry.items())
+        lines.append(f"  {json.dumps(url)}: {{ {methods} }},")
+    lines += [
+        "};",
+        "",
+        "/** 不要求管理员权限的路由（登录、初始化等） */",
+        "export const PUBLIC_ADMIN_ROUTES: ReadonlySet<string> = new Set(" + json.dumps(manifest['public']) + ");",
+        "",
+        "// 动态路由按具体程度排序，第一个匹配的即为结果",
+        "const DYNAMIC_ROUTES: ReadonlyArray<readonly [RegExp, string]> = [",
+    ]
+    for source, url in _dynamic_routes(routes):
+        lines.append(f"  [/{source}/, {json.dumps(url)}],")
+    lines += [
+        "];",
+        "",
+        "/** 请求路径 -> 清单中的路由（如 /api/admin/users/42 -> /api/admin/users/[id]） */",
+        "export function resolveAdminRoute(pathname: string): string | undefined {",
+        "  const path = pathname.length > 1 ? pathname.replace(/\\/+$/, '') : pathname;",
+        "  if (path in ADMIN_ROUTE_PERMISSIONS) {",
+        "    return path;",
+        "  }",
+        "  for (const [pattern, route] of DYNAMIC_ROUTES) {",
+        "    if (pattern.test(path)) {",
+        "      return route;",
+        "    }",
+        "  }",
+        "  return undefined;",
+        "}",
+        "",
+        "/** 路由方法所需的权限；清单中没有该路由或方法时返回 undefined */",
+        "export function getRequiredPermissions(pathname: string, method: string): readonly string[] | undefined {",
+        "  const route = resolveAdminRoute(pathname);",
+        "  if (route === undefined) {",
+        "    return undefined;",
+        "  }",
+        "  return ADMIN_ROUTE_PERMISSIONS[route][method.toUpperCase() as AdminRouteMethod];",
+        "}",
+        "",
+        "/** 管理员是否拥有访问该路由方法所需的全部权限；清单中没有的路由一律拒绝 */",
+        "export function hasRoutePermission(pathname: string, method: string, granted: ReadonlySet<string>): boolean {",
+        "  const required = getRequiredPermissions(pathname, method);",
+        "  return required !== undefined && required.every((permission) => granted.has(permission));",
+        "}",
+        "",
+    ]
+    return '\n'.join(lines)
@@ -0,0 +1,191 @@
+"""
+Next.js API 路由清单
+
+一次并行扫描 app/api/**/route.ts，记录每个路由导出的 HTTP 方法、
+是否已经接入 AdminPermissionManager / getAdminFromRequest，
+并按路径推断管理后台路由所属的权限域。新增路由不需要改任何配置。
+"""
+
+import functools
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from tstools import profiling
+from tstools.scan_engine import ScanStats, iter_source_files, read_source, scan_files
+from tstools.ts_lexer import COMMENT, IDENT, PUNCT, STRING, Token, tokenize_all
+
+API_DIR = 'app/api'
+ADMIN_API_DIR = 'app/api/admin'
+ROUTE_FILENAME = 'route.ts'
+
+HTTP_METHODS = ('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE')
+READ_METHODS = {'GET', 'HEAD'}
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+# 管理后台路由（相对 app/api/admin）到权限域的映射，按最长路径前缀匹配
+DOMAIN_RULES = {
+    'analytics': 'stats',
+    'costs': 'stats',
+    'financial': 'stats',
+    'growth': 'stats',
+    'stats': 'stats',
+    'users': 'users',
+    'show-off': 'users',
+    'products': 'products',
+    'orders': 'orders',
+    'lottery': 'lottery',
+    'withdrawals': 'withdrawals',
+    'organization': 'system',
+    'telegram': 'system',
+    'rate-limit': 'system',
+    'risk-events': 'system',
+    'risk-rules': 'system',
+    'risk-stats': 'system',
+    'risk-users': 'system',
+    'settings': 'settings',
+    'settings/features': 'features',
+    'settings/operation': 'operations',
+    'settings/rewards': 'rewards',
+    'settings/risk': 'risk',
+}
+
+# 登录、初始化等路由本身不能要求管理员权限
+PUBLIC_ADMIN_ROUTES = {'login', 'init', 'permissions/my-permissions'}
+
+
+@dataclass
+class RouteInfo:
+    """单个 route.ts 的清单条目"""
+    path: str                                   # 相对项目根目录
+    methods: List[str] = field(default_factory=list)
+    uses_permission_manager: bool = False
+    uses_get_admin: bool = False
+    uses_supabase: bool = False
+    domain: Optional[str] = None
+
+    @property
+    def is_admin(self) -> bool:
+        return self.path.startswith(ADMIN_API_DIR + '/')
+
+    @property
+    def permissions(self) -> Dict[str, str]:
+        """按导出的方法生成 {'read': 域, 'write': 域}"""
+        if self.domain is None:
+            return {}
+        perms = {}
+        if READ_METHODS.intersection(self.methods):
+            perms['read'] = self.domain
+        if WRITE_METHODS.intersection(self.methods):
+            perms['write'] = self.domain
+        return perms
+
+
+def route_key(rel_path: str) -> Optional[str]:
+    """app/api/admin/users/[id]/route.ts -> users/[id]；非管理后台路由返回 None"""
+    prefix = ADMIN_API_DIR + '/'
+    if not rel_path.startswith(prefix) or not rel_path.endswith('/' + ROUTE_FILENAME):
+        return None
+    return rel_path[len(prefix):-len(ROUTE_FILENAME) - 1]
+
+
+def infer_domain(rel_path: str) -> Optional[str]:
+    """按路径推断权限域，无法推断或不需要权限时返回 None"""
+    key = route_key(rel_path)
+    if key is None or key in PUBLIC_ADMIN_ROUTES:
+        return None
+    parts = key.split('/')
+    for n in range(len(parts), 0, -1):
+        domain = DOMAIN_RULES.get('/'.join(parts[:n]))
+        if domain is not None:
+            return domain
+    return None
+
+
+def exported_methods(tokens: Sequence[Token]) -> List[Tuple[str, int]]:
+    """
+    找出导出的 HTTP 方法，返回 [(方法名, export token 下标)]
+
+    支持 export [async] function GET、export const GET = ... 和
+    export { handler as GET } 三种写法。
+    """
+    found = []
+    n = len(tokens)
+    for i, tok in enumerate(tokens):
+        if tok.kind != IDENT or tok.value != 'export' or i + 1 >= n:
+            continue
+        j = i + 1
+        if tokens[j].value == 'async':
+            j += 1
+        if j + 1 < n and tokens[j].kind == IDENT and tokens[j].value in ('function', 'const', 'let', 'var'):
+            name = tokens[j + 1].value
+            if name in HTTP_METHODS:
+                found.append((name, i))
+            continue
+        if tokens[j].kind == PUNCT and tokens[j].value == '{':
+            k = j + 1
+            while k < n and tokens[k].value != '}':
+                # 只看对外的名字：handler as GET 取 GET，GET as handler 不算
+                if tokens[k].kind == IDENT and tokens[k].value in HTTP_METHODS and \
+                        (k + 1 >= n or tokens[k + 1].value != 'as'):
+                    found.append((tokens[k].value, i))
+                k += 1
+    return found
+
+
+def handler_insert_pos(content: str) -> int:
+    """
+    第一个导出的 HTTP 方法处理函数之前的位置（连同紧贴其上的注释），
+    没有找到时返回 -1
+    """
+    tokens = tokenize_all(content, comments=True)
+    code = [tok for tok in tokens if tok.kind != COMMENT]
+    methods = exported_methods(code)
+    if not methods:
+        return -1
+    export_tok = code[methods[0][1]]
+    k = next(i for i, tok in enumerate(tokens) if tok.start == export_tok.start)
+    while k > 0 and tokens[k - 1].kind == COMMENT:
+        k -= 1
+    start = tokens[k].start
+    return content.rfind('\n', 0, start) + 1
+
+
+def analyze_route(content: str, rel_path: str, tokens: Optional[Sequence[Token]] = None) -> RouteInfo:
+    """分析单个 route.ts 的内容（tokens 为已有的词法分析结果时直接复用）"""
+    if tokens is None:
+        tokens = tokenize_all(content)
+    methods = []
+    for name, _ in exported_methods(tokens):
+        if name not in methods:
+            methods.append(name)
+    idents = {tok.value for tok in tokens if tok.kind == IDENT}
+    return RouteInfo(
+        path=rel_path,
+        methods=methods,
+        uses_permission_manager='AdminPermissionManager' in idents,
+        uses_get_admin='getAdminFromRequest' in idents,
+        uses_supabase=any(tok.kind == STRING and tok.value[1:-1] == '@supabase/supabase-js'
+                          for tok in tokens),
+        domain=infer_domain(rel_path),
+    )
+
+
+def _route_worker(path: Path, root: Path) -> Tuple[int, Optional[RouteInfo]]:
+    """进程池 worker（不是合法 UTF-8 的文件返回 None）"""
+    nbytes, content = read_source(path)
+    if content is None:
+        return nbytes, None
+    with profiling.phase('analyze'):
+        return nbytes, analyze_route(content, path.relative_to(root).as_posix())
+
+
+def discover_routes(root: Path, api_dir: str = API_DIR, workers: Optional[int] = None,
+                    stats: Optional[ScanStats] = None, budget: Optional[float] = None) -> List[RouteInfo]:
+    """并行扫描 api_dir 下全部 route.ts，按路径排序返回清单（超时跳过和无法解码的路由不在清单中）"""
+    root = Path(root).resolve()
+    with profiling.phase('walk'):
+        paths = [p for p in iter_source_files(root, [api_dir]) if p.name == ROUTE_FILENAME]
+    worker = functools.partial(_route_worker, root=root)
+    return [info for _, info in scan_files(paths, worker, workers=workers, stats=stats, budget=budget)
+            if info is not None]
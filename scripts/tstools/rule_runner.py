@@ -0,0 +1,289 @@
+"""
+统一的单次遍历规则运行器
+
+原先 scan-sql-injection.py、fix_syntax_errors.py、update-api-permissions.py 和
+wrap_user_apis.py 各自遍历目录、各自读文件和做词法分析。这里把它们作为规则插件
+挂到同一次遍历上：每个文件只读一次，token 只在第一个需要它的规则处生成一次，
+之后所有启用的规则共用（改写过内容后才重新生成）。
+
+规则插件继承 Rule，注册为 "模块:类名" 字符串，只有启用的规则才会被导入；
+重量级模块在 Rule.setup() 中导入。内置规则见 BUILTIN_RULES，
+外部规则可以用 run-hygiene.py --plugin 模块:类名 加入。
+
+执行顺序：只读规则先在读入的原始内容上运行（报告的行号与磁盘上的文件一致），
+改写规则再按注册顺序依次运行，后一条规则看到的是前一条改写后的内容。
+"""
+
+import functools
+import importlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from tstools import fileio, findings, profiling, regex_guard
+from tstools.git_diff import LineRanges
+from tstools.rewrite_engine import REWRITE_RULES, atomic_write, unified_diff
+from tstools.scan_engine import SOURCE_EXTENSIONS, ScanStats, iter_source_files, scan_files
+from tstools.ts_lexer import Token, match_brackets, tokenize_all
+
+# 运行模式：只报告 / 输出统一diff / 写回文件
+MODES = ('check', 'dry-run', 'fix')
+
+# 规则自身抛出异常时的记录
+RULE_ERROR = 'rule-error'
+
+
+class RuleSpec(NamedTuple):
+    name: str
+    target: str          # "模块:类名"
+    description: str
+
+
+# 内置规则，按执行顺序排列
+BUILTIN_RULES = [
+    RuleSpec('sql-injection', 'tstools.rules.sql_injection:SqlInjectionRule',
+             "原始SQL调用的注入风险（scan-sql-injection.py）"),
+    RuleSpec('type-annotations', 'tstools.rules.type_annotations:TypeAnnotationRule',
+             "修复重复的参数类型注解（fix_syntax_errors.py）"),
+    RuleSpec('admin-permissions', 'tstools.rules.admin_permissions:AdminPermissionRule',
+             "为管理后台路由添加权限中间件声明（update-api-permissions.py）"),
+    RuleSpec('wrap-admin-apis', 'tstools.rules.wrap_admin_apis:WrapAdminApiRule',
+             "把管理后台HTTP方法包装到权限中间件中（wrap_user_apis.py）"),
+]
+
+
+class FileContext:
+    """
+    单个文件在一次遍历中的共享状态
+
+    content 为当前内容（改写规则运行后更新），tokens / pairs 按需生成并缓存；
+    lines 为 git diff 的改动行区间（None 表示整个文件），对应读入时的内容。
+    """
+
+    def __init__(self, rel: str, content: str, lines: LineRanges = None, mode: str = 'check'):
+        self.rel = rel
+        self.original = content
+        self.content = content
+        self.lines = lines
+        self.mode = mode
+        self.records: List[dict] = []
+        self.changed_by: List[str] = []
+        self._tokens: Optional[List[Token]] = None
+        self._pairs: Optional[Dict[int, int]] = None
+
+    @property
+    def tokens(self) -> List[Token]:
+        if self._tokens is None:
+            with profiling.rule('tokenize'):
+                self._tokens = tokenize_all(self.content)
+        return self._tokens
+
+    @property
+    def pairs(self) -> Dict[int, int]:
+        if self._pairs is None:
+            self._pairs = match_brackets(self.tokens)
+        return self._pairs
+
+    def report(self, rule: str, level: str, message: str, line: Optional[int] = None, **extra):
+        """记录一条 finding"""
+        self.records.append(findings.record('finding', rule, level, self.rel, message, line=line, **extra))
+
+    def rewrite(self, rule: str, content: str, changes: Sequence[str]):
+        """
+        改写规则提交新内容；之后的规则看到的是新内容
+
+        内容未变时 changes 视为跳过说明。check 模式下改动记为 warning（需要修复），
+        dry-run / fix 模式下记为 note。
+        """
+        if content == self.content:
+            for change in changes:
+                self.records.append(findings.record('change', 'rewrite-skipped', 'warning',
+                                                    self.rel, change, fixer=rule))
+            return
+        level = 'warning' if self.mode == 'check' else 'note'
+        for change in changes:
+            self.records.append(findings.record('change', rule, level, self.rel, change,
+                                                applied=self.mode == 'fix'))
+        self.content = content
+        self._tokens = self._pairs = None
+        self.changed_by.append(rule)
+
+
+class Rule:
+    """
+    规则插件基类
+
+    子类设置 name / description，需要改写文件时 fixes = True，
+    在 setup() 中导入重量级模块并设置 dirs（相对项目根目录的源码目录），
+    在 check(ctx) 中通过 ctx.report() / ctx.rewrite() 输出结果。
+    literals 非空时，读入的文件至少要包含其中之一（解码前在映射上按字节预筛，
+    见 tstools/fileio.py）；文件被前面的规则改写过之后不再按它筛选。
+    """
+
+    name = ''
+    description = ''
+    fixes = False
+    dirs: Sequence[str] = ()
+    literals: Sequence[str] = ()
+
+    def setup(self):
+        """每个进程首次使用前调用一次"""
+
+    def sarif_rules(self) -> Dict[str, str]:
+        """本规则可能输出的规则ID -> 说明（写入 SARIF 的规则列表）"""
+        return {self.name: self.description}
+
+    def applies(self, rel_path: str) -> bool:
+        """按路径判断是否处理该文件（不读取内容）"""
+        return any(rel_path.startswith(d.rstrip('/') + '/') for d in self.dirs)
+
+    def prefilter(self, content: str) -> bool:
+        """廉价的内容预筛，返回 False 时不调用 check()"""
+        return True
+
+    def check(self, ctx: FileContext):
+        raise NotImplementedError
+
+
+class FileOutcome(NamedTuple):
+    path: str                    # 相对项目根目录
+    records: List[dict]
+    changed_by: List[str]        # 改写了该文件的规则
+    diff: Optional[str] = None   # 仅 dry-run 时提供
+    error: Optional[str] = None
+
+
+def resolve_targets(names: Optional[Iterable[str]] = None, plugins: Iterable[str] = ()) -> List[str]:
+    """规则名（None 为全部内置规则）和外部插件 -> 按执行顺序排列的 "模块:类名" 列表"""
+    builtin = {spec.name: spec.target for spec in BUILTIN_RULES}
+    if names is None:
+        targets = [spec.target for spec in BUILTIN_RULES]
+    else:
+        unknown = [name for name in names if name not in builtin]
+        if unknown:
+            raise ValueError(f"未知规则: {', '.join(unknown)}（可用: {', '.join(builtin)}）")
+        wanted = set(names)
+        targets = [spec.target for spec in BUILTIN_RULES if spec.name in wanted]
+    return targets + [p for p in plugins if p not in targets]
+
+
+def _import_rule(target: str) -> Rule:
+    module_name, _, class_name = target.partition(':')
+    if not class_name:
+        raise ValueError(f"规则插件应写作 模块:类名，收到 {target!r}")
+    rule = getattr(importlib.import_module(module_name), class_name)()
+    if not isinstance(rule, Rule):
+        raise TypeError(f"{target} 不是 tstools.rule_runner.Rule 的子类")
+    return rule
+
+
+# 每个进程内已加载的规则；主进程先加载，fork 出的 worker 直接继承
+_loaded: Dict[Tuple[str, ...], List[Rule]] = {}
+
+
+def load_rules(targets: Sequence[str]) -> List[Rule]:
+    """导入并初始化规则，只读规则排在改写规则之前（同类中保持给定顺序）"""
+    key = tuple(targets)
+    rules = _loaded.get(key)
+    if rules is None:
+        rules = [_import_rule(target) for target in targets]
+        rules.sort(key=lambda rule: rule.fixes)
+        for rule in rules:
+            rule.setup()
+            rule.byte_literals = fileio.encode_literals(rule.literals)
+        _loaded[key] = rules
+    return rules
+
+
+def sarif_rules(rules: Sequence[Rule]) -> Dict[str, str]:
+    merged = {}
+    for rule in rules:
+        merged.update(rule.sarif_rules())
+    merged['rewrite-skipped'] = REWRITE_RULES['rewrite-skipped']
+    merged[RULE_ERROR] = "规则执行失败"
+    return merged
+
+
+def _run_file(item: Tuple[Path, LineRanges], targets: Tuple[str, ...], root: Path,
+              mode: str) -> Tuple[int, FileOutcome]:
+    """读取一次文件，依次运行全部适用的规则（进程池worker）"""
+    path, lines = item
+    rel = path.relative_to(root).as_posix()
+    rules = [rule for rule in load_rules(targets) if rule.applies(rel)]
+    try:
+        with profiling.phase('read'), fileio.MappedSource(path) as source:
+            nbytes = source.size
+            matched = {rule.name for rule in rules
+                       if not rule.byte_literals or source.contains_any(rule.byte_literals)}
+            # 没有规则的字面量出现在文件中时不解码
+            if not matched:
+                return nbytes, FileOutcome(rel, [], [])
+            content = source.text(warn=False)
+    except OSError as e:
+        return 0, FileOutcome(rel, [], [], error=str(e))
+    if content is None:
+        return nbytes, FileOutcome(rel, [], [], error=f"不是合法的 UTF-8: {source.decode_error}")
+
+    ctx = FileContext(rel, content, lines=lines, mode=mode)
+    with profiling.phase('analyze'):
+        for rule in rules:
+            if rule.name not in matched and not ctx.changed_by:
+                continue
+            if not rule.prefilter(ctx.content):
+                continue
+            before = len(ctx.records)
+            with profiling.rule(f'rule:{rule.name}') as r:
+                try:
+                    rule.check(ctx)
+                except regex_guard.BudgetExceeded:
+                    raise
+                except Exception as e:
+                    ctx.report(RULE_ERROR, 'error', f"{rule.name}: {type(e).__name__}: {e}")
+                r.matches = len(ctx.records) - before
+
+    if ctx.content == content:
+        return nbytes, FileOutcome(rel, ctx.records, [])
+    if mode == 'dry-run':
+        return nbytes, FileOutcome(rel, ctx.records, ctx.changed_by,
+                                   diff=unified_diff(rel, content, ctx.content))
+    if mode == 'fix':
+        try:
+            with profiling.phase('write'):
+                atomic_write(path, ctx.content)
+        except OSError as e:
+            return nbytes, FileOutcome(rel, ctx.records, [], error=f"写回失败: {e}")
+    return nbytes, FileOutcome(rel, ctx.records, ctx.changed_by)
+
+
+def select_files(root: Path, rules: Sequence[Rule]) -> List[Path]:
+    """一次遍历全部规则关心的目录，只保留至少有一条规则适用的文件"""
+    root = Path(root)
+    dirs = sorted({d for rule in rules for d in rule.dirs})
+    return [path for path in iter_source_files(root, dirs)
+            if any(rule.applies(path.relative_to(root).as_posix()) for rule in rules)]
+
+
+def run_rules(root: Path, targets: Sequence[str], files: Optional[Sequence[Path]] = None,
+              hunks: Optional[Dict[Path, LineRanges]] = None, mode: str = 'check',
+              workers: Optional[int] = None, stats: Optional[ScanStats] = None,
+              budget: Optional[float] = None) -> Iterator[FileOutcome]:
+    """
+    对每个文件运行全部规则，按路径顺序流式产出结果
+
+    files 为 None 时遍历规则关心的全部目录；hunks 为 {绝对路径: 改动行区间}，
+    给出时只处理其中的文件。超出 budget 的文件整体跳过，记录在 stats.skipped 中。
+    """
+    assert mode in MODES, mode
+    root = Path(root).resolve()
+    targets = tuple(targets)
+    rules = load_rules(targets)
+    if files is None:
+        with profiling.phase('walk'):
+            if hunks is None:
+                files = select_files(root, rules)
+            else:
+                files = [path for path in sorted(hunks) if path.name.endswith(SOURCE_EXTENSIONS)
+                         and any(rule.applies(path.relative_to(root).as_posix()) for rule in rules)]
+    items = [(Path(path), hunks.get(path) if hunks is not None else None) for path in files]
+    worker = functools.partial(_run_file, targets=targets, root=root, mode=mode)
+    for _, outcome in scan_files(items, worker, workers=workers, stats=stats, budget=budget):
+        yield outcome
@@ -0,0 +1,5 @@
+"""
+内置规则插件（由 tstools/rule_runner.py 按需导入）
+
+每个模块只在顶层导入 rule_runner，对应脚本和分析模块在 setup() 中加载。
+"""
@@ -0,0 +1,37 @@
+"""管理后台权限中间件声明规则：复用 update-api-permissions.py 的插入逻辑"""
+
+from tstools.paths import SCRIPTS_DIR, load_script
+from tstools.rule_runner import FileContext, Rule
+
+
+class AdminPermissionRule(Rule):
+    name = 'admin-permissions'
+    description = "为仍使用 getAdminFromRequest 的管理后台路由添加权限中间件声明"
+    fixes = True
+    literals = ('getAdminFromRequest', '@supabase/supabase-js')
+
+    def setup(self):
+        from tstools import routes
+        self.script = load_script(SCRIPTS_DIR / 'update-api-permissions.py', 'update_api_permissions')
+        self.routes = routes
+        self.dirs = (routes.ADMIN_API_DIR,)
+
+    def sarif_rules(self):
+        return {self.name: self.description,
+                'permission-domain-unknown': self.script.RULES['permission-domain-unknown']}
+
+    def applies(self, rel_path: str) -> bool:
+        key = self.routes.route_key(rel_path)
+        return key is not None and key not in self.routes.PUBLIC_ADMIN_ROUTES
+
+    def check(self, ctx: FileContext):
+        route = self.routes.analyze_route(ctx.content, ctx.rel, tokens=ctx.tokens)
+        if route.uses_permission_manager or not (route.uses_get_admin or route.uses_supabase):
+            return
+        if not route.permissions:
+            ctx.report('permission-domain-unknown', 'warning',
+                       "未能推断权限域，请在 tstools/routes.py 的 DOMAIN_RULES 中补充")
+            return
+        content, changes = self.script.add_permission_middleware(ctx.content, route.permissions,
+                                                                 tokens=ctx.tokens)
+        ctx.rewrite(self.name, content, changes)
@@ -0,0 +1,25 @@
+"""SQL注入扫描规则：复用 scan-sql-injection.py 的分类和记录格式"""
+
+from tstools.paths import SCRIPTS_DIR, load_script
+from tstools.rule_runner import FileContext, Rule
+
+
+class SqlInjectionRule(Rule):
+    name = 'sql-injection'
+    description = "原始SQL中插值或拼接了外部输入"
+
+    def setup(self):
+        from tstools.sql_taint import SINK_LITERALS
+        self.script = load_script(SCRIPTS_DIR / 'scan-sql-injection.py', 'scan_sql_injection')
+        self.literals = SINK_LITERALS
+        self.dirs = tuple(self.script.SCAN_DIRS)
+
+    def sarif_rules(self):
+        return {rule: text for rule, _, text in self.script.RULES.values()}
+
+    def check(self, ctx: FileContext):
+        result = self.script.analyze_content(ctx.content, ctx.rel, tokens=ctx.tokens, pairs=ctx.pairs)
+        # --since / --staged 时只报告判定受改动行影响的调用
+        result = self.script.restrict_to_lines(result, ctx.lines)
+        if result is not None:
+            ctx.records.extend(self.script.result_records(result))
@@ -0,0 +1,23 @@
+"""类型注解语法修复规则：复用 fix_syntax_errors.py 的修复模式"""
+
+from tstools.paths import REPO_DIR, load_script
+from tstools.rule_runner import FileContext, Rule
+
+
+class TypeAnnotationRule(Rule):
+    name = 'type-annotations'
+    description = "修复重复的参数类型注解（如 request: any: any）"
+    fixes = True
+    literals = (': any',)
+
+    def setup(self):
+        self.script = load_script(REPO_DIR / 'fix_syntax_errors.py', 'fix_syntax_errors')
+        self.dirs = tuple(self.script.directories)
+
+    def prefilter(self, content: str) -> bool:
+        return self.script.has_syntax_errors(content)
+
+    def check(self, ctx: FileContext):
+        # 只修复 git diff 改动行内的匹配（ctx.lines 为 None 时整个文件）
+        fixed, changes = self.script.fix_content(ctx.content, ctx.lines, tokens=ctx.tokens)
+        ctx.rewrite(self.name, fixed, changes)
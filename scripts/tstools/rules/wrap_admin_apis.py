@@ -0,0 +1,31 @@
+"""管理后台HTTP方法包装规则：复用 wrap_user_apis.py 的包装逻辑"""
+
+from tstools.paths import SCRIPTS_DIR, load_script
+from tstools.rule_runner import FileContext, Rule
+
+
+class WrapAdminApiRule(Rule):
+    name = 'wrap-admin-apis'
+    description = "把管理后台路由导出的HTTP方法包装到已声明的权限中间件中"
+    fixes = True
+    literals = ('Permission',)
+
+    def setup(self):
+        from tstools import routes
+        self.script = load_script(SCRIPTS_DIR / 'wrap_user_apis.py', 'wrap_user_apis')
+        self.routes = routes
+        self.dirs = (routes.ADMIN_API_DIR,)
+
+    def applies(self, rel_path: str) -> bool:
+        return self.routes.route_key(rel_path) is not None
+
+    def prefilter(self, content: str) -> bool:
+        return 'Permission' in content
+
+    def check(self, ctx: FileContext):
+        # 与 wrap_user_apis.py 相同：只处理能推断出权限域、并且已经接入权限管理器的路由
+        route = self.routes.analyze_route(ctx.content, ctx.rel, tokens=ctx.tokens)
+        if route.domain is None or not route.uses_permission_manager:
+            return
+        content, changes = self.script.wrap_methods(ctx.content, tokens=ctx.tokens, pairs=ctx.pairs)
+        ctx.rewrite(self.name, content, changes)
@@ -0,0 +1,133 @@
+"""
+多进程扫描引擎
+
+每个文件只读取一次，按可配置的进程数分发到进程池，
+结果按输入顺序返回，保证报告稳定、可以直接diff。
+"""
+
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from tstools import fileio, profiling, regex_guard
+
+# 需要扫描的源码扩展名
+SOURCE_EXTENSIONS = ('.ts', '.tsx')
+
+# 遍历时跳过的目录
+SKIP_DIRS = {'node_modules', '.next', '.git', 'dist', 'build', 'coverage', 'out'}
+
+
+@dataclass
+class ScanStats:
+    """扫描吞吐统计"""
+    files: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+    cached: int = 0
+    skipped: List[str] = field(default_factory=list)   # 超出时间预算被跳过的文件
+
+    @property
+    def files_per_sec(self) -> float:
+        return self.files / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.bytes / (1024 * 1024) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        text = (
+            f"{self.files} 个文件, {self.bytes / (1024 * 1024):.2f} MB, "
+            f"耗时 {self.elapsed:.2f}s "
+            f"({self.files_per_sec:.0f} 文件/s, {self.mb_per_sec:.2f} MB/s)"
+        )
+        if self.cached:
+            text += f", 另有 {self.cached} 个文件命中缓存"
+        if self.skipped:
+            text += f", {len(self.skipped)} 个文件超时跳过"
+        return text
+
+
+def default_workers() -> int:
+    """默认进程数：CPU核数"""
+    return os.cpu_count() or 1
+
+
+def iter_source_files(root: Path, dirs: Iterable[str],
+                      extensions: Sequence[str] = SOURCE_EXTENSIONS) -> List[Path]:
+    """列出指定目录下的全部源码文件（按路径排序）"""
+    files = []
+    for dir_name in dirs:
+        base = Path(root) / dir_name
+        if not base.is_dir():
+            continue
+        for current, subdirs, filenames in os.walk(base):
+            subdirs[:] = [d for d in subdirs if d not in SKIP_DIRS]
+            for filename in filenames:
+                if filename.endswith(tuple(extensions)):
+                    files.append(Path(current) / filename)
+    return sorted(set(files))
+
+
+def read_source(filepath: Path) -> Tuple[int, Optional[str]]:
+    """读取源码文件，返回 (字节数, 文本)；不是合法 UTF-8 时逐文件警告，文本为 None"""
+    return fileio.read_if_contains(filepath, ())
+
+
+def scan_files(paths: Sequence[Any],
+               worker: Callable[[Any], Tuple[int, Any]],
+               workers: Optional[int] = None,
+               stats: Optional[ScanStats] = None,
+               budget: Optional[float] = None) -> Iterator[Tuple[Path, Any]]:
+    """
+    在进程池中对每个文件执行 worker，按 paths 顺序逐个产出 (path, result)
+
+    paths 的元素原样传给 worker（可以是路径，也可以是带附加信息的元组）。
+    worker 必须是可pickle的顶层函数（或其 functools.partial），
+    返回 (读取字节数, 结果)。workers<=1 时在当前进程内串行执行。
+    启用 --profile 时，worker 中记录的剖析数据随结果返回并合并到主进程。
+    给出 budget（秒）时，单个文件超出时间预算即被跳过：不产出结果，
+    只记录到 stats.skipped。
+    """
+    stats = stats if stats is not None else ScanStats()
+    workers = workers or default_workers()
+    start = time.perf_counter()
+
+    if budget:
+        worker = functools.partial(regex_guard.budgeted_call, worker, budget)
+    profiler = profiling.active_profiler()
+    if profiler is not None:
+        worker = functools.partial(profiling.profiled_call, worker)
+
+    def collect(path, nbytes, result):
+        stats.files += 1
+        stats.bytes += nbytes
+        stats.elapsed = time.perf_counter() - start
+        if profiler is not None:
+            result, data = result
+            profiler.merge(data)
+        if isinstance(result, regex_guard.TimedOut):
+            stats.files -= 1
+            stats.skipped.append(result.path)
+            return None
+        return path, result
+
+    if workers <= 1 or len(paths) < 2:
+        for path in paths:
+            nbytes, result = worker(path)
+            item = collect(path, nbytes, result)
+            if item is not None:
+                yield item
+        return
+
+    # 分块降低进程间通信开销，同时保留足够的粒度做负载均衡
+    chunksize = max(1, len(paths) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for path, (nbytes, result) in zip(paths, executor.map(worker, paths, chunksize=chunksize)):
+            item = collect(path, nbytes, result)
+            if item is not None:
+                yield item
@@ -0,0 +1,636 @@
+"""
+原始SQL目录
+
+从源码中提取每一处 $queryRaw / $executeRaw / $queryRawUnsafe / $executeRawUnsafe 的SQL模板：
+
+- 标签模板 prisma.$queryRaw`...${x}...`（及 Prisma.sql`...`）中的插值由 Prisma 作为绑定参数发送，
+  记为 $1、$2 ...；Prisma.raw(x) 原样拼入，Prisma.join(x) 记为一个参数，Prisma.empty 为空
+- $queryRawUnsafe(sql, ...args) 的 sql 可以是字符串、模板或本地变量；变量按赋值和 += 拼接还原
+  （所有分支里的拼接都算上，得到条件全部成立时的完整查询），
+  紧跟在 $ 之后的插值（$${params.length + 1}）视为占位符，其余插值原样拼入
+
+每个参数按表达式中的名称推断一个样例值（limit -> 100，userId -> 种子数据中的第一个主键，
+startDate -> now() - 30天 ...），得到可以直接 EXPLAIN 的SQL；样例值可以用 JSON 文件覆盖。
+同时记录模板自身的问题（开头多余的分号、被历史脚本改坏的 = 等），便于和执行结果对照。
+"""
+
+import datetime
+import functools
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from tstools import fileio, profiling
+from tstools.scan_engine import ScanStats, iter_source_files, scan_files
+from tstools.ts_lexer import (IDENT, NUMBER, PUNCT, STRING, TEMPLATE, TEMPLATE_HEAD, TEMPLATE_MIDDLE,
+                              TEMPLATE_TAIL, Token, find_function_declarations, match_brackets, split_args,
+                              tokenize_all)
+
+CATALOG_VERSION = 1
+
+# 默认提取的目录
+CATALOG_DIRS = ['app', 'lib']
+
+TAGGED_METHODS = ('$queryRaw', '$executeRaw')
+UNSAFE_METHODS = ('$queryRawUnsafe', '$executeRawUnsafe')
+RAW_METHODS = TAGGED_METHODS + UNSAFE_METHODS
+
+# 解码前的字节预筛（$queryRaw 也是 $queryRawUnsafe 的前缀）
+_RAW_BYTES = fileio.encode_literals(TAGGED_METHODS)
+
+# 模板问题
+ISSUE_LEADING_SEMICOLON = 'leading-semicolon'          # `; SELECT ...：Prisma 会把它当作两条语句
+ISSUE_DAMAGED_OPERATOR = 'damaged-operator'            # a : b、:== 等被历史脚本改坏的运算符
+ISSUE_PLACEHOLDER_IN_LITERAL = 'placeholder-in-literal'  # '${x} days'：参数落在字符串字面量里
+ISSUE_UNBOUND_PLACEHOLDER = 'unbound-placeholder'      # $n 没有对应的实参
+ISSUE_DYNAMIC_SQL = 'dynamic-sql'                      # SQL 无法静态还原
+
+ISSUES = {
+    ISSUE_LEADING_SEMICOLON: "SQL 以分号开头，会被当作多条语句",
+    ISSUE_DAMAGED_OPERATOR: "SQL 中有被改坏的运算符（如 a : b、:==）",
+    ISSUE_PLACEHOLDER_IN_LITERAL: "插值参数位于字符串字面量内，Prisma 不会绑定它",
+    ISSUE_UNBOUND_PLACEHOLDER: "占位符没有对应的参数",
+    ISSUE_DYNAMIC_SQL: "SQL 无法静态还原",
+}
+
+# 样例值使用的种子主键：与 prisma_schema.seed_sql 生成的第 1 行主键一致（md5('1')::uuid）
+_KEY_HEX = hashlib.md5(b'1').hexdigest()
+SAMPLE_KEY = "'{}-{}-{}-{}-{}'".format(_KEY_HEX[:8], _KEY_HEX[8:12], _KEY_HEX[12:16], _KEY_HEX[16:20],
+                                       _KEY_HEX[20:])
+SAMPLE_DEFAULT = "'1'"
+# 日期参数：种子数据的时间分布在最近一年内
+SAMPLE_DATE = "now() - interval '30 days'"
+
+# 参数名（小写）-> 样例值（SQL 字面量），按顺序取第一个匹配
+_SAMPLE_RULES = [
+    (re.compile(r'(?:^|_)ids?$|[a-z]ids?$'), SAMPLE_KEY),
+    (re.compile(r'limit$|take$|pagesize$|perpage$|^top$'), '100'),
+    (re.compile(r'offset$|skip$'), '0'),
+    (re.compile(r'^page$'), '1'),
+    (re.compile(r'cohorttype$|granularity$|unit$'), "'month'"),
+    (re.compile(r'days?$|hours?$|weeks?$|months?$|period$|interval$|window$'), '30'),
+    (re.compile(r'date$|time$|since$|from$|start$|end$|until$|before$|after$|(?:^|_|[a-z])at$'),
+     SAMPLE_DATE),
+    (re.compile(r'^(?:is|has|should|can)[a-z]|dryrun$|enabled$|active$'), 'true'),
+    (re.compile(r'status$'), "'pending'"),
+    (re.compile(r'amount$|price$|balance$|threshold$'), '100'),
+]
+
+_SQL_RESERVED = {'new', 'Date', 'parseInt', 'parseFloat', 'Number', 'String', 'Boolean', 'get',
+                 'toISOString', 'toString', 'trim', 'toLowerCase', 'toUpperCase', 'searchParams',
+                 'url', 'body', 'params', 'query', 'request', 'req', 'length', 'Math', 'floor', 'max', 'min'}
+
+_DECLARATIONS = {'const', 'let', 'var'}
+_OPERAND_END = {STRING, TEMPLATE, TEMPLATE_TAIL, IDENT, NUMBER}
+_CONTINUE_OPS = {'+', '.', '?.', '?', ':', '||', '&&', '??', '-', '*', '/', '%', '=', '==', '===', '!=',
+                 '!==', '<', '>', '<=', '>=', ',', '=>'}
+_CLOSERS = {';', ',', ')', ']', '}'}
+_JS_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0'}
+_ESCAPE_RE = re.compile(r'\\(.)', re.S)
+_DAMAGED_OPERATOR_RE = re.compile(r'(?<![:\w]):==|(?<=[\w)\'"])\s+:\s+(?=[\w(\'"$])')
+# 表名之后紧跟 ( 的是函数调用（FROM get_user_wallet_balance(...)）
+_TABLE_RE = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+((?:"[^"]+"|\w+)(?:\.(?:"[^"]+"|\w+))?)(?!\s*\(|\w)', re.I)
+_NOT_TABLES = {'select', 'lateral', 'set', 'only'}
+# EXTRACT(EPOCH FROM x)、TRIM(BOTH ' ' FROM x) 里的 FROM 不是表
+_FIELD_FROM_RE = re.compile(r'\b(?:EPOCH|CENTURY|DECADE|YEAR|QUARTER|MONTH|WEEK|DAY|DOW|ISODOW|DOY|HOUR|MINUTE|SECOND'
+                            r'|MILLISECONDS|MICROSECONDS|BOTH|LEADING|TRAILING|\'\')\s*$', re.I)
+_CTE_RE = re.compile(r'(?:\bWITH(?:\s+RECURSIVE)?|,)\s*(\w+)\s+AS\s*(?:NOT\s+)?(?:MATERIALIZED\s+)?\(', re.I)
+_PLACEHOLDER_RE = re.compile(r'\$(\d+)')
+
+
+class SqlTemplate(NamedTuple):
+    path: str                    # 相对项目根目录
+    line: int
+    function: Optional[str]      # 所在的函数声明（箭头函数为 None）
+    method: str                  # $queryRaw / $queryRawUnsafe ...
+    template: str                # 绑定参数为 $n，原样拼入的插值为 ${表达式}
+    sql: Optional[str]           # 代入样例值后可执行的SQL；无法还原时为 None
+    params: List[dict]           # 绑定参数 [{'expr', 'sample'}]，按 $n 顺序
+    inline: List[dict]           # 原样拼入的插值 [{'expr', 'sample'}]
+    issues: List[str]
+
+    @property
+    def id(self) -> str:
+        return f"{self.path}:{self.line}"
+
+    @property
+    def fingerprint(self) -> str:
+        """模板的指纹（忽略空白），版本之间比对用"""
+        return hashlib.sha1(' '.join(self.template.split()).encode('utf-8')).hexdigest()[:12]
+
+    @property
+    def tables(self) -> List[str]:
+        return referenced_tables(self.template)
+
+    def to_dict(self) -> dict:
+        return dict(self._asdict(), id=self.id, fingerprint=self.fingerprint, tables=self.tables)
+
+
+def referenced_tables(sql: str) -> List[str]:
+    """SQL 中 FROM / JOIN / UPDATE / INTO 之后的表名（去掉 CTE 名称、函数调用和引号）"""
+    ctes = {name.lower() for name in _CTE_RE.findall(sql)}
+    tables = []
+    text = _strip_literals(sql)
+    for m in _TABLE_RE.finditer(text):
+        if _FIELD_FROM_RE.search(text, max(m.start() - 20, 0), m.start()):
+            continue
+        name = m.group(1).replace('"', '')
+        if name.lower() not in ctes and name.lower() not in _NOT_TABLES and name not in tables:
+            tables.append(name)
+    return tables
+
+
+def _strip_literals(sql: str) -> str:
+    """把字符串字面量替换为空串，避免其中的关键字被误认"""
+    return re.sub(r"'(?:[^']|'')*'", "''", sql)
+
+
+def repair_sql(sql: str) -> str:
+    """去掉开头多余的分号，把被改坏的运算符（a : b、:==）恢复为 =（字符串字面量内不变）"""
+    def fix(m):
+        if m.group(0).startswith("'"):
+            return m.group(0)
+        return '=' if m.group(0) == ':==' else ' = '
+
+    sql = sql.strip().lstrip(';').strip()
+    return re.sub(r"'(?:[^']|'')*'|" + _DAMAGED_OPERATOR_RE.pattern, fix, sql)
+
+
+def _quote_open(sql: str) -> bool:
+    """sql 末尾是否处在单引号字符串内（'' 转义不改变奇偶）"""
+    return _strip_literals(sql).count("'") % 2 == 1
+
+
+def sample_for(expr: str, overrides: Optional[Dict[str, str]] = None) -> str:
+    """按表达式推断样例值（SQL 字面量）；overrides 可按完整表达式或参数名覆盖"""
+    expr = expr.strip()
+    overrides = overrides or {}
+    if expr in overrides:
+        return overrides[expr]
+    if re.fullmatch(r'-?\d+(?:\.\d+)?', expr):
+        return expr
+    if expr in ('true', 'false'):
+        return expr
+    if expr in ('null', 'undefined'):
+        return 'NULL'
+    literal = re.fullmatch(r"""'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)"|`([^`$]*)`""", expr, re.S)
+    if literal:
+        return _sql_string(_unescape(next(g for g in literal.groups() if g is not None)))
+    # 三元表达式取第一个分支里的字面量
+    choice = re.search(r"\?\s*('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")", expr)
+    if choice:
+        return _sql_string(_unescape(choice.group(1)[1:-1]))
+
+    idents = [name for name in re.findall(r'[A-Za-z_$][\w$]*', expr) if name not in _SQL_RESERVED]
+    names = idents + re.findall(r"""\.get\(\s*['"]([\w-]+)['"]""", expr)
+    for name in reversed(names):
+        if name in overrides:
+            return overrides[name]
+    if re.search(r'\bnew\s+Date\b|\bDate\.now\b', expr) and not idents:
+        return SAMPLE_DATE
+    for name in reversed(names):
+        lowered = name.lower()
+        for pattern, sample in _SAMPLE_RULES:
+            if pattern.search(lowered):
+                return sample
+    return SAMPLE_DEFAULT
+
+
+def sample_text(sample: str) -> str:
+    """样例值在字符串字面量内部时使用的文本形式"""
+    if sample.startswith("'") and sample.endswith("'"):
+        return sample[1:-1].replace("''", "'")
+    if re.fullmatch(r'-?\d+(?:\.\d+)?|true|false', sample):
+        return sample
+    if sample == SAMPLE_DATE:
+        return (datetime.date.today() - datetime.timedelta(days=30)).isoformat()
+    return '1'
+
+
+def _sql_string(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+
+def _unescape(text: str) -> str:
+    return _ESCAPE_RE.sub(lambda m: _JS_ESCAPES.get(m.group(1), m.group(1)), text)
+
+
+class _Piece(NamedTuple):
+    kind: str     # 'text' / 'bind'（Prisma 绑定参数）/ 'placeholder'（$${...}）/ 'inline'（原样拼入）
+    value: str    # 文本或表达式源码
+
+
+class _Extractor:
+    """单个文件内的SQL还原"""
+
+    def __init__(self, content: str, tokens: List[Token], pairs: Dict[int, int]):
+        self.content = content
+        self.tokens = tokens
+        self.pairs = pairs
+        self.functions = list(find_function_declarations(tokens, pairs=pairs))
+        self.dynamic = False
+
+    def source(self, start: int, end: int) -> str:
+        if start >= end:
+            return ''
+        return self.content[self.tokens[start].start:self.tokens[end - 1].end]
+
+    def function_at(self, index: int):
+        inner = None
+        for span in self.functions:
+            if span.start <= index and (span.body_close < 0 or index <= span.body_close):
+                if inner is None or span.start >= inner.start:
+                    inner = span
+        return inner
+
+    # --- 表达式边界 ---
+
+    def expr_end(self, start: int, limit: Optional[int] = None) -> int:
+        """从 start 开始的表达式的结束位置（不含）"""
+        tokens = self.tokens
+        limit = len(tokens) if limit is None else limit
+        if start >= limit:
+            return start
+        depth = tokens[start].depth
+        k = start
+        while k < limit:
+            tok = tokens[k]
+            if tok.depth < depth:
+                break
+            if tok.depth == depth and tok.kind == PUNCT and tok.value in _CLOSERS:
+                break
+            if k > start and tok.depth == depth and tok.line > tokens[k - 1].line:
+                prev = tokens[k - 1]
+                # 换行处前后都不是运算符时视为语句结束（自动插入分号）
+                if ((prev.kind in _OPERAND_END or prev.value in (')', ']'))
+                        and tok.value not in _CONTINUE_OPS and tok.kind != TEMPLATE_MIDDLE
+                        and tok.kind != TEMPLATE_TAIL):
+                    break
+            if tok.kind == PUNCT and tok.value in ('(', '[', '{') and k in self.pairs:
+                k = self.pairs[k] + 1
+                continue
+            if tok.kind == TEMPLATE_HEAD:
+                k = self.template_end(k) + 1
+                continue
+            k += 1
+        return k
+
+    def template_end(self, head: int) -> int:
+        """模板开头 token 的下标 -> 结尾 token（TEMPLATE_TAIL）的下标"""
+        depth = self.tokens[head].depth
+        for k in range(head + 1, len(self.tokens)):
+            tok = self.tokens[k]
+            if tok.kind == TEMPLATE_TAIL and tok.depth == depth:
+                return k
+        return len(self.tokens) - 1
+
+    def split_top(self, start: int, end: int, op: str) -> List[Tuple[int, int]]:
+        """按顶层运算符切分 [start, end)"""
+        parts = []
+        if start >= end:
+            return parts
+        depth = self.tokens[start].depth
+        last = start
+        k = start
+        while k < end:
+            tok = self.tokens[k]
+            if tok.kind == PUNCT and tok.value in ('(', '[', '{') and k in self.pairs:
+                k = self.pairs[k] + 1
+                continue
+            if tok.kind == TEMPLATE_HEAD:
+                k = self.template_end(k) + 1
+                continue
+            if tok.kind == PUNCT and tok.value == op and tok.depth == depth:
+                parts.append((last, k))
+                last = k + 1
+            k += 1
+        parts.append((last, end))
+        return parts
+
+    # --- SQL 表达式求值 ---
+
+    def sql_expr(self, start: int, end: int, tagged: bool, seen: Set[str]) -> List[_Piece]:
+        """把 [start, end) 的表达式还原为SQL片段"""
+        tokens = self.tokens
+        # 三元表达式取第一个分支
+        question = self.split_top(start, end, '?')
+        if len(question) > 1:
+            consequent = self.split_top(question[1][0], end, ':')
+            return self.sql_expr(consequent[0][0], consequent[0][1], tagged, seen)
+        operands = self.split_top(start, end, '+')
+        pieces: List[_Piece] = []
+        for a, b in operands:
+            pieces.extend(self.operand(a, b, tagged, seen))
+        return pieces
+
+    def operand(self, a: int, b: int, tagged: bool, seen: Set[str]) -> List[_Piece]:
+        tokens = self.tokens
+        if a >= b:
+            return []
+        first = tokens[a]
+        if first.kind == PUNCT and first.value == '(' and self.pairs.get(a) == b - 1:
+            return self.sql_expr(a + 1, b - 1, tagged, seen)
+        if b - a == 1 and first.kind == STRING:
+            return [_Piece('text', _unescape(first.value[1:-1]))]
+        if first.kind in (TEMPLATE, TEMPLATE_HEAD) and self.operand_template_end(a) == b - 1:
+            return self.template(a, tagged, seen)
+        # Prisma.sql`...` / sql`...`
+        tag_end = a + 3 if self.source(a, a + 3) == 'Prisma.sql' else a + 1 if first.value == 'sql' else a
+        if tag_end > a and tag_end < b and tokens[tag_end].kind in (TEMPLATE, TEMPLATE_HEAD) \
+                and self.operand_template_end(tag_end) == b - 1:
+            return self.template(tag_end, True, seen)
+        if self.source(a, b) == 'Prisma.empty':
+            return []
+        if b - a == 1 and first.kind == IDENT and first.value not in seen:
+            resolved = self.resolve(first.value, a, tagged, seen | {first.value})
+            if resolved is not None:
+                return resolved
+        expr = self.source(a, b)
+        return [_Piece('bind' if tagged else 'inline', expr)]
+
+    def operand_template_end(self, index: int) -> int:
+        return index if self.tokens[index].kind == TEMPLATE else self.template_end(index)
+
+    def template(self, head: int, tagged: bool, seen: Set[str]) -> List[_Piece]:
+        """模板字符串 -> SQL片段；tagged 时插值为绑定参数"""
+        tokens = self.tokens
+        tok = tokens[head]
+        if tok.kind == TEMPLATE:
+            return [_Piece('text', _unescape(tok.value[1:-1]))]
+        pieces = [_Piece('text', _unescape(tok.value[1:-2]))]
+        end = self.template_end(head)
+        depth = tok.depth
+        k = head + 1
+        expr_start = k
+        while k <= end:
+            t = tokens[k]
+            if t.kind in (TEMPLATE_MIDDLE, TEMPLATE_TAIL) and t.depth == depth:
+                pieces.extend(self.interpolation(expr_start, k, tagged, pieces, seen))
+                text = t.value[1:-2] if t.kind == TEMPLATE_MIDDLE else t.value[1:-1]
+                pieces.append(_Piece('text', _unescape(text)))
+                expr_start = k + 1
+            k += 1
+        return pieces
+
+    def interpolation(self, start: int, end: int, tagged: bool, before: List[_Piece],
+                      seen: Set[str]) -> List[_Piece]:
+        expr = self.source(start, end)
+        if tagged:
+            raw = re.fullmatch(r'Prisma\.raw\(([\s\S]*)\)', expr)
+            if raw:
+                return [_Piece('inline', raw.group(1).strip())]
+            join = re.fullmatch(r'Prisma\.join\(([\s\S]*)\)', expr)
+            if join:
+                return [_Piece('bind', join.group(1).strip())]
+            if expr == 'Prisma.empty':
+                return []
+            if re.search(r'\bPrisma\.sql\b|\bsql`', expr):
+                return self.sql_expr(start, end, True, seen)
+            return [_Piece('bind', expr)]
+        # $${params.length + 1}：占位符
+        if before and before[-1].kind == 'text' and before[-1].value.endswith('$'):
+            before[-1] = _Piece('text', before[-1].value[:-1])
+            return [_Piece('placeholder', expr)]
+        return self.sql_expr(start, end, False, seen)
+
+    # --- 本地变量 ---
+
+    def assignments(self, name: str, before: int) -> List[Tuple[str, int, int]]:
+        """name 在 before 之前（同一函数内）的赋值：[(运算符, 表达式起点, 终点)]"""
+        span = self.function_at(before)
+        scope_start = span.body_open if span is not None else 0
+        tokens = self.tokens
+        found = []
+        for k in range(scope_start, before):
+            tok = tokens[k]
+            if tok.kind != IDENT or tok.value != name:
+                continue
+            if k > 0 and tokens[k - 1].value in ('.', '?.'):
+                continue
+            j = k + 1
+            # const name: Type = ...
+            if j < before and tokens[j].value == ':' and k > 0 and tokens[k - 1].value in _DECLARATIONS:
+                while j < before and tokens[j].value not in ('=', ';') and tokens[j].depth >= tok.depth:
+                    j += 1
+            if j < before and tokens[j].kind == PUNCT and tokens[j].value in ('=', '+='):
+                start = j + 1
+                found.append((tokens[j].value, start, self.expr_end(start, before)))
+        return found
+
+    def resolve(self, name: str, before: int, tagged: bool, seen: Set[str]) -> Optional[List[_Piece]]:
+        """还原字符串变量：最后一次 = 赋值加上之后全部 += 拼接"""
+        found = self.assignments(name, before)
+        last = max((i for i, (op, _, _) in enumerate(found) if op == '='), default=None)
+        if last is None:
+            return None
+        pieces = []
+        for _, start, end in found[last:]:
+            pieces.extend(self.sql_expr(start, end, tagged, seen))
+        return pieces
+
+    def array_items(self, name: str, before: int) -> Optional[List[str]]:
+        """数组变量在 before 之前的元素：初始字面量加上全部 name.push(...) 的实参"""
+        found = [(op, s, e) for op, s, e in self.assignments(name, before) if op == '=']
+        if not found:
+            return None
+        _, start, end = found[-1]
+        tokens = self.tokens
+        if tokens[start].value != '[' or self.pairs.get(start) != end - 1:
+            return None
+        items = [self.source(a, b) for a, b in split_args(tokens, start, end - 1)]
+        for k in range(end, before):
+            if (tokens[k].kind == IDENT and tokens[k].value == name and k + 3 < before
+                    and tokens[k + 1].value == '.' and tokens[k + 2].value == 'push'
+                    and tokens[k + 3].value == '(' and k + 3 in self.pairs):
+                items.extend(self.source(a, b) for a, b in split_args(tokens, k + 3, self.pairs[k + 3]))
+        return items
+
+    # --- 调用点 ---
+
+    def call_sites(self):
+        tokens = self.tokens
+        for i, tok in enumerate(tokens):
+            if tok.kind != IDENT or tok.value not in RAW_METHODS or i == 0 or tokens[i - 1].value not in ('.', '?.'):
+                continue
+            j = i + 1
+            if j < len(tokens) and tokens[j].value == '<':
+                # $queryRaw<Type[]>
+                nesting = 0
+                while j < len(tokens):
+                    nesting += tokens[j].value.count('<') - tokens[j].value.count('>')
+                    j += 1
+                    if nesting <= 0:
+                        break
+            if j < len(tokens):
+                yield i, j
+
+    def extract(self, index: int, start: int) -> Optional[Tuple[str, List[_Piece], List[str]]]:
+        """调用点 -> (方法名, SQL片段, 额外实参表达式)"""
+        tokens = self.tokens
+        method = tokens[index].value
+        tok = tokens[start]
+        args: List[str] = []
+        if method in TAGGED_METHODS and tok.kind in (TEMPLATE, TEMPLATE_HEAD):
+            return method, self.template(start, True, set()), args
+        if tok.kind != PUNCT or tok.value != '(' or start not in self.pairs:
+            return None
+        spans = split_args(tokens, start, self.pairs[start])
+        if not spans:
+            return None
+        a, b = spans[0]
+        pieces = self.sql_expr(a, b, method in TAGGED_METHODS, set())
+        for a, b in spans[1:]:
+            if tokens[a].value == '...' and b - a == 2 and tokens[a + 1].kind == IDENT:
+                items = self.array_items(tokens[a + 1].value, index)
+                if items is None:
+                    self.dynamic = True
+                    items = []
+                args.extend(items)
+            else:
+                args.append(self.source(a, b))
+        return method, pieces, args
+
+
+def _render(pieces: Sequence[_Piece], args: Sequence[str], overrides: Optional[Dict[str, str]]):
+    """SQL片段 -> (模板, 可执行SQL, 绑定参数, 拼入的插值, 问题)"""
+    template = []
+    sql = []
+    params: List[dict] = []
+    inline: List[dict] = []
+    issues: List[str] = []
+    placeholders = 0
+
+    def bind(expr: str):
+        params.append({'expr': expr, 'sample': sample_for(expr, overrides)})
+        ref = f"${len(params)}"
+        template.append(ref)
+        sql.append(ref)
+
+    for piece in pieces:
+        if piece.kind == 'text':
+            template.append(piece.value)
+            sql.append(piece.value)
+        elif piece.kind == 'bind':
+            if _quote_open(''.join(template)) and ISSUE_PLACEHOLDER_IN_LITERAL not in issues:
+                issues.append(ISSUE_PLACEHOLDER_IN_LITERAL)
+            bind(piece.value)
+        elif piece.kind == 'placeholder':
+            # $${params.length + 1} 按出现顺序对应 ...params 中的元素
+            placeholders += 1
+            template.append(f"${placeholders}")
+            sql.append(f"${placeholders}")
+        else:
+            sample = sample_for(piece.value, overrides)
+            inline.append({'expr': piece.value, 'sample': sample})
+            template.append('${' + piece.value + '}')
+            sql.append(sample_text(sample) if _quote_open(''.join(sql)) else sample)
+
+    # 非标签调用的额外实参按 $n 对应
+    if not params:
+        params = [{'expr': expr, 'sample': sample_for(expr, overrides)} for expr in args]
+    template_text = ''.join(template)
+    bound = _bind_placeholders(''.join(sql), params, issues)
+    if template_text.lstrip().startswith(';'):
+        issues.append(ISSUE_LEADING_SEMICOLON)
+        bound = bound.lstrip().lstrip(';')
+    if _DAMAGED_OPERATOR_RE.search(_strip_literals(template_text)):
+        issues.append(ISSUE_DAMAGED_OPERATOR)
+    return template_text.strip(), bound.strip(), params, inline, issues
+
+
+def _bind_placeholders(sql: str, params: List[dict], issues: List[str]) -> str:
+    """把 $n 替换为样例值：字符串字面量内用文本形式，其余位置用SQL字面量"""
+    out = []
+    in_quote = False
+    i = 0
+    while i < len(sql):
+        ch = sql[i]
+        if ch == "'":
+            in_quote = not in_quote
+            out.append(ch)
+            i += 1
+            continue
+        m = _PLACEHOLDER_RE.match(sql, i) if ch == '$' else None
+        if m:
+            n = int(m.group(1))
+            if 1 <= n <= len(params):
+                sample = params[n - 1]['sample']
+            else:
+                sample = SAMPLE_DEFAULT
+                if ISSUE_UNBOUND_PLACEHOLDER not in issues:
+                    issues.append(ISSUE_UNBOUND_PLACEHOLDER)
+            if in_quote:
+                out.append(sample_text(sample))
+            elif re.fullmatch(r"-?\d+(?:\.\d+)?|'(?:[^']|'')*'|\w+", sample):
+                out.append(sample)
+            else:
+                out.append(f"({sample})")
+            i = m.end()
+            continue
+        out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def extract_templates(content: str, rel_path: str, tokens: Optional[List[Token]] = None,
+                      pairs: Optional[Dict[int, int]] = None,
+                      overrides: Optional[Dict[str, str]] = None) -> List[SqlTemplate]:
+    """提取单个文件中的全部原始SQL调用"""
+    if not any(method in content for method in TAGGED_METHODS):
+        return []
+    if tokens is None:
+        tokens = tokenize_all(content)
+    if pairs is None:
+        pairs = match_brackets(tokens)
+    extractor = _Extractor(content, tokens, pairs)
+    templates = []
+    for index, start in extractor.call_sites():
+        extractor.dynamic = False
+        span = extractor.function_at(index)
+        function = span.name if span is not None else None
+        extracted = extractor.extract(index, start)
+        method = tokens[index].value
+        if extracted is None or not any(p.kind == 'text' and p.value.strip() for p in extracted[1]):
+            template = extractor.source(index, extractor.expr_end(start))
+            templates.append(SqlTemplate(rel_path, tokens[index].line, function, method, template, None,
+                                         [], [], [ISSUE_DYNAMIC_SQL]))
+            continue
+        _, pieces, args = extracted
+        template, sql, params, inline, issues = _render(pieces, args, overrides)
+        if extractor.dynamic:
+            issues.append(ISSUE_DYNAMIC_SQL)
+        templates.append(SqlTemplate(rel_path, tokens[index].line, function, method, template, sql,
+                                     params, inline, issues))
+    return templates
+
+
+def _catalog_worker(path: Path, root: Path, overrides: Optional[Dict[str, str]]) -> Tuple[int, List[SqlTemplate]]:
+    """进程池 worker"""
+    nbytes, content = fileio.read_if_contains(path, _RAW_BYTES)
+    if content is None:
+        return nbytes, []
+    with profiling.phase('analyze'):
+        return nbytes, extract_templates(content, path.relative_to(root).as_posix(), overrides=overrides)
+
+
+def build_catalog(root: Path, dirs: Sequence[str] = CATALOG_DIRS, workers: Optional[int] = None,
+                  stats: Optional[ScanStats] = None, budget: Optional[float] = None,
+                  overrides: Optional[Dict[str, str]] = None) -> List[SqlTemplate]:
+    """并行提取目录下全部原始SQL（按路径、行号排序）"""
+    root = Path(root).resolve()
+    with profiling.phase('walk'):
+        paths = iter_source_files(root, dirs)
+    worker = functools.partial(_catalog_worker, root=root, overrides=overrides)
+    templates = []
+    for _, found in scan_files(paths, worker, workers=workers, stats=stats, budget=budget):
+        templates.extend(found)
+    return templates
+
+
+def catalog_dict(templates: Sequence[SqlTemplate]) -> dict:
+    """目录的 JSON 形式"""
+    return {
+        'version': CATALOG_VERSION,
+        'queries': [template.to_dict() for template in templates],
+    }
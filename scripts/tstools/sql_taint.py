@@ -0,0 +1,825 @@
+"""
+原始SQL的跨函数污点分析
+
+跟踪 SQL 字符串经由变量、字符串拼接/插值和同一文件内函数调用的构造过程，
+判断传给 $queryRawUnsafe / $executeRawUnsafe / Prisma.raw 的 SQL 是否混入了外部输入。
+
+每个函数只分析一次，得到摘要：返回值依赖哪些参数、函数内的原始SQL调用依赖哪些参数。
+调用处直接把实参代入摘要，不在每个调用点重新分析被调用函数，
+因此整个文件的分析代价与代码量成线性关系。
+从其他文件导入的函数不展开，返回值视为未知。
+"""
+
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+from tstools.ts_lexer import (
+    IDENT,
+    NUMBER,
+    PUNCT,
+    REGEX,
+    STRING,
+    TEMPLATE,
+    TEMPLATE_HEAD,
+    TEMPLATE_MIDDLE,
+    TEMPLATE_TAIL,
+    Token,
+    find_function_declarations,
+    match_brackets,
+    split_args,
+)
+
+# 把第一个实参当作原始SQL执行的调用
+RAW_SQL_METHODS = ('$queryRawUnsafe', '$executeRawUnsafe')
+# Prisma.raw(sql) 把字符串原样拼进 Prisma.sql 模板
+PRISMA_RAW = 'Prisma.raw'
+SINK_LITERALS = RAW_SQL_METHODS + (PRISMA_RAW,)
+
+# 污点等级：常量（含数字）< 无法确定 < 混入了外部输入
+SAFE = 0
+UNKNOWN = 1
+TAINTED = 2
+
+
+class Taint(NamedTuple):
+    """
+    一个值的污点
+
+    direct / interpolated 记录该值依赖的当前函数参数下标：
+    direct 为参数原样流入，interpolated 为参数被插值或拼接进字符串。
+    """
+    level: int = SAFE
+    direct: FrozenSet[int] = frozenset()
+    interpolated: FrozenSet[int] = frozenset()
+
+    def join(self, other: 'Taint') -> 'Taint':
+        if other == _SAFE:
+            return self
+        if self == _SAFE:
+            return other
+        return Taint(max(self.level, other.level),
+                     self.direct | other.direct,
+                     self.interpolated | other.interpolated)
+
+    def spliced(self) -> 'Taint':
+        """插值/拼接进字符串：无法确定的值升级为污点"""
+        return Taint(TAINTED if self.level == UNKNOWN else self.level,
+                     frozenset(), self.direct | self.interpolated)
+
+    def resolve(self, args: Sequence['Taint']) -> 'Taint':
+        """把参数依赖替换为实参的污点（缺省的实参视为常量）"""
+        result = Taint(self.level)
+        for i in self.direct:
+            if i < len(args):
+                result = result.join(args[i])
+        for i in self.interpolated:
+            if i < len(args):
+                result = result.join(args[i].spliced())
+        return result
+
+
+_SAFE = Taint()
+_UNKNOWN = Taint(UNKNOWN)
+
+# 返回数字/布尔值等可以安全插值的函数与方法
+_SAFE_FUNCTIONS = {'parseInt', 'parseFloat', 'Number', 'Boolean', 'isNaN', 'isFinite'}
+_SAFE_OBJECTS = {'Math', 'Number'}
+_SAFE_METHODS = {
+    'toFixed', 'toISOString', 'getTime', 'valueOf', 'indexOf', 'lastIndexOf', 'includes',
+    'startsWith', 'endsWith', 'test', 'some', 'every', 'findIndex', 'getFullYear',
+    'getMonth', 'getDate', 'getHours', 'localeCompare',
+}
+# 结果由接收者（及实参）拼接而来的字符串/数组方法
+_DERIVED_METHODS = {
+    'trim', 'trimStart', 'trimEnd', 'toLowerCase', 'toUpperCase', 'toString', 'replace',
+    'replaceAll', 'slice', 'substring', 'substr', 'padStart', 'padEnd', 'concat', 'join',
+    'repeat', 'filter', 'flat', 'split',
+}
+# Prisma 的参数化构造，结果不含原样拼接的字符串
+_PARAMETERIZED = {'Prisma.sql', 'Prisma.join', 'Prisma.empty', 'sql'}
+_SAFE_LITERALS = {'true', 'false', 'null', 'undefined'}
+
+_DECLARATIONS = {'const', 'let', 'var'}
+# 语句分析需要关注的标识符（另加本文件中的函数名和赋值目标）
+SINK_NAMES = RAW_SQL_METHODS + ('raw',)
+_STATEMENT_WORDS = _DECLARATIONS | {'return', 'push', 'unshift'} | set(SINK_NAMES)
+_ASSIGN_OPS = {'=', '+=', '||=', '??='}
+_CONTROL_KEYWORDS = {'if', 'for', 'while', 'switch', 'catch', 'return', 'function', 'with'}
+_MEMBER_MODIFIERS = {'static', 'async', 'public', 'private', 'protected', 'readonly', 'override', 'get'}
+# 二元运算符按优先级从低到高分组：|| ?? && 取任一操作数，比较和算术的结果是常量，+ 是拼接
+_LOGICAL, _COMPARISON, _CONCAT, _ARITHMETIC = range(4)
+_BINARY_OPS = {
+    '||': _LOGICAL, '??': _LOGICAL, '&&': _LOGICAL,
+    '===': _COMPARISON, '!==': _COMPARISON, '==': _COMPARISON, '!=': _COMPARISON, '<': _COMPARISON,
+    '>': _COMPARISON, '<=': _COMPARISON, '>=': _COMPARISON, 'instanceof': _COMPARISON, 'in': _COMPARISON,
+    '+': _CONCAT, '-': _CONCAT,
+    '*': _ARITHMETIC, '/': _ARITHMETIC, '%': _ARITHMETIC, '**': _ARITHMETIC, '|': _ARITHMETIC,
+    '&': _ARITHMETIC, '^': _ARITHMETIC, '<<': _ARITHMETIC, '>>': _ARITHMETIC,
+}
+_PREFIX_OPS = {'await', 'typeof', 'void', '!', '...'}
+_OPENERS = {'(', '[', '{'}
+_OPERAND_KINDS = {IDENT, NUMBER, STRING, TEMPLATE, TEMPLATE_TAIL}
+# 表达式跨行时，下一行以这些 token 开头说明语句尚未结束
+_CONTINUATION = {
+    '.', '?.', '+', '-', '*', '/', '%', '?', ':', '??', '||', '&&', '===', '!==', '==', '!=',
+    '<', '>', '<=', '>=', '=>', 'as', 'satisfies', 'instanceof', 'in', ')', ']', '}',
+}
+
+
+class Sink(NamedTuple):
+    """一次原始SQL调用"""
+    name: str
+    index: int          # 方法名 token 下标
+    close: int          # 配对 ) 的下标（未闭合时为 -1）
+    taint: Optional[Taint]   # 第一个实参的污点；None 表示未直接调用（如把方法赋给变量）
+    has_params: bool    # 是否另外传入了参数
+    simple_query: bool  # 第一个实参是单个标识符
+
+
+class Verdict(NamedTuple):
+    """原始SQL调用的最终判定"""
+    sink: Sink
+    level: int
+    via: List[int]      # 决定该判定的调用所在行（SQL 经函数参数传入时）
+    spans: List[Tuple[int, int]]    # 影响该判定的代码行区间：所在函数以及 via 所在的调用方函数
+
+
+class Scope(NamedTuple):
+    """函数（或模块顶层）"""
+    name: str
+    params: Dict[str, int]      # 参数名（含解构出的名字）-> 参数下标
+    start: int                  # 分析的 token 区间 [start, end)
+    end: int
+    expression_body: bool       # 箭头函数的表达式函数体
+    exported: bool
+
+
+class _Binding:
+    """局部变量：记录全部赋值的表达式区间，第一次读取时才求值"""
+    __slots__ = ('scope', 'env', 'parts', 'cached', 'busy')
+
+    def __init__(self, scope: Scope, env: dict, parts: list):
+        self.scope = scope
+        self.env = env
+        self.parts = parts      # Taint 或 (起点, 终点, 是否拼接)
+        self.cached: Optional[Taint] = None
+        self.busy = False
+
+
+class _Call:
+    """对本文件中函数的调用；实参在需要传播参数污点时才求值"""
+    __slots__ = ('callee', 'ranges', 'line', 'scope', 'env', 'args')
+
+    def __init__(self, callee: str, ranges: List[Tuple[int, int]], line: int, scope: Scope, env: dict):
+        self.callee = callee
+        self.ranges = ranges
+        self.line = line
+        self.scope = scope
+        self.env = env
+        self.args: Optional[List[Taint]] = None
+
+
+class Summary(NamedTuple):
+    returns: Taint
+    sinks: List[Sink]
+    calls: List[_Call]
+
+
+def _param_names(tokens: Sequence[Token], open_idx: int, close_idx: int) -> Dict[str, int]:
+    """形参名 -> 下标；解构参数中的每个名字都对应该参数"""
+    names = {}
+    for index, (a, b) in enumerate(split_args(tokens, open_idx, close_idx)):
+        k = a
+        while k < b and tokens[k].value in ('...', 'public', 'private', 'protected', 'readonly'):
+            k += 1
+        if k >= b:
+            continue
+        if tokens[k].kind == IDENT:
+            names[tokens[k].value] = index
+        elif tokens[k].value in ('{', '['):
+            depth = tokens[k].depth + 1
+            for j in range(k + 1, b):
+                tok = tokens[j]
+                if tok.depth < depth:
+                    break
+                if tok.depth == depth and tok.kind == IDENT and j + 1 < b and \
+                        tokens[j + 1].value in (',', '}', ']', '=') and tokens[j - 1].value != '=':
+                    names[tok.value] = index
+    return names
+
+
+class FileAnalysis:
+    """单个文件的污点分析"""
+
+    def __init__(self, tokens: Sequence[Token], pairs: Optional[Dict[int, int]] = None):
+        self.tokens = tokens
+        self.pairs = pairs if pairs is not None else match_brackets(tokens)
+        self.scopes: List[Scope] = []
+        self.by_name: Dict[str, List[int]] = {}
+        self._idents: Dict[str, List[int]] = {}     # 标识符 -> 出现位置
+        self._assign_sites: List[int] = []          # 赋值目标的位置
+        self._events: Dict[Optional[int], List[int]] = {}
+        self._definitions: set = set()             # 函数名 token 下标（声明处不算调用）
+        self._decl_lines: List[int] = []            # 每个函数声明所在行
+        self._summaries: Dict[int, Summary] = {}
+        self._in_progress: set = set()
+        self._module = Scope('<module>', {}, 0, len(tokens), False, True)
+        self._module_env: Dict[str, _Binding] = {}
+        self._owner: Dict[int, Optional[int]] = {}   # 语句分析访问的标识符 -> 所在的最内层函数
+        self._find_scopes()
+
+    # ------------------------------------------------------------ 函数边界
+
+    def _add_scope(self, scope: Scope, name_index: int):
+        sid = len(self.scopes)
+        self._definitions.add(name_index)
+        self._decl_lines.append(self.tokens[name_index].line)
+        self.scopes.append(scope)
+        self.by_name.setdefault(scope.name, []).append(sid)
+
+    def _find_scopes(self):
+        tokens, pairs = self.tokens, self.pairs
+        n = len(tokens)
+        for span in find_function_declarations(tokens, pairs=pairs):
+            if span.body_close < 0:
+                continue
+            params = _param_names(tokens, span.params_open, pairs.get(span.params_open, -1))
+            self._add_scope(Scope(span.name, params, span.body_open + 1, span.body_close,
+                                  False, span.exported), span.params_open - 1)
+
+        class_bodies = []
+        idents = self._idents
+        for i, tok in enumerate(tokens):
+            if tok.kind != IDENT:
+                continue
+            positions = idents.get(tok.value)
+            if positions is None:
+                idents[tok.value] = [i]
+            else:
+                positions.append(i)
+            if i + 1 < n and tokens[i + 1].value in _ASSIGN_OPS and tokens[i + 1].kind == PUNCT:
+                self._assign_sites.append(i)
+            if tok.value == 'class':
+                k = i + 1
+                while k < n and not (tokens[k].kind == PUNCT and tokens[k].value == '{'):
+                    k += 1
+                if k < n and k in pairs:
+                    class_bodies.append((k, pairs[k]))
+            elif tok.value in _DECLARATIONS and i + 2 < n and tokens[i + 1].kind == IDENT:
+                self._arrow_scope(i, tokens[i + 1].value, i > 0 and tokens[i - 1].value == 'export')
+
+        for open_idx, close_idx in class_bodies:
+            self._method_scopes(open_idx, close_idx)
+
+        # 语句分析要访问的标识符，按所在的最内层函数分组
+        sites = set(self._assign_sites)
+        for name in _STATEMENT_WORDS.union(self.by_name):
+            sites.update(idents.get(name, ()))
+        ordered = sorted(sites)
+        self._owner = dict(zip(ordered, self._innermost(ordered)))
+        for k in ordered:
+            self._events.setdefault(self._owner[k], []).append(k)
+
+    def _innermost(self, indices: Sequence[int]) -> List[Optional[int]]:
+        """
+        一次扫描求出每个下标（升序）所在的最内层函数（模块顶层为 None）
+
+        函数按起点入栈，栈顶是已开始的函数中起点最靠后的一个；栈顶已结束时出栈，
+        被压在下面的已结束函数等露出栈顶时再出栈。
+        """
+        scopes = self.scopes
+        order = sorted(range(len(scopes)), key=lambda sid: (scopes[sid].start, sid))
+        result: List[Optional[int]] = []
+        stack: List[int] = []
+        j = 0
+        for index in indices:
+            while j < len(order) and scopes[order[j]].start <= index:
+                stack.append(order[j])
+                j += 1
+            while stack and scopes[stack[-1]].end <= index:
+                stack.pop()
+            result.append(stack[-1] if stack else None)
+        return result
+
+    def _body_open(self, k: int, limit: int) -> int:
+        """跳过返回值类型注解，返回函数体的 { 或 => 的下标（找不到时返回 -1）"""
+        tokens, pairs = self.tokens, self.pairs
+        while k < limit:
+            value = tokens[k].value
+            if value in ('=>', ';'):
+                return k if value == '=>' else -1
+            if value == '{' and tokens[k - 1].value not in (':', '<', '|', '&', ','):
+                return k
+            k = pairs.get(k, k) + 1
+        return -1
+
+    def _arrow_scope(self, decl: int, name: str, exported: bool):
+        """const NAME [: T] = [async] (params) [: T] => ... / = [async] function (params) {...}"""
+        tokens, pairs = self.tokens, self.pairs
+        n = len(tokens)
+        k = decl + 2
+        if k < n and tokens[k].value == ':':
+            while k < n and tokens[k].value not in ('=', ';') and tokens[k].depth >= tokens[decl].depth:
+                k = pairs.get(k, k) + 1
+        if k >= n or tokens[k].value != '=':
+            return
+        k += 1
+        if k < n and tokens[k].value == 'async':
+            k += 1
+        if k < n and tokens[k].value == 'function':
+            k += 1
+            if k < n and tokens[k].kind == IDENT:
+                k += 1
+        if k < n and tokens[k].kind == IDENT and k + 1 < n and tokens[k + 1].value == '=>':
+            params = {tokens[k].value: 0}
+            arrow = k + 1
+        elif k < n and tokens[k].value == '(' and k in pairs:
+            params = _param_names(tokens, k, pairs[k])
+            arrow = self._body_open(pairs[k] + 1, n)
+        else:
+            return
+        if arrow < 0:
+            return
+        if tokens[arrow].value == '=>':
+            body = arrow + 1
+            if body < n and tokens[body].value == '{' and body in pairs:
+                self._add_scope(Scope(name, params, body + 1, pairs[body], False, exported), decl + 1)
+            elif body < n:
+                self._add_scope(Scope(name, params, body, self._expr_end(body, n), True, exported), decl + 1)
+        elif arrow in pairs:
+            self._add_scope(Scope(name, params, arrow + 1, pairs[arrow], False, exported), decl + 1)
+
+    def _method_scopes(self, open_idx: int, close_idx: int):
+        """类成员方法：[static] [async] NAME(params) [: T] { ... }"""
+        tokens, pairs = self.tokens, self.pairs
+        depth = tokens[open_idx].depth + 1
+        k = open_idx + 1
+        while k < close_idx:
+            tok = tokens[k]
+            if tok.depth != depth:
+                k += 1
+                continue
+            if tok.kind == IDENT and tok.value not in _MEMBER_MODIFIERS and tok.value not in _CONTROL_KEYWORDS \
+                    and k + 1 < close_idx and tokens[k + 1].value == '(' and k + 1 in pairs:
+                params_close = pairs[k + 1]
+                body = self._body_open(params_close + 1, close_idx)
+                if body >= 0 and tokens[body].value == '{' and body in pairs:
+                    params = _param_names(tokens, k + 1, params_close)
+                    # 私有方法只能在类内部调用，参数来自调用处；其余方法视为对外接口
+                    private = any(t.value == 'private' for t in tokens[max(open_idx, k - 3):k])
+                    self._add_scope(Scope(tok.value, params, body + 1, pairs[body], False, not private), k)
+                    k = pairs[body] + 1
+                    continue
+            elif tok.kind == IDENT and k + 1 < close_idx and tokens[k + 1].value == '=':
+                # 类字段形式的箭头函数 NAME = async (...) => {...}
+                self._arrow_scope(k - 1, tok.value, True)
+            k = pairs.get(k, k) + 1 if tok.value in ('{', '(', '[') else k + 1
+
+    # ------------------------------------------------------------ 表达式
+
+    def _expr_end(self, start: int, limit: int) -> int:
+        """表达式的结束位置：同一深度的 ; 或 ,、外层闭括号，或按自动分号插入规则换行结束"""
+        tokens = self.tokens
+        depth = tokens[start].depth
+        prev = None
+        for k in range(start, limit):
+            tok = tokens[k]
+            if tok.depth < depth:
+                return k
+            if tok.depth == depth:
+                if tok.kind == PUNCT and tok.value in (';', ','):
+                    return k
+                if prev is not None and tok.line > prev.line and tok.value not in _CONTINUATION \
+                        and tok.kind not in (TEMPLATE_MIDDLE, TEMPLATE_TAIL) \
+                        and (prev.kind in (IDENT, NUMBER, STRING, TEMPLATE, TEMPLATE_TAIL, REGEX)
+                             or prev.value in (')', ']', '}')) \
+                        and prev.value not in _CONTINUATION:
+                    return k
+            prev = tok
+        return limit
+
+    def value(self, a: int, b: int, env: Dict[str, _Binding], scope: Scope) -> Taint:
+        """计算 tokens[a:b] 这个表达式的污点"""
+        tokens, pairs = self.tokens, self.pairs
+        while a < b and tokens[a].value in _PREFIX_OPS:
+            if tokens[a].value in ('typeof', '!'):
+                return _SAFE
+            a += 1
+        while b > a and tokens[b - 1].value in ('!', ';'):
+            b -= 1
+        if a >= b:
+            return _SAFE
+
+        # 一次扫描区间顶层的运算符（括号和模板插值内部直接跳过）
+        ternary = []
+        found: Dict[int, List[int]] = {}
+        k = a
+        while k < b:
+            tok = tokens[k]
+            value = tok.value
+            if tok.kind == PUNCT or tok.kind == IDENT:
+                if value in _OPENERS and k in pairs:
+                    k = pairs[k] + 1
+                    continue
+                if value == '=>':
+                    return _UNKNOWN
+                if (value == 'as' or value == 'satisfies') and k > a and tok.kind == IDENT:
+                    return self.value(a, k, env, scope)
+                if value == '?' or value == ':':
+                    ternary.append(k)
+                else:
+                    level = _BINARY_OPS.get(value)
+                    if level is not None and k > a and (tok.kind == PUNCT or value in ('instanceof', 'in')):
+                        prev = tokens[k - 1]
+                        # 一元 +/- 不是二元运算符
+                        if level != _CONCAT or value != '-' and value != '+' or \
+                                prev.kind in _OPERAND_KINDS or prev.value in (')', ']'):
+                            found.setdefault(level if value != '-' else _ARITHMETIC, []).append(k)
+            elif tok.kind in (TEMPLATE_HEAD, TEMPLATE_MIDDLE) and k in pairs:
+                k = pairs[k]
+                continue
+            k += 1
+
+        # 三元表达式：取两个分支
+        if ternary and tokens[ternary[0]].value == '?' and ternary[0] > a:
+            nested = 0
+            for k in ternary[1:]:
+                if tokens[k].value == '?':
+                    nested += 1
+                elif nested:
+                    nested -= 1
+                else:
+                    return self.value(ternary[0] + 1, k, env, scope).join(self.value(k + 1, b, env, scope))
+
+        for level in (_LOGICAL, _COMPARISON, _CONCAT, _ARITHMETIC):
+            positions = found.get(level)
+            if not positions:
+                continue
+            if level == _COMPARISON or level == _ARITHMETIC:
+                return _SAFE
+            result = _SAFE
+            start = a
+            for k in positions + [b]:
+                part = self.value(start, k, env, scope)
+                result = result.join(part.spliced() if level == _CONCAT else part)
+                start = k + 1
+            return result
+
+        return self._primary(a, b, env, scope)
+
+    def _template(self, a: int, b: int, env: Dict[str, _Binding], scope: Scope) -> Tuple[Taint, int]:
+        """从 TEMPLATE_HEAD 开始的模板字符串，返回 (污点, 结束位置)"""
+        tokens = self.tokens
+        result = _SAFE
+        k = a
+        while k < b and tokens[k].kind in (TEMPLATE_HEAD, TEMPLATE_MIDDLE):
+            end = self.pairs.get(k, b)
+            result = result.join(self.value(k + 1, end, env, scope).spliced())
+            k = end
+        return result, min(k + 1, b)
+
+    def _lookup(self, name: str, env: Dict[str, _Binding], scope: Scope) -> Taint:
+        binding = env.get(name)
+        if binding is None:
+            if name in scope.params:
+                return Taint(SAFE, frozenset([scope.params[name]]))
+            if name in _SAFE_LITERALS:
+                return _SAFE
+            binding = self._module_env.get(name)
+            if binding is None:
+                return _UNKNOWN
+        if binding.cached is not None:
+            return binding.cached
+        if binding.busy:   # x = x + ... 之类的自引用
+            return _SAFE
+        binding.busy = True
+        result = _SAFE
+        for part in binding.parts:
+            if isinstance(part, Taint):
+                result = result.join(part)
+            else:
+                a, b, spliced = part
+                value = self.value(a, b, binding.env, binding.scope)
+                result = result.join(value.spliced() if spliced else value)
+        binding.busy = False
+        binding.cached = result
+        return result
+
+    def _assign(self, name: str, part, env: Dict[str, _Binding], scope: Scope):
+        """给已有变量追加一次赋值（分支中的赋值都可能生效，取并集）"""
+        binding = env.get(name)
+        if binding is None:
+            binding = _Binding(scope, env, [self._lookup(name, env, scope)])
+            env[name] = binding
+        binding.parts.append(part)
+        binding.cached = None
+
+    def call_args(self, call: _Call) -> List[Taint]:
+        if call.args is None:
+            call.args = [self.value(a, b, call.env, call.scope) for a, b in call.ranges]
+        return call.args
+
+    def _primary(self, a: int, b: int, env: Dict[str, _Binding], scope: Scope) -> Taint:
+        tokens, pairs = self.tokens, self.pairs
+        tok = tokens[a]
+        if tok.kind in (STRING, NUMBER, TEMPLATE, REGEX):
+            k, current = a + 1, _SAFE
+        elif tok.kind == TEMPLATE_HEAD:
+            current, k = self._template(a, b, env, scope)
+        elif tok.value == '(' and a in pairs:
+            current, k = self.value(a + 1, pairs[a], env, scope), pairs[a] + 1
+        elif tok.value == '[' and a in pairs:
+            current = _SAFE
+            for ea, eb in split_args(tokens, a, pairs[a]):
+                current = current.join(self.value(ea, eb, env, scope))
+            k = pairs[a] + 1
+        elif tok.value == 'new':
+            return _UNKNOWN
+        elif tok.kind == IDENT:
+            current, k = self._lookup(tok.value, env, scope), a + 1
+        else:
+            return _UNKNOWN
+
+        # 成员访问与调用链
+        # 调用结果之后的成员访问记为 ().name，避免与同名函数混淆
+        path = tok.value if tok.kind == IDENT else '()'
+        receiver = _UNKNOWN
+        while k < b:
+            t = tokens[k]
+            if t.value in ('.', '?.') and k + 1 < b and tokens[k + 1].kind == IDENT:
+                prop = tokens[k + 1].value
+                receiver = current
+                current = _SAFE if prop == 'length' else current
+                path = f'{path}.{prop}'
+                k += 2
+            elif t.value == '(' and k in pairs:
+                args = [self.value(ea, eb, env, scope) for ea, eb in split_args(tokens, k, pairs[k])]
+                current = self._call_result(path, receiver, args)
+                path = '()'
+                k = pairs[k] + 1
+            elif t.value == '[' and k in pairs:
+                k = pairs[k] + 1
+            elif t.kind in (TEMPLATE, TEMPLATE_HEAD):
+                # 标签模板：Prisma.sql`...` 是参数化的
+                end = k + 1 if t.kind == TEMPLATE else self._template(k, b, env, scope)[1]
+                current = _SAFE if path in _PARAMETERIZED else _UNKNOWN
+                path = '()'
+                k = end
+            elif t.value == '!':
+                k += 1
+            else:
+                break
+        return current
+
+    def _call_result(self, path: str, receiver: Taint, args: List[Taint]) -> Taint:
+        """调用表达式的返回值污点"""
+        name = path.rsplit('.', 1)[-1]
+        base = path.split('.', 1)[0]
+        if path in _PARAMETERIZED:
+            return _SAFE
+        if path == PRISMA_RAW or path == 'String':
+            return args[0] if args else _SAFE
+        if path in _SAFE_FUNCTIONS or (base in _SAFE_OBJECTS and '.' in path):
+            return _SAFE
+        if name in self.by_name and (path == name or path.count('.') == 1 and base != '()'):
+            return self._returns(name, args)
+        if '.' in path:
+            if name in _SAFE_METHODS:
+                return _SAFE
+            if name in _DERIVED_METHODS:
+                result = receiver
+                for arg in args:
+                    result = result.join(arg.spliced() if name == 'concat' else arg)
+                return result
+        return _UNKNOWN
+
+    def _returns(self, name: str, args: List[Taint]) -> Taint:
+        result = _SAFE
+        for sid in self.by_name[name]:
+            result = result.join(self.summary(sid).returns.resolve(args))
+        return result
+
+    # ------------------------------------------------------------ 语句
+
+    def summary(self, sid: int) -> Summary:
+        """函数摘要（每个函数只计算一次；递归调用中的返回值视为未知）"""
+        cached = self._summaries.get(sid)
+        if cached is not None:
+            return cached
+        if sid in self._in_progress:
+            return Summary(_UNKNOWN, [], [])
+        self._in_progress.add(sid)
+        summary = self._analyze(sid)
+        self._in_progress.discard(sid)
+        self._summaries[sid] = summary
+        return summary
+
+    def _analyze(self, sid: Optional[int]) -> Summary:
+        """按顺序分析函数中的语句（只访问预先索引的标识符，嵌套函数单独分析）"""
+        tokens, pairs = self.tokens, self.pairs
+        scope = self._module if sid is None else self.scopes[sid]
+        env: Dict[str, _Binding] = self._module_env if sid is None else {}
+        returns = _SAFE
+        sinks: List[Sink] = []
+        calls: List[_Call] = []
+        if scope.expression_body:
+            returns = self.value(scope.start, scope.end, env, scope)
+
+        for k in self._events.get(sid, ()):
+            tok = tokens[k]
+            value = tok.value
+            nxt = tokens[k + 1].value if k + 1 < scope.end else ''
+            if k > 0 and tokens[k - 1].value in ('.', '?.'):
+                if value in ('push', 'unshift') and tokens[k - 2].kind == IDENT and nxt == '(' and k + 1 in pairs:
+                    for ea, eb in split_args(tokens, k + 1, pairs[k + 1]):
+                        self._assign(tokens[k - 2].value, (ea, eb, False), env, scope)
+            elif value in _DECLARATIONS:
+                self._declare(k, scope, env)
+            elif value == 'return' and not scope.expression_body:
+                if k + 1 < scope.end and tokens[k + 1].line == tok.line:
+                    end = self._expr_end(k + 1, scope.end)
+                    returns = returns.join(self.value(k + 1, end, env, scope))
+            elif nxt in _ASSIGN_OPS and tokens[k + 1].kind == PUNCT:
+                end = self._expr_end(k + 2, scope.end)
+                self._assign(value, (k + 2, end, nxt == '+='), env, scope)
+
+            sink = self._sink_at(k, env, scope)
+            if sink is not None:
+                sinks.append(sink)
+            elif value in self.by_name and nxt == '(' and k + 1 in pairs and k not in self._definitions:
+                calls.append(_Call(value, split_args(tokens, k + 1, pairs[k + 1]), tok.line, scope, env))
+        return Summary(returns, sinks, calls)
+
+    def _declare(self, k: int, scope: Scope, env: Dict[str, _Binding]):
+        """const/let/var 声明（支持一条语句多个声明和解构）"""
+        tokens, pairs = self.tokens, self.pairs
+        depth = tokens[k].depth
+        j = k + 1
+        while j < scope.end:
+            names = []
+            tok = tokens[j]
+            if tok.kind == IDENT:
+                names.append(tok.value)
+                j += 1
+            elif tok.value in ('{', '[') and j in pairs:
+                names.extend(t.value for t in tokens[j + 1:pairs[j]]
+                             if t.kind == IDENT and t.depth == tok.depth + 1)
+                j = pairs[j] + 1
+            else:
+                return
+            # 跳过类型注解
+            while j < scope.end and tokens[j].depth >= depth and tokens[j].value not in ('=', ';', ',') \
+                    and tokens[j].value not in ('of', 'in'):
+                if tokens[j].depth == depth and tokens[j].line != tokens[j - 1].line and tokens[j - 1].value != ':':
+                    break
+                j = pairs.get(j, j) + 1
+            if j >= scope.end or tokens[j].value != '=':
+                # for (const x of xs) 等没有初始值的声明
+                for name in names:
+                    env[name] = _Binding(scope, env, [_UNKNOWN])
+                return
+            end = self._expr_end(j + 1, scope.end)
+            for name in names:
+                env[name] = _Binding(scope, env, [(j + 1, end, False)])
+            if end >= scope.end or tokens[end].value != ',' or tokens[end].depth != depth:
+                return
+            j = end + 1
+
+    def _sink_at(self, k: int, env: Dict[str, _Binding], scope: Scope) -> Optional[Sink]:
+        """k 处的原始SQL调用，计算第一个实参的污点"""
+        tokens, pairs = self.tokens, self.pairs
+        tok = tokens[k]
+        if tok.value in RAW_SQL_METHODS:
+            name = tok.value
+        elif tok.value == 'raw' and k >= 2 and tokens[k - 1].value == '.' and tokens[k - 2].value == 'Prisma':
+            name = PRISMA_RAW
+        else:
+            return None
+        j = k + 1
+        if j < len(tokens) and tokens[j].value == '?.':
+            j += 1
+        if j >= len(tokens) or tokens[j].value != '(':
+            return Sink(name, k, -1, None, False, False)
+        close = pairs.get(j, -1)
+        args = split_args(tokens, j, close)
+        if not args:
+            return Sink(name, k, close, _UNKNOWN, False, False)
+        a, b = args[0]
+        return Sink(name, k, close, self.value(a, b, env, scope), len(args) > 1,
+                    b - a == 1 and tokens[a].kind == IDENT)
+
+    # ------------------------------------------------------------ 整个文件
+
+    def run(self) -> List[Verdict]:
+        """分析全部函数，沿调用关系传播参数污点，返回每个原始SQL调用的判定"""
+        module_summary = self._analyze(None)
+        # 只需要包含原始SQL调用的函数及其（间接）调用者的摘要；被调用函数的摘要在求值时按需计算
+        relevant, referenced = self._references()
+        summaries = {sid: self.summary(sid) for sid in sorted(relevant)}
+        every = [(None, module_summary)] + list(summaries.items())
+
+        callers: Dict[int, List[Tuple[Optional[int], _Call]]] = {}
+        for caller, summary in every:
+            for call in summary.calls:
+                for sid in self.by_name.get(call.callee, ()):
+                    callers.setdefault(sid, []).append((caller, call))
+
+        # 被导出、没有调用者或被当作值传递的函数，参数视为外部输入
+        contexts: Dict[Optional[int], List[Taint]] = {None: []}
+        for sid, scope in enumerate(self.scopes):
+            external = scope.exported or not callers.get(sid) or scope.name in referenced
+            contexts[sid] = [_UNKNOWN if external else _SAFE] * (max(scope.params.values(), default=-1) + 1)
+
+        # 不动点迭代：格只有三层，每个参数最多被抬高两次
+        pending = [None] + list(summaries)
+        while pending:
+            caller = pending.pop()
+            summary = module_summary if caller is None else summaries.get(caller)
+            if summary is None:
+                continue
+            for call in summary.calls:
+                actual = [arg.resolve(contexts[caller]) for arg in self.call_args(call)]
+                for target in self.by_name.get(call.callee, ()):
+                    context = contexts[target]
+                    changed = False
+                    for i in range(min(len(context), len(actual))):
+                        joined = context[i].join(actual[i])
+                        if joined != context[i]:
+                            context[i] = joined
+                            changed = True
+                    if changed:
+                        pending.append(target)
+
+        verdicts = [self._verdict(sink, sid, contexts, callers)
+                    for sid, summary in every for sink in summary.sinks]
+        verdicts.sort(key=lambda v: v.sink.index)
+        return verdicts
+
+    def _verdict(self, sink: Sink, sid: Optional[int], contexts, callers) -> Verdict:
+        if sink.taint is None:
+            return Verdict(sink, UNKNOWN, [], [self._line_span(sid)])
+        level = sink.taint.resolve(contexts[sid]).level
+        via = []
+        spans = {self._line_span(sid)}
+        if sid is not None and (sink.taint.direct or sink.taint.interpolated):
+            for caller, call in callers.get(sid, ()):
+                actual = [arg.resolve(contexts[caller]) for arg in self.call_args(call)]
+                if sink.taint.resolve(actual).level == level:
+                    via.append(call.line)
+                    spans.add(self._line_span(caller))
+        return Verdict(sink, level, sorted(set(via)), sorted(spans))
+
+    def _line_span(self, sid: Optional[int]) -> Tuple[int, int]:
+        """函数从声明行到函数体结束的行区间（模块顶层为整个文件）"""
+        tokens = self.tokens
+        if sid is None:
+            return (1, tokens[-1].line if tokens else 1)
+        scope = self.scopes[sid]
+        return (self._decl_lines[sid], tokens[min(scope.end, len(tokens) - 1)].line)
+
+    def _enclosing(self, index: int) -> Optional[int]:
+        """包含 index 的最内层函数（模块顶层为 None）；index 须为语句分析访问的标识符"""
+        return self._owner[index]
+
+    def _references(self) -> Tuple[set, set]:
+        """
+        返回 (需要分析的函数, 被当作值引用的函数名)
+
+        需要分析的是包含原始SQL调用的函数，以及直接或间接调用了它们的函数。
+        """
+        tokens = self.tokens
+        n = len(tokens)
+        relevant = set()
+        for name in SINK_NAMES:
+            for k in self._idents.get(name, ()):
+                if name != 'raw' or k >= 2 and tokens[k - 2].value == 'Prisma' and tokens[k - 1].value == '.':
+                    sid = self._enclosing(k)
+                    if sid is not None:
+                        relevant.add(sid)
+
+        calls_by_name: Dict[str, List[int]] = {}
+        referenced = set()
+        for name in self.by_name:
+            for k in self._idents.get(name, ()):
+                if k in self._definitions:
+                    continue
+                nxt = tokens[k + 1].value if k + 1 < n else ''
+                if nxt == '(':
+                    calls_by_name.setdefault(name, []).append(k)
+                elif nxt not in ('=', ':', '?.') and \
+                        tokens[k - 1].value not in ('function', 'const', 'let', 'var', '.', 'async', 'static'):
+                    referenced.add(name)
+
+        pending = list(relevant)
+        while pending:
+            name = self.scopes[pending.pop()].name
+            for k in calls_by_name.pop(name, ()):
+                sid = self._enclosing(k)
+                if sid is not None and sid not in relevant:
+                    relevant.add(sid)
+                    pending.append(sid)
+        return relevant, referenced
+
+
+def analyze_sql_taint(tokens: Sequence[Token], pairs: Optional[Dict[int, int]] = None) -> List[Verdict]:
+    """分析已分词的文件，返回每个原始SQL调用（按出现顺序）的判定"""
+    return FileAnalysis(tokens, pairs).run()
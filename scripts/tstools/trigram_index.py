@@ -0,0 +1,360 @@
+"""
+源码树三元组（trigram）倒排索引
+
+为每个源码文件记录其内容中出现的全部3字节片段，持久化在SQLite中。
+查询"哪些文件可能包含某个字面量/正则"时只需求交集，
+非候选文件完全不用打开。
+
+- refresh() 只对目录做stat遍历，按 (大小, mtime) 增量更新变化的文件
+- candidates() 返回可能包含字面量的文件（保证不漏，可能有误报）
+- candidates_regex() 从正则中提取必需的字面量后再查询
+"""
+
+import os
+import sqlite3
+import time
+from array import array
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from tstools.scan_engine import SKIP_DIRS, SOURCE_EXTENSIONS, default_workers, iter_source_files, scan_files
+
+try:  # Python 3.11+ 中 sre_parse/sre_constants 已弃用
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_constants
+    import sre_parse
+
+# 建立索引的源码目录
+INDEX_DIRS = ['app', 'components', 'lib', 'hooks', 'utils', 'types',
+              'constants', 'contexts', 'config', 'src', 'bot']
+
+# 索引文件（相对项目根目录）
+INDEX_FILE = Path('.cache') / 'source-index.sqlite'
+
+# 索引结构版本，变化时自动重建
+INDEX_VERSION = '2'
+
+# 少于该数量的变化文件不启动进程池
+_PARALLEL_THRESHOLD = 64
+
+
+def trigrams_of(data: bytes) -> Set[int]:
+    """内容中出现的全部三元组（按大端拼成24位整数）"""
+    grams = {data[i:i + 3] for i in range(len(data) - 2)}
+    return {int.from_bytes(g, 'big') for g in grams}
+
+
+def _index_worker(path: Path) -> Tuple[int, Optional[List[int]]]:
+    """读取文件并计算三元组（进程池worker）"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return 0, None
+    return len(data), sorted(trigrams_of(data))
+
+
+# ---------------------------------------------------------------------------
+# 正则 -> 必需字面量
+# ---------------------------------------------------------------------------
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+            getattr(sre_constants, 'POSSESSIVE_REPEAT', sre_constants.MAX_REPEAT)}
+_ATOMIC_GROUP = getattr(sre_constants, 'ATOMIC_GROUP', None)
+
+
+def _and(parts):
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else ('and', parts)
+
+
+def _or(parts):
+    # 任一分支没有约束，则整体没有约束
+    if any(p is None for p in parts) or not parts:
+        return None
+    return parts[0] if len(parts) == 1 else ('or', parts)
+
+
+def _literal_query(ops) -> object:
+    """
+    把 sre_parse 的解析结果转换为查询树
+
+    查询树为：字面量字符串 | ('and', [...]) | ('or', [...]) | None（无约束）。
+    连续的 LITERAL 拼成一个字面量，其余结构打断字面量。
+    """
+    parts = []
+    run = []
+
+    def flush():
+        if len(run) >= 3:
+            parts.append(''.join(run))
+        run.clear()
+
+    for op, arg in ops:
+        if op == sre_constants.LITERAL:
+            run.append(chr(arg))
+            continue
+        flush()
+        if op == sre_constants.SUBPATTERN:
+            parts.append(_literal_query(arg[-1]))
+        elif op == sre_constants.BRANCH:
+            parts.append(_or([_literal_query(branch) for branch in arg[1]]))
+        elif op in _REPEATS:
+            min_count, _, body = arg
+            if min_count >= 1:
+                parts.append(_literal_query(body))
+        elif op == _ATOMIC_GROUP:
+            parts.append(_literal_query(arg))
+        # 其余（字符类、锚点、断言等）不提供字面量约束
+    flush()
+    return _and(parts)
+
+
+def regex_query(pattern: str, flags: int = 0):
+    """从正则中提取必需字面量；忽略大小写等情况返回 None（无约束）"""
+    parsed = sre_parse.parse(pattern, flags)
+    if (flags | parsed.state.flags) & sre_constants.SRE_FLAG_IGNORECASE:
+        return None
+    return _literal_query(list(parsed))
+
+
+# ---------------------------------------------------------------------------
+# 索引
+# ---------------------------------------------------------------------------
+
+class TrigramIndex:
+    """持久化的三元组倒排索引"""
+
+    def __init__(self, root: Path, dirs: Sequence[str] = INDEX_DIRS,
+                 path: Optional[Path] = None,
+                 extensions: Sequence[str] = SOURCE_EXTENSIONS):
+        self.root = Path(root).resolve()
+        self.dirs = list(dirs)
+        self.extensions = tuple(extensions)
+        self.path = Path(path) if path else self.root / INDEX_FILE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self._init_schema()
+
+    def _init_schema(self):
+        db = self.db
+        db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        row = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != INDEX_VERSION:
+            db.execute('DROP TABLE IF EXISTS files')
+            db.execute('DROP TABLE IF EXISTS postings')
+        # files.grams 保存该文件的三元组列表，删除旧倒排项时按主键逐条删除，
+        # 省掉 postings(file_id) 二级索引的维护开销
+        db.execute('CREATE TABLE IF NOT EXISTS files ('
+                   'id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime INTEGER, grams BLOB)')
+        db.execute('CREATE TABLE IF NOT EXISTS postings ('
+                   'trigram INTEGER, file_id INTEGER, PRIMARY KEY (trigram, file_id)) WITHOUT ROWID')
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (INDEX_VERSION,))
+        db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _walk(self) -> dict:
+        """stat遍历源码目录，返回 {相对路径: (大小, mtime)}"""
+        found = {}
+        for dir_name in self.dirs:
+            base = self.root / dir_name
+            if not base.is_dir():
+                continue
+            stack = [str(base)]
+            while stack:
+                current = stack.pop()
+                try:
+                    entries = list(os.scandir(current))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS:
+                            stack.append(entry.path)
+                    elif entry.name.endswith(self.extensions):
+                        st = entry.stat()
+                        rel = os.path.relpath(entry.path, self.root)
+                        found[rel] = (st.st_size, st.st_mtime_ns)
+        return found
+
+    def refresh(self, workers: Optional[int] = None) -> List[str]:
+        """增量更新索引，返回本次重新索引的文件列表"""
+        db = self.db
+        on_disk = self._walk()
+        known = {path: (file_id, size, mtime)
+                 for file_id, path, size, mtime in db.execute('SELECT id, path, size, mtime FROM files')}
+
+        removed = [known[p][0] for p in known if p not in on_disk]
+        changed = sorted(p for p, stat in on_disk.items()
+                         if p not in known or known[p][1:] != stat)
+
+        for file_id in removed:
+            self._drop_postings(file_id)
+            db.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+        if changed:
+            workers = workers or default_workers()
+            if len(changed) < _PARALLEL_THRESHOLD:
+                workers = 1
+            paths = [self.root / p for p in changed]
+            rows = []
+            for path, grams in scan_files(paths, _index_worker, workers=workers):
+                rel = str(path.relative_to(self.root))
+                blob = array('I', grams or []).tobytes()
+                if rel in known:
+                    file_id = known[rel][0]
+                    self._drop_postings(file_id)
+                    db.execute('UPDATE files SET size = ?, mtime = ?, grams = ? WHERE id = ?',
+                               (*on_disk[rel], blob, file_id))
+                else:
+                    file_id = db.execute('INSERT INTO files (path, size, mtime, grams) VALUES (?, ?, ?, ?)',
+                                         (rel, *on_disk[rel], blob)).lastrowid
+                if grams:
+                    rows.extend((g, file_id) for g in grams)
+            # 按主键顺序批量插入，B树写入接近顺序追加
+            rows.sort()
+            db.executemany('INSERT INTO postings VALUES (?, ?)', rows)
+
+        db.commit()
+        return changed
+
+    def _drop_postings(self, file_id: int):
+        row = self.db.execute('SELECT grams FROM files WHERE id = ?', (file_id,)).fetchone()
+        if row and row[0]:
+            grams = array('I')
+            grams.frombytes(row[0])
+            self.db.executemany('DELETE FROM postings WHERE trigram = ? AND file_id = ?',
+                                ((g, file_id) for g in grams))
+
+    def covers(self, dirs: Iterable[str]) -> bool:
+        """dirs 是否都在索引范围内（不在时调用方应退回目录遍历）"""
+        return all(any(d.rstrip('/') == base or d.startswith(base + '/') for base in self.dirs)
+                   for d in dirs)
+
+    def all_files(self, dirs: Optional[Iterable[str]] = None) -> List[Path]:
+        rows = self.db.execute('SELECT path FROM files').fetchall()
+        return self._to_paths((r[0] for r in rows), dirs)
+
+    def _to_paths(self, rel_paths: Iterable[str], dirs: Optional[Iterable[str]]) -> List[Path]:
+        prefixes = None
+        if dirs is not None:
+            prefixes = tuple(d.rstrip('/') + os.sep for d in dirs)
+        return sorted(self.root / p for p in rel_paths
+                      if prefixes is None or p.startswith(prefixes))
+
+    def _ids_for_literal(self, literal: str) -> Optional[Set[int]]:
+        data = literal.encode('utf-8')
+        if len(data) < 3:
+            return None
+        grams = sorted(trigrams_of(data))
+        placeholders = ','.join('?' * len(grams))
+        rows = self.db.execute(
+            f'SELECT file_id FROM postings WHERE trigram IN ({placeholders}) '
+            f'GROUP BY file_id HAVING COUNT(*) = ?', (*grams, len(grams)))
+        return {r[0] for r in rows}
+
+    def _ids_for_query(self, query) -> Optional[Set[int]]:
+        """计算查询树对应的文件id集合；None 表示无约束（全部文件）"""
+        if query is None:
+            return None
+        if isinstance(query, str):
+            return self._ids_for_literal(query)
+        op, parts = query
+        results = [self._ids_for_query(p) for p in parts]
+        if op == 'and':
+            constrained = [r for r in results if r is not None]
+            if not constrained:
+                return None
+            return set.intersection(*constrained)
+        if any(r is None for r in results):
+            return None
+        return set.union(*results)
+
+    def _files_for_ids(self, ids: Optional[Set[int]], dirs: Optional[Iterable[str]]) -> List[Path]:
+        if ids is None:
+            return self.all_files(dirs)
+        if not ids:
+            return []
+        rows = self.db.execute('SELECT id, path FROM files').fetchall()
+        return self._to_paths((path for file_id, path in rows if file_id in ids), dirs)
+
+    def candidates(self, *literals: str, dirs: Optional[Iterable[str]] = None) -> List[Path]:
+        """可能同时包含全部字面量的文件"""
+        return self._files_for_ids(self._ids_for_query(_and(list(literals))), dirs)
+
+    def candidates_any(self, *literals: str, dirs: Optional[Iterable[str]] = None) -> List[Path]:
+        """可能包含任一字面量的文件"""
+        return self._files_for_ids(self._ids_for_query(_or(list(literals))), dirs)
+
+    def candidates_regex(self, pattern: str, flags: int = 0,
+                         dirs: Optional[Iterable[str]] = None) -> List[Path]:
+        """可能匹配正则的文件"""
+        return self._files_for_ids(self._ids_for_query(regex_query(pattern, flags)), dirs)
+
+
+def open_index(root: Path, workers: Optional[int] = None, **kwargs) -> TrigramIndex:
+    """打开并增量刷新索引"""
+    index = TrigramIndex(root, **kwargs)
+    index.refresh(workers=workers)
+    return index
+
+
+def benchmark(root: Path, literals: Sequence[str], workers: Optional[int] = None) -> List[dict]:
+    """
+    对比索引查询与全量读取扫描的耗时
+
+    两边都包含各自的目录遍历：全量扫描用 os.walk 列出文件，
+    索引一侧用 refresh() 做stat增量检查。
+    """
+    root = Path(root).resolve()
+    results = []
+    with TrigramIndex(root) as index:
+        start = time.perf_counter()
+        index.refresh(workers=workers)
+        refresh_time = time.perf_counter() - start
+        file_count = len(index.all_files())
+
+        for literal in literals:
+            start = time.perf_counter()
+            needle = literal.encode('utf-8')
+            matched = 0
+            for path in iter_source_files(root, index.dirs):
+                with open(path, 'rb') as f:
+                    if needle in f.read():
+                        matched += 1
+            full_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index.refresh(workers=workers)
+            candidates = index.candidates(literal)
+            indexed_matched = 0
+            for path in candidates:
+                with open(path, 'rb') as f:
+                    if needle in f.read():
+                        indexed_matched += 1
+            index_time = time.perf_counter() - start
+
+            results.append({
+                'literal': literal,
+                'files': file_count,
+                'matches': matched,
+                'candidates': len(candidates),
+                'full_scan_seconds': full_time,
+                'indexed_seconds': index_time,
+                'initial_refresh_seconds': refresh_time,
+                'consistent': matched == indexed_matched,
+            })
+    return results
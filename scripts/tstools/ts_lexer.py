@@ -0,0 +1,406 @@
+"""
+线性时间 TypeScript 词法分析器
+
+单次 O(n) 扫描源码，产出带位置、行号和括号深度的 token 流，
+供扫描/改写脚本共用，替代在原始文本上反复切片跑正则。
+
+支持：
+- 单/双引号字符串、模板字符串（含嵌套 ${...}）
+- 行注释、块注释、正则字面量
+- ()[]{} 以及 ${ } 的括号深度
+
+项目里有不少被历史脚本改坏的文件，词法分析器对此做了容错：
+未闭合的字符串在行尾结束，多余的右括号被忽略，不会抛异常。
+JSX 文本按普通代码处理，文本里的撇号最多影响到当前行。
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+# token 类型
+IDENT = 'IDENT'                      # 标识符和关键字（含 $ 开头的 $queryRawUnsafe）
+NUMBER = 'NUMBER'
+STRING = 'STRING'                    # '...' 或 "..."
+TEMPLATE = 'TEMPLATE'                # 无插值模板 `...`
+TEMPLATE_HEAD = 'TEMPLATE_HEAD'      # `...${
+TEMPLATE_MIDDLE = 'TEMPLATE_MIDDLE'  # }...${
+TEMPLATE_TAIL = 'TEMPLATE_TAIL'      # }...`
+REGEX = 'REGEX'
+PUNCT = 'PUNCT'
+COMMENT = 'COMMENT'
+
+KINDS = {IDENT, NUMBER, STRING, TEMPLATE, TEMPLATE_HEAD, TEMPLATE_MIDDLE,
+         TEMPLATE_TAIL, REGEX, PUNCT, COMMENT}
+
+OPEN_BRACKETS = {'(': ')', '[': ']', '{': '}'}
+CLOSE_BRACKETS = {')': '(', ']': '[', '}': '{'}
+
+# 这些关键字之后的 / 是正则字面量而不是除号
+_REGEX_PREFIX_KEYWORDS = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'case', 'do', 'else', 'yield', 'await',
+}
+
+_PUNCT = (
+    r'>>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|\?\?=|&&=|\|\|='
+    r'|=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.|\+\+|--|\+=|-=|\*=|/=|%=|&=|\|=|\^=|\*\*|<<|>>'
+    r'|[{}()\[\];,<>+\-*%&|^!~?:=.@#]'
+)
+# 主扫描正则：各分支互斥且不含嵌套量词，每个位置只尝试常数次
+_TOKEN_RE = re.compile(
+    r'\s*(?:'
+    r'(?P<comment>//[^\n]*|/\*[\s\S]*?(?:\*/|\Z))'
+    r'|(?P<ident>[A-Za-z_$\u0080-\uffff][\w$\u0080-\uffff]*)'
+    r'|(?P<number>0[xXoObB][\da-fA-F_]+n?|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?n?)'
+    r"""|(?P<string>'(?:[^'\\\n]|\\[\s\S])*'?|"(?:[^"\\\n]|\\[\s\S])*"?)"""
+    r'|(?P<template>`)'
+    r'|(?P<slash>/=?)'
+    r'|(?P<punct>' + _PUNCT + r')'
+    r'|(?P<other>\S))'
+)
+# 模板字符串片段：遇到 ` 或 ${ 停止
+_TEMPLATE_CHUNK_RE = re.compile(r'(?:[^`\\$]|\\[\s\S]|\$(?!\{))*')
+_REGEX_RE = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*')
+
+
+class Token(NamedTuple):
+    kind: str
+    value: str
+    start: int
+    end: int
+    line: int
+    depth: int  # 所处括号深度；开括号与其配对的闭括号深度相同
+
+
+def _regex_allowed(prev: Optional[Token]) -> bool:
+    """根据前一个有效 token 判断 / 是否开始一个正则字面量"""
+    if prev is None:
+        return True
+    if prev.kind == IDENT:
+        return prev.value in _REGEX_PREFIX_KEYWORDS
+    if prev.kind in (NUMBER, STRING, TEMPLATE, TEMPLATE_TAIL, REGEX):
+        return False
+    # JSX 闭合标签 </div>
+    if prev.value == '<':
+        return False
+    return prev.value not in (')', ']', '}')
+
+
+def tokenize(text: str, comments: bool = False) -> Iterator[Token]:
+    """
+    流式产出 token（默认不含注释和空白）
+
+    整个过程只向前推进，每个字符只被检查常数次。
+    """
+    pos = 0
+    n = len(text)
+    line = 1
+    line_pos = 0          # 已统计行号的位置
+    stack: List[str] = []  # 未闭合的括号，模板插值记为 '${'
+    open_counts = {'(': 0, '[': 0, '{': 0, '${': 0}
+    prev: Optional[Token] = None
+
+    def line_at(offset: int) -> int:
+        nonlocal line, line_pos
+        if offset > line_pos:
+            line += text.count('\n', line_pos, offset)
+            line_pos = offset
+        return line
+
+    def template_rest(start: int, kind_closed: str, kind_open: str) -> Tuple[str, int]:
+        """从 start（` 或 } 之后）继续读取模板内容，直到 ` 或 ${"""
+        m = _TEMPLATE_CHUNK_RE.match(text, start)
+        end = m.end()
+        if text.startswith('${', end):
+            stack.append('${')
+            open_counts['${'] += 1
+            return kind_open, end + 2
+        if end < n:  # 结束的反引号
+            end += 1
+        return kind_closed, end
+
+    scanner = _TOKEN_RE.scanner(text)
+    while True:
+        m = scanner.match()
+        if m is None:  # 只剩空白
+            break
+        group = m.lastgroup
+        start = m.start(group)
+        pos = m.end()
+        depth = len(stack)
+
+        if group == 'comment':
+            if comments:
+                yield Token(COMMENT, m.group(group), start, pos, line_at(start), depth)
+            continue
+
+        if group == 'ident':
+            prev = Token(IDENT, m.group(group), start, pos, line_at(start), depth)
+        elif group == 'number':
+            prev = Token(NUMBER, m.group(group), start, pos, line_at(start), depth)
+        elif group == 'string':
+            prev = Token(STRING, m.group(group), start, pos, line_at(start), depth)
+        elif group == 'template':
+            kind, pos = template_rest(pos, TEMPLATE, TEMPLATE_HEAD)
+            prev = Token(kind, text[start:pos], start, pos, line_at(start), depth)
+            scanner = _TOKEN_RE.scanner(text, pos)
+        elif group == 'slash':
+            rm = _REGEX_RE.match(text, start) if _regex_allowed(prev) else None
+            if rm:
+                pos = rm.end()
+                prev = Token(REGEX, rm.group(), start, pos, line_at(start), depth)
+                scanner = _TOKEN_RE.scanner(text, pos)
+            else:
+                prev = Token(PUNCT, m.group(group), start, pos, line_at(start), depth)
+        else:
+            value = m.group(group)
+            if value == '}' and stack and stack[-1] == '${':
+                stack.pop()
+                open_counts['${'] -= 1
+                depth = len(stack)
+                kind, pos = template_rest(pos, TEMPLATE_TAIL, TEMPLATE_MIDDLE)
+                prev = Token(kind, text[start:pos], start, pos, line_at(start), depth)
+                scanner = _TOKEN_RE.scanner(text, pos)
+            else:
+                if value in OPEN_BRACKETS:
+                    stack.append(value)
+                    open_counts[value] += 1
+                elif value in CLOSE_BRACKETS:
+                    opener = CLOSE_BRACKETS[value]
+                    if open_counts[opener]:
+                        # 弹出到配对的开括号为止，容忍中间未闭合的括号
+                        while True:
+                            popped = stack.pop()
+                            open_counts[popped] -= 1
+                            if popped == opener:
+                                break
+                    depth = len(stack)
+                # 其余无法识别的字符（如 \）同样单独成 token，保持线性推进
+                prev = Token(PUNCT, value, start, pos, line_at(start), depth)
+        yield prev
+
+
+def tokenize_all(text: str, comments: bool = False) -> List[Token]:
+    return list(tokenize(text, comments=comments))
+
+
+def match_brackets(tokens: Sequence[Token]) -> Dict[int, int]:
+    """
+    一次遍历计算括号配对：开括号下标 -> 闭括号下标
+
+    模板插值 ${ 与结束它的 TEMPLATE_MIDDLE/TEMPLATE_TAIL 同样配对。
+    未闭合的开括号不出现在结果中。
+    """
+    pairs: Dict[int, int] = {}
+    stack: List[Tuple[str, int]] = []
+    open_counts = {'(': 0, '[': 0, '{': 0, '${': 0}
+
+    def close(opener: str, i: int):
+        if not open_counts[opener]:
+            return
+        while True:
+            kind, j = stack.pop()
+            open_counts[kind] -= 1
+            if kind == opener:
+                pairs[j] = i
+                return
+
+    for i, tok in enumerate(tokens):
+        if tok.kind == PUNCT:
+            if tok.value in OPEN_BRACKETS:
+                stack.append((tok.value, i))
+                open_counts[tok.value] += 1
+            elif tok.value in CLOSE_BRACKETS:
+                close(CLOSE_BRACKETS[tok.value], i)
+        elif tok.kind in (TEMPLATE_MIDDLE, TEMPLATE_TAIL):
+            close('${', i)
+            if tok.kind == TEMPLATE_MIDDLE:
+                stack.append(('${', i))
+                open_counts['${'] += 1
+        elif tok.kind == TEMPLATE_HEAD:
+            stack.append(('${', i))
+            open_counts['${'] += 1
+    return pairs
+
+
+def brackets_balanced(tokens: Sequence[Token], pairs: Optional[Dict[int, int]] = None) -> bool:
+    """全部括号（含模板插值）是否一一配对"""
+    if pairs is None:
+        pairs = match_brackets(tokens)
+    opens = closes = 0
+    for tok in tokens:
+        if tok.kind == PUNCT:
+            if tok.value in OPEN_BRACKETS:
+                opens += 1
+            elif tok.value in CLOSE_BRACKETS:
+                closes += 1
+        elif tok.kind == TEMPLATE_HEAD:
+            opens += 1
+        elif tok.kind == TEMPLATE_MIDDLE:
+            opens += 1
+            closes += 1
+        elif tok.kind == TEMPLATE_TAIL:
+            closes += 1
+    return opens == closes == len(pairs)
+
+
+class CallSite(NamedTuple):
+    name: str
+    index: int        # 被调用标识符的 token 下标
+    open: int         # ( 的下标
+    close: int        # 配对 ) 的下标（未闭合时为 -1）
+    args: List[Tuple[int, int]]  # 每个实参的 [start, end) token 下标区间
+
+
+def split_args(tokens: Sequence[Token], open_idx: int, close_idx: int) -> List[Tuple[int, int]]:
+    """按顶层逗号切分括号内的实参"""
+    args = []
+    if close_idx < 0:
+        return args
+    inner_depth = tokens[open_idx].depth + 1
+    start = open_idx + 1
+    for i in range(open_idx + 1, close_idx):
+        tok = tokens[i]
+        if tok.kind == PUNCT and tok.value == ',' and tok.depth == inner_depth:
+            args.append((start, i))
+            start = i + 1
+    if start < close_idx:
+        args.append((start, close_idx))
+    return args
+
+
+def find_calls(tokens: Sequence[Token], names: Iterable[str],
+               pairs: Optional[Dict[int, int]] = None) -> Iterator[CallSite]:
+    """
+    找出对指定标识符的调用，如 prisma.$queryRawUnsafe(...)
+
+    只匹配 IDENT token，字符串和注释里出现的同名文本不会命中。
+    泛型调用 fn<T>(...) 不做处理。
+    """
+    names = set(names)
+    if pairs is None:
+        pairs = match_brackets(tokens)
+    for i, tok in enumerate(tokens):
+        if tok.kind != IDENT or tok.value not in names:
+            continue
+        j = i + 1
+        if j < len(tokens) and tokens[j].value == '?.':
+            j += 1
+        if j < len(tokens) and tokens[j].kind == PUNCT and tokens[j].value == '(':
+            close = pairs.get(j, -1)
+            yield CallSite(tok.value, i, j, close, split_args(tokens, j, close))
+
+
+def is_call_reference(tokens: Sequence[Token], index: int) -> bool:
+    """标识符之后紧跟 ( 即视为调用"""
+    j = index + 1
+    if j < len(tokens) and tokens[j].value == '?.':
+        j += 1
+    return j < len(tokens) and tokens[j].kind == PUNCT and tokens[j].value == '('
+
+
+class FunctionSpan(NamedTuple):
+    name: str
+    start: int        # 第一个 token（export/async/function）的下标
+    params_open: int
+    body_open: int    # 函数体 { 的下标
+    body_close: int   # 配对 } 的下标（未闭合时为 -1）
+    exported: bool
+    is_async: bool
+
+
+# 出现在这些 token 之后的 { 属于类型注解，而不是函数体
+_TYPE_CONTEXT = {':', '<', '|', '&', ',', '(', '=>', '?'}
+
+
+def find_function_declarations(tokens: Sequence[Token], names: Optional[Iterable[str]] = None,
+                               pairs: Optional[Dict[int, int]] = None) -> Iterator[FunctionSpan]:
+    """
+    找出 [export] [async] function NAME(...) [: Type] { ... } 形式的函数声明
+
+    通过括号配对确定函数体边界，字符串、注释和模板里的括号不影响结果。
+    """
+    wanted = set(names) if names is not None else None
+    if pairs is None:
+        pairs = match_brackets(tokens)
+    n = len(tokens)
+    for i, tok in enumerate(tokens):
+        if tok.kind != IDENT or tok.value != 'function':
+            continue
+        j = i + 1
+        if j < n and tokens[j].value == '*':
+            j += 1
+        if j >= n or tokens[j].kind != IDENT:
+            continue
+        name = tokens[j].value
+        if wanted is not None and name not in wanted:
+            continue
+        params_open = j + 1
+        if params_open >= n or tokens[params_open].value != '(':
+            continue
+        params_close = pairs.get(params_open, -1)
+        if params_close < 0:
+            continue
+
+        # 跳过返回值类型注解，找到函数体的 {
+        body_open = -1
+        k = params_close + 1
+        while k < n:
+            t = tokens[k]
+            if t.kind == PUNCT and t.value == '{' and tokens[k - 1].value not in _TYPE_CONTEXT:
+                body_open = k
+                break
+            if t.kind == PUNCT and t.value in ('{', '(', '[') and k in pairs:
+                k = pairs[k] + 1
+                continue
+            if t.kind == PUNCT and t.value in (';', '}'):
+                break
+            k += 1
+        if body_open < 0:
+            continue
+
+        start = i
+        is_async = False
+        exported = False
+        if start > 0 and tokens[start - 1].kind == IDENT and tokens[start - 1].value == 'async':
+            start -= 1
+            is_async = True
+        if start > 0 and tokens[start - 1].kind == IDENT and tokens[start - 1].value == 'export':
+            start -= 1
+            exported = True
+        yield FunctionSpan(name, start, params_open, body_open,
+                           pairs.get(body_open, -1), exported, is_async)
+
+
+Pattern = Sequence[Union[str, Tuple[str, ...]]]
+
+
+def match_sequence(tokens: Sequence[Token], index: int, pattern: Pattern) -> bool:
+    """
+    判断从 index 开始的 token 是否依次匹配 pattern
+
+    pattern 的每一项可以是 token 类型常量（如 IDENT，只按类型比较）、
+    具体的 token 文本（如 ':'、'any'），或由它们组成的元组（任一匹配即可）。
+    """
+    if index + len(pattern) > len(tokens):
+        return False
+    for offset, expected in enumerate(pattern):
+        tok = tokens[index + offset]
+        options = expected if isinstance(expected, tuple) else (expected,)
+        if not any(tok.kind == opt if opt in KINDS else
+                   (tok.value == opt and tok.kind in (PUNCT, IDENT))
+                   for opt in options):
+            return False
+    return True
+
+
+def statement_end(tokens: Sequence[Token], index: int) -> int:
+    """从 index 开始，找到同一深度上结束该语句的 ; 的下标（找不到时返回 -1）"""
+    depth = tokens[index].depth
+    for k in range(index, len(tokens)):
+        tok = tokens[k]
+        if tok.depth < depth:
+            return -1
+        if tok.kind == PUNCT and tok.value == ';' and tok.depth == depth:
+            return k
+    return -1
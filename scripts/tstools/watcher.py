@@ -0,0 +1,219 @@
+"""
+源码目录变更监听
+
+Linux 上通过 ctypes 直接调用 inotify（不依赖第三方包），
+其他平台、libc 不可用或 watch 数量超出上限时退回按间隔轮询 stat。
+两种实现都提供同样的接口：fileno() 可交给 select，changes() 非阻塞地
+返回自上次调用以来变化（新增/修改/删除）的源码文件集合。
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple
+
+from tstools.scan_engine import SKIP_DIRS, SOURCE_EXTENSIONS, iter_source_files
+
+# 轮询间隔（秒）
+POLL_INTERVAL = 1.0
+
+# inotify 事件掩码（<sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# 只关心写完、重命名（原子写回）、新建和删除；不监听 IN_MODIFY，避免读到写了一半的文件
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_EVENT = struct.Struct('iIII')
+
+
+class WatchUnavailable(Exception):
+    """inotify 不可用（非 Linux、libc 缺少符号或 watch 数量超限）"""
+
+
+def is_source(path: Path, extensions: Sequence[str] = SOURCE_EXTENSIONS) -> bool:
+    return path.name.endswith(tuple(extensions))
+
+
+class PollingWatcher:
+    """按间隔比较 (size, mtime) 的轮询实现"""
+
+    backend = 'polling'
+    overflowed = False
+
+    def __init__(self, root: Path, dirs: Iterable[str], interval: float = POLL_INTERVAL):
+        self.root = Path(root)
+        self.dirs = list(dirs)
+        self.interval = interval
+        self._last = 0.0
+        self._snapshot = self._stat_all()
+
+    def _stat_all(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for path in iter_source_files(self.root, self.dirs):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            snapshot[path] = (st.st_size, st.st_mtime_ns)
+        self._last = time.monotonic()
+        return snapshot
+
+    def fileno(self) -> Optional[int]:
+        return None
+
+    def timeout(self) -> Optional[float]:
+        """距离下一次轮询的秒数（交给 select）"""
+        return max(0.0, self._last + self.interval - time.monotonic())
+
+    def changes(self, force: bool = False) -> Set[Path]:
+        if not force and time.monotonic() - self._last < self.interval:
+            return set()
+        current = self._stat_all()
+        changed = {p for p, sig in current.items() if self._snapshot.get(p) != sig}
+        changed.update(p for p in self._snapshot if p not in current)
+        self._snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """递归监听目录树的 inotify 实现"""
+
+    backend = 'inotify'
+
+    def __init__(self, root: Path, dirs: Iterable[str]):
+        if not sys.platform.startswith('linux'):
+            raise WatchUnavailable(sys.platform)
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        try:
+            self._libc = ctypes.CDLL(libc_name, use_errno=True)
+            self._libc.inotify_init1
+            self._libc.inotify_add_watch
+        except (OSError, AttributeError) as e:
+            raise WatchUnavailable(str(e))
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.root = Path(root)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise WatchUnavailable(os.strerror(ctypes.get_errno()))
+        self._dirs: Dict[int, Path] = {}
+        # 事件队列溢出（或新目录无法监听）时置位，调用方需要整体重扫
+        self.overflowed = False
+        try:
+            for dir_name in dirs:
+                base = self.root / dir_name
+                if base.is_dir():
+                    self._watch_tree(base)
+        except WatchUnavailable:
+            self.close()
+            raise
+
+    def _watch_tree(self, base: Path) -> Set[Path]:
+        """监听 base 及其全部子目录，返回其中已有的源码文件"""
+        found = set()
+        for current, subdirs, filenames in os.walk(base):
+            subdirs[:] = [d for d in subdirs if d not in SKIP_DIRS]
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(current), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise WatchUnavailable("inotify watch 数量超过 fs.inotify.max_user_watches")
+                if err in (errno.ENOENT, errno.ENOTDIR):
+                    continue
+                raise WatchUnavailable(os.strerror(err))
+            self._dirs[wd] = Path(current)
+            found.update(Path(current) / f for f in filenames if is_source(Path(f)))
+        return found
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def timeout(self) -> Optional[float]:
+        return None
+
+    def _read_events(self) -> bytes:
+        chunks = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            chunks.append(data)
+        return b''.join(chunks)
+
+    def changes(self, force: bool = False) -> Set[Path]:
+        changed: Set[Path] = set()
+        data = self._read_events()
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, name_len = _EVENT.unpack_from(data, offset)
+            raw_name = data[offset + _EVENT.size:offset + _EVENT.size + name_len].rstrip(b'\0')
+            offset += _EVENT.size + name_len
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._dirs[wd]
+                continue
+            if not raw_name:
+                continue
+            path = directory / os.fsdecode(raw_name)
+            if mask & IN_ISDIR:
+                if path.name in SKIP_DIRS:
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # 新目录（如 git checkout 建出的目录）里可能已经有文件
+                    try:
+                        changed.update(self._watch_tree(path))
+                    except WatchUnavailable as e:
+                        print(f"⚠️  无法监听新目录 {path}: {e}")
+                        self.overflowed = True
+                else:
+                    # 目录被删除或移走：其中的文件由调用方按前缀清理
+                    changed.add(path)
+                continue
+            if is_source(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def open_watcher(root: Path, dirs: Iterable[str], polling: bool = False,
+                 interval: float = POLL_INTERVAL):
+    """优先使用 inotify，不可用时退回轮询"""
+    dirs = list(dirs)
+    if not polling:
+        try:
+            return InotifyWatcher(root, dirs)
+        except WatchUnavailable as e:
+            print(f"inotify 不可用（{e}），改为每 {interval:g}s 轮询")
+    return PollingWatcher(root, dirs, interval=interval)
@@ -2,65 +2,33 @@
 """
 批量更新管理员API权限中间件
 将所有使用getAdminFromRequest的API统一使用AdminPermissionManager
+
+--build-manifest 作为构建步骤，静态提取每个管理后台路由方法所需的权限，
+生成 lib/generated/admin-route-permissions.{json,ts} 查找表（见 tstools/route_permissions.py），
+并报告没有权限守卫的路由方法。
 """
 
+import argparse
+import json
 import os
-import re
+import sys
+from dataclasses import asdict
 from pathlib import Path
 
-# API文件路径及其对应的权限配置
-API_PERMISSION_CONFIG = {
-    # Batch 2: 财务相关 (stats:read)
-    'app/api/admin/financial/costs/route.ts': {'read': 'stats', 'write': 'stats'},
-    'app/api/admin/financial/reports/route.ts': {'read': 'stats', 'write': 'stats'},
-    'app/api/admin/financial/withdrawals/route.ts': {'read': 'stats', 'write': 'stats'},
-    'app/api/admin/financial/profits/route.ts': {'read': 'stats', 'write': 'stats'},
-    'app/api/admin/financial/revenue/route.ts': {'read': 'stats', 'write': 'stats'},
-    
-    # Batch 3: 成本监控 (stats:read)
-    'app/api/admin/costs/breakdown/route.ts': {'read': 'stats'},
-    'app/api/admin/costs/trends/route.ts': {'read': 'stats'},
-    'app/api/admin/costs/roi/route.ts': {'read': 'stats'},
-    'app/api/admin/costs/daily/route.ts': {'read': 'stats'},
-    
-    # Batch 4: 用户管理 (users:read/users:write)
-    'app/api/admin/users/route.ts': {'read': 'users', 'write': 'users'},
-    'app/api/admin/users/[id]/route.ts': {'read': 'users', 'write': 'users'},
-    'app/api/admin/users/segments/route.ts': {'read': 'users'},
-    'app/api/admin/users/spending/route.ts': {'read': 'users'},
-    'app/api/admin/users/retention/route.ts': {'read': 'users'},
-    'app/api/admin/users/engagement/route.ts': {'read': 'users'},
-    'app/api/admin/users/behavior/route.ts': {'read': 'users'},
-    
-    # Batch 5: 产品和订单
-    'app/api/admin/products/route.ts': {'read': 'products', 'write': 'products'},
-    'app/api/admin/products/[id]/route.ts': {'read': 'products', 'write': 'products'},
-    'app/api/admin/products/trending/route.ts': {'read': 'products'},
-    'app/api/admin/products/profit/route.ts': {'read': 'products'},
-    'app/api/admin/products/conversion/route.ts': {'read': 'products'},
-    'app/api/admin/products/performance/route.ts': {'read': 'products'},
-    'app/api/admin/orders/route.ts': {'read': 'orders', 'write': 'orders'},
-    
-    # Batch 6: 抽奖管理
-    'app/api/admin/lottery/draw/route.ts': {'read': 'lottery', 'write': 'lottery'},
-    'app/api/admin/lottery/rounds/route.ts': {'read': 'lottery', 'write': 'lottery'},
-    'app/api/admin/lottery/data-fix/route.ts': {'write': 'lottery'},
-    
-    # Batch 7: 提现管理
-    'app/api/admin/withdrawals/route.ts': {'read': 'withdrawals', 'write': 'withdrawals'},
-    
-    # Batch 8: 晒单管理
-    'app/api/admin/show-off/posts/route.ts': {'read': 'users', 'write': 'users'},
-    
-    # Batch 9: 风险控制
-    'app/api/admin/risk-stats/route.ts': {'read': 'system'},
-    'app/api/admin/risk-rules/route.ts': {'read': 'system', 'write': 'system'},
-    'app/api/admin/risk-users/route.ts': {'read': 'system', 'write': 'system'},
-    'app/api/admin/risk-events/route.ts': {'read': 'system', 'write': 'system'},
-    
-    # Batch 10: 其他
-    'app/api/admin/stats/route.ts': {'read': 'stats'},
-    'app/api/admin/rate-limit/route.ts': {'read': 'system', 'write': 'system'},
+from tstools import findings, paths, profiling, regex_guard, route_permissions
+from tstools.rewrite_engine import REWRITE_RULES, atomic_write
+from tstools.routes import ADMIN_API_DIR, PUBLIC_ADMIN_ROUTES, discover_routes, handler_insert_pos, route_key
+from tstools.scan_engine import ScanStats
+from tstools.ts_lexer import IDENT, PUNCT, STRING, tokenize_all
+
+# 改动记录的规则ID -> 说明
+RULES = dict(REWRITE_RULES, **{'permission-domain-unknown': "未能推断权限域"})
+
+# 权限清单的检查结果：清单分类 -> (规则ID, 级别, 说明)
+MANIFEST_RULES = {
+    'unguarded': ('admin-route-unguarded', 'error', "管理后台路由方法没有任何权限守卫"),
+    'unresolved': ('admin-route-unresolved', 'warning', "权限中间件的权限无法静态解析，未写入查找表"),
+    'legacy': ('admin-route-legacy-guard', 'warning', "只有 getAdminFromRequest 校验，没有具体权限"),
 }
 
 def get_import_section(permissions):
@@ -89,80 +57,231 @@ const withWritePermission = AdminPermissionManager.createPermissionMiddleware({{
     
     return '\n'.join(declarations)
 
-def process_api_file(file_path, permissions, base_dir):
-    """处理单个API文件"""
-    full_path = os.path.join(base_dir, file_path)
+def last_import_end(content, tokens=None):
+    """
+    返回最后一条顶层import语句所在行之后的位置（没有import时返回-1）
+
+    基于token判断语句边界，多行import、没有分号的import都能正确处理，
+    import()动态导入和import.meta不计在内。tokens 为已有的词法分析结果（可选）。
+    """
+    if tokens is None:
+        tokens = tokenize_all(content)
+    insert_pos = -1
+    for i, tok in enumerate(tokens):
+        if tok.kind != IDENT or tok.value != 'import' or tok.depth != 0:
+            continue
+        if i + 1 < len(tokens) and tokens[i + 1].value in ('(', '.'):
+            continue
+        # 模块路径字符串之后（可选的分号）就是语句结尾
+        k = i + 1
+        while k < len(tokens) and not (tokens[k].kind == STRING and tokens[k].depth == 0):
+            k += 1
+        if k >= len(tokens):
+            break
+        if k + 1 < len(tokens) and tokens[k + 1].kind == PUNCT and tokens[k + 1].value == ';':
+            k += 1
+        line_end = content.find('\n', tokens[k].end)
+        insert_pos = len(content) if line_end < 0 else line_end + 1
+    return insert_pos
+
+def add_permission_middleware(content, permissions, tokens=None):
+    """
+    添加权限中间件的imports和声明，返回 (新内容, 改动说明列表)
+
+    tokens 为 content 已有的词法分析结果（可选）。
+    """
+    # 添加imports
+    import_section = get_import_section(permissions)
+    
+    # 在最后一个import语句后插入
+    with profiling.rule('last_import_end') as r:
+        insert_pos = last_import_end(content, tokens)
+        r.matches = int(insert_pos >= 0)
+    if insert_pos >= 0:
+        content = content[:insert_pos] + '\n' + import_section + '\n' + content[insert_pos:]
+    
+    # 添加中间件声明
+    middleware_declarations = get_middleware_declarations(permissions)
+    
+    # 在第一个导出的HTTP方法（及其上方紧贴的注释）之前插入
+    with profiling.rule('handler_insert_pos') as r:
+        insert_pos = handler_insert_pos(content)
+        r.matches = int(insert_pos >= 0)
+    if insert_pos >= 0:
+        content = content[:insert_pos] + middleware_declarations + '\n\n' + content[insert_pos:]
     
-    if not os.path.exists(full_path):
-        print(f"⚠️  文件不存在: {file_path}")
+    scopes = ', '.join(f"{k}: {v}" for k, v in permissions.items())
+    return content, [f"添加权限中间件imports和声明（{scopes}）"]
+
+def process_api_file(route, base_dir, stream=None):
+    """
+    处理单个API文件
+
+    route 为路由清单条目，是否需要处理、使用哪个权限域都已在清单中确定，
+    不需要处理的文件不会被再次打开。给出 stream 时同时写出改动记录。
+    """
+    def emit(rule, level, message):
+        if stream is not None:
+            stream.emit(findings.record('change', rule, level, file_path, message))
+
+    file_path = route.path
+    
+    if route.uses_permission_manager:
+        print(f"✓  已处理: {file_path}")
+        return True
+    
+    # 检查是否使用getAdminFromRequest或没有权限验证
+    if not route.uses_get_admin and not route.uses_supabase:
+        print(f"⊘  无需处理: {file_path}")
+        return True
+    
+    permissions = route.permissions
+    if not permissions:
+        print(f"⚠️  未能推断权限域: {file_path}（请在 tstools/routes.py 的 DOMAIN_RULES 中补充）")
+        emit('permission-domain-unknown', 'warning', "未能推断权限域，请在 tstools/routes.py 的 DOMAIN_RULES 中补充")
         return False
     
+    full_path = os.path.join(base_dir, file_path)
+    
     try:
-        with open(full_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 检查是否已经有AdminPermissionManager
-        if 'AdminPermissionManager' in content:
-            print(f"✓  已处理: {file_path}")
-            return True
-        
-        # 检查是否使用getAdminFromRequest或没有权限验证
-        if 'getAdminFromRequest' not in content and '@supabase/supabase-js' not in content:
-            print(f"⊘  无需处理: {file_path}")
-            return True
-        
-        # 添加imports
-        import_section = get_import_section(permissions)
-        
-        # 查找第一个import语句后插入
-        import_pattern = r'(import .+?;\n)'
-        last_import_match = None
-        for match in re.finditer(import_pattern, content):
-            last_import_match = match
+        with profiling.phase('read'):
+            with open(full_path, 'r', encoding='utf-8') as f:
+                content = f.read()
         
-        if last_import_match:
-            insert_pos = last_import_match.end()
-            content = content[:insert_pos] + '\n' + import_section + '\n' + content[insert_pos:]
-        
-        # 添加中间件声明
-        middleware_declarations = get_middleware_declarations(permissions)
-        
-        # 在第一个export function之前插入
-        export_pattern = r'(//[^\n]*\nexport async function (GET|POST|PUT|DELETE|PATCH))'
-        match = re.search(export_pattern, content)
-        if match:
-            insert_pos = match.start()
-            content = content[:insert_pos] + middleware_declarations + '\n\n' + content[insert_pos:]
+        content, changes = add_permission_middleware(content, permissions)
         
         # 保存文件
-        with open(full_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        with profiling.phase('write'):
+            atomic_write(full_path, content)
         
         print(f"✓  已更新imports和middleware: {file_path}")
+        for change in changes:
+            emit('rewrite', 'note', change)
         return True
         
     except Exception as e:
         print(f"✗  处理失败: {file_path} - {str(e)}")
+        emit('rewrite-error', 'error', str(e))
         return False
 
+def print_manifest(routes):
+    """打印管理后台路由清单"""
+    print(f"{'路由':<44}{'方法':<28}{'权限域':<12}状态")
+    for route in routes:
+        if route.uses_permission_manager:
+            status = "AdminPermissionManager"
+        elif route.uses_get_admin:
+            status = "getAdminFromRequest"
+        elif route.uses_supabase:
+            status = "supabase"
+        else:
+            status = "-"
+        print(f"{route_key(route.path):<44}{','.join(route.methods):<28}{route.domain or '-':<12}{status}")
+
+def build_permission_manifest(args, base_dir):
+    """构建步骤：生成路由权限查找表并报告缺少守卫的路由，返回退出码"""
+    stats = ScanStats()
+    guards = route_permissions.discover_guards(base_dir, workers=args.workers, stats=stats,
+                                               budget=args.file_budget)
+    manifest = route_permissions.build_manifest(guards)
+    with profiling.phase('write'):
+        for path, text in ((args.manifest_json or base_dir / route_permissions.JSON_FILE,
+                            route_permissions.render_json(manifest)),
+                           (args.manifest_ts or base_dir / route_permissions.TS_FILE,
+                            route_permissions.render_ts(manifest))):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(path, text)
+            print(f"已生成: {path}")
+    
+    rules = {rule: text for rule, _, text in MANIFEST_RULES.values()}
+    with findings.from_args(args, 'update-api-permissions', rules=rules) as stream:
+        for kind, (rule, level, message) in MANIFEST_RULES.items():
+            for item in manifest[kind]:
+                stream.emit(findings.record('finding', rule, level, item['file'], message,
+                                            route=item['route'], methods=item['methods']))
+        stream.close(routes=len(manifest['routes']), skipped=stats.skipped,
+                     **{kind: len(manifest[kind]) for kind in MANIFEST_RULES})
+    
+    methods = sum(len(entry) for entry in manifest['routes'].values())
+    print(f"查找表: {len(manifest['routes'])} 个路由，{methods} 个方法（扫描: {stats.summary()}）")
+    icons = {'unguarded': "❌ 没有权限守卫", 'unresolved': "⚠️  权限无法解析", 'legacy': "⚠️  旧的校验"}
+    for kind in MANIFEST_RULES:
+        for item in manifest[kind]:
+            print(f"{icons[kind]}: {item['route']} {','.join(item['methods'])} ({item['file']})")
+    for path in stats.skipped:
+        print(f"⏱️ 超时跳过（不在查找表中）: {path}")
+    return 1 if args.fail_on_unguarded and manifest['unguarded'] else 0
+
 def main():
-    base_dir = '/workspace/luckymart-tj'
+    parser = argparse.ArgumentParser(description="批量更新管理员API权限中间件")
+    paths.add_root_argument(parser)
+    parser.add_argument('--workers', '-j', type=int, help="并行进程数（默认CPU核数）")
+    parser.add_argument('--discover', action='store_true', help="只输出路由清单，不修改文件")
+    parser.add_argument('--json', type=Path, metavar='FILE', help="把完整路由清单写入JSON文件")
+    manifest_group = parser.add_argument_group("路由权限查找表（构建步骤）")
+    manifest_group.add_argument('--build-manifest', action='store_true',
+                                help="生成路由+方法 -> 权限的查找表，不修改路由文件")
+    manifest_group.add_argument('--manifest-json', type=Path, metavar='FILE',
+                                help=f"JSON 输出（默认 <root>/{route_permissions.JSON_FILE}）")
+    manifest_group.add_argument('--manifest-ts', type=Path, metavar='FILE',
+                                help=f"TypeScript 输出（默认 <root>/{route_permissions.TS_FILE}）")
+    manifest_group.add_argument('--fail-on-unguarded', action='store_true',
+                                help="有没有权限守卫的路由方法时退出码为1")
+    regex_guard.add_budget_argument(parser)
+    profiling.add_profile_arguments(parser)
+    findings.add_output_arguments(parser)
+    args = parser.parse_args()
+    
+    base_dir = args.root.resolve()
+    profiler = profiling.from_args(args, 'update-api-permissions', base_dir)
+    
+    if args.build_manifest:
+        status = build_permission_manifest(args, base_dir)
+        if profiler is not None:
+            profiler.finish()
+            print(profiler.summary())
+        return status
+    
+    stats = ScanStats()
+    routes = discover_routes(base_dir, workers=args.workers, stats=stats, budget=args.file_budget)
+    admin_routes = [r for r in routes if r.is_admin]
+    for path in stats.skipped:
+        print(f"⏱️ 超时跳过（不在清单中）: {path}")
+    
+    if args.json:
+        manifest = [dict(asdict(r), permissions=r.permissions) for r in routes]
+        args.json.write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        print(f"路由清单已写入: {args.json}")
+    
+    if args.discover:
+        with profiling.phase('report'):
+            print_manifest(admin_routes)
+            print()
+            print(f"共 {len(routes)} 个路由，其中管理后台 {len(admin_routes)} 个（扫描: {stats.summary()}）")
+        if profiler is not None:
+            profiler.finish()
+            print(profiler.summary())
+        return
     
     print("=" * 60)
     print("开始批量更新API权限中间件")
     print("=" * 60)
+    print(f"路由清单: {ADMIN_API_DIR} 下 {len(admin_routes)} 个路由（扫描: {stats.summary()}）")
     print()
     
     success_count = 0
     fail_count = 0
-    skip_count = 0
     
-    for file_path, permissions in API_PERMISSION_CONFIG.items():
-        result = process_api_file(file_path, permissions, base_dir)
-        if result:
-            success_count += 1
-        else:
-            fail_count += 1
+    with findings.from_args(args, 'update-api-permissions', rules=RULES) as stream:
+        for route in admin_routes:
+            if route_key(route.path) in PUBLIC_ADMIN_ROUTES:
+                continue
+            result = process_api_file(route, base_dir, stream)
+            if result:
+                success_count += 1
+            else:
+                fail_count += 1
+        stream.close(succeeded=success_count, failed=fail_count, skipped=stats.skipped)
     
     print()
     print("=" * 60)
@@ -172,8 +291,13 @@ def main():
     print("=" * 60)
     print()
     print("⚠️  注意: 此脚本只添加了imports和middleware声明")
-    print("   仍需手动修改每个HTTP方法函数以使用权限中间件")
+    print("   接着运行 python3 scripts/wrap_user_apis.py 把各HTTP方法包装到权限中间件中")
+    print("   （或用 python3 scripts/run-hygiene.py --fix 在同一次遍历中完成这两步）")
     print("=" * 60)
+    
+    if profiler is not None:
+        profiler.finish()
+        print(profiler.summary())
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -1,112 +1,267 @@
 #!/usr/bin/env python3
 """
-批量更新已有imports但未包装方法的API文件
+把管理后台API的HTTP方法包装到权限中间件中
+
+对 app/api/admin 下每个 route.ts，找到导出的 GET/POST/PUT/DELETE/PATCH 函数，
+移除旧的 getAdminFromRequest 手工校验，并把函数体包装为
+    return withReadPermission(async (request, admin) => { ... })(request);
+读方法使用 withReadPermission，写方法使用 withWritePermission。
+函数边界通过词法分析和括号配对确定，不依赖代码格式。
 """
 
-import re
+import argparse
+import bisect
 from pathlib import Path
 
-def wrap_get_method(content):
-    """包装GET方法并移除旧的权限验证"""
-    # 找到GET方法的开始
-    pattern = r'(// GET - [^\n]+\nexport async function GET\(request: NextRequest\)) \{\n  const logger = getLogger\(\);\n\n  try \{\n    // 验证管理员权限\n    const admin = getAdminFromRequest\(request\);\n    if \(!admin\) \{[^}]+\}\n\n    // 检查[^}]+\}\n'
-    
-    replacement = r'\1 {\n  return withReadPermission(async (request, admin) => {\n    const logger = getLogger();\n\n    try {\n'
-    
-    content = re.sub(pattern, replacement, content, flags=re.DOTALL)
-    
-    # 找到GET方法的结束，添加闭包
-    # 查找最后一个独立的 } catch 块
-    pattern2 = r'(\n  \} catch \(error: any\) \{\n    logger\.error\([^)]+\);?\n    return NextResponse\.json\(\{[^}]+\}, \{ status: 500 \}\);\n  \}\n\})'
-    
-    replacement2 = r'\n    } catch (error: any) {\n      logger.error(\1);\n      return NextResponse.json({\2}, { status: 500 });\n    }\n  })(request);\n}'
-    
-    # 这个比较复杂，我需要更精确的模式
-    
-    return content
-
-def process_file(filepath):
-    """处理单个文件"""
-    print(f"处理: {filepath}")
-    
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # 检查是否已经包装
-    if 'return withReadPermission(async (request, admin) => {' in content:
-        print(f"  已处理，跳过")
-        return False
-    
-    # 检查是否有getAdminFromRequest需要替换
-    if 'const admin = getAdminFromRequest(request);' not in content:
-        print(f"  无需处理")
-        return False
-    
-    original = content
-    
-    # 方法1：替换GET方法开头
-    content = re.sub(
-        r'export async function GET\(request: NextRequest\) \{\n  const logger = getLogger\(\);\n\n  try \{\n    // 验证管理员权限\n    const admin = getAdminFromRequest\(request\);\n    if \(!admin\) \{\n      return NextResponse\.json\(\{[^}]+\}, \{ status: 403 \}\);\n    \}\n\n    // 检查是否有[^:]+权限\n    const hasPermission = admin\.permissions\.includes\([^)]+\) \|\| admin\.role === \'super_admin\';\n    if \(!hasPermission\) \{\n      return NextResponse\.json\(\{[^}]+\}, \{ status: 403 \}\);\n    \}',
-        'export async function GET(request: NextRequest) {\n  return withReadPermission(async (request, admin) => {\n    const logger = getLogger();\n\n    try {',
-        content,
-        flags=re.DOTALL
-    )
-    
-    # 方法2：替换GET方法结尾
-    # 查找最后一个 } 在文件中的位置
-    lines = content.split('\n')
-    
-    # 找到GET方法的结束（在下一个export前或文件末尾）
-    get_method_end = -1
-    in_get_method = False
-    brace_count = 0
-    
-    for i, line in enumerate(lines):
-        if 'export async function GET' in line:
-            in_get_method = True
-            brace_count = 0
-        
-        if in_get_method:
-            brace_count += line.count('{') - line.count('}')
-            if brace_count == 0 and i > 0:
-                get_method_end = i
-                break
-    
-    if get_method_end > 0 and content != original:
-        # 在GET方法结束前添加 })(request);
-        # 找到结尾的 } 并替换
-        # 简单策略：在catch块的最后一个}后面添加
-        content = re.sub(
-            r'(\n  \} catch \(error: any\) \{\n    logger\.error\([^\n]+\n    return NextResponse\.json\(\{[^}]+\}, \{ status: 500 \}\);\n  \}\n)\}(\n\n)',
-            r'\1  })(request);\n}\2',
-            content
-        )
-    
-    if content != original:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"  ✓ 已更新")
-        return True
+from tstools import findings, paths, profiling, regex_guard
+from tstools.rewrite_engine import REWRITE_RULES, change_records, rewrite_files
+from tstools.routes import ADMIN_API_DIR, READ_METHODS, WRITE_METHODS, discover_routes
+from tstools.scan_engine import ScanStats
+from tstools.ts_lexer import (IDENT, TEMPLATE, TEMPLATE_HEAD, TEMPLATE_MIDDLE, TEMPLATE_TAIL,
+                              brackets_balanced, find_function_declarations, match_brackets, match_sequence,
+                              statement_end, tokenize_all)
+
+READ_MIDDLEWARE = 'withReadPermission'
+WRITE_MIDDLEWARE = 'withWritePermission'
+WRAPPED_METHODS = sorted(READ_METHODS | WRITE_METHODS)
+
+INDENT = '  '
+
+# 旧的手工权限校验
+OLD_GUARD = ('const', 'admin', '=', 'getAdminFromRequest', '(', IDENT, ')', ';')
+ADMIN_CHECK = ('if', '(', '!', 'admin', ')', '{')
+PERMISSION_CONST = ('const', 'hasPermission', '=')
+PERMISSION_CHECK = ('if', '(', '!', 'hasPermission', ')', '{')
+
+_MULTILINE_KINDS = {TEMPLATE, TEMPLATE_HEAD, TEMPLATE_MIDDLE, TEMPLATE_TAIL}
+
+
+def line_start(content, pos):
+    return content.rfind('\n', 0, pos) + 1
+
+
+def line_end(content, pos):
+    """pos 所在行结尾（含换行符）之后的位置"""
+    end = content.find('\n', pos)
+    return len(content) if end < 0 else end + 1
+
+
+def leading_comments_start(content, pos):
+    """向上跳过紧贴在 pos 所在行之前的 // 注释行"""
+    start = line_start(content, pos)
+    while start > 0:
+        prev = line_start(content, start - 1)
+        if not content[prev:start].strip().startswith('//'):
+            break
+        start = prev
+    return start
+
+
+def old_guard_range(content, tokens, pairs, first, last):
+    """
+    在 tokens[first:last] 中查找旧的管理员校验代码，返回要删除的 (start, end)
+
+    依次匹配 const admin = getAdminFromRequest(request); if (!admin) {...}
+    以及可选的 const hasPermission = ...; if (!hasPermission) {...}，
+    连同它们上方的注释一起删除。
+    """
+    for i in range(first, last):
+        if not match_sequence(tokens, i, OLD_GUARD):
+            continue
+        end_idx = i + len(OLD_GUARD) - 1
+        k = end_idx + 1
+        if match_sequence(tokens, k, ADMIN_CHECK) and pairs.get(k + 5, -1) > 0:
+            end_idx = pairs[k + 5]
+            k = end_idx + 1
+        if match_sequence(tokens, k, PERMISSION_CONST):
+            stmt_end = statement_end(tokens, k)
+            if 0 < stmt_end < last:
+                end_idx = stmt_end
+                k = stmt_end + 1
+                if match_sequence(tokens, k, PERMISSION_CHECK) and pairs.get(k + 5, -1) > 0:
+                    end_idx = pairs[k + 5]
+        start = leading_comments_start(content, tokens[i].start)
+        end = line_end(content, tokens[end_idx].end)
+        # 删除后紧跟的空行若接在空行或 { 之后，一并删除
+        prev_line = content[line_start(content, start - 1):start].strip() if start > 0 else ''
+        if prev_line in ('', '{') or prev_line.endswith('{'):
+            if end < len(content) and not content[end:line_end(content, end)].strip():
+                end = line_end(content, end)
+        return start, end
+    return None
+
+
+def is_wrapped(tokens, func):
+    """函数体中是否已经调用了 withXxxPermission(...)"""
+    for k in range(func.body_open + 1, func.body_close):
+        tok = tokens[k]
+        if (tok.kind == IDENT and tok.value.startswith('with') and tok.value.endswith('Permission')
+                and tokens[k + 1].value == '('):
+            return True
+    return False
+
+
+def wrap_body(content, tokens, func, middleware, param, removed, multiline):
+    """生成包装后的函数体（含两侧花括号之间的全部文本）"""
+    body_start = tokens[func.body_open].end
+    body_end = tokens[func.body_close].start
+    base = content[line_start(content, tokens[func.start].start):tokens[func.start].start]
+    base = base[:len(base) - len(base.lstrip())]
+
+    parts = []
+    pos = body_start
+    if content[body_start:body_end].startswith('\n'):
+        # 逐行增加一级缩进；多行模板字符串内部的行保持原样
+        line = body_start + 1
+        while line < body_end:
+            if removed and removed[0] <= line < removed[1]:
+                parts.append(content[pos:removed[0]])
+                pos = line = removed[1]
+                continue
+            nxt = line_end(content, line)
+            idx = bisect.bisect_right(multiline, (line, float('inf'))) - 1
+            inside = idx >= 0 and multiline[idx][0] < line < multiline[idx][1]
+            if not inside and content[line:min(nxt, body_end)].strip():
+                parts.append(content[pos:line])
+                parts.append(INDENT)
+                pos = line
+            line = nxt
+        parts.append(content[pos:body_end])
+        inner = ''.join(parts).rstrip(' \t')
+        if not inner.endswith('\n'):
+            inner += '\n'
     else:
-        print(f"  无变化")
-        return False
+        inner = f"\n{base}{INDENT * 2}{content[body_start:body_end].strip()}\n"
+
+    return (f"\n{base}{INDENT}return {middleware}(async ({param}, admin) => {{"
+            f"{inner}"
+            f"{base}{INDENT}}})({param});\n{base}")
+
+
+def wrap_methods(content, tokens=None, pairs=None):
+    """
+    包装文件中全部导出的HTTP方法，返回 (新内容, 改动说明列表)
+
+    tokens / pairs 为调用方已有的词法分析结果时直接复用。
+    """
+    if 'Permission' not in content:
+        return content, []
+
+    if tokens is None:
+        with profiling.rule('tokenize'):
+            tokens = tokenize_all(content)
+    if pairs is None:
+        pairs = match_brackets(tokens)
+    declared = {tokens[i + 1].value for i, tok in enumerate(tokens[:-1])
+                if tok.kind == IDENT and tok.value == 'const'}
+    multiline = sorted((tok.start, tok.end) for tok in tokens
+                       if tok.kind in _MULTILINE_KINDS and '\n' in tok.value)
+
+    edits = []
+    changes = []
+    last_end = -1
+    with profiling.rule('find_function_declarations') as r:
+        functions = list(find_function_declarations(tokens, names=WRAPPED_METHODS, pairs=pairs))
+        r.matches = len(functions)
+    for func in functions:
+        if not func.exported or func.body_close < 0 or func.start <= last_end:
+            continue
+        last_end = func.body_close
+        if is_wrapped(tokens, func):
+            continue
+        middleware = READ_MIDDLEWARE if func.name in READ_METHODS else WRITE_MIDDLEWARE
+        if middleware not in declared:
+            changes.append(f"{func.name}: 跳过，文件中没有声明 {middleware}")
+            continue
+        # 括号不配对说明文件本身已损坏，函数边界不可信，整体跳过
+        if not brackets_balanced(tokens, pairs):
+            return content, ["跳过: 文件括号不配对，无法确定函数边界"]
+        param_tok = tokens[func.params_open + 1]
+        if param_tok.kind != IDENT:
+            changes.append(f"{func.name}: 跳过，没有 request 参数")
+            continue
+
+        with profiling.rule('old_guard') as r:
+            removed = old_guard_range(content, tokens, pairs, func.body_open + 1, func.body_close)
+            r.matches = int(removed is not None)
+        with profiling.rule('wrap_body') as r:
+            body = wrap_body(content, tokens, func, middleware, param_tok.value, removed, multiline)
+            r.matches = 1
+        edits.append((tokens[func.body_open].end, tokens[func.body_close].start, body))
+        changes.append(f"{func.name}: 包装为 {middleware}")
+        if removed:
+            changes.append(f"{func.name}: 移除旧的 getAdminFromRequest 校验")
+
+    if not edits:
+        return content, []
+
+    parts = []
+    pos = 0
+    for start, end, text in edits:
+        parts.append(content[pos:start])
+        parts.append(text)
+        pos = end
+    parts.append(content[pos:])
+    return ''.join(parts), changes
+
 
 def main():
-    # 需要处理的文件列表
-    files = [
-        '/workspace/luckymart-tj/app/api/admin/users/retention/route.ts',
-        '/workspace/luckymart-tj/app/api/admin/users/engagement/route.ts',
-        '/workspace/luckymart-tj/app/api/admin/users/behavior/route.ts',
-        '/workspace/luckymart-tj/app/api/admin/users/segments/route.ts',
-        '/workspace/luckymart-tj/app/api/admin/users/spending/route.ts',
-    ]
-    
+    parser = argparse.ArgumentParser(description="把管理后台API的HTTP方法包装到权限中间件中")
+    paths.add_root_argument(parser)
+    parser.add_argument('--workers', '-j', type=int, help="并行进程数（默认CPU核数）")
+    parser.add_argument('--dry-run', action='store_true', help="只输出统一diff，不写文件")
+    regex_guard.add_budget_argument(parser)
+    profiling.add_profile_arguments(parser)
+    findings.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    root = args.root.resolve()
+    profiler = profiling.from_args(args, 'wrap_user_apis', root)
+
+    # 只处理能推断出权限域、并且已经声明了权限中间件的管理后台路由
+    discovery = ScanStats()
+    routes = [r for r in discover_routes(root, api_dir=ADMIN_API_DIR, workers=args.workers,
+                                         stats=discovery, budget=args.file_budget)
+              if r.domain is not None and r.uses_permission_manager]
+    files = [str(root / r.path) for r in routes]
+
+    stats = ScanStats()
     success_count = 0
-    for filepath in files:
-        if process_file(filepath):
-            success_count += 1
-    
-    print(f"\n处理完成: {success_count}/{len(files)} 个文件已更新")
+    stream = findings.from_args(args, 'wrap_user_apis', rules=REWRITE_RULES)
+    for result in rewrite_files(files, wrap_methods, workers=args.workers,
+                                dry_run=args.dry_run, stats=stats, root=root,
+                                budget=args.file_budget):
+        rel = Path(result.path).relative_to(root)
+        for item in change_records(result, rel.as_posix(), dry_run=args.dry_run):
+            stream.emit(item)
+        if result.error:
+            print(f"处理: {rel}\n  ✗ 处理失败: {result.error}")
+            continue
+        if not result.changed:
+            for change in result.changes:
+                print(f"⚠️  {rel}: {change}")
+            continue
+        success_count += 1
+        if args.dry_run:
+            print(result.diff, end='')
+            continue
+        print(f"处理: {rel}")
+        for change in result.changes:
+            print(f"  - {change}")
+        print(f"  ✓ 已更新")
+
+    skipped = [Path(path).relative_to(root).as_posix() for path in discovery.skipped + stats.skipped]
+    for path in skipped:
+        print(f"⏱️ 超时跳过: {path}")
+    stream.close(changed=success_count, files=len(files), dry_run=args.dry_run, skipped=skipped)
+
+    action = "需要更新" if args.dry_run else "已更新"
+    print(f"\n处理完成: {success_count}/{len(files)} 个文件{action}（{stats.summary()}）")
+
+    if profiler is not None:
+        profiler.finish()
+        print(profiler.summary())
+
 
 if __name__ == '__main__':
     main()